@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmarks the constraint solver used by ConstrainedDynamics on a box of
+rigid water molecules.
+
+Runs the geodesic position step of the constrained integrators (free
+flight, projection on the manifold, projection of the momenta on the
+cotangent space) with the different solver set-ups, and prints the time
+per step and the final violation of the constraints.
+
+Usage: python constrained_water.py [-n NWATER] [-s NSTEPS]
+"""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import argparse
+import time
+
+import numpy as np
+
+from ipi.engine.beads import Beads
+from ipi.engine.motion.constrained_dynamics import ConstraintSolver
+from ipi.utils.constrtools import (
+    ConstraintList,
+    AngleConstraint,
+    RigidBondConstraint,
+)
+
+
+def make_solver(nwater, q0, p0, single_list=False, **kwargs):
+    """Builds beads and a bound solver with rigid-water constraints."""
+
+    beads = Beads(3 * nwater, 1)
+    beads.m = np.tile([15.9994, 1.00794, 1.00794], nwater) * 1822.8885
+    beads.q[0] = q0
+    beads.p[0] = p0
+
+    clist = []
+    for i in range(nwater):
+        o, h1, h2 = 3 * i, 3 * i + 1, 3 * i + 2
+        clist.append(
+            [
+                AngleConstraint(np.array([o, h1, h2]), [1.8242]),
+                RigidBondConstraint(np.array([o, h1, o, h2]), [1.8088, 1.8088]),
+            ]
+        )
+    if single_list:
+        clist = [ConstraintList(sum(clist, []))]
+    else:
+        clist = [ConstraintList(c) for c in clist]
+    for c in clist:
+        c.bind(beads)
+
+    solver = ConstraintSolver(clist, dt=40.0, tolerance=1e-6, maxit=1000, **kwargs)
+    solver.bind(beads)
+    return solver, beads
+
+
+def main(nwater, nsteps):
+
+    prng = np.random.RandomState(12345)
+    water = np.array([[0.0, 0.0, 0.0], [1.8088, 0.0, 0.0], [-0.4538, 1.7509, 0.0]])
+    box = 6.0 * nwater ** (1.0 / 3.0)
+    q0 = (water[np.newaxis] + prng.uniform(0, box, (nwater, 1, 3))).flatten()
+    # thermal momenta at about 300 K
+    m3 = np.tile(np.repeat([15.9994, 1.00794, 1.00794], 3), nwater) * 1822.8885
+    p0 = prng.normal(size=9 * nwater) * np.sqrt(m3 * 9.5e-4)
+
+    setups = [
+        ("batched, quasi-Newton", {}),
+        ("batched, exact Newton", {"quasi_newton": False}),
+        ("per group, quasi-Newton", {"batched": False}),
+        ("per group, exact Newton", {"batched": False, "quasi_newton": False}),
+        ("single sparse list, quasi-Newton", {"single_list": True}),
+    ]
+    for label, kwargs in setups:
+        solver, beads = make_solver(nwater, q0, p0, **kwargs)
+        solver.proj_manifold()
+        solver.proj_cotangent()
+        start = time.time()
+        for i in range(nsteps):
+            beads.q[0] += beads.p[0] / beads.m3[0] * solver.dt
+            solver.proj_manifold()
+            solver.proj_cotangent()
+        elapsed = (time.time() - start) / nsteps
+        err = 0.0
+        for c in solver.constraint_list:
+            c.q = beads.q[0][c.i3_unique]
+            err = max(err, np.abs(c.g).max())
+        print("%-34s %10.3f ms/step   max |g| = %8.2e" % (label, elapsed * 1e3, err))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--nwater", type=int, default=256)
+    parser.add_argument("-s", "--nsteps", type=int, default=10)
+    args = parser.parse_args()
+    main(args.nwater, args.nsteps)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Benchmarks the nudged elastic band optimizer on the Muller-Brown surface.
+
+Relaxes a band between the two deepest minima of the Muller-Brown potential
+(drivers/pes/MB.f90), with uniform or energy-weighted springs, with or
+without the climbing image, and with the L-BFGS or FIRE optimizers.
+For each set-up prints the number of
+iterations, the number of evaluations of the band (each of them requires one
+force call per interior image, the end images are only computed once), the
+wall time and the error of the highest image with respect to the energy of
+the saddle point.
+
+Requires i-pi and i-pi-driver in the PATH.
+
+Usage: python neb_mullerbrown.py [-n NIMAGES] [-d NDRIVERS]
+"""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+
+# parameters of the potential, as in drivers/pes/MB.f90
+A0 = np.array([-200.0, -100.0, -170.0, 15.0]) * 0.004737803248674678
+A = np.array([-1.0, -1.0, -6.5, 0.7])
+B = np.array([0.0, 0.0, 11.0, 0.6])
+C = np.array([-10.0, -10.0, -6.5, 0.7])
+X0 = np.array([1.0, 0.0, -0.5, -1.0])
+Y0 = np.array([0.0, 0.5, 1.5, 1.0])
+
+minima = np.array([[-0.558224, 1.441726, 0.0], [0.623499, 0.028038, 0.0]])
+saddle = np.array([-0.822001, 0.624314])
+
+
+def mb_potential(x, y):
+    dx, dy = x - X0, y - Y0
+    return (A0 * np.exp(A * dx ** 2 + B * dx * dy + C * dy ** 2)).sum()
+
+
+input_template = """<simulation mode='static' verbosity='medium'>
+  <ffsocket mode='unix' name='mb'>
+    <latency> 1e-4 </latency>
+    <slots> {ndrivers} </slots>
+    <address> {address} </address>
+  </ffsocket>
+  <total_steps> 2000 </total_steps>
+  <output prefix='simulation'>
+    <properties stride='1' filename='neb'> [ step, {potentials} ] </properties>
+  </output>
+  <system>
+    <forces>
+      <force forcefield='mb'/>
+    </forces>
+    <initialize nbeads='{nimg}'>
+      <file mode='xyz'> init.xyz </file>
+      <cell mode='abc'> [100, 100, 100] </cell>
+    </initialize>
+    <motion mode='neb'>
+      <neb_optimizer mode='{mode}'>
+        <tolerances>
+          <energy> 1e-7 </energy> <force> 1e-4 </force> <position> 1e-4 </position>
+        </tolerances>
+        <biggest_step> 0.2 </biggest_step>
+        <fire_options>
+          <dt> 10.0 </dt> <dtmax> 100.0 </dtmax> <maxstep> 0.1 </maxstep>
+        </fire_options>
+        <spring>
+          <varsprings> {varsprings} </varsprings>
+          <kappa> 0.1 </kappa> <kappamax> 0.15 </kappamax> <kappamin> 0.05 </kappamin>
+        </spring>
+        <climb> {climb} </climb>
+      </neb_optimizer>
+    </motion>
+  </system>
+</simulation>
+"""
+
+
+def run_neb(nimg, ndrivers, mode, varsprings, climb):
+    """Runs i-PI and the drivers in a temporary directory, and returns the
+    number of iterations, the number of band evaluations, the wall time and
+    the energies of the images at the last step."""
+
+    tmp = tempfile.mkdtemp()
+    address = "nebmb%d" % os.getpid()
+    with open(os.path.join(tmp, "init.xyz"), "w") as f:
+        for i in range(nimg):
+            q = minima[0] + (minima[1] - minima[0]) * i / (nimg - 1.0)
+            f.write("1\n# positions{atomic_unit}\nH %f %f %f\n" % tuple(q))
+    with open(os.path.join(tmp, "input.xml"), "w") as f:
+        f.write(
+            input_template.format(
+                ndrivers=ndrivers,
+                address=address,
+                nimg=nimg,
+                mode=mode,
+                potentials=", ".join("potential(%d)" % i for i in range(nimg)),
+                varsprings=varsprings,
+                climb=climb,
+            )
+        )
+
+    start = time.time()
+    with open(os.path.join(tmp, "log"), "w") as log:
+        ipi = subprocess.Popen(["i-pi", "input.xml"], cwd=tmp, stdout=log)
+        time.sleep(2)
+        drivers = [
+            subprocess.Popen(
+                ["i-pi-driver", "-u", "-h", address, "-m", "MB"],
+                cwd=tmp,
+                stdout=subprocess.DEVNULL,
+            )
+            for i in range(ndrivers)
+        ]
+        ipi.wait()
+        for d in drivers:
+            d.wait()
+    elapsed = time.time() - start
+
+    nevals = 0
+    with open(os.path.join(tmp, "log")) as f:
+        for line in f:
+            if "force evaluations on the band" in line:
+                nevals = int(line.split()[-1])
+    data = np.loadtxt(os.path.join(tmp, "simulation.neb"), ndmin=2)
+    shutil.rmtree(tmp)
+    return int(data[-1, 0]) + 1, nevals, elapsed, data[-1, 1:]
+
+
+def main(nimg, ndrivers):
+
+    esaddle = mb_potential(*saddle)
+    setups = [
+        ("L-BFGS, uniform springs", "lbfgs", False, False),
+        ("L-BFGS, energy-weighted springs", "lbfgs", True, False),
+        ("L-BFGS, climbing image", "lbfgs", False, True),
+        ("L-BFGS, climbing, weighted springs", "lbfgs", True, True),
+        ("FIRE, climbing, weighted springs", "fire", True, True),
+        ("FIRE 2.0, climbing, weighted springs", "fire2", True, True),
+    ]
+    print(
+        "%-38s %6s %6s %8s %10s" % ("set-up", "iter", "evals", "time/s", "E_max-E_TS")
+    )
+    for label, mode, varsprings, climb in setups:
+        nsteps, nevals, elapsed, pots = run_neb(nimg, ndrivers, mode, varsprings, climb)
+        print(
+            "%-38s %6d %6d %8.2f %10.2e"
+            % (label, nsteps, nevals, elapsed, pots.max() - esaddle)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--nimages", type=int, default=9)
+    parser.add_argument("-d", "--ndrivers", type=int, default=2)
+    args = parser.parse_args()
+    main(args.nimages, args.ndrivers)
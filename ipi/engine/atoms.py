@@ -18,26 +18,40 @@ from ipi.utils.depend import *
 __all__ = ["Atoms", "Atom"]
 
 
-class Atom(dobject):
+def _readonly(v):
+    """Returns a read-only view of v, so that the parent arrays can only be
+    changed through the setters, which taint their dependants."""
+
+    v = v.view()
+    v.flags.writeable = False
+    return v
+
+
+class Atom(object):
 
     """Represent an atom, with position, velocity, mass and related properties.
 
-    This is actually only an interface to the Atoms class, i.e. only stores
-    views of the large arrays which contain all the coordinates.
+    This is actually only an interface to the Atoms class, i.e. it only stores
+    a reference to the parent Atoms object and the index of the atom. No depend
+    objects are created: reading an attribute returns a read-only view of the
+    appropriate slice of the parent arrays, and assigning to an attribute
+    writes into the parent arrays, tainting their dependants once. The views
+    cannot be modified in place, as that would bypass the depend machinery,
+    so one should always assign, e.g. atom.q = newq.
 
     Attributes:
-       kin: The kinetic energy of the atom.
-       kstress: The contribution of the atom to the kinetic stress tensor.
-
-    Depend objects:
        p: The three components of the momentum of the atom.
        q: The three components of the position of the atom.
        m: The mass of the atom.
        name: The name of the atom.
        m3: An array of 3 elements with each element being the mass of the atom.
           Used when each degree of freedom needs to be divided by the mass.
+       kin: The kinetic energy of the atom.
+       kstress: The contribution of the atom to the kinetic stress tensor.
     """
 
+    __slots__ = ("_system", "_index")
+
     def __init__(self, system, index):
         """Initialises Atom.
 
@@ -46,19 +60,62 @@ class Atom(dobject):
            index: An integer giving the index of the required atom in the atoms
               list. Note that indices start from 0.
         """
-        dself = dd(self)  # direct access
 
-        dself.p = system.p[3 * index : 3 * index + 3]
-        dself.q = system.q[3 * index : 3 * index + 3]
-        dself.m = system.m[index : index + 1]
-        dself.name = system.names[index : index + 1]
-        dself.m3 = system.m3[3 * index : 3 * index + 3]
+        if index < 0:
+            index += system.natoms
+        if index < 0 or index >= system.natoms:
+            raise IndexError("Atom index out of range")
+
+        self._system = system
+        self._index = index
+
+    @property
+    def q(self):
+        i = 3 * self._index
+        return _readonly(dstrip(self._system.q)[i : i + 3])
+
+    @q.setter
+    def q(self, value):
+        i = 3 * self._index
+        self._system.q[i : i + 3] = value
+
+    @property
+    def p(self):
+        i = 3 * self._index
+        return _readonly(dstrip(self._system.p)[i : i + 3])
+
+    @p.setter
+    def p(self, value):
+        i = 3 * self._index
+        self._system.p[i : i + 3] = value
+
+    @property
+    def m(self):
+        return dstrip(self._system.m)[self._index]
+
+    @m.setter
+    def m(self, value):
+        self._system.m[self._index] = value
+
+    @property
+    def name(self):
+        return dstrip(self._system.names)[self._index]
+
+    @name.setter
+    def name(self, value):
+        self._system.names[self._index] = value
+
+    @property
+    def m3(self):
+        i = 3 * self._index
+        return _readonly(dstrip(self._system.m3)[i : i + 3])
 
     @property
     def kin(self):
         """Calculates the contribution of the atom to the kinetic energy."""
 
-        return np.dot(self.p, self.p) / (2.0 * self.m)
+        p = self.p
+        return np.dot(p, p) / (2.0 * self.m)
 
     @property
     def kstress(self):
@@ -66,12 +123,8 @@ class Atom(dobject):
         tensor.
         """
 
-        p = dstrip(self.p)
-        ks = np.zeros((3, 3), float)
-        for i in range(3):
-            for j in range(i, 3):
-                ks[i, j] = p[i] * p[j]
-        return ks / self.m
+        p = self.p
+        return np.triu(np.outer(p, p)) / self.m
 
 
 class Atoms(dobject):
@@ -79,7 +132,7 @@ class Atoms(dobject):
     """Storage for the atoms' positions, masses and velocities.
 
     Everything is stored as 3*n sized contiguous arrays,
-    and a convenience-access is provided through a list of Atom objects.
+    and a convenience-access is provided through lightweight Atom views.
 
     Attributes:
        natoms: The number of atoms.
@@ -191,10 +244,9 @@ class Atoms(dobject):
         """Overwrites standard getting function.
 
         This is called whenever the standard function atoms[index] is used.
-        Returns an Atom object with the appropriate position and momenta arrays.
-        Note that they are dynamically generated each time an Atom needs to be
-        accessed, as this reduces the number of depend objects that need to be
-        held at any one time.
+        Returns an Atom view with the appropriate position and momenta arrays.
+        Views are dynamically generated each time an Atom needs to be
+        accessed, but are cheap as they hold no depend objects.
 
         Args:
            index: The index of the atom to be accessed.
@@ -211,9 +263,6 @@ class Atoms(dobject):
         This is called whenever the standard function atoms[index]=value is used.
         Changes the position and momenta of the appropriate slice of the global
         position and momentum arrays to those given by value.
-        Note that they are dynamically generated each time an Atom needs to be
-        accessed, as this reduces the number of depend objects that need to be
-        held at any one time.
 
         Args:
            index: The atom to be changed.
@@ -23,6 +23,7 @@ from ipi.utils.mathtools import (
     invert_ut3x3,
     matrix_exp,
 )
+from ipi.utils import beadtools
 from ipi.engine.thermostats import Thermostat
 from ipi.engine.cell import Cell
 
@@ -181,6 +182,35 @@ class Barostat(dobject):
             ],
         )
 
+        # Kinetic stress associated with the forces at each MTS level. These are
+        # cached, and only recomputed when the positions, the forces or (for the
+        # innermost level, which includes the centroid kinetic term) the centroid
+        # momenta have changed since the last pstep at the same level.
+        self._kstress_mts = []
+        self._kstress_mts_sc = []
+        fdeps = [dd(fc).f for fc in forces.mforces]
+        fdeps += [dd(fc).weight for fc in forces.mforces]
+        for level in range(nmts):
+            deps = [dd(beads).q, dd(beads).qc] + fdeps
+            if level == nmts - 1:
+                deps.append(dd(beads).pc)
+            if bias is not None and level == 0:
+                deps.append(dd(bias).f)
+            self._kstress_mts.append(
+                depend_value(
+                    name="kstress_mts_%d" % level,
+                    func=(lambda level=level: self.get_kstress_mts(level)),
+                    dependencies=deps,
+                )
+            )
+            self._kstress_mts_sc.append(
+                depend_value(
+                    name="kstress_mts_sc_%d" % level,
+                    func=(lambda level=level: self.get_kstress_mts_sc(level)),
+                    dependencies=deps + [dd(forces).coeffsc_part_1],
+                )
+            )
+
         if fixdof is None:
             self.mdof = float(self.beads.natoms) * 3.0
         else:
@@ -224,65 +254,55 @@ class Barostat(dobject):
 
     # ~ return kst
 
+    def cv_kstress(self, f, kinetic=False):
+        """Calculates the quantum centroid virial kinetic stress tensor
+        associated with the forces f, in upper triangular form. The centroid
+        kinetic term is added only if kinetic is True.
+        """
+
+        kst = -beadtools.centroid_virial(self.beads.q, self.beads.qc, f)
+        if kinetic:
+            kst += np.diag(
+                np.diag(beadtools.kinetic_stress(self.beads.pc, self.beads.m))
+                * self.beads.nbeads
+            )
+        return np.triu(kst)
+
     def kstress_mts_sc(self, level):
-        """Calculates the Suzuki-Chin quantum centroid virial kinetic stress tensor
+        """Returns the Suzuki-Chin quantum centroid virial kinetic stress tensor
         associated with the forces at a MTS level.
         """
 
-        kst = np.zeros((3, 3), float)
-        q = dstrip(self.beads.q)
-        qc = dstrip(self.beads.qc)
-        pc = dstrip(self.beads.pc)
-        m = dstrip(self.beads.m)
-        na3 = 3 * self.beads.natoms
-        fall = dstrip(self.forces.forces_mts(level)) * (1 + self.forces.coeffsc_part_1)
-        if self.bias is None or level != 0:
-            ball = fall * 0.00
-        else:
-            ball = dstrip(self.bias.f)
+        return self._kstress_mts_sc[level].get()
 
-        for b in range(self.beads.nbeads):
-            for i in range(3):
-                for j in range(i, 3):
-                    kst[i, j] -= np.dot(
-                        q[b, i:na3:3] - qc[i:na3:3], fall[b, j:na3:3] + ball[b, j:na3:3]
-                    )
+    def kstress_mts(self, level):
+        """Returns the quantum centroid virial kinetic stress tensor
+        associated with the forces at a MTS level.
+        """
 
-        if level == self.nmtslevels - 1:
-            for i in range(3):
-                kst[i, i] += np.dot(pc[i:na3:3], pc[i:na3:3] / m) * self.beads.nbeads
+        return self._kstress_mts[level].get()
 
-        return kst
+    def get_kstress_mts_sc(self, level):
+        """Calculates the Suzuki-Chin quantum centroid virial kinetic stress tensor
+        associated with the forces at a MTS level.
+        """
 
-    def kstress_mts(self, level):
+        fall = dstrip(self.forces.forces_mts(level)) * (1 + self.forces.coeffsc_part_1)
+        if self.bias is not None and level == 0:
+            fall = fall + dstrip(self.bias.f)
+
+        return self.cv_kstress(fall, kinetic=(level == self.nmtslevels - 1))
+
+    def get_kstress_mts(self, level):
         """Calculates the quantum centroid virial kinetic stress tensor
         associated with the forces at a MTS level.
         """
 
-        kst = np.zeros((3, 3), float)
-        q = dstrip(self.beads.q)
-        qc = dstrip(self.beads.qc)
-        pc = dstrip(self.beads.pc)
-        m = dstrip(self.beads.m)
-        na3 = 3 * self.beads.natoms
         fall = dstrip(self.forces.forces_mts(level))
-        if self.bias is None or level != 0:
-            ball = fall * 0.00
-        else:
-            ball = dstrip(self.bias.f)
-
-        for b in range(self.beads.nbeads):
-            for i in range(3):
-                for j in range(i, 3):
-                    kst[i, j] -= np.dot(
-                        q[b, i:na3:3] - qc[i:na3:3], fall[b, j:na3:3] + ball[b, j:na3:3]
-                    )
-
-        if level == self.nmtslevels - 1:
-            for i in range(3):
-                kst[i, i] += np.dot(pc[i:na3:3], pc[i:na3:3] / m) * self.beads.nbeads
+        if self.bias is not None and level == 0:
+            fall = fall + dstrip(self.bias.f)
 
-        return kst
+        return self.cv_kstress(fall, kinetic=(level == self.nmtslevels - 1))
 
     def get_kstress_sc(self):
         """Calculates the high order part of the Suzuki-Chin
@@ -290,19 +310,7 @@ class Barostat(dobject):
         associated with the forces at a MTS level.
         """
 
-        kst = np.zeros((3, 3), float)
-        q = dstrip(self.beads.q)
-        qc = dstrip(self.beads.qc)
-        pc = dstrip(self.beads.pc)
-        m = dstrip(self.beads.m)
-        na3 = 3 * self.beads.natoms
-        fall = dstrip(self.forces.fsc_part_2)
-
-        for b in range(self.beads.nbeads):
-            for i in range(3):
-                for j in range(i, 3):
-                    kst[i, j] -= np.dot(q[b, i:na3:3] - qc[i:na3:3], fall[b, j:na3:3])
-        return kst
+        return self.cv_kstress(self.forces.fsc_part_2)
 
     def get_stress_sc(self):
         """Calculates the high order part of the Suzuki-Chin internal stress tensor."""
@@ -14,6 +14,7 @@ centroid coordinate is required.
 import numpy as np
 
 from ipi.utils.depend import *
+from ipi.utils import beadtools
 from ipi.engine.atoms import Atoms
 
 
@@ -35,7 +36,9 @@ class Beads(dobject):
        natoms: The number of atoms.
        nbeads: The number of beads.
        _blist: A list of Atoms objects for each replica of the system. Each
-          replica is assumed to have the same mass and atom label.
+          replica is assumed to have the same mass and atom label. The
+          Atoms objects are only created the first time a replica is accessed,
+          and are None until then.
        centroid: An atoms object giving the centroid coordinate of the beads.
 
     Depend objects:
@@ -145,19 +148,17 @@ class Beads(dobject):
             dependencies=[dself.q],
         )
 
-        # create proxies to access the individual beads as Atoms objects
-        # TODO: ACTUALLY THIS IS ONLY USED HERE METHINK, SO PERHAPS WE COULD REMOVE IT TO DECLUTTER THE CODE.
-        self._blist = [
-            Atoms(natoms, _prebind=(self.q[i, :], self.p[i, :], self.m, self.names))
-            for i in range(nbeads)
-        ]
+        # proxies to access the individual beads as Atoms objects. these are
+        # created on demand, as the bulk quantities below are computed directly
+        # from the (nbeads, 3*natoms) arrays
+        self._blist = [None] * nbeads
 
-        # kinetic energies of thhe beads, and total (classical) kinetic stress tensor
+        # kinetic energies of the beads, and total (classical) kinetic stress tensor
         dself.kins = depend_array(
             name="kins",
             value=np.zeros(nbeads, float),
             func=self.kin_gather,
-            dependencies=[dd(b).kin for b in self._blist],
+            dependencies=[dself.p, dself.m3],
         )
         dself.kin = depend_value(
             name="kin", func=self.get_kin, dependencies=[dself.kins]
@@ -166,7 +167,7 @@ class Beads(dobject):
             name="kstress",
             value=np.zeros((3, 3), float),
             func=self.get_kstress,
-            dependencies=[dd(b).kstress for b in self._blist],
+            dependencies=[dself.p, dself.m],
         )
 
     def copy(self, nbeads=-1):
@@ -225,7 +226,7 @@ class Beads(dobject):
            A list of the kinetic energy for each system.
         """
 
-        return np.array([b.kin for b in self._blist])
+        return beadtools.kinetic_energies(self.p, self.m3)
 
     def get_kin(self):
         """Gets the total kinetic energy of all the replicas.
@@ -249,10 +250,8 @@ class Beads(dobject):
            The sum of the kinetic stress tensor of each replica.
         """
 
-        ks = np.zeros((3, 3), float)
-        for b in range(self.nbeads):
-            ks += self[b].kstress
-        return ks
+        # only the upper triangle is stored, consistently with Atoms.kstress
+        return np.triu(beadtools.kinetic_stress(self.p, self.m))
 
     def get_vpath(self):
         """Calculates the spring potential between the replicas.
@@ -262,15 +261,10 @@ class Beads(dobject):
         ensemble as the temperature is required to calculate it.
         """
 
-        epath = 0.0
         q = dstrip(self.q)
         m = dstrip(self.m3)[0]
-        for b in range(self.nbeads):
-            if b > 0:
-                dq = q[b, :] - q[b - 1, :]
-            else:
-                dq = q[b, :] - q[self.nbeads - 1, :]
-            epath += np.dot(dq, m * dq)
+        dq = q - np.roll(q, 1, axis=0)
+        epath = np.dot((dq * dq).sum(axis=0), m)
         print(
             "WARNING: RETURNS AN INCORRECT RESULT IF OPEN PATHS ARE BEING USED. CALL NM.VSPRING INSTEAD!!"
         )
@@ -284,24 +278,10 @@ class Beads(dobject):
         ensemble as the temperature is required to calculate it.
         """
 
-        nbeads = self.nbeads
-        natoms = self.natoms
-        f = np.zeros((nbeads, 3 * natoms), float)
-
         q = dstrip(self.q)
         m = dstrip(self.m3)[0]
-        for b in range(nbeads):
-            if b > 0:
-                dq = q[b, :] - q[b - 1, :]
-            else:
-                dq = q[b, :] - q[self.nbeads - 1, :]
-            dq *= m
-            f[b] -= dq
-            if b > 0:
-                f[b - 1] += dq
-            else:
-                f[nbeads - 1] += dq
-        return f
+        dq = (q - np.roll(q, 1, axis=0)) * m
+        return np.roll(dq, -1, axis=0) - dq
 
     # A set of functions to access individual beads as Atoms objects
     def __len__(self):
@@ -320,6 +300,8 @@ class Beads(dobject):
 
         This is called whenever the standard function beads[index] is used.
         Returns an Atoms object with the appropriate position and momenta arrays.
+        The object is created the first time the replica is accessed, and
+        reused afterwards.
 
         Args:
            index: The index of the replica of the system to be accessed.
@@ -328,7 +310,20 @@ class Beads(dobject):
            The replica of the system given by the index.
         """
 
-        return self._blist[index]
+        atoms = self._blist[index]
+        if atoms is None:
+            dself = dd(self)
+            atoms = Atoms(
+                self.natoms,
+                _prebind=(
+                    dself.q[index, :],
+                    dself.p[index, :],
+                    dself.m,
+                    dself.names,
+                ),
+            )
+            self._blist[index] = atoms
+        return atoms
 
     def __setitem__(self, index, value):
         """Overwrites standard setting function.
@@ -342,7 +337,7 @@ class Beads(dobject):
            value: The Atoms object that holds the new values.
         """
 
-        self._blist[index].p[:] = value.p
-        self._blist[index].q[:] = value.q
-        self._blist[index].m[:] = value.m
-        self._blist[index].names[:] = value.names
+        self.p[index, :] = value.p
+        self.q[index, :] = value.q
+        self.m[:] = value.m
+        self.names[:] = value.names
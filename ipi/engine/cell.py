@@ -8,10 +8,14 @@ Used for implementing the minimum image convention.
 # See the "licenses" directory for full license information.
 
 
+import weakref
+
 import numpy as np
 
 from ipi.utils.depend import *
 from ipi.utils.mathtools import *
+from ipi.utils import pbctools
+from ipi.utils.beadtools import atomic_view
 
 
 __all__ = ["Cell"]
@@ -29,6 +33,10 @@ class Cell(dobject):
        h: An array giving the lattice vector matrix.
        ih: An array giving the inverse of the lattice vector matrix.
        V: The volume of the cell.
+
+    Fractional coordinates of depend arrays of positions can be obtained with
+    fractional(). They are cached, and recomputed when either the positions
+    or the cell change.
     """
 
     def __init__(self, h=None):
@@ -53,6 +61,7 @@ class Cell(dobject):
             dependencies=[dself.h],
         )
         dself.V = depend_value(name="V", func=self.get_volume, dependencies=[dself.h])
+        self._fractional = {}
 
     def copy(self):
         return Cell(dstrip(self.h).copy())
@@ -67,27 +76,44 @@ class Cell(dobject):
 
         return det_ut3x3(self.h)
 
-    def apply_pbc(self, atom):
-        """Uses the minimum image convention to return a particle to the
-           unit cell.
+    def fractional(self, pos):
+        """Returns the fractional coordinates of an array of positions.
+
+        The fractional coordinates are held in a depend array that is created
+        the first time they are requested for pos, and that depends on pos and
+        on ih, so that they are only recomputed after either has changed. The cache only
+        holds a weak reference to pos.
 
         Args:
-           atom: An Atom object.
+           pos: A depend array of positions, e.g. dd(beads).q or dd(atoms).q.
 
         Returns:
-           An array giving the position of the image that is inside the
-           system box.
+           An up-to-date array with the same shape as pos, that must not be
+           modified.
         """
 
-        s = np.dot(self.ih, atom.q)
-
-        for i in range(3):
-            s[i] = s[i] - round(s[i])
-
-        return np.dot(self.h, s)
+        key = id(pos)
+        cached = self._fractional.get(key)
+        if cached is None or cached[0]() is not pos:
+            cache = self._fractional
+            ref = weakref.ref(pos, lambda r: cache.pop(key, None))
+            s = depend_array(
+                name="s",
+                value=np.zeros(pos.shape, float),
+                func=(lambda: self.get_fractional(ref())),
+                dependencies=[pos, dd(self).ih],
+            )
+            cached = self._fractional[key] = (ref, s)
+        return dstrip(cached[1].get())
+
+    def get_fractional(self, pos):
+        """Computes the fractional coordinates of an array of positions."""
+
+        pos = dstrip(pos.get())
+        return pbctools.fractional(atomic_view(pos), self.ih).reshape(pos.shape)
 
-    def array_pbc(self, pos):
-        """Uses the minimum image convention to return a list of particles to the
+    def apply_pbc(self, atom):
+        """Uses the minimum image convention to return a particle to the
            unit cell.
 
         Args:
@@ -98,15 +124,25 @@ class Cell(dobject):
            system box.
         """
 
-        s = dstrip(pos).copy()
-        s.shape = (len(pos) // 3, 3)
+        return pbctools.minimum_image(dstrip(atom.q), self.h, self.ih)
 
-        s = np.dot(dstrip(self.ih), s.T)
-        s = s - np.round(s)
+    def array_pbc(self, pos):
+        """Uses the minimum image convention to return a list of particles to the
+           unit cell.
 
-        s = np.dot(dstrip(self.h), s).T
+        Args:
+           pos: An array of positions, of shape (3*natoms) or (nbeads, 3*natoms),
+              that is modified in place.
+        """
 
-        pos[:] = s.reshape((len(s) * 3))
+        if isinstance(pos, depend_array):
+            pos[:] = pbctools.minimum_image(atomic_view(pos), self.h, self.ih).reshape(
+                pos.shape
+            )
+        else:
+            q = pos.view()
+            q.shape = pos.shape[:-1] + (pos.shape[-1] // 3, 3)
+            pbctools.minimum_image(q, self.h, self.ih, out=q)
 
     def minimum_distance(self, atom1, atom2):
         """Takes two atoms and tries to find the smallest vector between two
@@ -126,7 +162,6 @@ class Cell(dobject):
            atom1 and atom2 in the minimum image convention.
         """
 
-        s = np.dot(self.ih, atom1.q - atom2.q)
-        for i in range(3):
-            s[i] -= round(s[i])
-        return np.dot(self.h, s)
+        return pbctools.minimum_image(
+            dstrip(atom1.q) - dstrip(atom2.q), self.h, self.ih
+        )
@@ -11,6 +11,7 @@ layer for a driver that gets positions and returns forces (and energy).
 
 import time
 import threading
+import queue
 
 import numpy as np
 
@@ -19,7 +20,11 @@ from ipi.utils.messages import verbosity
 from ipi.utils.messages import info
 from ipi.interfaces.sockets import InterfaceSocket
 from ipi.utils.depend import dobject
-from ipi.utils.depend import dstrip
+from ipi.utils.depend import dstrip, dd
+from ipi.utils import pbctools
+from ipi.utils.beadtools import atomic_view
+from ipi.engine.atoms import Atoms
+from ipi.engine.cell import Cell
 from ipi.utils.io import read_file
 from ipi.utils.units import unit_to_internal, UnitMap
 
@@ -136,7 +141,15 @@ class ForceField(dobject):
         else:
             par_str = " "
 
-        pbcpos = dstrip(atoms.q).copy()
+        if self.dopbc:
+            # folds the positions back into the cell starting from their
+            # fractional coordinates, that are shared by all the forcefields
+            # acting on the same replica
+            s = atomic_view(cell.fractional(dd(atoms).q))
+            pbcpos = np.empty(s.size)
+            pbctools.cartesian(pbctools.fold(s), cell.h, out=atomic_view(pbcpos))
+        else:
+            pbcpos = dstrip(atoms.q).copy()
 
         # Indexes come from input in a per atom basis and we need to make a per atom-coordinate basis
         # Reformat indexes for full system (default) or piece of system
@@ -158,9 +171,6 @@ class ForceField(dobject):
 
             self.iactive = activehere
 
-        if self.dopbc:
-            cell.array_pbc(pbcpos)
-
         newreq = ForceRequest(
             {
                 "id": reqid,
@@ -636,22 +646,44 @@ class FFPlumed(ForceField):
 
     def mtd_update(self, pos, cell):
         """Makes updates to the potential that only need to be triggered
-        upon completion of a time step."""
+        upon completion of a time step.
+
+        Several walkers that share the bias can be updated with a single
+        call, in which case PLUMED deposits the hills for each of them in
+        turn, as if they were updated one after the other.
+
+        Args:
+           pos: The positions of a walker, or a (nwalkers, 3*natoms) array
+              with the positions of all the walkers.
+           cell: The cell matrix of a walker, or a (nwalkers, 3, 3) array
+              with the cells of all the walkers.
+
+        Returns:
+           True, as the bias must then be recomputed.
+        """
+
+        pos = np.reshape(pos, (-1, 3 * self.natoms))
+        cell = np.reshape(cell, (-1, 3, 3))
+        if len(cell) != len(pos):
+            raise ValueError("Each walker must come with its own cell")
 
-        self.plumedstep += 1
         f = np.zeros(3 * self.natoms)
         vir = np.zeros((3, 3))
-
-        self.plumed.cmd("setStep", self.plumedstep)
-        self.plumed.cmd("setCharges", self.charges)
-        self.plumed.cmd("setMasses", self.masses)
-        self.plumed.cmd("setPositions", pos)
-        self.plumed.cmd("setBox", cell)
-        self.plumed.cmd("setForces", f)
-        self.plumed.cmd("setVirial", vir)
-        self.plumed.cmd("prepareCalc")
-        self.plumed.cmd("performCalcNoUpdate")
-        self.plumed.cmd("update")
+        with self._threadlock:
+            for q, h in zip(pos, cell):
+                self.plumedstep += 1
+                f[:] = 0.0
+                vir[:] = 0.0
+                self.plumed.cmd("setStep", self.plumedstep)
+                self.plumed.cmd("setCharges", self.charges)
+                self.plumed.cmd("setMasses", self.masses)
+                self.plumed.cmd("setPositions", np.ascontiguousarray(q))
+                self.plumed.cmd("setBox", np.ascontiguousarray(h))
+                self.plumed.cmd("setForces", f)
+                self.plumed.cmd("setVirial", vir)
+                self.plumed.cmd("prepareCalc")
+                self.plumed.cmd("performCalcNoUpdate")
+                self.plumed.cmd("update")
 
         return True
 
@@ -885,3 +917,147 @@ class FFsGDML(ForceField):
         ]
         r["status"] = "Done"
         r["t_finished"] = time.time()
+
+
+class ProxyChannel(object):
+
+    """The connection of a worker process with a ProxyServer, shared by all
+    the FFProxy objects of the worker.
+
+    Attributes:
+        slot: The index of the worker, that identifies its results queue.
+        requests: A multiprocessing queue on which the requests are sent.
+        results: A multiprocessing queue from which the results are read.
+        pending: A dictionary of the requests waiting for a result, indexed
+            by a serial number.
+    """
+
+    def __init__(self, slot, requests, results):
+        self.slot = slot
+        self.requests = requests
+        self.results = results
+        self.pending = {}
+        self.nreq = 0
+        self._threadlock = threading.Lock()
+
+
+class FFProxy(ForceField):
+
+    """Forcefield that forwards the requests to a forcefield living in
+    another process.
+
+    Used in worker processes that must compute forces with the forcefields
+    (and hence the clients) of the main i-PI process. The positions are sent
+    to a ProxyServer in the main process, that queues them to the forcefield
+    with the same name and sends back the results.
+
+    Attributes:
+        channel: The ProxyChannel connecting the worker to the server.
+    """
+
+    def __init__(self, ff, channel):
+        """Initialises FFProxy.
+
+        Args:
+            ff: The forcefield of the main process this is a proxy for.
+            channel: The ProxyChannel of this worker.
+        """
+
+        # the forcefield on the other side takes care of the PBC
+        super(FFProxy, self).__init__(
+            latency=ff.latency,
+            name=ff.name,
+            pars=ff.pars,
+            dopbc=False,
+            active=ff.active,
+            threaded=True,
+        )
+        self.channel = channel
+
+    def queue(self, atoms, cell, reqid=-1):
+        """Adds a request, and sends it to the server."""
+
+        newreq = super(FFProxy, self).queue(atoms, cell, reqid)
+        ch = self.channel
+        with ch._threadlock:
+            ch.nreq += 1
+            ch.pending[ch.nreq] = newreq
+            ch.requests.put(
+                (ch.slot, ch.nreq, self.name, newreq["pos"], newreq["cell"][0])
+            )
+        return newreq
+
+    def poll(self):
+        """Collects the results that have been sent back by the server."""
+
+        ch = self.channel
+        with ch._threadlock:
+            while True:
+                try:
+                    nreq, status, result = ch.results.get_nowait()
+                except queue.Empty:
+                    break
+                r = ch.pending.pop(nreq)
+                r["result"] = result
+                r["t_dispatched"] = r["t_finished"] = time.time()
+                r["status"] = status
+
+
+class ProxyServer(object):
+
+    """Evaluates the requests of FFProxy objects in worker processes with the
+    forcefields of this process.
+
+    Attributes:
+        fflist: A dictionary of the forcefields, indexed by name.
+        requests: The multiprocessing queue on which requests arrive.
+        results: A list of multiprocessing queues, one per worker.
+    """
+
+    def __init__(self, fflist, requests, results):
+        self.fflist = fflist
+        self.requests = requests
+        self.results = results
+        self.latency = min([ff.latency for ff in fflist.values()] + [1e-2])
+        self._thread = None
+        self._doloop = [False]
+
+    def start(self):
+        """Starts the thread that serves the requests."""
+
+        self._doloop[0] = True
+        self._thread = threading.Thread(target=self._serve, name="proxy_server")
+        self._thread.daemon = True
+        self._thread.start()
+        softexit.register_thread(self._thread, self._doloop)
+
+    def stop(self):
+        self._doloop[0] = False
+
+    def _serve(self):
+        """Queues the incoming requests to the forcefields, and sends back
+        the results of those that have been completed."""
+
+        pending = []
+        while self._doloop[0]:
+            try:
+                msg = self.requests.get(timeout=self.latency)
+            except queue.Empty:
+                msg = None
+            while msg is not None:
+                slot, nreq, name, pos, h = msg
+                atoms = Atoms(len(pos) // 3)
+                atoms.q = pos
+                ff = self.fflist[name]
+                pending.append((slot, nreq, ff, ff.queue(atoms, Cell(h), reqid=slot)))
+                try:
+                    msg = self.requests.get_nowait()
+                except queue.Empty:
+                    msg = None
+
+            for p in pending[:]:
+                slot, nreq, ff, r = p
+                if r["status"] in ["Done", "Exit"]:
+                    self.results[slot].put((nreq, r["status"], r["result"]))
+                    ff.release(r)
+                    pending.remove(p)
@@ -851,29 +851,52 @@ class Forces(dobject):
         nforce.bind(nbeads, ncell, self.fcomp, self.ff, self.open_paths)
         return nforce
 
-    def transfer_forces(self, refforce):
+    def transfer_forces(self, refforce, beads=None):
         """Low-level function copying over the value of a second force object,
         triggering updates but un-tainting this force depends themselves.
 
         We have noted that in some corner cases it is necessary to copy only
         the values of updated forces rather than the full depend object, in order to
         avoid triggering a repeated call to the client code that is potentially
-        very costly. This happens routinely in geometry relaxation routines, for example."""
+        very costly. This happens routinely in geometry relaxation routines, for example.
 
-        if len(self.mforces) != len(refforce.mforces):
-            raise ValueError(
-                "Cannot copy forces between objects with different numbers of components"
-            )
+        Args:
+            refforce: The force object to copy from, or a list of force objects.
+            beads: If given, a list with the indices of the beads of this object
+                that correspond to the beads of refforce, or a list of such lists
+                if refforce is a list. Together, the lists should cover all the
+                beads. Defaults to copying all the beads in order.
+        """
+
+        if not isinstance(refforce, list):
+            refforce, beads = [refforce], [beads]
+
+        for reff in refforce:
+            if len(self.mforces) != len(reff.mforces):
+                raise ValueError(
+                    "Cannot copy forces between objects with different numbers of components"
+                )
 
         for k in range(len(self.mforces)):
-            mreff = refforce.mforces[k]
             mself = self.mforces[k]
-            if mreff.nbeads != mself.nbeads:
+            if beads[0] is None:
+                kbeads = [list(range(mself.nbeads))]
+            elif mself.nbeads == self.nbeads:
+                kbeads = beads
+            else:
                 raise ValueError(
-                    "Cannot copy forces between objects with different numbers of beads for the "
-                    + str(k)
-                    + "th component"
+                    "Cannot copy a subset of the beads of a contracted force component"
                 )
+            q = dstrip(mself.beads.q).copy()
+            for reff, rbeads in zip(refforce, kbeads):
+                mreff = reff.mforces[k]
+                if mreff.nbeads != len(rbeads):
+                    raise ValueError(
+                        "Cannot copy forces between objects with different numbers of beads for the "
+                        + str(k)
+                        + "th component"
+                    )
+                q[rbeads] = dstrip(mreff.beads.q)
 
             # this is VERY subtle. beads in this force component are
             # obtained as a contraction, and so are computed automatically.
@@ -885,13 +908,15 @@ class Forces(dobject):
             # the value of the contracted bead, so that it's marked as NOT
             # tainted - it should not be as it's an internal of the force and
             # therefore get copied
-            dd(mself.beads).q.set(mreff.beads.q, manual=False)
-            for b in range(mself.nbeads):
-                dfkbref = dd(mreff._forces[b])
-                dfkbself = dd(mself._forces[b])
-
-                dfkbself.ufvx.set(deepcopy(dfkbref.ufvx._value), manual=False)
-                dfkbself.ufvx.taint(taintme=False)
+            dd(mself.beads).q.set(q, manual=False)
+            for reff, rbeads in zip(refforce, kbeads):
+                mreff = reff.mforces[k]
+                for b, bself in enumerate(rbeads):
+                    dfkbref = dd(mreff._forces[b])
+                    dfkbself = dd(mself._forces[bself])
+
+                    dfkbself.ufvx.set(deepcopy(dfkbref.ufvx._value), manual=False)
+                    dfkbself.ufvx.taint(taintme=False)
 
     def transfer_forces_manual(
         self, new_q, new_v, new_forces, vir=np.zeros((3, 3)), extra=""
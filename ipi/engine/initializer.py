@@ -122,7 +122,7 @@ def init_file(
        a Cell object as read from the final pdb frame.
     """
 
-    rfile = open(filename, "r")
+    rfile = open(filename, "rb" if mode == "bin" else "r")
     ratoms = []
 
     info(
@@ -224,7 +224,7 @@ def init_vector(
 
     mode = iif.mode
     value = iif.value
-    if mode == "xyz" or mode == "pdb":
+    if mode == "xyz" or mode == "pdb" or mode == "bin":
         rq = init_beads(iif, nbeads, dimension, units, cell_units).q
     elif mode == "chk":
         if momenta:
@@ -1,5 +1,10 @@
 """Highly specialized Kinetic Monte Carlo class for aluminum 6xxx alloys.
 Could probably be generalized to something more general.
+
+Relaxed energies and geometries are cached by StateCache, keyed by the
+occupation string of the lattice reduced to a canonical form under the
+translations of the supercell, so that states that differ only by a
+lattice translation are relaxed once.
 """
 
 # This file is part of i-PI.
@@ -8,17 +13,127 @@ Could probably be generalized to something more general.
 
 
 import pickle
+import signal
+import sqlite3
 import threading
+import time
+import multiprocessing
 import numpy as np
 import collections
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from ipi.engine.motion import Motion, GeopMotion
 from ipi.utils.depend import dstrip, depend_value, dd
 from ipi.engine.cell import Cell
+from ipi.engine.forces import Forces
+from ipi.engine.forcefields import FFProxy, ProxyChannel, ProxyServer
+from ipi.utils.softexit import softexit
 from ipi.utils.units import Constants
+from ipi.utils import pbctools
 import ipi.utils.io as io
 
 
+def pack_codes(codes):
+    """Packs an array of 2-bit site codes into bytes."""
+
+    return np.packbits(np.unpackbits(codes[:, np.newaxis], axis=1)[:, 6:]).tobytes()
+
+
+class StateCache(object):
+    """Least-recently-used cache of relaxed energies and geometries.
+
+    Entries are kept in memory up to a maximum number, evicting the ones
+    that have not been used for the longest time. If a database file is
+    given, all entries are also written to a sqlite table, which is looked
+    up on memory misses and can be shared between restarts and between
+    concurrent KMC runs on the same system.
+
+    Attributes:
+        ecache: An ordered dictionary of energies, most recently used last.
+        qcache: An ordered dictionary of positions, in the same order.
+        max_len: The maximum number of entries kept in memory.
+        nhit, ndisk, nmiss: Number of lookups found in memory, found in the
+            database, and not found.
+    """
+
+    def __init__(self, max_len=1000, dbfile=""):
+        self.ecache = collections.OrderedDict()
+        self.qcache = collections.OrderedDict()
+        self.max_len = max_len
+        self.nhit = self.ndisk = self.nmiss = 0
+        self._lock = threading.Lock()
+        self.db = None
+        if dbfile != "":
+            # the connection is shared by the evaluator threads, under the lock
+            self.db = sqlite3.connect(dbfile, timeout=60, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS states "
+                "(key BLOB PRIMARY KEY, energy REAL, q BLOB)"
+            )
+            self.db.commit()
+
+    def __len__(self):
+        return len(self.ecache)
+
+    def __contains__(self, key):
+        return key in self.ecache
+
+    def _insert(self, key, e, q):
+        self.ecache[key] = e
+        self.qcache[key] = q
+        self.ecache.move_to_end(key)
+        self.qcache.move_to_end(key)
+        while len(self.ecache) > self.max_len:
+            self.ecache.popitem(last=False)
+            self.qcache.popitem(last=False)
+
+    def get(self, key):
+        """Returns (energy, positions) for key, or None if it is unknown."""
+
+        with self._lock:
+            if key in self.ecache:
+                self.nhit += 1
+                self.ecache.move_to_end(key)
+                self.qcache.move_to_end(key)
+                return self.ecache[key], self.qcache[key]
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT energy, q FROM states WHERE key=?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self.ndisk += 1
+                    q = np.frombuffer(row[1], float).copy()
+                    self._insert(key, row[0], q)
+                    return row[0], q
+            self.nmiss += 1
+            return None
+
+    def put(self, key, e, q):
+        """Stores energy and positions for key."""
+
+        with self._lock:
+            self._insert(key, e, q)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO states VALUES (?, ?, ?)",
+                    (key, float(e), np.asarray(q, float).tobytes()),
+                )
+                self.db.commit()
+
+    def report(self):
+        """Returns a summary of the cache hit rate."""
+
+        nlookup = max(self.nhit + self.ndisk + self.nmiss, 1)
+        return "Cache: %d states, hit rate %.1f%% (memory %d, disk %d, miss %d)" % (
+            len(self.ecache),
+            100.0 * (self.nhit + self.ndisk) / nlookup,
+            self.nhit,
+            self.ndisk,
+            self.nmiss,
+        )
+
+
 class AlKMC(Motion):
     """Stepper for a KMC for Al-6xxx alloys.
 
@@ -65,12 +180,14 @@ class AlKMC(Motion):
         tottime=0,
         ecache_file="",
         qcache_file="",
+        cache_db="",
         thermostat=None,
         barostat=None,
         fixcom=False,
         fixatoms=None,
         nmts=None,
         max_cache_len=1000,
+        parallel="threads",
     ):
         """Initialises a "dynamics" motion object.
 
@@ -93,6 +210,7 @@ class AlKMC(Motion):
         self.nsites = self.ncell ** 3
         self.natoms = self.nsites - self.nvac
         self.neval = neval
+        self.parallel = parallel
         self.diffusion_barrier_al = diffusion_barrier_al
         self.diffusion_prefactor_al = diffusion_prefactor_al
         if diffusion_barrier_mg > 0:
@@ -145,21 +263,30 @@ class AlKMC(Motion):
         print(len(self.sites), self.nsites, "###")
         # now we build list of nearest neighbors (fcc-lattice hardcoded!)
         self.neigh = np.zeros((self.nsites, 12), int)
-        nneigh = np.zeros(self.nsites, int)
         # could be done in a more analytic way but whatever, I'm too lazy
         a02 = 1.01 * 0.5 * self.a0 ** 2  # perhaps 1.01 it is not enough, must check!
-        for i in range(self.nsites):  # determines the connectivity of the lattice
-            rij = self.sites.copy().flatten()
-            for j in range(self.nsites):
-                rij[3 * j : 3 * j + 3] -= self.sites[i]
-            self.dcell.array_pbc(rij)
-            rij.shape = (self.nsites, 3)
-            for j in range(i):
-                if np.dot(rij[j], rij[j]) < a02:  # found nearest neighbor
-                    self.neigh[i, nneigh[i]] = j
-                    self.neigh[j, nneigh[j]] = i
-                    nneigh[i] += 1
-                    nneigh[j] += 1
+        # the pairs come sorted by site, and then by neighbour
+        (pi, pj), _, _ = pbctools.pair_distances(
+            self.sites, self.sites, self.dcell.h, self.dcell.ih, np.sqrt(a02)
+        )
+        pi, pj = pi[pi != pj], pj[pi != pj]
+        nneigh = np.bincount(pi, minlength=self.nsites)
+        self.neigh[pi, np.arange(len(pi)) - (np.cumsum(nneigh) - nneigh)[pi]] = pj
+
+        # site permutations and displacements for the lattice translations of
+        # the supercell, used to reduce the states to a canonical form
+        n = self.ncell
+        ijk = np.asarray([ix.flatten(), iy.flatten(), iz.flatten()]).T
+        shifts = np.asarray(
+            [[i, j, k] for i in range(n) for j in range(n) for k in range(n)]
+        )
+        tijk = (ijk[np.newaxis] + shifts[:, np.newaxis]) % n
+        self.tperm = (tijk * [n * n, n, 1]).sum(axis=2)
+        self.tvec = np.dot(shifts, self.scell.T)
+        # 2-bit codes of the site occupations
+        self.scode = np.zeros(256, np.uint8)
+        for i, s in enumerate("AMSV"):
+            self.scode[ord(s)] = i
 
         self.idx = idx
 
@@ -171,6 +298,7 @@ class AlKMC(Motion):
         # geop should not trigger exit if there is early convergence, but just carry on.
         # we hard-code this option to avoid early-termination that would be hard to debug for a user
         geop["exit_on_convergence"] = False
+        self.geop_args = dict(fixcom=fixcom, fixatoms=fixatoms, **geop)
         for i in range(self.neval):
             # geometry optimizer should not have *any* hystory dependence
             self.geop[i] = GeopMotion(
@@ -180,15 +308,23 @@ class AlKMC(Motion):
         # dictionary of previous energy evaluations - kind of tricky to use this with the omaker thingie
         self.ecache_file = ecache_file
         self.qcache_file = qcache_file
+        self.cache_db = cache_db
         self.max_cache_len = max_cache_len  # default 1000; user modification allowed
+        self.cache = StateCache(self.max_cache_len, self.cache_db)
         try:
             ff = open(self.ecache_file, "rb")
-            self.ecache = pickle.load(ff)
+            ecache = pickle.load(ff)
             ff.close()
             ff = open(self.qcache_file, "rb")
-            self.qcache = pickle.load(ff)
+            qcache = pickle.load(ff)
             ff.close()
-            print("Loaded %d cached energies" % (len(self.ecache)))
+            for key in ecache:
+                if isinstance(key, str):
+                    # old caches are keyed by the full occupation string
+                    self.cache_store(key, ecache[key], qcache[key])
+                else:
+                    self.cache.put(key, ecache[key], qcache[key])
+            print("Loaded %d cached energies" % (len(ecache)))
         except (OSError, ValueError, NameError):
             print(
                 "Couldn't load cache files "
@@ -197,14 +333,11 @@ class AlKMC(Motion):
                 + self.qcache_file
                 + " - resetting"
             )
-            self.ecache = collections.OrderedDict()
-            self.qcache = collections.OrderedDict()
-        self.ncache = len(self.ecache)
-        self.ncache_stored = self.ncache
-        self.struct_count = self.ncache
+        self.ncache_stored = len(self.cache)
+        self.struct_count = self.ncache_stored
 
         # no TS evaluation implemented yet
-        self.tscache = {}  # collections.OrderedDict()
+        self.tscache = collections.OrderedDict()
         self.tottime = tottime
 
     def bind(self, ens, beads, nm, cell, bforce, prng, omaker):
@@ -312,6 +445,49 @@ class AlKMC(Motion):
             )
         self.feval = np.ones(self.neval, int)
         self._threadlock = threading.Lock()
+        self.pool = None
+
+    def start_pool(self):
+        """Starts the worker processes used to relax the new states when
+        parallel is "processes". The workers are forked from this process,
+        and evaluate the forces through a ProxyServer that forwards their
+        requests to the forcefields (and hence to the clients) of i-PI."""
+
+        ctx = multiprocessing.get_context("fork")
+        requests = ctx.Queue()
+        results = [ctx.Queue() for i in range(self.neval)]
+        self.proxy_server = ProxyServer(self.forces.ff, requests, results)
+        self.proxy_server.start()
+        self.pool = ProcessPoolExecutor(
+            self.neval,
+            mp_context=ctx,
+            initializer=_worker_init,
+            initargs=(self, requests, results, ctx.Value("i", 0)),
+        )
+        softexit.register_function(self.stop_pool)
+
+    def stop_pool(self):
+        """Stops the worker processes, that might be waiting for forces
+        that will never come if this is called upon a soft exit."""
+
+        if self.pool is not None:
+            for p in list(self.pool._processes.values()):
+                p.terminate()
+            self.pool.shutdown(wait=True)
+            self.proxy_server.stop()
+            self.pool = None
+
+    def relaxed(self, nstr, nevent, ipot, newpot, newq):
+        """Stores the result of the relaxation of a new state in the cache
+        and in the list describing the event that leads to it."""
+
+        self.cache_store(nstr, newpot, newq)
+        with self._threadlock:
+            nevent[2] = newpot
+            nevent[3] = newq
+            self.struct_count += 1
+            print("Finished ", nstr)
+            print("Energy, initial - TS - final: ", ipot, nevent[-1], newpot)
 
     # threaded geometry optimization
     def geop_thread(self, ieval, nstr, nevent, ostr=None):
@@ -326,17 +502,7 @@ class AlKMC(Motion):
         newpot = self.dforces[ieval].pot
 
         # print "geop ", self.nstep, self.dforces[ieval].pot
-        with self._threadlock:
-            self.ecache[nstr] = newpot
-            self.qcache[nstr] = newq
-            if self.ncache == self.max_cache_len:
-                self.ecache.popitem(last=False)
-                self.qcache.popitem(last=False)
-            else:
-                self.ncache += 1
-            nevent[2] = self.ecache[nstr]
-            nevent[3] = self.qcache[nstr]
-            self.struct_count += 1
+        self.relaxed(nstr, nevent, ipot, newpot, newq)
 
         # launches TS calculation
         # if not ostr is None:
@@ -347,16 +513,12 @@ class AlKMC(Motion):
         with self._threadlock:
             self.feval[ieval] = 1
 
-        with self._threadlock:
-            print("Finished ", nstr)
-            print("Energy, initial - TS - final: ", ipot, nevent[-1], newpot)
-
     # threaded ts evaluation
     def ts_thread(self, ieval, ostr, nstr, nevent, setfev=1):
         # computes TS energy by linearly interpolating initial & final state
         # interpolates between two structures considering PBCs
-        qstart = self.qcache[ostr]
-        qend = self.qcache[nstr].copy()
+        qstart = self.cache_fetch(ostr)[1]
+        qend = self.cache_fetch(nstr)[1].copy()
         # finds atom matching assuming initial and final states differ only by a vacancy swap and are based on unique_idx lists
         midx = self.unique_idx_match(list(ostr), list(nstr))[0 : self.natoms]
         qend.shape = (self.natoms, 3)
@@ -411,10 +573,10 @@ class AlKMC(Motion):
 
         with self._threadlock:
             # sets the tscache for both FW and BW transition (uses a dictionary to be super-safe and lazy, although of course this could be just a list)
-            self.tscache[ostr][nstr] = tspot
-            if nstr not in self.tscache:
-                self.tscache[nstr] = {}
-            self.tscache[nstr][ostr] = tspot
+            okey, it = self.canonical_state(ostr)[:2]
+            nkey, jt = self.canonical_state(nstr)[:2]
+            self.tscache.setdefault(okey, {})[self.translate_key(nstr, it)] = tspot
+            self.tscache.setdefault(nkey, {})[self.translate_key(ostr, jt)] = tspot
             self.feval[ieval] = 1
             nevent[4] = tspot
 
@@ -436,6 +598,67 @@ class AlKMC(Motion):
                     break
         return ieval
 
+    def translate_key(self, state, it):
+        """Packs the occupations of the sites after the translation it into
+        a compact key, with two bits per site."""
+
+        codes = self.scode[np.frombuffer("".join(state).encode(), np.uint8)]
+        tcodes = np.zeros(self.nsites, np.uint8)
+        tcodes[self.tperm[it]] = codes
+        return pack_codes(tcodes)
+
+    def canonical_state(self, state):
+        """Reduces a state to its canonical form under lattice translations.
+
+        Returns the key of the canonical state, the index of the translation
+        that brings the state onto it, and the map from the atoms of the
+        state (in unique_idx order, including the dummy atoms that sit on the
+        vacancies) to those of the canonical state.
+        """
+
+        codes = self.scode[np.frombuffer("".join(state).encode(), np.uint8)]
+        tcodes = np.zeros((len(self.tperm), self.nsites), np.uint8)
+        tcodes[np.arange(len(self.tperm))[:, np.newaxis], self.tperm] = codes
+        # lexicographically smallest translated occupation string
+        it = np.lexsort(tcodes.T[::-1])[0]
+
+        cstate = np.asarray(list("AMSV"))[tcodes[it]]
+        ridx = np.zeros(self.nsites, int)
+        ridx[self.unique_idx(cstate)] = np.arange(self.nsites)
+        amap = ridx[self.tperm[it][self.unique_idx(state)]]
+        return pack_codes(tcodes[it]), it, amap
+
+    def cache_fetch(self, state):
+        """Returns the cached energy and relaxed positions of a state, or
+        None if the state (or any of its translations) is not known."""
+
+        key, it, amap = self.canonical_state(state)
+        rv = self.cache.get(key)
+        if rv is None:
+            return None
+        return rv[0], self.from_canonical(state, rv[1])
+
+    def cache_store(self, state, e, q):
+        """Stores energy and relaxed positions of a state, translated to
+        the canonical form."""
+
+        self.cache.put(self.canonical_state(state)[0], e, self.to_canonical(state, q))
+
+    def to_canonical(self, state, q):
+        """Maps positions of a state onto the canonical state."""
+
+        key, it, amap = self.canonical_state(state)
+        qc = np.zeros((self.nsites, 3))
+        qc[amap] = np.reshape(q, (self.nsites, 3)) + self.tvec[it]
+        return qc.flatten()
+
+    def from_canonical(self, state, qc):
+        """Maps positions of the canonical state onto a state."""
+
+        key, it, amap = self.canonical_state(state)
+        q = np.reshape(qc, (self.nsites, 3))[amap] - self.tvec[it]
+        return q.flatten()
+
     def unique_idx(self, state):
         # generates a starting lattice configuration that corresponds to a given state vector (a string of atomic types)
         # makes sure that the same occupation string corresponds to the same atom positions,
@@ -502,19 +725,32 @@ class AlKMC(Motion):
         ostr = "".join(
             self.state
         )  # this is a unique id string that charactrizes the current state
-        self.tscache[ostr] = {}
-        if ostr not in self.ecache:
+        okey = self.canonical_state(ostr)[0]
+        self.tscache.setdefault(okey, {})
+        self.tscache.move_to_end(okey)
+        if len(self.tscache) > self.max_cache_len:
+            self.tscache.popitem(last=False)
+        cached = self.cache_fetch(ostr)
+        if cached is None:
             self.dbeads[0].q[0, :] = self.sites[self.unique_idx(self.state)].flatten()
             rv = [0, 0, 0, 0, 0]
             self.geop_thread(0, ostr, rv)
             # self.beads.q[0,:] = self.dbeads[0].q[0,:] # also updates current position
             # self.forces.transfer_forces(self.dforces[0]) # forces have already been computed here...
-
-        ecurr = self.ecache[ostr]
+            ecurr = rv[2]
+        else:
+            ecurr = cached[0]
 
         # enumerates possible reactive events (vacancy swaps)
         levents = []
         ethreads = [None] * self.neval
+        futures = {}
+        if self.parallel == "processes" and self.pool is None:
+            self.start_pool()
+        # translations of states that are being relaxed wait for the result
+        pending = {}
+        deferred = []
+        tstart = time.time()
         # loops over the vacancy
         for ivac in range(self.natoms, self.natoms + self.nvac):
             svac = self.idx[ivac]  # lattice site associated with this vacancy
@@ -534,7 +770,14 @@ class AlKMC(Motion):
                 nstr = "".join(
                     nstate
                 )  # this is the string that corresponds to the new state
-                if nstr not in self.ecache:
+                nkey = self.canonical_state(nstr)[0]
+                cached = None
+                if nkey not in pending:
+                    cached = self.cache_fetch(nstr)
+                if nkey in pending:
+                    nevent = [svac, sneigh, 0.0, 0.0, 0.0]
+                    deferred.append((nevent, nstr, pending[nkey]))
+                elif cached is None:
                     # new state, must compute!
                     # creates a swapped index
                     nidx = self.idx.copy()
@@ -549,39 +792,42 @@ class AlKMC(Motion):
                     ]  # gets index of atom associated with the neighboring site
                     nidx[ivac], nidx[ineigh] = self.idx[ineigh], self.idx[ivac]
 
-                    ieval = self.find_eval(ethreads)
-                    # launches evaluator
-                    self.dbeads[ieval].q[0, :] = self.sites[
-                        self.unique_idx(nstate)
-                    ].flatten()
-
+                    q0 = self.sites[self.unique_idx(nstate)].flatten()
                     nevent = [svac, sneigh, 0.0, 0.0, 0.0]
-
-                    # runs a geometry optimization
-                    # self.geop_thread(ieval=ieval, nstr=nstr, nevent=nevent)
-                    st = threading.Thread(
-                        target=self.geop_thread,
-                        name=str(ieval),
-                        kwargs={
-                            "ieval": ieval,
-                            "nstr": nstr,
-                            "nevent": nevent,
-                            "ostr": ostr,
-                        },
-                    )
-                    st.daemon = True
-                    st.start()
-                    ethreads[ieval] = st
+                    pending[nkey] = (nevent, nstr)
+                    if self.parallel == "processes":
+                        # runs a geometry optimization in a worker process
+                        futures[self.pool.submit(_worker_relax, q0)] = (nevent, nstr)
+                    else:
+                        ieval = self.find_eval(ethreads)
+                        # launches evaluator
+                        self.dbeads[ieval].q[0, :] = q0
+
+                        # runs a geometry optimization
+                        # self.geop_thread(ieval=ieval, nstr=nstr, nevent=nevent)
+                        st = threading.Thread(
+                            target=self.geop_thread,
+                            name=str(ieval),
+                            kwargs={
+                                "ieval": ieval,
+                                "nstr": nstr,
+                                "nevent": nevent,
+                                "ostr": ostr,
+                            },
+                        )
+                        st.daemon = True
+                        st.start()
+                        ethreads[ieval] = st
                 else:
                     print(
                         "Found state ",
                         nstr,
                         " retrieving cached energy ",
-                        self.ecache[nstr],
+                        cached[0],
                     )
 
                     # fetch energy from previous calculation
-                    nevent = [svac, sneigh, self.ecache[nstr], self.qcache[nstr], 0.0]
+                    nevent = [svac, sneigh, cached[0], cached[1], 0.0]
 
                     # EVALUATION OF TS ENERGY IS DISABLED FOR THE MOMENT...
                     # we might still need to compute the TS energy!
@@ -601,13 +847,20 @@ class AlKMC(Motion):
         for st in ethreads:
             while st is not None and st.isAlive():
                 st.join(2)
-
+        for fut in as_completed(futures):
+            nevent, nstr = futures[fut]
+            self.relaxed(nstr, nevent, *fut.result())
         print(
-            "Computed ",
-            len(levents),
-            " possible reactions. Cache len ",
-            len(self.ecache),
+            "Relaxed %d new states in %.3f s with %d evaluators (%s)"
+            % (len(pending), time.time() - tstart, self.neval, self.parallel)
         )
+        # uses the relaxation of the equivalent state, that might already
+        # have been evicted from the cache
+        for nevent, nstr, (lead, lstr) in deferred:
+            nevent[2] = lead[2]
+            nevent[3] = self.from_canonical(nstr, self.to_canonical(lstr, lead[3]))
+
+        print("Computed ", len(levents), " possible reactions. ", self.cache.report())
 
         # get list of rates
         rates = np.zeros(len(levents), float)
@@ -673,3 +926,60 @@ class AlKMC(Motion):
         newq -= oldq
         self.cell.array_pbc(newq)
         self.beads.q[0] += newq
+
+
+# evaluator of a worker process, when the relaxations run in a process pool
+_worker = None
+
+
+def _worker_init(kmc, requests, results, nworkers):
+    """Sets up the evaluator of a worker process: a copy of the system, whose
+    forces are computed by the forcefields of the main process through
+    FFProxy objects, and a geometry optimizer."""
+
+    global _worker
+    # the worker must not run the soft exit of i-PI, that would e.g. close
+    # the sockets, when it is terminated
+    softexit.flist, softexit.tlist = [], []
+    for sig in [signal.SIGINT, signal.SIGTERM]:
+        signal.signal(sig, signal.SIG_DFL)
+    with nworkers.get_lock():
+        slot = nworkers.value
+        nworkers.value += 1
+    channel = ProxyChannel(slot, requests, results[slot])
+    fflist = {}
+    for name, ff in kmc.forces.ff.items():
+        fflist[name] = FFProxy(ff, channel)
+        fflist[name].start()
+
+    dbeads = kmc.beads.copy()
+    dforces = Forces()
+    dforces.bind(dbeads, kmc.dcell, kmc.forces.fcomp, fflist, kmc.forces.open_paths)
+    dbias = Forces()
+    dbias.bind(
+        dbeads,
+        kmc.dcell,
+        kmc.ensemble.bias.fcomp,
+        fflist,
+        kmc.ensemble.bias.open_paths,
+    )
+    dnm = kmc.nm.copy()
+    dens = kmc.ensemble.copy()
+    dnm.bind(dens, kmc, beads=dbeads, forces=dforces)
+    dens.bind(dbeads, dnm, kmc.dcell, dforces, dbias)
+    geop = GeopMotion(**kmc.geop_args)
+    geop.bind(dens, dbeads, dnm, kmc.dcell, dforces, kmc.prng, kmc.output_maker)
+    _worker = (kmc.nstep, dbeads, dforces, geop)
+
+
+def _worker_relax(q0):
+    """Relaxes a state starting from the positions q0, in a worker process.
+    Returns the initial and final energy, and the final positions."""
+
+    nstep, dbeads, dforces, geop = _worker
+    dbeads.q[0, :] = q0
+    geop.reset()
+    ipot = dforces.pot
+    for i in range(nstep):
+        geop.step(i)
+    return ipot, dforces.pot, dstrip(dbeads.q[0]).copy()
@@ -13,6 +13,7 @@ import numpy as np
 
 from ipi.engine.motion import Motion
 from ipi.utils.depend import *
+from ipi.utils.beadtools import atomic_view
 from ipi.utils.units import Constants
 
 
@@ -76,12 +77,7 @@ class AlchemyMC(Motion):
         """This compile a list of atoms ready for exchanges."""
 
         # selects the types of atoms for exchange
-        atomexchangelist = []
-        for i in range(self.beads.natoms):
-            if self.beads.names[i] in atomtype:
-                atomexchangelist.append(i)
-
-        return np.asarray(atomexchangelist)
+        return np.flatnonzero(np.isin(dstrip(self.beads.names), atomtype))
 
     def step(self, step=None):
 
@@ -91,33 +87,30 @@ class AlchemyMC(Motion):
             return
 
         """Does one round of alchemical exchanges."""
-        # record the spring energy (divided by mass) for each atom in the exchange chain
-        # q = dstrip(self.beads.q)
         nb = self.beads.nbeads
         axlist = self.AXlist(self.names)
         lenlist = len(axlist)
         if lenlist == 0:
             raise ValueError("Atoms exchange list is empty in alchemical sampler.")
-        atomspring = np.zeros(lenlist)
-        wk2 = dstrip(self.nm.omegak2)
 
-        i = 0
-        for atomnum in axlist:
-            na3 = atomnum * 3
-
-            # computes spring in NM representation
-            spr = 0.0
-            for b in range(1, nb):
-                spr += wk2[b] * (self.nm.qnm[b, na3 : na3 + 3] ** 2).sum()
-            spr *= 0.5
+        # records the spring energy (divided by mass) of each atom in the exchange
+        # list, computed in NM representation. these do not depend on the masses,
+        # so they stay the same as the exchanges are accepted
+        wk2 = dstrip(self.nm.omegak2)
+        qnm = atomic_view(self.nm.qnm)[1:, axlist]
+        atomspring = 0.5 * np.dot(wk2[1:], (qnm ** 2).sum(axis=2))
 
-            # no mass here - just the massless spring term
-            atomspring[i] = spr
-            i += 1
+        # works on copies of the names and masses of the atoms in the list, and
+        # writes them back once all the exchanges have been tried
+        names0 = dstrip(self.beads.names)[axlist]
+        names = names0.copy()
+        m0 = dstrip(self.beads.m)[axlist]
+        m = m0.copy()
 
         # does the exchange
         betaP = 1.0 / (Constants.kb * self.ensemble.temp * nb)
         nexch = 0
+        dealc = 0.0
 
         # this would be double-counting, we already have a bail-out condition above
         # if (1.0/self.nxc < self.prng.u) : return  # tries a round of exhanges with probability 1/nmc
@@ -125,37 +118,36 @@ class AlchemyMC(Motion):
         for x in range(ntries):
             i = self.prng.rng.randint(lenlist)
             j = self.prng.rng.randint(lenlist)
-            while self.beads.names[axlist[i]] == self.beads.names[axlist[j]]:
+            while names[i] == names[j]:
                 j = self.prng.rng.randint(lenlist)  # makes sure we pick a real exchange
 
             # energy change due to the swap
-            difspring = (atomspring[i] - atomspring[j]) * (
-                self.beads.m[axlist[j]] - self.beads.m[axlist[i]]
-            )
+            difspring = (atomspring[i] - atomspring[j]) * (m[j] - m[i])
             pexchange = np.exp(-betaP * difspring)
 
             # attemps the exchange
             if pexchange > self.prng.u:
                 nexch += 1
-                # print 'exchange atom No.  ', axlist[i], '  and  ', axlist[j]
-
-                # swap names
-                nameswap = self.beads.names[axlist[i]]
-                self.beads.names[axlist[i]] = self.beads.names[axlist[j]]
-                self.beads.names[axlist[j]] = nameswap
-
-                # change masses
-                massratio = self.beads.m[axlist[i]] / self.beads.m[axlist[j]]
-                self.beads.m[axlist[i]] /= massratio
-                self.beads.m[axlist[j]] *= massratio
-
-                # adjust the (classical) momenta to conserve ke
-                self.beads.p[:, 3 * axlist[i] : 3 * (axlist[i] + 1)] /= np.sqrt(
-                    massratio
-                )
-                self.beads.p[:, 3 * axlist[j] : 3 * (axlist[j] + 1)] *= np.sqrt(
-                    massratio
-                )
+                names[i], names[j] = names[j], names[i]
+                m[i], m[j] = m[j], m[i]
 
                 # adjusts the conserved quantity counter based on the change in spring energy
-                self.ealc += -difspring
+                dealc -= difspring
+
+        if nexch == 0:
+            return
+
+        # swaps names and masses, and adjusts the (classical) momenta to conserve
+        # the kinetic energy, for all the atoms whose mass has changed
+        changed = (names != names0) | (m != m0)
+        nlist = axlist[changed]
+        self.beads.names[nlist] = names[changed]
+        self.beads.m[nlist] = m[changed]
+        p = (
+            atomic_view(self.beads.p)[:, nlist]
+            * np.sqrt(m[changed] / m0[changed])[np.newaxis, :, np.newaxis]
+        )
+        self.beads.p[
+            :, (3 * nlist[:, np.newaxis] + np.arange(3)).flatten()
+        ] = p.reshape((nb, -1))
+        self.ealc += dealc
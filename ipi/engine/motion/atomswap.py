@@ -26,13 +26,22 @@ class AtomSwap(Motion):
     """
 
     def __init__(
-        self, fixcom=False, fixatoms=None, mode=None, names=[], nxc=1, ealc=None
+        self,
+        fixcom=False,
+        fixatoms=None,
+        mode=None,
+        names=[],
+        nxc=1,
+        ealc=None,
+        nparallel=1,
     ):
         """Initialises a "alchemical exchange" motion object.
 
         Args:
             names : A list of isotopes
             nmc : frequency of doing exchanges
+            nparallel : number of trial swaps whose energies are evaluated
+                concurrently
 
         """
 
@@ -40,6 +49,7 @@ class AtomSwap(Motion):
 
         self.names = names
         self.nxc = nxc
+        self.nparallel = nparallel
 
         dself = dd(self)
         dself.ealc = depend_value(name="ealc")
@@ -66,9 +76,14 @@ class AtomSwap(Motion):
 
         super(AtomSwap, self).bind(ens, beads, cell, bforce, nm, prng, omaker)
         self.ensemble.add_econs(dd(self).ealc)
-        self.dbeads = self.beads.copy()
+        # one copy of the system for each of the trial swaps that are
+        # evaluated at the same time
         self.dcell = self.cell.copy()
-        self.dforces = self.forces.copy(self.dbeads, self.dcell)
+        self.dbeads = []
+        self.dforces = []
+        for k in range(self.nparallel):
+            self.dbeads.append(self.beads.copy())
+            self.dforces.append(self.forces.copy(self.dbeads[k], self.dcell))
 
     def AXlist(self, atomtype):
         """This compile a list of atoms ready for exchanges."""
@@ -81,6 +96,17 @@ class AtomSwap(Motion):
 
         return np.asarray(atomexchangelist)
 
+    def trial(self, k, i, j):
+        """Sets up the k-th copy of the system with the positions of atoms
+        i and j exchanged, and queues its force calculation."""
+
+        q = dstrip(self.beads.q)
+        dq = q.copy()
+        dq[:, 3 * i : 3 * i + 3] = q[:, 3 * j : 3 * j + 3]
+        dq[:, 3 * j : 3 * j + 3] = q[:, 3 * i : 3 * i + 3]
+        self.dbeads[k].q[:] = dq
+        self.dforces[k].queue()
+
     def step(self, step=None):
 
         # picks number of attempted exchanges
@@ -106,27 +132,39 @@ class AtomSwap(Motion):
         self.dcell.h = (
             self.cell.h
         )  # just in case the cell gets updated in the other motion classes
-        for x in range(ntries):
-            i = self.prng.rng.randint(lenlist)
-            j = self.prng.rng.randint(lenlist)
-            while self.beads.names[axlist[i]] == self.beads.names[axlist[j]]:
-                j = self.prng.rng.randint(lenlist)  # makes sure we pick a real exchange
-
-            old_energy = self.forces.pot
-            # swap the atom positions
-            self.dbeads.q[:] = self.beads.q[:]
-            self.dbeads.q[:, 3 * i : 3 * i + 3] = self.beads.q[:, 3 * j : 3 * j + 3]
-            self.dbeads.q[:, 3 * j : 3 * j + 3] = self.beads.q[:, 3 * i : 3 * i + 3]
-            new_energy = self.dforces.pot
-            pexchange = np.exp(-betaP * (new_energy - old_energy))
-
-            # attemps the exchange, and actually propagate the exchange if something has happened
-            if pexchange > self.prng.u:
-                nexch += 1
-
-                # copy the exchanged beads position
-                self.beads.q[:] = self.dbeads.q[:]
-                # transfers the (already computed) status of the force, so we don't need to recompute
-                self.forces.transfer_forces(self.dforces)
-
-                self.ealc += -(new_energy - old_energy)
+
+        # trial swaps are evaluated nparallel at a time, and accepted or rejected
+        # in order. after an exchange is accepted, the remaining trials of the
+        # batch start from the new configuration, so they are queued again
+        for x in range(0, ntries, self.nparallel):
+            pairs = []
+            for k in range(min(self.nparallel, ntries - x)):
+                i = self.prng.rng.randint(lenlist)
+                j = self.prng.rng.randint(lenlist)
+                # makes sure we pick a real exchange
+                while self.beads.names[axlist[i]] == self.beads.names[axlist[j]]:
+                    j = self.prng.rng.randint(lenlist)
+                # map the "subset" indices back to the "absolute" atom indices
+                pairs.append((axlist[i], axlist[j]))
+                self.trial(k, axlist[i], axlist[j])
+
+            for k in range(len(pairs)):
+                old_energy = self.forces.pot
+                new_energy = self.dforces[k].pot
+                pexchange = np.exp(-betaP * (new_energy - old_energy))
+
+                # attemps the exchange, and actually propagate the exchange if something has happened
+                if pexchange > self.prng.u:
+                    nexch += 1
+
+                    # copy the exchanged beads position
+                    self.beads.q[:] = self.dbeads[k].q[:]
+                    # transfers the (already computed) status of the force, so we don't need to recompute
+                    self.forces.transfer_forces(self.dforces[k])
+
+                    self.ealc += -(new_energy - old_energy)
+
+                    for kk in range(k + 1, len(pairs)):
+                        # waits for the outdated evaluation before queueing a new one
+                        self.dforces[kk].pot
+                        self.trial(kk, *pairs[kk])
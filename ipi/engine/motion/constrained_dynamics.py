@@ -159,6 +159,7 @@ class ConstrainedDynamics(Dynamics):
                 tolerance=csolver["tolerance"],
                 maxit=csolver["maxit"],
                 norm_order=norm_order,
+                quasi_newton=csolver["quasi_newton"],
             )
 
         # parameters of the geodesic integrator. will probably never need
@@ -238,19 +239,73 @@ class ConstraintSolver(ConstraintSolverBase):
 
     For the quasi-Newton method in proj_cotangent see
         ???
+
+    The quasi-Newton iteration keeps the Jacobian (and the factorisation of
+    the Gram matrix) computed at the previous point on the manifold fixed
+    while iterating. Setting quasi_newton to False recomputes the Jacobian
+    at each iteration (exact Newton), which converges in fewer but more
+    expensive iterations.
     """
 
     def __init__(
-        self, constraint_list, dt=1.0, tolerance=0.001, maxit=1000, norm_order=2
+        self,
+        constraint_list,
+        dt=1.0,
+        tolerance=0.001,
+        maxit=1000,
+        norm_order=2,
+        batched=True,
+        quasi_newton=True,
     ):
         """Solver options include a tolerance for the projection on the
         manifold, maximum number of iterations for the projection, and
-        the order of the norm to estimate the convergence"""
+        the order of the norm to estimate the convergence. If batched is
+        True, groups of constraints with the same structure are stacked and
+        projected together with vectorised linear algebra. If quasi_newton
+        is False, an exact Newton iteration is used instead."""
 
         super(ConstraintSolver, self).__init__(constraint_list, dt)
         self.tolerance = tolerance
         self.maxit = maxit
         self.norm_order = norm_order
+        self.batched = batched
+        self.quasi_newton = quasi_newton
+
+    def bind(self, beads):
+        """Binds the solver, and sorts the constraints into batches of
+        groups with the same structure. Groups that cannot be batched (or
+        all of them, if different groups share atoms, as then the order in
+        which they are projected matters) are treated one at a time."""
+
+        super(ConstraintSolver, self).bind(beads)
+
+        self.batches = []
+        self.unbatched = list(self.constraint_list)
+        if not self.batched or len(self.constraint_list) == 0:
+            return
+
+        i_all = np.concatenate([constr.i_unique for constr in self.constraint_list])
+        if len(np.unique(i_all)) < len(i_all):
+            return
+
+        groups = {}
+        self.unbatched = []
+        for constr in self.constraint_list:
+            key = constr.batch_key()
+            if key is None:
+                self.unbatched.append(constr)
+            else:
+                groups.setdefault(key, []).append(constr)
+        q = dstrip(beads.q[0])
+        for clist in groups.values():
+            if len(clist) == 1:
+                # a single (possibly large) group is better handled by its
+                # own, possibly sparse, Jacobian
+                self.unbatched += clist
+                continue
+            batch = ConstraintBatch(clist)
+            batch.set_qprev(q)
+            self.batches.append(batch)
 
     def proj_cotangent(self):
         """Set the momenta conjugate to the constrained degrees of freedom
@@ -260,21 +315,28 @@ class ConstraintSolver(ConstraintSolverBase):
         (sparsely).
         """
 
-        #        m3 = dstrip(self.beads.m3[0])
+        m3 = dstrip(self.beads.m3[0])
         p = dstrip(self.beads.p[0]).copy()
         self.beads.p.hold()
 
-        for constr in self.constraint_list:
-            dg = dstrip(constr.Dg)
+        for batch in self.batches:
+            dg = batch.Dg()
+            ic = batch.i3_unique
+            igram = batch.iGram(m3[ic])
+            b = np.einsum("bij,bj->bi", dg, p[ic] / m3[ic])
+            x = np.einsum("bij,bj->bi", igram, b)
+            p[ic] -= np.einsum("bji,bj->bi", dg, x)
+
+        for constr in self.unbatched:
             ic = constr.i3_unique
-            b = np.dot(dg, p[ic] / constr.m3)
+            b = constr.Dg_dot(p[ic] / constr.m3)
 
             if spla is None:
                 x = np.linalg.solve(dstrip(constr.Gram), b)
             else:
                 x = spla.cho_solve(dstrip(constr.GramChol), b)
 
-            p[ic] -= np.dot(np.transpose(dg), x)
+            p[ic] -= constr.DgT_dot(x)
         self.beads.p[0] = p
         self.beads.p.resume()
 
@@ -282,20 +344,64 @@ class ConstraintSolver(ConstraintSolverBase):
         """Iteratively enforce the constraints onto the positions by finding
         the Lagrange multipliers using a quasi-Newton solver. Note
         that independent groups of constraints are treated separately
-        (sparsely).
+        (sparsely). Batched groups are iterated together, and each group
+        stops being updated as soon as it has converged.
         """
 
         m3 = dstrip(self.beads.m3[0])
         p = dstrip(self.beads.p[0]).copy()
         q = dstrip(self.beads.q[0]).copy()
 
-        for constr in self.constraint_list:
-            dg = dstrip(constr.Dg)
+        for batch in self.batches:
+            dg = batch.Dg()
+            ic = batch.i3_unique
+            igram = batch.iGram(m3[ic])
+            qc = q[ic]
+            pc = p[ic]
+            mc = m3[ic]
+
+            # iterative projection on the manifold. active flags the groups
+            # that have not converged yet
+            active = np.arange(len(ic))
+            for i in range(self.maxit):
+                g = batch.g(qc, active)
+                # bailout condition
+                todo = self.tolerance <= np.linalg.norm(g, ord=self.norm_order, axis=1)
+                if not todo.any():
+                    break
+                active = active[todo]
 
-            if spla is None:
-                gram = dstrip(constr.Gram)
+                if self.quasi_newton:
+                    dlambda = np.einsum("bij,bj->bi", igram[active], g[todo])
+                else:
+                    # Jacobian of g along the (fixed) projection directions
+                    jac = np.einsum(
+                        "bij,bkj->bik",
+                        batch.Dg_at(qc, active),
+                        dg[active] / mc[active, np.newaxis, :],
+                    )
+                    dlambda = np.linalg.solve(jac, g[todo][:, :, np.newaxis])[:, :, 0]
+                delta = np.einsum("bji,bj->bi", dg[active], dlambda)
+                qc[active] -= delta / mc[active]
+                pc[active] -= delta / self.dt
+            else:
+                warning(
+                    "No convergence in Newton iteration for positional component "
+                    "(%d of %d batched groups)" % (len(active), len(ic)),
+                    verbosity.low,
+                )
+            q[ic] = qc
+            p[ic] = pc
+
+        for constr in self.unbatched:
+            if self.quasi_newton:
+                if spla is None:
+                    gram = dstrip(constr.Gram)
+                else:
+                    chol_gram = dstrip(constr.GramChol)
             else:
-                chol_gram = dstrip(constr.GramChol)
+                # keeps the projection directions, as qprev will be moved
+                dg = dstrip(constr.Dg).copy()
 
             ic = constr.i3_unique
             constr.q = q[ic]
@@ -307,24 +413,31 @@ class ConstraintSolver(ConstraintSolverBase):
                 if self.tolerance > np.linalg.norm(g, ord=self.norm_order):
                     break
 
-                if spla is None:
-                    dlambda = np.linalg.solve(gram, g)
+                if not self.quasi_newton:
+                    constr.qprev = q[ic]
+                    jac = np.dot(dstrip(constr.Dg), dg.T / m3[ic, np.newaxis])
+                    dlambda = np.linalg.solve(jac, g)
+                    delta = np.dot(dg.T, dlambda)
                 else:
-                    dlambda = spla.cho_solve(chol_gram, g)
-                delta = np.dot(np.transpose(dg), dlambda)
+                    if spla is None:
+                        dlambda = np.linalg.solve(gram, g)
+                    else:
+                        dlambda = spla.cho_solve(chol_gram, g)
+                    delta = constr.DgT_dot(dlambda)
                 q[ic] -= delta / m3[ic]
                 constr.q = q[ic]  # updates the constraint to recompute g
 
                 p[ic] -= delta / self.dt
-
-            if i == self.maxit:
+            else:
                 warning(
                     "No convergence in Newton iteration for positional component",
                     verbosity.low,
                 )
 
         # after all constraints have been applied, q is on the manifold and we can update the constraint positions
-        for constr in self.constraint_list:
+        for batch in self.batches:
+            batch.set_qprev(q)
+        for constr in self.unbatched:
             constr.qprev = q[constr.i3_unique.flatten()]
         self.beads.p[0] = p
         self.beads.q[0] = q
@@ -409,6 +409,9 @@ class NVEIntegrator(DummyIntegrator):
             potential energy, and the spring potential energy.
     """
 
+    # whether the position steps only touch qnm and pnm, and can be batched
+    batch_qstep = True
+
     def pstep(self, level=0):
         """Velocity Verlet monemtum propagator."""
 
@@ -424,6 +427,30 @@ class NVEIntegrator(DummyIntegrator):
             dstrip(self.nm.pnm)[0, :] / dstrip(self.beads.m3)[0] * self.qdt
         )
 
+    def ppstep(self, level=0):
+        """Momentum step followed by the momentum constraints.
+
+        The updates of the momenta are grouped in a dbatch block, so that
+        the taint is propagated only once to the quantities that depend on them.
+        """
+
+        with dbatch():
+            self.pstep(level)
+            self.pconstraints()
+
+    def qqstep(self, nsteps=1):
+        """Centroid and free ring-polymer position steps, repeated nsteps times.
+
+        When the free ring-polymer propagation is done in the normal modes
+        representation, the updates of qnm and pnm are grouped in a dbatch
+        block, so that the taint is propagated only once at the end.
+        """
+
+        with dbatch(self.batch_qstep and self.nm.propagator != "bab"):
+            for i in range(nsteps):
+                self.qcstep()
+                self.nm.free_qstep()
+
     # now the idea is that for BAOAB the MTS should work as follows:
     # take the BAB MTS, and insert the O in the very middle. This might imply breaking a A step in two, e.g. one could have
     # Bbabb(a/2) O (a/2)bbabB
@@ -434,29 +461,21 @@ class NVEIntegrator(DummyIntegrator):
 
         for i in range(mk):  # do nmts/2 full sub-steps
 
-            self.pstep(index)
-            self.pconstraints()
+            self.ppstep(index)
             if index == self.nmtslevels - 1:
                 # call Q propagation for dt/alpha at the inner step
-                self.qcstep()
-                self.nm.free_qstep()
-                self.qcstep()
-                self.nm.free_qstep()
-
+                self.qqstep(2)
             else:
                 self.mtsprop(index + 1)
 
-            self.pstep(index)
-            self.pconstraints()
+            self.ppstep(index)
 
         if self.nmts[index] % 2 == 1:
             # propagate p for dt/2alpha with force at level index
-            self.pstep(index)
-            self.pconstraints()
+            self.ppstep(index)
             if index == self.nmtslevels - 1:
                 # call Q propagation for dt/alpha at the inner step
-                self.qcstep()
-                self.nm.free_qstep()
+                self.qqstep()
             else:
                 self.mtsprop_ba(index + 1)
 
@@ -466,29 +485,22 @@ class NVEIntegrator(DummyIntegrator):
         if self.nmts[index] % 2 == 1:
             if index == self.nmtslevels - 1:
                 # call Q propagation for dt/alpha at the inner step
-                self.qcstep()
-                self.nm.free_qstep()
+                self.qqstep()
             else:
                 self.mtsprop_ab(index + 1)
 
             # propagate p for dt/2alpha with force at level index
-            self.pstep(index)
-            self.pconstraints()
+            self.ppstep(index)
 
         for i in range(int(self.nmts[index] / 2)):  # do nmts/2 full sub-steps
-            self.pstep(index)
-            self.pconstraints()
+            self.ppstep(index)
             if index == self.nmtslevels - 1:
                 # call Q propagation for dt/alpha at the inner step
-                self.qcstep()
-                self.nm.free_qstep()
-                self.qcstep()
-                self.nm.free_qstep()
+                self.qqstep(2)
             else:
                 self.mtsprop(index + 1)
 
-            self.pstep(index)
-            self.pconstraints()
+            self.ppstep(index)
 
     def mtsprop(self, index):
         # just calls the two pieces together
@@ -604,6 +616,9 @@ class NPTIntegrator(NVTIntegrator):
 
     # should be enough to redefine these functions, and the step() from NVTIntegrator should do the trick
 
+    # the barostat position step reads quantities that depend on q
+    batch_qstep = False
+
     def pstep(self, level=0):
         """Velocity Verlet monemtum propagator."""
 
@@ -742,6 +757,8 @@ class SCNPTIntegrator(SCIntegrator):
     """
 
     # should be enough to redefine these functions, and the step() from NVTIntegrator should do the trick
+    batch_qstep = False
+
     def pstep(self, level=0):
         """Velocity Verlet monemtum propagator."""
 
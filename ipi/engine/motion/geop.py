@@ -17,7 +17,7 @@ import time
 from ipi.engine.motion import Motion
 from ipi.utils.depend import dstrip, dobject
 from ipi.utils.softexit import softexit
-from ipi.utils.mintools import min_brent, BFGS, BFGSTRM, L_BFGS
+from ipi.utils.mintools import min_brent, BFGS, BFGSTRM, L_BFGS, FIRE
 from ipi.utils.messages import verbosity, info
 
 
@@ -48,6 +48,14 @@ class GeopMotion(Motion):
         scale_lbfgs: Scale choice for the initial hessian.
         qlist_lbfgs: list of previous positions (x_n+1 - x_n) for L-BFGS. Number of entries = corrections_lbfgs
         glist_lbfgs: list of previous gradients (g_n+1 - g_n) for L-BFGS. Number of entries = corrections_lbfgs
+        fire_options:
+        {dt: initial time step for FIRE
+        dtmax: maximum time step for FIRE
+        maxstep: maximum displacement of any degree of freedom in one FIRE step
+        alpha: initial velocity mixing parameter for FIRE
+        nmin: number of downhill steps before FIRE increases the time step
+        ndelay: number of initial steps without time-step decrease in FIRE 2.0}
+        state_fire: current time step, mixing parameter and number of downhill steps for FIRE
     """
 
     def __init__(
@@ -70,6 +78,15 @@ class GeopMotion(Motion):
         scale_lbfgs=1,
         qlist_lbfgs=np.zeros(0, float),
         glist_lbfgs=np.zeros(0, float),
+        fire_options={
+            "dt": 41.341373,
+            "dtmax": 413.41373,
+            "maxstep": 0.5,
+            "alpha": 0.1,
+            "nmin": 5,
+            "ndelay": 20,
+        },
+        state_fire=np.zeros(0, float),
     ):
         """Initialises GeopMotion.
 
@@ -115,6 +132,10 @@ class GeopMotion(Motion):
             self.optimizer = SDOptimizer()
         elif self.mode == "cg":
             self.optimizer = CGOptimizer()
+        elif self.mode in ["fire", "fire2"]:
+            self.fire_options = fire_options
+            self.state_fire = state_fire
+            self.optimizer = FIREOptimizer()
         else:
             self.optimizer = DummyOptimizer()
 
@@ -139,6 +160,12 @@ class GeopMotion(Motion):
             self.scale *= 0.0
             self.qlist *= 0.0
             self.glist *= 0.0
+        elif self.mode in ["fire", "fire2"]:
+            self.state_fire[:] = [
+                self.fire_options["dt"],
+                self.fire_options["alpha"],
+                0,
+            ]
 
     def bind(self, ens, beads, nm, cell, bforce, prng, omaker):
         """Binds beads, cell, bforce and prng to GeopMotion
@@ -903,3 +930,71 @@ class CGOptimizer(DummyOptimizer):
         # Exit simulation step
         d_x_max = np.amax(np.absolute(d_x))
         self.exitstep(self.forces.pot, u0, d_x_max)
+
+
+class FIREOptimizer(DummyOptimizer):
+    """
+    FIRE and FIRE 2.0 minimization. Damped molecular dynamics that does a
+    single force evaluation per step, with no line search, which makes it
+    robust with noisy forces. All the beads are moved at once, so their
+    forces are requested together.
+    """
+
+    def bind(self, geop):
+        # call bind function from DummyOptimizer
+        super(FIREOptimizer, self).bind(geop)
+        self.gm.bind(self)
+        self.fire_options = geop.fire_options
+        self.version = 2 if geop.mode == "fire2" else 1
+
+        if geop.state_fire.size != 3:
+            if geop.state_fire.size == 0:
+                geop.state_fire = np.array(
+                    [self.fire_options["dt"], self.fire_options["alpha"], 0]
+                )
+            else:
+                raise ValueError("FIRE state should contain 3 elements")
+        self.state_fire = geop.state_fire
+
+    def step(self, step=None):
+        """Does one simulation time step
+        Attributes:
+        qtime: The time taken in updating the positions.
+        """
+
+        self.qtime = -time.time()
+        info("\nMD STEP %d" % step, verbosity.debug)
+
+        self.old_x[:] = self.beads.q
+        self.old_u[:] = self.forces.pot
+        self.old_f[:] = self.forces.f
+
+        # The velocities are stored as the direction, and only the
+        # degrees of freedom that are not fixed are integrated
+        mask = self.gm.fixatoms_mask
+        v = self.d[:, mask]
+        FIRE(
+            self.old_x[:, mask],
+            self.old_f[:, mask],
+            v,
+            dstrip(self.beads.m3)[:, mask],
+            self.gm,
+            self.state_fire,
+            self.fire_options,
+            step,
+            self.version,
+        )
+        self.d[:, mask] = v
+
+        info("   Number of force calls: %d" % (self.gm.fcount))
+        self.gm.fcount = 0
+
+        # Update positions and forces
+        self.beads.q = self.gm.dbeads.q
+        self.forces.transfer_forces(
+            self.gm.dforces
+        )  # This forces the update of the forces
+
+        # Exit simulation step
+        d_x_max = np.amax(np.absolute(np.subtract(self.beads.q, self.old_x)))
+        self.exitstep(self.forces.pot, self.old_u, d_x_max)
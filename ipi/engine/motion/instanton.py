@@ -18,17 +18,17 @@ from ipi.utils.depend import dstrip, dobject
 from ipi.utils.softexit import softexit
 from ipi.utils.messages import verbosity, info
 from ipi.utils import units
-from ipi.utils.mintools import nichols, Powell
+from ipi.utils.mintools import Powell
 from ipi.engine.motion.geop import L_BFGS
 from ipi.utils.instools import (
     banded_hessian,
     invmul_banded,
-    red2comp,
+    nichols_banded,
     get_imvector,
     print_instanton_geo,
 )
 from ipi.utils.instools import print_instanton_hess, diag_banded, ms_pathway
-from ipi.utils.hesstools import get_hessian, clean_hessian, get_dynmat
+from ipi.utils.hesstools import get_hessian, external_modes, get_dynmat
 from ipi.engine.beads import Beads
 
 __all__ = ["InstantonMotion"]
@@ -70,6 +70,7 @@ class InstantonMotion(Motion):
         corrections_lbfgs: Number of corrections to be stored for L-BFGS
         ls_options: Options for line search methods.
         hessian_final:  Boolean which decides whether the hessian after the optimization will be computed.
+        hessian_format: Whether the hessian files are printed as 'text' or 'binary' (.npy).
         energy_shift: zero of energy (usually it corresponds to reactant state)
     """
 
@@ -102,6 +103,9 @@ class InstantonMotion(Motion):
         old_direction=np.zeros(0, float),
         hessian_final="False",
         energy_shift=np.zeros(0, float),
+        hessian_batch=1,
+        hessian_symmetrize="false",
+        hessian_format="text",
     ):
         """Initialises InstantonMotion."""
 
@@ -121,6 +125,9 @@ class InstantonMotion(Motion):
         self.options["save"] = alt_out
         self.options["prefix"] = prefix
         self.options["hessian_final"] = hessian_final
+        self.options["hessian_batch"] = hessian_batch
+        self.options["hessian_symmetrize"] = hessian_symmetrize
+        self.options["hessian_format"] = hessian_format
 
         self.options["max_e"] = max_e
         self.options["max_ms"] = max_ms
@@ -176,8 +183,8 @@ class InstantonMotion(Motion):
 
         if self.options["opt"] == "NR":
             info(
-                "Note that we need scipy to use NR. If storage and diagonalization of the full hessian is not a "
-                "problem use nichols even though it may not be as efficient.",
+                "Note that we need scipy to use NR. If the starting geometry is far from the optimized one "
+                "use nichols, which works with the same banded hessian.",
                 verbosity.low,
             )
 
@@ -461,6 +468,30 @@ class GradientMapper(object):
 
         return e, g
 
+    def batch_gradient(self, xs):
+        """Computes the gradients for a stack of independent ring-polymer
+        configurations (e.g. finite-difference displacements), returning the
+        active components. All the replicas are evaluated as a single
+        beads object, so the force requests go out to the clients together.
+        If the forces are interpolated along the path (max_ms, max_e), each
+        configuration is evaluated separately instead, as is done when
+        some of the force components use ring-polymer contraction, which
+        would otherwise mix the replicas of different configurations."""
+
+        if self.spline or any(fc.nbeads > 0 for fc in self.dforces.fcomp):
+            return np.asarray([self(x, new_disc=False)[1] for x in xs])
+
+        self.fcount += 1
+        nconf, nbeads = xs.shape[0], xs.shape[1]
+        batch_b = Beads(self.dbeads.natoms, nconf * nbeads)
+        batch_b.q[:] = xs.reshape((nconf * nbeads, -1))
+        batch_b.m[:] = self.dbeads.m
+        batch_b.names[:] = self.dbeads.names
+        batch_forces = self.dforces.copy(batch_b, self.dcell.copy())
+
+        g = self.fix.get_active_vector(-dstrip(batch_forces.f), 1)
+        return g.reshape((nconf, nbeads, -1))
+
 
 class SpringMapper(object):
     """Creation of the multi-dimensional function to compute full or half ring polymer pot
@@ -501,19 +532,6 @@ class SpringMapper(object):
                 / units.Constants.hbar
             ) ** 2
 
-        if (
-            dumop.options["opt"] == "nichols"
-            or dumop.options["opt"] == "NR"
-            or dumop.options["opt"] == "lanczos"
-        ):
-            self.h = self.spring_hessian(
-                natoms=self.dbeads.natoms,
-                nbeads=self.dbeads.nbeads,
-                m3=self.dbeads.m3[0],
-                omega2=self.omega2,
-                coef=self.coef,
-            )
-
     def set_coef(self, coef):
         """ Sets coeficients for non-uniform instanton calculation """
         self.coef = coef.reshape(-1, 1)
@@ -759,6 +777,9 @@ class DummyOptimizer(dobject):
         self.options["prefix"] = geop.options["prefix"]
         self.optarrays["delta"] = geop.optarrays["delta"]
         self.options["hessian_final"] = geop.options["hessian_final"]
+        self.options["hessian_batch"] = geop.options["hessian_batch"]
+        self.options["hessian_symmetrize"] = geop.options["hessian_symmetrize"]
+        self.options["hessian_format"] = geop.options["hessian_format"]
         self.optarrays["energy_shift"] = geop.optarrays["energy_shift"]
 
         self.gm.bind(
@@ -870,6 +891,8 @@ class DummyOptimizer(dobject):
                     self.beads.natoms,
                     self.beads.nbeads,
                     self.fixatoms,
+                    batch=self.options["hessian_batch"],
+                    symmetrize=self.options["hessian_symmetrize"] == "true",
                 )
                 self.optarrays["hessian"][:] = self.fix.get_full_vector(
                     active_hessian, 2
@@ -879,6 +902,7 @@ class DummyOptimizer(dobject):
                     step,
                     self.optarrays["hessian"],
                     self.output_maker,
+                    binary=self.options["hessian_format"] == "binary",
                 )
 
             return True
@@ -1055,6 +1079,8 @@ class HessianOptimizer(DummyOptimizer):
                 self.beads.natoms,
                 self.beads.nbeads,
                 self.fixatoms,
+                batch=self.options["hessian_batch"],
+                symmetrize=self.options["hessian_symmetrize"] == "true",
             )
             self.optarrays["hessian"][:] = self.fix.get_full_vector(active_hessian, 2)
 
@@ -1080,7 +1106,13 @@ class HessianOptimizer(DummyOptimizer):
 
         elif update == "recompute":
             active_hessian = get_hessian(
-                self.gm, new_x, self.beads.natoms, self.beads.nbeads, self.fixatoms
+                self.gm,
+                new_x,
+                self.beads.natoms,
+                self.beads.nbeads,
+                self.fixatoms,
+                batch=self.options["hessian_batch"],
+                symmetrize=self.options["hessian_symmetrize"] == "true",
             )
 
         self.optarrays["hessian"][:] = self.fix.get_full_vector(active_hessian, 2)
@@ -1094,6 +1126,7 @@ class HessianOptimizer(DummyOptimizer):
                 step,
                 self.optarrays["hessian"],
                 self.output_maker,
+                binary=self.options["hessian_format"] == "binary",
             )
 
     def post_step(self, step, new_x, d_x, activearrays):
@@ -1140,20 +1173,14 @@ class NicholsOptimizer(HessianOptimizer):
 
         activearrays = self.pre_step(step)
 
-        # First construct complete hessian from reduced
-        h0 = red2comp(
-            activearrays["hessian"],
-            self.im.dbeads.nbeads,
-            self.im.dbeads.natoms,
-            self.im.coef,
+        # Mass-scaled ring polymer hessian, in upper banded form
+        dyn_mat = get_dynmat(
+            activearrays["hessian"], self.im.dbeads.m3, self.im.dbeads.nbeads
         )
+        h_up_band = banded_hessian(dyn_mat, self.im, masses=False, shift=0.0)
 
-        # Add spring terms to the physical hessian
-        h1 = np.add(self.im.h, h0)
-
-        # Get eigenvalues and eigenvector.
-        d, w = clean_hessian(
-            h1,
+        # External modes that are projected out
+        D = external_modes(
             self.im.dbeads.q,
             self.im.dbeads.natoms,
             self.im.dbeads.nbeads,
@@ -1162,7 +1189,20 @@ class NicholsOptimizer(HessianOptimizer):
             self.options["hessian_asr"],
         )
 
-        # d,w =np.linalg.eigh(h1) #Cartesian
+        # Find new movement direction
+        if self.options["mode"] == "rate":
+            f = activearrays["old_f"] * (self.im.coef[1:] + self.im.coef[:-1]) / 2
+            mode = 1
+        elif self.options["mode"] == "splitting":
+            f = activearrays["old_f"]
+            mode = 0
+        f = np.multiply(f + self.im.f, self.im.dbeads.m3 ** -0.5)
+
+        d, d_x = nichols_banded(h_up_band, f, activearrays["big_step"], mode=mode, D=D)
+        d_x = np.multiply(
+            d_x.reshape(self.im.dbeads.q.shape), self.im.dbeads.m3 ** -0.5
+        )
+
         info(
             "\n@Nichols: 1st freq {} cm^-1".format(
                 units.unit_to_user(
@@ -1187,26 +1227,6 @@ class NicholsOptimizer(HessianOptimizer):
             ),
             verbosity.medium,
         )
-        # info('@Nichols: 4th freq {} cm^-1'.format(units.unit_to_user('frequency','inversecm',np.sign(d[3])*np.sqrt(np.absolute(d[3])))),verbosity.medium)
-        # info('@Nichols: 8th freq {} cm^-1\n'.format(units.unit_to_user('frequency','inversecm',np.sign(d[7])*np.sqrt(np.absolute(d[7])))),verbosity.medium)
-
-        # Find new movement direction
-        if self.options["mode"] == "rate":
-            f = activearrays["old_f"] * (self.im.coef[1:] + self.im.coef[:-1]) / 2
-            d_x = nichols(
-                f, self.im.f, d, w, self.im.dbeads.m3, activearrays["big_step"]
-            )
-        elif self.options["mode"] == "splitting":
-            d_x = nichols(
-                activearrays["old_f"],
-                self.im.f,
-                d,
-                w,
-                self.im.dbeads.m3,
-                activearrays["big_step"],
-                mode=0,
-            )
-
         # Rescale step if necessary
         if np.amax(np.absolute(d_x)) > activearrays["big_step"]:
             info(
@@ -1290,42 +1310,16 @@ class LanczosOptimizer(HessianOptimizer):
             self.im.dbeads.natoms * 3 * self.im.dbeads.nbeads, 1
         )
 
-        banded = False
-        banded = True
-        if banded:
-            # BANDED Version
-            # MASS-scaled
-            dyn_mat = get_dynmat(
-                activearrays["hessian"], self.im.dbeads.m3, self.im.dbeads.nbeads
-            )
-            h_up_band = banded_hessian(
-                dyn_mat, self.im, masses=False, shift=0.000000001
-            )  # create upper band matrix
-            f = np.multiply(f, self.im.dbeads.m3.reshape(f.shape) ** -0.5)
-            # CARTESIAN
-            # h_up_band = banded_hessian(activearrays["hessian"], self.im,masses=True)  # create upper band matrix
-
-            d = diag_banded(h_up_band)
-        else:
-            # FULL dimensions version
-            h_0 = red2comp(
-                activearrays["hessian"],
-                self.im.dbeads.nbeads,
-                self.im.dbeads.natoms,
-                self.im.coef,
-            )
-            h_test = np.add(self.im.h, h_0)  # add spring terms to the physical hessian
-            d, w = clean_hessian(
-                h_test,
-                self.im.dbeads.q,
-                self.im.dbeads.natoms,
-                self.im.dbeads.nbeads,
-                self.im.dbeads.m,
-                self.im.dbeads.m3,
-                None,
-            )
-            # CARTESIAN
-            # d,w =np.linalg.eigh(h_test) #Cartesian
+        # MASS-scaled
+        dyn_mat = get_dynmat(
+            activearrays["hessian"], self.im.dbeads.m3, self.im.dbeads.nbeads
+        )
+        h_up_band = banded_hessian(
+            dyn_mat, self.im, masses=False, shift=0.000000001
+        )  # create upper band matrix
+        f = np.multiply(f, self.im.dbeads.m3.reshape(f.shape) ** -0.5)
+
+        d = diag_banded(h_up_band)
         info(
             "\n@Lanczos: 1st freq {} cm^-1".format(
                 units.unit_to_user(
@@ -1377,12 +1371,8 @@ class LanczosOptimizer(HessianOptimizer):
             alpha = 1
             lamb = (d[0] + d[1]) / 4
 
-        if banded:
-            h_up_band[-1, :] += -np.ones(h_up_band.shape[1]) * lamb
-            d_x = invmul_banded(h_up_band, f)
-        else:
-            h_test = alpha * (h_test - np.eye(h_test.shape[0]) * lamb)
-            d_x = np.linalg.solve(h_test, f)
+        h_up_band[-1, :] += -np.ones(h_up_band.shape[1]) * lamb
+        d_x = invmul_banded(h_up_band, f)
 
         d_x.shape = self.im.dbeads.q.shape
 
@@ -12,50 +12,199 @@ import numpy as np
 import time
 
 from ipi.engine.motion import Motion
+from ipi.engine.beads import Beads
 from ipi.utils.depend import *
 from ipi.utils.softexit import softexit
-from ipi.utils.mintools import L_BFGS, min_brent_neb
+from ipi.utils.mintools import min_brent_neb, FIRE
 from ipi.utils.messages import verbosity, info
 
 
 __all__ = ["NEBMover"]
 
 
-# TODO: Do not shout :-)
-# NOTE: CURRENTLY, NEB ONLY WORKS FOR L-BFGS MINIMIZATION.
-#       IF SD, CG, OR BFGS OPTIONS ARE NOT DESIRED, CONSIDER ELIMINATING
-#       NEBLineMover AND THE RELEVANT BLOCKS IN NEBMover. IF THESE OPTIONS ARE DESIRED,
-#       THE INFRASTRUCTURE IS PRESENT BUT MUST BE DEBUGGED AND MADE CONSISTENT WITH
-#       THAT PRESENT IN NEBBFGSMover (TO REMOVE REMAINING ERRORS IN COMPUTATION).
-#       CLIMBING IMAGE AND VARIABLE SPRING CONSTANTS HAVE NOT YET BEEN IMPLEMENTED, BUT
-#       THE GENERIC INFRASTRUCTURE IS PRESENT (SEE COMMENTED BLOCKS IN NEBLineMover AND
-#       NEBBFGSMover). REQUIRES REARRANGEMENT AND DEBUGGING.
-#       THIS NEB IMPLEMENTATION USES THE 'IMPROVED TANGENTS' OF HENKELMAN AND JONSSON, 2000.
-#       THE 'OLD IMPLEMENTATION' IS PRESERVED IN COMMENTS
+# NOTE: the line-search (SD and CG) modes reuse the infrastructure of the geometry
+#       optimizer and have not been validated as thoroughly as L-BFGS.
+#       This NEB implementation uses the 'improved tangents' of Henkelman and Jonsson,
+#       J. Chem. Phys. 113, 9978 (2000), and the climbing image and energy-weighted
+#       springs of Henkelman, Uberuaga and Jonsson, J. Chem. Phys. 113, 9901 (2000).
+#       The end images are fixed: their forces are computed once and never again.
 
 
-class NEBLineMover(object):
+def neb_tangents(bq, be):
+    """Computes the tangents to the band at the interior images, using the
+    improved tangent estimate, that weighs the segments by the energy
+    differences when an image is at an extremum of the energy.
+
+    Args:
+        bq: A (nimg, 3*natoms) array with the positions of the images.
+        be: A (nimg) array with the energies of the images.
+
+    Returns:
+        A (nimg-2, 3*natoms) array with the normalised tangents.
+    """
+
+    dq = bq[1:] - bq[:-1]
+    de = be[1:] - be[:-1]
+    deplus, deminus = np.abs(de[1:]), np.abs(de[:-1])
+    demax = np.maximum(deplus, deminus)
+    demin = np.minimum(deplus, deminus)
+
+    # at extrema, the segment towards the higher neighbour gets more weight
+    higher = be[2:] > be[:-2]
+    wplus = np.where(higher, demax, demin)
+    wminus = np.where(higher, demin, demax)
+    wplus[be[2:] == be[:-2]] = 1.0
+    wminus[be[2:] == be[:-2]] = 1.0
+
+    # monotonic energy profiles use the segment towards the higher neighbour
+    uphill = (de[1:] > 0) & (de[:-1] > 0)
+    downhill = (de[1:] < 0) & (de[:-1] < 0)
+    wplus[uphill], wminus[uphill] = 1.0, 0.0
+    wplus[downhill], wminus[downhill] = 0.0, 1.0
+
+    btau = wplus[:, np.newaxis] * dq[1:] + wminus[:, np.newaxis] * dq[:-1]
+    btau /= np.sqrt((btau ** 2).sum(axis=1))[:, np.newaxis]
+    return btau
+
+
+def neb_springs(be, spring):
+    """Computes the spring constants of the nimg-1 segments of the band.
+
+    Args:
+        be: A (nimg) array with the energies of the images.
+        spring: A dictionary with the spring options. If varsprings is True,
+            the constants are scaled between kappamin and kappamax depending
+            on the energy of the segment, to increase the density of
+            images close to the saddle point. Otherwise they are all kappa.
+    """
+
+    if not spring["varsprings"]:
+        return np.ones(len(be) - 1) * spring["kappa"]
+
+    eseg = np.maximum(be[1:], be[:-1])
+    emax = be.max()
+    eref = max(be[0], be[-1])
+    kappa = np.ones(len(eseg)) * spring["kappamin"]
+    if emax > eref:
+        high = eseg > eref
+        kappa[high] = spring["kappamax"] - (spring["kappamax"] - spring["kappamin"]) * (
+            emax - eseg[high]
+        ) / (emax - eref)
+    return kappa
+
+
+def neb_forces(bq, bf, be, spring, climb=False):
+    """Computes the NEB forces on the images of a band.
+
+    Args:
+        bq: A (nimg, 3*natoms) array with the positions of the images.
+        bf: A (nimg, 3*natoms) array with the physical forces.
+        be: A (nimg) array with the energies of the images.
+        spring: A dictionary with the spring options, see neb_springs.
+        climb: If True, the highest-energy interior image feels no spring
+            force, and the component of its force along the band is inverted,
+            so that it climbs to the saddle point.
+
+    Returns:
+        A (nimg, 3*natoms) array with the NEB forces. The forces on the end
+        images are zero, as these are kept fixed.
+    """
+
+    btau = neb_tangents(bq, be)
+    kappa = neb_springs(be, spring)
+
+    fneb = np.zeros(bq.shape)
+    fpar = (bf[1:-1] * btau).sum(axis=1)
+    dl = np.sqrt(((bq[1:] - bq[:-1]) ** 2).sum(axis=1))
+    fspring = kappa[1:] * dl[1:] - kappa[:-1] * dl[:-1]
+    fneb[1:-1] = bf[1:-1] + (fspring - fpar)[:, np.newaxis] * btau
+
+    if climb:
+        ic = np.argmax(be[1:-1])
+        fneb[ic + 1] = bf[ic + 1] - 2.0 * fpar[ic] * btau[ic]
+
+    return fneb
+
+
+class NEBForceMapper(object):
+
+    """Base class for the functions that are minimized during the NEB
+    optimization. Takes care of evaluating the forces on the interior
+    images only, and of building the NEB forces out of them.
+
+    Attributes:
+        spring: dictionary with the spring options
+        climb: flag for climbing image NEB
+        nevals: number of evaluations of the forces on the band
+    """
+
+    def __init__(self):
+        self.spring = None
+        self.climb = False
+        self.nevals = 0
+
+    def bind(self, ens):
+        nimg = ens.beads.nbeads
+        if nimg < 3:
+            raise ValueError("NEB requires at least three images")
+
+        self.spring = ens.spring
+        self.climb = ens.climb
+
+        # separate copies for the end images, that are evaluated only once,
+        # and for the interior images, that move
+        self.dcell = ens.cell.copy()
+        self.ebeads = Beads(ens.beads.natoms, 2)
+        self.dbeads = Beads(ens.beads.natoms, nimg - 2)
+        for b in [self.ebeads, self.dbeads]:
+            b.m[:] = dstrip(ens.beads.m)
+            b.names[:] = dstrip(ens.beads.names)
+        self.ebeads.q = dstrip(ens.beads.q)[[0, -1]]
+        self.dbeads.q = dstrip(ens.beads.q)[1:-1]
+        self.eforces = ens.forces.copy(self.ebeads, self.dcell)
+        self.dforces = ens.forces.copy(self.dbeads, self.dcell)
+
+    def band(self, x):
+        """Evaluates positions, forces and energies of the band at x, reusing
+        the values of the end images."""
+
+        x = dstrip(x)
+        self.dbeads.q = x[1:-1]
+        self.nevals += 1
+
+        bq = np.vstack((dstrip(self.ebeads.q)[:1], x[1:-1], dstrip(self.ebeads.q)[1:]))
+        ef = dstrip(self.eforces.f)
+        bf = np.vstack((ef[:1], dstrip(self.dforces.f), ef[1:]))
+        ee = dstrip(self.eforces.pots)
+        be = np.concatenate((ee[:1], dstrip(self.dforces.pots), ee[1:]))
+        return bq, bf, be
+
+    def transfer_forces(self, forces):
+        """Copies the forces of the band in the last evaluation to a forces
+        object that contains all the images, without recomputing them."""
+
+        nimg = self.dbeads.nbeads + 2
+        forces.transfer_forces(
+            [self.eforces, self.dforces], [[0, nimg - 1], list(range(1, nimg - 1))]
+        )
+
+
+class NEBLineMover(NEBForceMapper):
 
     """Creation of the one-dimensional function that will be minimized
 
     Attributes:
         x0: initial position
         d: move direction
-        kappa: spring constants
         first: flag indicating first iteration of simulation
     """
 
     def __init__(self):
+        super(NEBLineMover, self).__init__()
         self.x0 = None
         self.d = None
-        self.kappa = None
         self.first = True
 
-    def bind(self, ens):
-        self.dbeads = ens.beads.copy()
-        self.dcell = ens.cell.copy()
-        self.dforces = ens.forces.copy(self.dbeads, self.dcell)
-
     def set_dir(self, x0, mdir):
         self.x0 = x0.copy()
         self.d = mdir.copy() / np.sqrt(np.dot(mdir.flatten(), mdir.flatten()))
@@ -66,110 +215,11 @@ class NEBLineMover(object):
 
     def __call__(self, x):
         if self.first is True:
-            self.dbeads.q = x
+            bq, bf, be = self.band(x)
         else:
-            self.dbeads.q = self.x0 + self.d * x
-
-        # List of atom/bead positions
-        bq = dstrip(self.dbeads.q).copy()
-
-        # List of forces
-        bf = dstrip(self.dforces.f).copy()
-
-        # List of bead energies
-        # be = dstrip(self.dforces.pots).copy()
-
-        # Number of images
-        nimg = self.dbeads.nbeads
-
-        # Number of atoms
-        nat = self.dbeads.natoms
-
-        kappa = np.zeros(nimg)
-
-        # Get tangents, end images are distinct, fixed, pre-relaxed configurations
-        btau = np.zeros((nimg, 3 * nat), float)
-        for ii in range(1, nimg - 1):
-            d1 = bq[ii] - bq[ii - 1]  # tau mius
-            d2 = bq[ii + 1] - bq[ii]  # tau plus
-
-            # "Old" implementation of NEB
-            btau[ii] = d1 / np.linalg.norm(d1) + d2 / np.linalg.norm(d2)
-            btau[ii] *= 1.0 / np.linalg.norm(btau)
-
-        # Energy of images: (ii+1) < (ii) < (ii-1)
-        #            if (be[ii + 1] < be[ii]) and (be[ii] < be[ii - 1]):
-        #                btau[ii] = d2
-        #
-        # Energy of images (ii-1) < (ii) < (ii+1)
-        #            elif (be[ii - 1] < be[ii]) and (be[ii] < be[ii + 1]):
-        #                btau[ii] = d1
-        #
-        # Energy of image (ii) is a minimum or maximum
-        #            else:
-        #                maxpot = max(be[ii + 1] - be[ii], be[ii - 1], be[ii])
-        #                minpot = min(be[ii + 1] - be[ii], be[ii - 1], be[ii])
-        #
-        #                if be[ii + 1] < be[ii - 1]:
-        #                    btau[ii] = d1 * minpot + d2 * maxpot
-        #
-        #                elif be[ii - 1] < be[ii + 1]:
-        #                    btau[ii] = d1 * maxpot + d2 * minpot
-        #
-        #                else:
-        #                    print "Error in NEB tangents: Energy of images are equal"
-        #
-        #            btau[ii] *= 1.0 / np.linalg.norm(btau)
-
-        # if mode == "variablesprings": #TODO: input option for variable spring mode
-
-        #        if mode == "ci":
-        #
-        # Climbing NEB term. Choose highest energy bead after 5 (arbitrary) iterations
-        #            if step >= 5:
-        #                imax = np.argmax(be)
-        #                bf[imax] = bf[imax] - 2 * np.dot(bf[imax], btau[imax]) * btau[imax]
-        #
-        # Determine variable spring constants
-        # kappa = np.zeros(nimg)
-        # ei = np.zeros(nimg)
-        # emax = np.amax(be)
-        # eref = max(be[0], be[nimg])
-        # kappamax = self.kappa_max
-        # kappamin = self.kappa_min #TODO: input options for max and min spring constant
-        # deltakappa = kappamax - kappamin
-        # for ii in range(1, nimg - 1):
-        # ei[ii] = max(be[ii], be[ii - 1])
-        # if ei[j] > eref:
-        # kappa[ii] = kappamax - deltakappa * ((emax - ei[ii]) / (emax - eref))
-        # else:
-        # kappa[ii] = kappamin
-        #
-        #        else:
-        #            kappa.fill(self.kappa)
-        #
-        #
-        # get perpendicular forces
-        #            for ii in range(1, nimg - 1):
-        #                bf[ii] = bf[ii] - np.dot(bf[ii], btau[ii]) * btau[ii]
-        #
-        # adds the spring forces
-        #            for ii in range(1, nimg - 1):
-        #                bf[ii] += kappa[ii] * btau[ii] * np.dot(btau[ii], (bq[ii + 1] + bq[ii - 1] - 2 * bq[ii]))
-
-        kappa.fill(self.kappa)
-
-        # get perpendicular forces
-        for ii in range(1, nimg - 1):
-            bf[ii] = bf[ii] - np.dot(bf[ii], btau[ii]) * btau[ii]
-
-        # adds the spring forces
-        for ii in range(1, nimg - 1):
-            bf[ii] += (
-                kappa[ii]
-                * btau[ii]
-                * np.dot(btau[ii], (bq[ii + 1] + bq[ii - 1] - 2 * bq[ii]))
-            )
+            bq, bf, be = self.band(self.x0 + self.d * x)
+
+        bf = neb_forces(bq, bf, be, self.spring, self.climb)
 
         # For first iteration, move in direction of the force
         if self.first is True:
@@ -185,133 +235,29 @@ class NEBLineMover(object):
         return linefunc
 
 
-class NEBBFGSMover(object):
+class NEBBFGSMover(NEBForceMapper):
 
     """Creation of the multi-dimensional function that will be minimized
 
     Attributes:
-        x0: initial position
         d: move direction
         xold: position from previous step
-        kappa: spring constants"""
+    """
 
     def __init__(self):
-        self.x0 = None
+        super(NEBBFGSMover, self).__init__()
         self.d = None
         self.xold = None
-        self.kappa = None
-
-    def bind(self, ens):
-        self.dbeads = ens.beads.copy()
-        self.dcell = ens.cell.copy()
-        self.dforces = ens.forces.copy(self.dbeads, self.dcell)
 
     def __call__(self, x):
 
-        # Bead positions
-        self.dbeads.q = x
-        bq = dstrip(self.dbeads.q).copy()
-
-        # Forces
-        bf = dstrip(self.dforces.f).copy()
-
-        # Bead energies
-        be = dstrip(self.dforces.pots).copy()
-
-        # Number of beads
-        nimg = self.dbeads.nbeads
-
-        # Number of atoms
-        nat = self.dbeads.natoms
-
-        # Array for sping constants
-        kappa = np.zeros(nimg)
-
-        # get tangents, end images are distinct, fixed, pre-relaxed configurations
-        btau = np.zeros((nimg, 3 * nat), float)
-        for ii in range(1, nimg - 1):
-            d1 = bq[ii] - bq[ii - 1]  # tau minus
-            d2 = bq[ii + 1] - bq[ii]  # tau plus
-
-            # Old implementation of NEB tangents
-            # btau[ii] = d1 / np.linalg.norm(d1) + d2 / np.linalg.norm(d2)
-            # btau[ii] *= 1.0 / np.linalg.norm(btau)
-
-            # Energy of images: (ii+1) < (ii) < (ii-1)
-            if (be[ii + 1] < be[ii]) and (be[ii] < be[ii - 1]):
-                btau[ii] = d1
-
-            # Energy of images (ii-1) < (ii) < (ii+1)
-            elif (be[ii - 1] < be[ii]) and (be[ii] < be[ii + 1]):
-                btau[ii] = d2
-
-            # Energy of image (ii) is a minimum or maximum
-            else:
-                maxpot = max(abs(be[ii + 1] - be[ii]), abs(be[ii - 1] - be[ii]))
-                minpot = min(abs(be[ii + 1] - be[ii]), abs(be[ii - 1] - be[ii]))
-
-                if be[ii + 1] < be[ii - 1]:
-                    btau[ii] = d2 * minpot + d1 * maxpot
-
-                elif be[ii - 1] < be[ii + 1]:
-                    btau[ii] = d2 * maxpot + d1 * minpot
-
-                else:
-                    print("Error in NEB tangents: Energy of images are equal")
-
-            btau[ii] *= 1.0 / np.linalg.norm(btau)
-
-        # if mode == "variablesprings":
-
-        #        if mode == "ci":
-        #
-        # Climbing NEB term. Choose highest energy bead after 5 (arbitrary) iterations
-        #            if step >= 5:
-        #                imax = np.argmax(be)
-        #                bf[imax] = bf[imax] - 2 * np.dot(bf[imax], btau[imax]) * btau[imax]
-        #
-        # Determine variable spring constants
-        # kappa = np.zeros(nimg)
-        # ei = np.zeros(nimg)
-        # emax = np.amax(be)
-        # eref = max(be[0], be[nimg])
-        # kappamax = self.spring["kappa_max"]
-        # kappamin = self.spring["kappa_min"]
-        # deltakappa = kappamax - kappamin
-        # for ii in range(1, nimg - 1):
-        # ei[ii] = max(be[ii], be[ii - 1])
-        # if ei[j] > eref:
-        # kappa[ii] = kappamax - deltakappa * ((emax - ei[ii]) / (emax - eref))
-        # else:
-        # kappa[ii] = kappamin
-        #
-        #        else:
-        #            kappa.fill(self.kappa)
-        #
-        # Array of spring constants; all are equal
-        kappa.fill(self.kappa)
-
-        # Get perpendicular forces
-        for ii in range(1, nimg - 1):
-            bf[ii] = bf[ii] - np.dot(bf[ii], btau[ii]) * btau[ii]
-
-        # Adds the spring forces
-        for ii in range(1, nimg - 1):
-
-            # Old implementation
-            # bf[ii] += kappa[ii] * btau[ii] * np.dot(btau[ii], (bq[ii + 1] + bq[ii - 1] - 2 * bq[ii]))
-            bf[ii] += (
-                kappa[ii]
-                * (
-                    np.linalg.norm(bq[ii + 1] - bq[ii])
-                    - np.linalg.norm(bq[ii] - bq[ii - 1])
-                )
-                * btau[ii]
-            )
+        bq, bf, be = self.band(x)
+        self.x = bq
+        bf = neb_forces(bq, bf, be, self.spring, self.climb)
 
         # Return forces and modulus of gradient
         g = -bf
-        e = np.linalg.norm(g)  # self.dforces.pot # 0.0
+        e = np.linalg.norm(g)
         return e, g
 
 
@@ -339,11 +285,13 @@ class NEBMover(Motion):
         glist_lbfgs: list of previous gradients (g_n+1 - g_n) for L-BFGS
         endpoints: flag for minimizing end images in NEB *** NOT YET IMPLEMENTED ***
         spring:
-            varsprings: T/F for variable spring constants
+            varsprings: T/F for energy-weighted spring constants
             kappa: single spring constant if varsprings is F
-            kappamax: max spring constant if varsprings is T *** NOT YET IMPLEMENTED ***
-            kappamin: min spring constant if varsprings is T *** NOT YET IMPLEMENTED ***
-        climb: flag for climbing image NEB *** NOT YET IMPLEMENTED ***
+            kappamax: max spring constant if varsprings is T
+            kappamin: min spring constant if varsprings is T
+        climb: flag for climbing image NEB
+        fire_options: options for FIRE, see GeopMotion
+        state_fire: current time step, mixing parameter and number of downhill steps for FIRE
     """
 
     def __init__(
@@ -364,6 +312,15 @@ class NEBMover(Motion):
         spring={"varsprings": False, "kappa": 1.0, "kappamax": 1.5, "kappamin": 0.5},
         scale_lbfgs=2,
         climb=False,
+        fire_options={
+            "dt": 41.341373,
+            "dtmax": 413.41373,
+            "maxstep": 0.5,
+            "alpha": 0.1,
+            "nmin": 5,
+            "ndelay": 20,
+        },
+        state_fire=np.zeros(0, float),
     ):
         """Initialises NEBMover.
 
@@ -389,6 +346,8 @@ class NEBMover(Motion):
         self.spring = spring
         self.climb = climb
         self.scale = scale_lbfgs
+        self.fire_options = fire_options
+        self.state_fire = state_fire
 
         self.neblm = NEBLineMover()
         self.nebbfgsm = NEBBFGSMover()
@@ -420,78 +379,130 @@ class NEBMover(Motion):
             else:
                 raise ValueError("Inverse Hessian size does not match system size")
 
+        if self.mode in ["fire", "fire2"] and self.state_fire.size != 3:
+            if self.state_fire.size == 0:
+                self.state_fire = np.array(
+                    [self.fire_options["dt"], self.fire_options["alpha"], 0]
+                )
+            else:
+                raise ValueError("FIRE state should contain 3 elements")
+
         self.neblm.bind(self)
         self.nebbfgsm.bind(self)
 
+    def lbfgs_direction(self, g):
+        """Computes the L-BFGS direction -H g from the stored position and
+        gradient differences, with the two-loop recursion. Returns None if
+        there is no history, or if the direction does not go downhill."""
+
+        hist = [j for j in range(self.corrections) if self.qlist[j].any()]
+        if len(hist) == 0:
+            return None
+
+        rho = [1.0 / np.dot(self.glist[j], self.qlist[j]) for j in hist]
+        alpha = np.zeros(len(hist))
+        q = g.copy()
+        for i in range(len(hist) - 1, -1, -1):
+            alpha[i] = rho[i] * np.dot(self.qlist[hist[i]], q)
+            q -= alpha[i] * self.glist[hist[i]]
+
+        if self.scale == 0:
+            hk = 1.0
+        else:
+            j = hist[0] if self.scale == 1 else hist[-1]
+            hk = np.dot(self.glist[j], self.qlist[j]) / np.dot(
+                self.glist[j], self.glist[j]
+            )
+        d = hk * q
+        for i in range(len(hist)):
+            beta = rho[i] * np.dot(self.glist[hist[i]], d)
+            d += self.qlist[hist[i]] * (alpha[i] - beta)
+
+        if np.dot(d, g) <= 0.0:
+            return None
+        return -d
+
     def step(self, step=None):
         """Does one simulation time step."""
 
         info(" @NEB STEP %d" % step, verbosity.debug)
 
-        # Fetch spring constants
-        self.nebbfgsm.kappa = self.spring["kappa"]
-        self.neblm.kappa = self.spring["kappa"]
-
         self.ptime = self.ttime = 0
         self.qtime = -time.time()
 
         if self.mode == "lbfgs":
 
-            # L-BFGS Minimization
-            # Initialize direction to the steepest descent direction
-            if (
-                step == 0
-            ):  # or np.sqrt(np.dot(self.bfgsm.d, self.bfgsm.d)) == 0.0: <-- this part for restarting at claimed minimum
+            # L-BFGS without line search. The NEB forces are not the gradient
+            # of any function, so rather than doing a line minimization we take
+            # the quasi-Newton step, limited to biggest_step, and evaluate the
+            # band only once per iteration
+            q0 = dstrip(self.beads.q).copy()
+            if step == 0 or self.qlist.shape != (self.corrections, q0.size):
                 info(" @NEB: Initializing L-BFGS", verbosity.debug)
-                fx, nebgrad = self.nebbfgsm(self.beads.q)
-
-                # Set direction to direction of NEB forces
-                self.nebbfgsm.d = -nebgrad
-                self.nebbfgsm.xold = self.beads.q.copy()
-
-                # Initialize lists of previous positions and gradients
-                self.qlist = np.zeros((self.corrections, len(self.beads.q.flatten())))
-                self.glist = np.zeros((self.corrections, len(self.beads.q.flatten())))
-
+                self.qlist = np.zeros((self.corrections, q0.size))
+                self.glist = np.zeros((self.corrections, q0.size))
+            if self.nebbfgsm.nevals == 0:
+                self.old_f[:] = -self.nebbfgsm(q0)[1]
+                self.nebbfgsm.transfer_forces(self.forces)
+            u0 = self.forces.pot
+
+            g0 = -self.old_f.flatten()
+            d = self.lbfgs_direction(g0)
+            if d is None:
+                # steepest descent, with the initial step of the line search options
+                d = -g0 * self.ls_options["step"] / np.amax(np.absolute(g0))
+            dmax = np.amax(np.absolute(d))
+            if dmax > self.big_step:
+                d *= self.big_step / dmax
+
+            fx, g1 = self.nebbfgsm(q0 + d.reshape(q0.shape))
+            self.old_f[:] = -g1
+            dg = g1.flatten() - g0
+            if np.dot(d, dg) > 0.0:
+                self.qlist[:] = np.roll(self.qlist, -1, axis=0)
+                self.glist[:] = np.roll(self.glist, -1, axis=0)
+                self.qlist[-1] = d
+                self.glist[-1] = dg
             else:
-                fx, nebgrad = self.nebbfgsm(self.beads.q)
-
-            # Intial gradient and gradient modulus
-            u0, du0 = (fx, nebgrad)
+                # negative curvature along the step, the history is useless
+                info(" @NEB: Resetting L-BFGS history", verbosity.debug)
+                self.qlist[:] = 0.0
+                self.glist[:] = 0.0
 
-            # Store old force
-            self.old_f[:] = -nebgrad
+            self.beads.q = self.nebbfgsm.x
+            self.nebbfgsm.transfer_forces(self.forces)
+            x = np.amax(np.absolute(d))
+            fx = self.forces.pot
 
-            # Do one iteration of L-BFGS and return positions, gradient modulus,
-            # direction, list of positions, list of gradients
-            # self.beads.q, fx, self.nebbfgsm.d, self.qlist, self.glist = L_BFGS(self.beads.q,
-            info(" @NEB: Entering BFGS", verbosity.debug)
+            info(" @NEB: Updated bead positions", verbosity.debug)
 
-            L_BFGS(
-                self.beads.q,
-                self.nebbfgsm.d,
+        elif self.mode in ["fire", "fire2"]:
+
+            # FIRE moves all the images at once, with one evaluation of the band
+            # per iteration. The velocities are stored as the old direction
+            q0 = dstrip(self.beads.q).copy()
+            if self.nebbfgsm.nevals == 0:
+                self.old_f[:] = -self.nebbfgsm(q0)[1]
+                self.nebbfgsm.transfer_forces(self.forces)
+            u0 = self.forces.pot
+
+            q1, fx, g1 = FIRE(
+                q0,
+                self.old_f.copy(),
+                self.old_d,
+                dstrip(self.beads.m3),
                 self.nebbfgsm,
-                self.qlist,
-                self.glist,
-                fdf0=(u0, du0),
-                big_step=self.big_step,
-                tol=self.ls_options["tolerance"],
-                itmax=self.ls_options["iter"],
-                m=self.corrections,
-                scale=self.scale,
-                k=step,
+                self.state_fire,
+                self.fire_options,
+                step,
+                2 if self.mode == "fire2" else 1,
             )
+            self.old_f[:] = -g1
 
-            info(" @NEB: Updated position list", verbosity.debug)
-            info(" @NEB: Updated gradient list", verbosity.debug)
-
-            # x = current position - previous position. Use to determine converged minimization
-            x = np.amax(np.absolute(np.subtract(self.beads.q, self.nebbfgsm.xold)))
-
-            # Store old positions
-            self.nebbfgsm.xold[:] = self.beads.q
-            self.beads.q = self.nebbfgsm.dbeads.q
-            self.forces.transfer_forces(self.nebbfgsm.dforces)
+            self.beads.q = self.nebbfgsm.x
+            self.nebbfgsm.transfer_forces(self.forces)
+            x = np.amax(np.absolute(q1 - q0))
+            fx = self.forces.pot
 
             info(" @NEB: Updated bead positions", verbosity.debug)
 
@@ -567,45 +578,30 @@ class NEBMover(Motion):
 
         self.qtime += time.time()
 
-        # Determine conditions for converged relaxation
+        # Determine conditions for converged relaxation. The forces are the NEB
+        # forces, that vanish on the minimum energy path
+        e = np.absolute((fx - u0) / self.beads.natoms)
+        fmax = np.amax(np.absolute(self.old_f))
+        info(
+            " @NEB: force evaluations on the band %d"
+            % (self.nebbfgsm.nevals + self.neblm.nevals),
+            verbosity.medium,
+        )
         if (
-            ((fx - u0) / self.beads.natoms <= self.tolerances["energy"])
-            and (
-                (np.amax(np.absolute(self.forces.f)) <= self.tolerances["force"])
-                or (
-                    np.sqrt(
-                        np.dot(
-                            self.forces.f.flatten() - self.old_f.flatten(),
-                            self.forces.f.flatten() - self.old_f.flatten(),
-                        )
-                    )
-                    == 0.0
-                )
-            )
+            (e <= self.tolerances["energy"])
+            and (fmax <= self.tolerances["force"])
             and (x <= self.tolerances["position"])
         ):
             softexit.trigger("Geometry optimization converged. Exiting simulation")
         else:
             info(
                 " @NEB: Not converged, deltaEnergy = %.8f, tol = %.8f"
-                % ((fx - u0 / self.beads.natoms), self.tolerances["energy"]),
+                % (e, self.tolerances["energy"]),
                 verbosity.debug,
             )
             info(
                 " @NEB: Not converged, force = %.8f, tol = %f"
-                % (np.amax(np.absolute(self.forces.f)), self.tolerances["force"]),
-                verbosity.debug,
-            )
-            info(
-                " @NEB: Not converged, deltaForce = %.8f, tol = 0.00000000"
-                % (
-                    np.sqrt(
-                        np.dot(
-                            self.forces.f.flatten() - self.old_f.flatten(),
-                            self.forces.f.flatten() - self.old_f.flatten(),
-                        )
-                    )
-                ),
+                % (fmax, self.tolerances["force"]),
                 verbosity.debug,
             )
             info(
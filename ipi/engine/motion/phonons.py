@@ -23,9 +23,16 @@ import numpy as np
 
 
 from ipi.engine.motion import Motion
+from ipi.engine.beads import Beads
 from ipi.utils.depend import *
 from ipi.utils.softexit import softexit
 from ipi.utils.messages import verbosity, info
+from ipi.utils.hesstools import (
+    lattice_translations,
+    irreducible_atoms,
+    expand_translations,
+    apply_translational_invariance,
+)
 
 
 class DynMatrixMover(Motion):
@@ -44,6 +51,8 @@ class DynMatrixMover(Motion):
         refdynmat=np.zeros(0, float),
         prefix="",
         asr="none",
+        batch=1,
+        symmetry="none",
     ):
         """Initialises DynMatrixMover.
         Args:
@@ -51,6 +60,13 @@ class DynMatrixMover(Motion):
                   motion will be constrained or not. Defaults to False.
         dynmatrix : A 3Nx3N array that stores the dynamic matrix.
         refdynmatrix : A 3Nx3N array that stores the refined dynamic matrix.
+        batch : Number of rows of the dynamic matrix computed together. The
+                2*batch displaced configurations are evaluated as a single
+                multi-bead system, so that they can be dispatched to all
+                the available clients in parallel.
+        symmetry : If "translations", only the atoms that are not equivalent
+                by a lattice translation are displaced, and the other rows
+                are obtained by permutation, enforcing translational invariance.
         """
 
         super(DynMatrixMover, self).__init__(fixcom=fixcom, fixatoms=fixatoms)
@@ -74,6 +90,8 @@ class DynMatrixMover(Motion):
         self.V = None
         self.prefix = prefix
         self.asr = asr
+        self.batch = max(batch, 1)
+        self.symmetry = symmetry
 
         if self.prefix == "":
             self.prefix = "phonons"
@@ -86,6 +104,12 @@ class DynMatrixMover(Motion):
         else:
             self.fixdof = np.array([])
 
+        if self.symmetry != "none":
+            if self.mode != "fd":
+                raise ValueError("Symmetry is only implemented for the fd mode.")
+            if len(self.fixdof) > 0:
+                raise ValueError("Symmetry cannot be used together with fixatoms.")
+
     def bind(self, ens, beads, nm, cell, bforce, prng, omaker):
 
         super(DynMatrixMover, self).bind(ens, beads, nm, cell, bforce, prng, omaker)
@@ -100,20 +124,100 @@ class DynMatrixMover(Motion):
         self.m = dstrip(self.beads.m)
         self.phcalc.bind(self)
 
+        # degrees of freedom that must be displaced
+        self.dofs = np.arange(3 * self.beads.natoms)
+        if self.symmetry == "translations":
+            labels = [
+                "%s_%r" % (n, mi) for n, mi in zip(dstrip(self.beads.names), self.m)
+            ]
+            self.perms = lattice_translations(
+                dstrip(self.beads.q[0]), dstrip(self.cell.h), labels
+            )
+            self.irreps = irreducible_atoms(self.perms)
+            self.dofs = (3 * self.irreps[:, np.newaxis] + np.arange(3)).flatten()
+            info(
+                " @DynMatrixMover: Found %d lattice translations, displacing %d atoms out of %d."
+                % (len(self.perms), len(self.irreps), self.beads.natoms),
+                verbosity.low,
+            )
+
         self.dbeads = self.beads.copy()
         self.dcell = self.cell.copy()
         self.dforces = self.forces.copy(self.dbeads, self.dcell)
 
+        # multi-bead copies used to evaluate batches of displacements,
+        # created on demand for each batch size
+        self.bforces = {}
+        if self.batch > 1 and any(fc.nbeads > 0 for fc in self.forces.fcomp):
+            info(
+                " Ring-polymer contraction would mix the displaced configurations: disabling batched evaluation.",
+                verbosity.low,
+            )
+            self.batch = 1
+
+    def batch_rows(self, step):
+        """Returns the rows of the dynamic matrix that are computed at this
+        step. In batched mode all the rows of a batch are computed at its
+        first step, and the other steps do nothing."""
+
+        if step % self.batch != 0:
+            return []
+        return list(self.dofs[step : step + self.batch])
+
+    def displaced_gradients(self, devs):
+        """Computes the gradients at the configurations displaced by +dev and
+        -dev, for each of the displacements in devs.
+
+        Args:
+            devs: A (ndev, 3*natoms) array of displacements.
+
+        Returns:
+            Two (ndev, 3*natoms) arrays with the gradients for the positive
+            and the negative displacements.
+        """
+
+        q = dstrip(self.beads.q)
+        if len(devs) == 1:
+            # displaces by +delta and then by -delta.
+            self.dbeads.q = q + devs[0]
+            plus = -dstrip(self.dforces.f).copy()
+            self.dbeads.q = q - devs[0]
+            minus = -dstrip(self.dforces.f).copy()
+            return plus, minus
+
+        ndev = len(devs)
+        if ndev not in self.bforces:
+            bbeads = Beads(self.beads.natoms, 2 * ndev)
+            bbeads.m[:] = dstrip(self.beads.m)
+            bbeads.names[:] = dstrip(self.beads.names)
+            self.bforces[ndev] = self.forces.copy(bbeads, self.dcell)
+        bforces = self.bforces[ndev]
+        bforces.beads.q = np.concatenate((q + devs, q - devs))
+        g = -dstrip(bforces.f)
+        return g[:ndev], g[ndev:]
+
     def step(self, step=None):
         """Executes one step of phonon computation. """
-        if step < 3 * self.beads.natoms:
+        if step < len(self.dofs):
             self.phcalc.step(step)
         else:
+            if self.symmetry == "translations":
+                self.dynmatrix = self.expand(self.dynmatrix)
+                self.refdynmatrix = self.expand(self.refdynmatrix)
             self.phcalc.transform()
             self.refdynmatrix = self.apply_asr(self.refdynmatrix.copy())
             self.printall(self.prefix, self.refdynmatrix.copy(), fixdof=self.fixdof)
             softexit.trigger("Dynamic matrix is calculated. Exiting simulation")
 
+    def expand(self, dm):
+        """Reconstructs the full dynamical matrix from the rows of the
+        irreducible atoms, and enforces translational invariance on the
+        corresponding force constants."""
+
+        dm = expand_translations(dm.copy(), self.perms, self.irreps)
+        ism2 = np.outer(self.ism, self.ism)
+        return apply_translational_invariance(dm / ism2) * ism2
+
     def printall(self, prefix, dmatx, deltaw=0.0, fixdof=np.array([])):
         """ Prints out diagnostics for a given dynamical matrix. """
 
@@ -341,26 +445,37 @@ class FDPhononCalculator(DummyPhononCalculator):
             )
 
     def step(self, step=None):
-        """Computes one row of the dynamic matrix."""
-
-        if step not in self.dm.fixdof:
-            # initializes the finite deviation
-            dev = np.zeros(3 * self.dm.beads.natoms, float)
-            dev[step] = self.dm.deltax
-            # displaces kth d.o.f by delta.
-            self.dm.dbeads.q = self.dm.beads.q + dev
-            plus = -dstrip(self.dm.dforces.f).copy()
-            # displaces kth d.o.f by -delta.
-            self.dm.dbeads.q = self.dm.beads.q - dev
-            minus = -dstrip(self.dm.dforces.f).copy()
-            # computes a row of force-constant matrix
-            dmrow = (
-                (plus - minus) / (2 * self.dm.deltax) * self.dm.ism[step] * self.dm.ism
-            )
-            self.dm.dynmatrix[step] = dmrow
-            self.dm.refdynmatrix[step] = dmrow
-        else:
-            info(" We have skiped the dof # {}.".format(step), verbosity.low)
+        """Computes one row (or one batch of rows) of the dynamic matrix."""
+
+        rows = []
+        for k in self.dm.batch_rows(step):
+            if k not in self.dm.fixdof:
+                rows.append(k)
+            else:
+                info(" We have skiped the dof # {}.".format(k), verbosity.low)
+        if len(rows) == 0:
+            return
+
+        devs = np.asarray([self.get_dev(k) for k in rows])
+        plus, minus = self.dm.displaced_gradients(devs)
+        for k, fplus, fminus in zip(rows, plus, minus):
+            self.set_row(k, fplus.flatten(), fminus.flatten())
+
+    def get_dev(self, k):
+        """Finite displacement used to compute the k-th row."""
+
+        # displaces kth d.o.f by delta.
+        dev = np.zeros(3 * self.dm.beads.natoms, float)
+        dev[k] = self.dm.deltax
+        return dev
+
+    def set_row(self, k, plus, minus):
+        """Computes the k-th row from the gradients at the displaced configurations."""
+
+        # computes a row of force-constant matrix
+        dmrow = (plus - minus) / (2 * self.dm.deltax) * self.dm.ism[k] * self.dm.ism
+        self.dm.dynmatrix[k] = dmrow
+        self.dm.refdynmatrix[k] = dmrow
 
     def transform(self):
         dm = self.dm.dynmatrix.copy()
@@ -398,21 +513,25 @@ class NMFDPhononCalculator(FDPhononCalculator):
         for i in range(len(self.dm.V)):
             self.dm.V[:, i] *= self.dm.ism
 
-    def step(self, step=None):
-        """Computes one row of the dynamic matrix."""
-
-        # initializes the finite deviation
-        vknorm = np.sqrt(np.dot(self.dm.V[:, step], self.dm.V[:, step]))
-        dev = np.real(self.dm.V[:, step] / vknorm) * self.dm.deltax
-        # displaces by -delta along kth normal mode.
-        self.dm.dbeads.q = self.dm.beads.q + dev
-        plus = -dstrip(self.dm.dforces.f).copy().flatten()
-        # displaces by -delta along kth normal mode.
-        self.dm.dbeads.q = self.dm.beads.q - dev
-        minus = -dstrip(self.dm.dforces.f).copy().flatten()
+    def get_delta(self, k):
+        """Amplitude of the displacement along the k-th normal mode."""
+
+        return self.dm.deltax
+
+    def get_dev(self, k):
+        """Finite displacement along the k-th normal mode."""
+
+        vknorm = np.sqrt(np.dot(self.dm.V[:, k], self.dm.V[:, k]))
+        return np.real(self.dm.V[:, k] / vknorm) * self.get_delta(k)
+
+    def set_row(self, k, plus, minus):
+        """Computes the k-th row from the gradients at the displaced configurations."""
+
+        vknorm = np.sqrt(np.dot(self.dm.V[:, k], self.dm.V[:, k]))
+        delta = self.get_delta(k)
         # computes a row of the refined dynmatrix, in the basis of the eigenvectors of the first dynmatrix
-        dmrowk = (plus - minus) / (2 * self.dm.deltax / vknorm)
-        self.dm.refdynmatrix[step] = np.dot(self.dm.V.T, dmrowk)
+        dmrowk = (plus - minus) / (2 * delta / vknorm)
+        self.dm.refdynmatrix[k] = np.dot(self.dm.V.T, dmrowk)
 
     def transform(self):
         self.dm.refdynmatrix = np.dot(
@@ -426,21 +545,12 @@ class ENMFDPhononCalculator(NMFDPhononCalculator):
 
     """Energy scaled normal mode finite difference phonon evaluator."""
 
-    def step(self, step=None):
-        """Computes one row of the dynamic matrix."""
+    def get_delta(self, k):
+        """Amplitude of the displacement along the k-th normal mode, scaled
+        so as to correspond to a fixed change in energy."""
 
-        # initializes the finite deviation
-        vknorm = np.sqrt(np.dot(self.dm.V[:, step], self.dm.V[:, step]))
-        edelta = vknorm * np.sqrt(self.dm.deltae * 2.0 / abs(self.dm.w2[step]))
+        vknorm = np.sqrt(np.dot(self.dm.V[:, k], self.dm.V[:, k]))
+        edelta = vknorm * np.sqrt(self.dm.deltae * 2.0 / abs(self.dm.w2[k]))
         if edelta > 100 * self.dm.deltax:
             edelta = 100 * self.dm.deltax
-        dev = np.real(self.dm.V[:, step] / vknorm) * edelta
-        # displaces by -delta along kth normal mode.
-        self.dm.dbeads.q = self.dm.beads.q + dev
-        plus = -dstrip(self.dm.dforces.f).copy().flatten()
-        # displaces by -delta along kth normal mode.
-        self.dm.dbeads.q = self.dm.beads.q - dev
-        minus = -dstrip(self.dm.dforces.f).copy().flatten()
-        # computes a row of the refined dynmatrix, in the basis of the eigenvectors of the first dynmatrix
-        dmrowk = (plus - minus) / (2 * edelta / vknorm)
-        self.dm.refdynmatrix[step] = np.dot(self.dm.V.T, dmrowk)
+        return edelta
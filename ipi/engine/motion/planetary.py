@@ -12,6 +12,7 @@ from ipi.engine.motion import Motion, Dynamics
 from ipi.utils.depend import *
 from ipi.engine.thermostats import *
 from ipi.utils.units import Constants
+from ipi.utils.mathtools import neighbour_pairs
 from ipi.utils.io import netstring_encoded_savez
 from ipi.utils.messages import verbosity, info
 
@@ -49,6 +50,7 @@ class Planetary(Motion):
         nsamples=0,
         stride=1,
         screen=0.0,
+        sparse=False,
         nbeads=-1,
         thermostat=None,
         barostat=None,
@@ -69,6 +71,12 @@ class Planetary(Motion):
         self.stride = stride
         self.nbeads = nbeads
         self.screen = screen
+        self.sparse = sparse
+
+        if self.sparse and self.screen <= 0.0:
+            raise ValueError(
+                "Sparse accumulation of the frequency matrix requires a screening distance"
+            )
 
         dself = dd(self)
 
@@ -147,7 +155,13 @@ class Planetary(Motion):
 
         self.natoms = self.dbeads.natoms
         natoms3 = self.dbeads.natoms * 3
-        self.omega2 = np.zeros((natoms3, natoms3), float)
+        if self.sparse:
+            # the 3x3 blocks of the pairs of atoms within the screening
+            # distance are allocated for each centroid configuration
+            self.pairs = None
+            self.omega2 = None
+        else:
+            self.omega2 = np.zeros((natoms3, natoms3), float)
 
         # initializes counters
         self.tmc = 0
@@ -161,7 +175,7 @@ class Planetary(Motion):
         )
 
         self.omaker = omaker
-        self.fomega2 = omaker.get_output("omega2")
+        self.fomega2 = omaker.get_output("omega2", "wb" if omaker.f_start else "ab")
 
     def increment(self, dnm):
 
@@ -173,6 +187,17 @@ class Planetary(Motion):
         qms[0, :] = 0
         qms *= (dnm.omegak ** 2)[:, np.newaxis]
 
+        if self.sparse:
+            # only accumulates the blocks of the pairs in self.pairs
+            fms = fms.reshape((len(fms), self.natoms, 3))
+            qms = qms.reshape((len(qms), self.natoms, 3))
+            pi, pj = self.pairs
+            fi, fj = fms[:, pi], fms[:, pj]
+            self.omega2 += np.einsum("kpx,kpy->pxy", fi, fj)
+            self.omega2 -= 0.5 * np.einsum("kpx,kpy->pxy", fi, qms[:, pj])
+            self.omega2 -= 0.5 * np.einsum("kpx,kpy->pxy", qms[:, pi], fj)
+            return
+
         self.omega2 += np.tensordot(fms, fms, axes=(0, 0))
         qffq = np.tensordot(fms, qms, axes=(0, 0))
         qffq = qffq + qffq.T
@@ -184,25 +209,59 @@ class Planetary(Motion):
         noisy elements of the covariance and frequency matrices for
         far-away atoms"""
 
-        q = np.array(self.dbeads[0].q).reshape(self.natoms, 3)
-        sij = q[:, np.newaxis, :] - q
-        sij = sij.transpose().reshape(3, self.natoms ** 2)
-        # find minimum distances between atoms (rigorous for cubic cell)
-        sij = np.matmul(self.dcell.ih, sij)
-        sij -= np.around(sij)
-        sij = np.matmul(self.dcell.h, sij)
-        sij = sij.reshape(3, self.natoms, self.natoms).transpose()
-        # take square magnitudes of distances
-        sij = np.sum(sij * sij, axis=2)
-        # screen with Heaviside step function
-        sij = (sij < self.screen ** 2).astype(float)
-        # sij = np.exp(-sij / (self.screen**2))
-        # acount for 3 dimensions
-        sij = np.concatenate((sij, sij, sij), axis=0)
-        sij = np.concatenate((sij, sij, sij), axis=1)
-        sij = sij.reshape(-1).reshape(-1, self.natoms).transpose()
-        sij = sij.reshape(-1).reshape(-1, 3 * self.natoms).transpose()
-        return sij
+        q = dd(self.dbeads[0]).q
+        pi, pj = neighbour_pairs(
+            dstrip(q),
+            dstrip(self.dcell.h),
+            dstrip(self.dcell.ih),
+            self.screen,
+            s=self.dcell.fractional(q),
+        )
+        # screen with Heaviside step function, accounting for 3 dimensions
+        sij = np.zeros((self.natoms, self.natoms))
+        sij[pi, pj] = 1.0
+        sij[pj, pi] = 1.0
+        return np.kron(sij, np.ones((3, 3)))
+
+    def screen_pairs(self):
+        """Finds the pairs of atoms within the screening distance, including
+        each atom with itself, in the centroid configuration. Only the
+        i >= j pairs are returned, as only the lower triangular part of the
+        frequency matrix is saved."""
+
+        qc = dd(self.dbeads).qc
+        return neighbour_pairs(
+            dstrip(qc),
+            dstrip(self.dcell.h),
+            dstrip(self.dcell.ih),
+            self.screen,
+            s=self.dcell.fractional(qc),
+        )
+
+    def block_matrix(self):
+        """Converts the accumulated 3x3 blocks into the lower triangular part
+        of the frequency matrix, as a sparse matrix in half precision."""
+
+        pi, pj = self.pairs
+        blocks = self.omega2.copy()
+        # ensure perfect symmetry of the diagonal blocks
+        diag = pi == pj
+        blocks[diag] = 0.5 * (blocks[diag] + blocks[diag].transpose((0, 2, 1)))
+
+        # (row, col) indices of the elements of each block
+        row, col = np.broadcast_arrays(
+            3 * pi[:, np.newaxis, np.newaxis] + np.arange(3)[:, np.newaxis],
+            3 * pj[:, np.newaxis, np.newaxis] + np.arange(3),
+        )
+        a = blocks.astype(np.float16)
+        sel = (row >= col) & (a != 0)
+        row, col, a = row[sel], col[sel], a[sel]
+
+        order = np.lexsort((row, col))
+        natoms3 = 3 * self.natoms
+        ia = np.zeros(natoms3 + 1, dtype=np.int64)
+        ia[1:] = np.cumsum(np.bincount(col, minlength=natoms3))
+        return sparse.csc_matrix(a=a[order], ia=ia, ja=row[order], m=natoms3, n=natoms3)
 
     def save_matrix(self, matrix):
         """ Writes the compressed, sparse frequency matrix to a netstring encoded file """
@@ -233,7 +292,11 @@ class Planetary(Motion):
         self.dnm.pnm[0] = 0.0
 
         # Resets the frequency matrix
-        self.omega2[:] = 0.0
+        if self.sparse:
+            self.pairs = self.screen_pairs()
+            self.omega2 = np.zeros((len(self.pairs[0]), 3, 3), float)
+        else:
+            self.omega2[:] = 0.0
 
         self.tmtx -= time.time()
         self.increment(self.dnm)
@@ -258,17 +321,20 @@ class Planetary(Motion):
         )
         self.tsave -= time.time()
 
-        if self.screen > 0.0:
-            scr = self.matrix_screen()
-            self.omega2 *= scr
+        if self.sparse:
+            save_omega2 = self.block_matrix()
+        else:
+            if self.screen > 0.0:
+                scr = self.matrix_screen()
+                self.omega2 *= scr
 
-        # ensure perfect symmetry
-        self.omega2[:] = 0.5 * (self.omega2 + self.omega2.transpose())
-        # only save lower triangular part
-        self.omega2[:] = np.tril(self.omega2)
+            # ensure perfect symmetry
+            self.omega2[:] = 0.5 * (self.omega2 + self.omega2.transpose())
+            # only save lower triangular part
+            self.omega2[:] = np.tril(self.omega2)
 
-        # save as a sparse matrix in half precision
-        save_omega2 = sparse.csc_matrix(self.omega2.astype(np.float16))
+            # save as a sparse matrix in half precision
+            save_omega2 = sparse.csc_matrix(self.omega2.astype(np.float16))
 
         # save the frequency matrix to the PLANETARY file
         self.save_matrix(save_omega2)
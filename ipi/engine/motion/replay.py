@@ -9,11 +9,18 @@
 
 import time
 import os
+import queue
+import signal
+import threading
+import traceback
+import multiprocessing as mp
 from fnmatch import fnmatch
 
+import numpy as np
+
 from ipi.engine.motion import Motion
 from ipi.utils.softexit import softexit
-from ipi.utils.io import read_file, read_file_raw
+from ipi.utils.io import read_file_raw
 from ipi.utils.io.inputs.io_xml import xml_parse_file
 from ipi.utils.units import unit_to_internal
 from ipi.utils.messages import verbosity, info
@@ -32,6 +39,10 @@ class Replay(Motion):
 
     Attributes:
         intraj: The input trajectory file.
+        prefetch: The number of steps that are read ahead of the current one
+            by a reader for each trajectory file. If zero, the frames are
+            read when they are needed.
+        readers: Whether the readers are 'threads' or 'processes'.
         ptime: The time taken in updating the velocities.
         qtime: The time taken in updating the positions.
         ttime: The time taken in applying the thermostat steps.
@@ -40,7 +51,9 @@ class Replay(Motion):
         None really meaningful.
     """
 
-    def __init__(self, fixcom=False, fixatoms=None, intraj=None):
+    def __init__(
+        self, fixcom=False, fixatoms=None, intraj=None, prefetch=0, readers="threads"
+    ):
         """Initialises Replay.
 
         Args:
@@ -49,6 +62,9 @@ class Replay(Motion):
            fixcom: An optional boolean which decides whether the centre of mass
               motion will be constrained or not. Defaults to False.
            intraj: The input trajectory file.
+           prefetch: The number of steps that are read ahead in the background.
+           readers: Whether the trajectory files are read by 'threads' or by
+              'processes'.
         """
 
         super(Replay, self).__init__(fixcom=fixcom, fixatoms=fixatoms)
@@ -59,22 +75,27 @@ class Replay(Motion):
         self.intraj = intraj
         if intraj.mode == "manual":
             raise ValueError(
-                "Replay can only read from PDB or XYZ files -- or a single frame from a CHK file"
+                "Replay can only read from PDB, XYZ or binary files -- or a single frame from a CHK file"
             )
+        if readers not in ["threads", "processes"]:
+            raise ValueError("Replay readers must be 'threads' or 'processes'")
+        self.prefetch = prefetch
+        self.readers = readers
+        self.reader = None
         # Posibility to read beads from separate XYZ files by a wildcard
         if any(char in self.intraj.value for char in "*?[]"):
             infilelist = []
-            for file in sorted(os.listdir('.')):
+            for file in sorted(os.listdir(".")):
                 if fnmatch(file, self.intraj.value):
                     infilelist.append(file)
             # determine bead numbers in input files
             bead_map_list = []
             for file in infilelist:
-                fdin = open(file, 'r')
+                fdin = open_trajectory(self.intraj.mode, file)
                 rr = read_file_raw(self.intraj.mode, fdin)
-                metainfo = rr['comment'].split()
+                metainfo = rr["comment"].split()
                 for i, word in enumerate(metainfo):
-                    if word == 'Bead:':
+                    if word == "Bead:":
                         bead_map_list.append(int(metainfo[i + 1]))
                 fdin.close()
             # check that beads are continuous (no files missing)
@@ -83,17 +104,80 @@ class Replay(Motion):
                     "ATTENTION: Provided trajectory files have non-sequential "
                     "range of bead indices.\n"
                     "\tIndices found: %s\n"
-                    "\tMake sure that the wildcard does what it's supposed to do." % str(bead_map_list),
-                    verbosity.low
+                    "\tMake sure that the wildcard does what it's supposed to do."
+                    % str(bead_map_list),
+                    verbosity.low,
                 )
             # sort the list of files according to their bead indices
-            infilelist_sorted, _ = zip(*sorted(zip(infilelist, bead_map_list),
-                                       key=lambda t: t[1]))
-            self.rfile = [open(f, 'r') for f in infilelist_sorted]
-        else:   # no wildcard
+            infilelist_sorted, _ = zip(
+                *sorted(zip(infilelist, bead_map_list), key=lambda t: t[1])
+            )
+            self.rfilenames = list(infilelist_sorted)
+        else:  # no wildcard
+            self.rfilenames = [self.intraj.value]
+        if self.intraj.mode == "chk" or self.intraj.mode == "checkpoint":
             self.rfile = open(self.intraj.value, "r")
+        elif self.prefetch == 0:
+            self.rfile = [open_trajectory(self.intraj.mode, f) for f in self.rfilenames]
         self.rstep = 0
 
+    def bind(self, ens, beads, nm, cell, bforce, prng, omaker):
+        """Binds the motion, and creates the buffers the frames are read into.
+
+        If frames are prefetched, this also starts the readers.
+        """
+
+        super(Replay, self).bind(ens, beads, nm, cell, bforce, prng, omaker)
+        if self.intraj.mode == "chk" or self.intraj.mode == "checkpoint":
+            return
+
+        # If wildcard is used, check that it is consistent with Nbeads
+        if len(self.rfilenames) > 1 and len(self.rfilenames) != self.beads.nbeads:
+            info(
+                "Error: if a wildcard is used for replay, then "
+                "the number of files should be equal to the number of beads.",
+                verbosity.low,
+            )
+            softexit.trigger(" # Error in replay input.")
+
+        # the trajectory units are applied on top of those in the comment lines
+        factor = unit_to_internal("length", self.intraj.units, 1.0)
+        if self.prefetch > 0:
+            self.reader = FramePrefetcher(
+                self.intraj.mode,
+                self.rfilenames,
+                self.beads.nbeads,
+                self.beads.natoms,
+                self.prefetch + 1,
+                factor,
+                self.readers,
+            )
+            softexit.register_function(self.reader.stop)
+        else:
+            self.qbuf = np.zeros((self.beads.nbeads, 3 * self.beads.natoms))
+            self.hbuf = np.zeros((len(self.rfile), 3, 3))
+            self.conv = [{"factor": factor} for f in self.rfile]
+
+    def read_step(self):
+        """Reads the frames of all the beads for one step, and returns them as
+        an array of positions and the cell of the last frame."""
+
+        if self.reader is not None:
+            slot = self.reader.get()
+            q, h = self.reader.q[slot], self.reader.h[slot, -1]
+            return q, h, slot
+
+        nrows = len(self.qbuf) // len(self.rfile)
+        for i, rfile in enumerate(self.rfile):
+            read_frames(
+                self.intraj.mode,
+                rfile,
+                self.qbuf[i * nrows : (i + 1) * nrows],
+                self.hbuf[i],
+                self.conv[i],
+            )
+        return self.qbuf, self.hbuf[-1], None
+
     def step(self, step=None):
         """Does one replay time step."""
 
@@ -101,41 +185,10 @@ class Replay(Motion):
         self.ttime = 0.0
         self.qtime = -time.time()
 
-        # If wildcard is used, check that it is consistent with Nbeads
-        wildcard_used = False
-        if any(char in self.intraj.value for char in "*?[]"):
-            wildcard_used = True
-            if len(self.rfile) != len(self.beads):
-                info(
-                    "Error: if a wildcard is used for replay, then "
-                    "the number of files should be equal to the number of beads.",
-                    verbosity.low
-                )
-                softexit.trigger(" # Error in replay input.")
         while True:
             self.rstep += 1
             try:
-                if self.intraj.mode == "xyz":
-                    for bindex, b in enumerate(self.beads):
-                        if wildcard_used:
-                            myframe = read_file("xyz", self.rfile[bindex])
-                        else:
-                            myframe = read_file("xyz", self.rfile)
-                        myatoms = myframe["atoms"]
-                        mycell = myframe["cell"]
-                        myatoms.q *= unit_to_internal("length", self.intraj.units, 1.0)
-                        mycell.h *= unit_to_internal("length", self.intraj.units, 1.0)
-                        b.q[:] = myatoms.q
-                elif self.intraj.mode == "pdb":
-                    for bindex, b in enumerate(self.beads):
-                        if wildcard_used:
-                            myatoms, mycell = read_file("pdb", self.rfile[bindex])
-                        else:
-                            myatoms, mycell = read_file("pdb", self.rfile)
-                        myatoms.q *= unit_to_internal("length", self.intraj.units, 1.0)
-                        mycell.h *= unit_to_internal("length", self.intraj.units, 1.0)
-                        b.q[:] = myatoms.q
-                elif self.intraj.mode == "chk" or self.intraj.mode == "checkpoint":
+                if self.intraj.mode == "chk" or self.intraj.mode == "checkpoint":
                     # TODO: Adapt the new `Simulation.load_from_xml`?
                     # reads configuration from a checkpoint file
                     xmlchk = xml_parse_file(self.rfile)  # Parses the file.
@@ -147,13 +200,213 @@ class Replay(Motion):
                     mycell = simchk.cell.fetch()
                     mybeads = simchk.beads.fetch()
                     self.beads.q[:] = mybeads.q
+                    # do not assign cell if it contains an invalid value (typically missing cell in the input)
+                    if mycell.V > 0:
+                        self.cell.h[:] = mycell.h
                     softexit.trigger(" # Read single checkpoint")
-                # do not assign cell if it contains an invalid value (typically missing cell in the input)
-                if mycell.V > 0:
-                    self.cell.h[:] = mycell.h
+                elif (step is None) or (self.rstep > step):
+                    q, h, slot = self.read_step()
+                    self.beads.q[:] = q
+                    # do not assign cell if it contains an invalid value (typically missing cell in the input)
+                    if np.linalg.det(h) > 0:
+                        self.cell.h[:] = h
+                    if slot is not None:
+                        self.reader.release(slot)
+                elif self.reader is not None:
+                    # skips the frames before the restart step
+                    self.reader.release(self.reader.get())
+                else:
+                    self.read_step()
             except EOFError:
                 softexit.trigger(" # Finished reading re-run trajectory")
             if (step is None) or (self.rstep > step):
                 break
 
         self.qtime += time.time()
+
+
+def open_trajectory(mode, filename):
+    """Opens a trajectory file, in binary mode if its format is binary."""
+
+    if mode in ["bin", "binary"]:
+        return open(filename, "rb")
+    return open(filename, "r")
+
+
+def read_frames(mode, rfile, q, h, conv):
+    """Reads consecutive frames from an open trajectory file.
+
+    The positions are written directly in the rows of q, and converted to
+    internal units. The units are found from the comment line of the first
+    frame that is read, as in read_file(), and the factors are then kept in
+    conv for the following frames.
+
+    Args:
+        mode: The format of the file.
+        rfile: The open trajectory file.
+        q: A (nframes, 3*natoms) array, filled with the positions of the frames.
+        h: A (3, 3) array, filled with the cell of the last frame.
+        conv: A dictionary with the 'factor' that is applied on top of the
+            units of the file, where the conversion factors are cached.
+
+    Raises:
+        EOFError: If the end of the file is reached.
+    """
+
+    from ipi.utils.io.io_units import auto_units
+
+    for k in range(len(q)):
+        raw = read_file_raw(mode, rfile)
+        if "q" not in conv:
+            dimension, units, cell_units = auto_units(raw["comment"], mode=mode)
+            conv["q"] = unit_to_internal(dimension, units, 1.0) * conv["factor"]
+            conv["h"] = unit_to_internal("length", cell_units, 1.0) * conv["factor"]
+        if len(raw["data"]) != q.shape[1]:
+            raise ValueError(
+                "Replay frame has %d atoms, the system has %d"
+                % (len(raw["data"]) // 3, q.shape[1] // 3)
+            )
+        np.multiply(raw["data"], conv["q"], out=q[k])
+    np.multiply(raw["cell"], conv["h"], out=h)
+
+
+class FramePrefetcher(object):
+
+    """Reads trajectory frames ahead of the replay in the background.
+
+    There is one reader (a thread or a process) for each trajectory file,
+    that parses frames into a ring of preallocated shared buffers, each
+    holding the positions of all the beads for one step. A slot is handed
+    to the replay once all the readers have filled their rows, and given
+    back to the readers once it has been copied into the beads.
+
+    Attributes:
+        q: A (nslots, nbeads, 3*natoms) array with the positions.
+        h: A (nslots, nfiles, 3, 3) array with the cell read from each file.
+        free: A queue for each reader, with the slots it can fill.
+        ready: A queue for each reader, with the slots it has filled.
+    """
+
+    def __init__(self, mode, filenames, nbeads, natoms, nslots, factor, readers):
+        """Allocates the buffers and starts the readers.
+
+        Args:
+            mode: The format of the trajectory files.
+            filenames: A list with either one file holding the beads one after
+                the other, or with one file for each bead.
+            nbeads: The number of beads.
+            natoms: The number of atoms.
+            nslots: The number of steps that are buffered.
+            factor: The conversion factor on top of the units of the files.
+            readers: Whether the readers are 'threads' or 'processes'.
+        """
+
+        nfiles = len(filenames)
+        qshape = (nslots, nbeads, 3 * natoms)
+        hshape = (nslots, nfiles, 3, 3)
+        qraw = mp.RawArray("d", int(np.prod(qshape)))
+        hraw = mp.RawArray("d", int(np.prod(hshape)))
+        self.q = np.frombuffer(qraw).reshape(qshape)
+        self.h = np.frombuffer(hraw).reshape(hshape)
+
+        if readers == "processes":
+            Queue, Worker = mp.Queue, mp.Process
+        else:
+            Queue, Worker = queue.Queue, threading.Thread
+        self.free = [Queue() for f in filenames]
+        self.ready = [Queue() for f in filenames]
+        self.workers = []
+        nrows = nbeads // nfiles
+        for i, f in enumerate(filenames):
+            w = Worker(
+                target=_prefetch_frames,
+                name="replay_reader_%d" % i,
+                args=(
+                    mode,
+                    f,
+                    (i * nrows, (i + 1) * nrows, i),
+                    factor,
+                    (qraw, qshape, hraw, hshape),
+                    self.free[i],
+                    self.ready[i],
+                    readers == "processes",
+                ),
+            )
+            w.daemon = True
+            w.start()
+            self.workers.append(w)
+        for slot in range(nslots):
+            self.release(slot)
+
+    def get(self):
+        """Waits until the next step has been read by all the readers.
+
+        Returns:
+            The index of the slot that holds the step.
+
+        Raises:
+            EOFError: If one of the files has ended.
+        """
+
+        slots = [r.get() for r in self.ready]
+        for s in slots:
+            if s == "eof":
+                raise EOFError
+            elif not isinstance(s, int):
+                raise RuntimeError("Error reading the replay trajectory:\n" + s)
+        return slots[0]
+
+    def release(self, slot):
+        """Gives a slot back to the readers."""
+
+        for f in self.free:
+            f.put(slot)
+
+    def stop(self):
+        """Stops the readers."""
+
+        for f in self.free:
+            f.put(None)
+        for w in self.workers:
+            if isinstance(w, mp.Process):
+                w.terminate()
+
+
+def _prefetch_frames(mode, filename, rows, factor, buffers, free, ready, process):
+    """Body of a reader: fills the slots it is given with frames from a file.
+
+    Args:
+        mode: The format of the file.
+        filename: The name of the file.
+        rows: The first and last bead read from the file, and the index of
+            the file.
+        factor: The conversion factor on top of the units of the file.
+        buffers: The shared arrays holding the positions and the cells, and
+            their shapes.
+        free: The queue the slots to be filled are taken from.
+        ready: The queue the filled slots, or the end of the file, are put on.
+        process: Whether the reader runs in a separate process.
+    """
+
+    if process:
+        # the reader must not run the soft exit of i-PI when it is terminated
+        softexit.flist, softexit.tlist = [], []
+        for sig in [signal.SIGINT, signal.SIGTERM]:
+            signal.signal(sig, signal.SIG_DFL)
+    qraw, qshape, hraw, hshape = buffers
+    q = np.frombuffer(qraw).reshape(qshape)
+    h = np.frombuffer(hraw).reshape(hshape)
+    b0, b1, i = rows
+    conv = {"factor": factor}
+    try:
+        rfile = open_trajectory(mode, filename)
+        while True:
+            slot = free.get()
+            if slot is None:
+                break
+            read_frames(mode, rfile, q[slot, b0:b1], h[slot, i], conv)
+            ready.put(slot)
+    except EOFError:
+        ready.put("eof")
+    except Exception:
+        ready.put(traceback.format_exc())
@@ -23,7 +23,9 @@ __all__ = ["SCPhononsMover"]
 import time
 import os
 import numpy as np
+from numpy.lib.format import open_memmap
 from ipi.engine.motion.motion import Motion
+from ipi.engine.beads import Beads
 from ipi.utils.depend import *
 from ipi.utils import units
 from ipi.utils.phonontools import apply_asr
@@ -133,10 +135,23 @@ class SCPhononsMover(Motion):
         self.atol = self.chop
 
         # Creates duplicate classes to simplify computation of forces.
+        # Each block of nparallel samples has its own multi-bead copy of
+        # the system, so that all the samples of an SCP iteration can be
+        # queued at once.
         self.dof = 3 * self.beads.natoms
-        self.dbeads = self.beads.copy(nbeads=self.nparallel)
         self.dcell = self.cell.copy()
-        self.dforces = self.forces.copy(self.dbeads, self.dcell)
+        if self.nparallel > 1 and any(fc.nbeads > 0 for fc in self.forces.fcomp):
+            info(
+                " Ring-polymer contraction would mix the sampled configurations: disabling batched evaluation.",
+                verbosity.low,
+            )
+            self.nparallel = 1
+        self.bforces = []
+        for i in range(self.max_steps // self.nparallel):
+            bbeads = Beads(self.beads.natoms, self.nparallel)
+            bbeads.m[:] = dstrip(self.beads.m)
+            bbeads.names[:] = dstrip(self.beads.names)
+            self.bforces.append(self.forces.copy(bbeads, self.dcell))
 
         # Sets temperature.
         self.temp = self.ensemble.temp
@@ -235,10 +250,15 @@ class SCPhononator(DummyPhononator):
         Reference all the variables for simpler access.
         """
         super(SCPhononator, self).bind(dm)
-        self.v = np.zeros((self.dm.max_iter, self.dm.max_steps))
-        self.x = np.zeros((self.dm.max_iter, self.dm.max_steps, self.dm.dof))
+
+        # Memory-mapped stores of the configurations, potentials and forces
+        # sampled at each SCP iteration.
+        self.x = []
+        self.v = []
+        self.f = []
+        self.pending = set()
+        self.stack = None
         self.q = np.zeros((self.dm.max_iter, 1, self.dm.dof))
-        self.f = np.zeros((self.dm.max_iter, self.dm.max_steps, self.dm.dof))
         self.iD = np.zeros((self.dm.max_iter, self.dm.dof, self.dm.dof))
 
         # New variables added to dampen the displacements (between scp steps)
@@ -315,137 +335,145 @@ class SCPhononator(DummyPhononator):
         outfile.close_stream()
         info(" @SCP: Saving the minimum potential.", verbosity.medium)
 
-        if os.path.exists(
-            self.dm.output_maker.prefix
-            + "."
-            + self.dm.prefix
-            + ".x."
-            + str(self.dm.isc)
-        ):
+        if os.path.exists(self.samples_file("v", self.dm.isc)):
             info(
                 " @SCP: Loading %8d configurations from file." % (self.dm.max_steps,),
                 verbosity.medium,
             )
-            self.x[self.dm.isc] = np.loadtxt(
-                self.dm.output_maker.prefix
-                + "."
-                + self.dm.prefix
-                + ".x."
-                + str(self.dm.isc)
-            )
+            x, v, f = [
+                open_memmap(self.samples_file(name, self.dm.isc), mode="r+")
+                for name in "xvf"
+            ]
         else:
             info(
                 " @SCP: Generating %8d new configurations to be sampled."
                 % (self.dm.max_steps,),
                 verbosity.medium,
             )
+            x = open_memmap(
+                self.samples_file("x", self.dm.isc),
+                mode="w+",
+                shape=(self.dm.max_steps, self.dm.dof),
+            )
+
             # Creates a list of configurations that are to be sampled.
             while self.dm.imc <= self.dm.max_steps:
 
                 irng = (self.dm.isc) * self.dm.max_steps // 2 + (self.dm.imc + 1) // 2
-                x = self.dm.fginv(self.dm.random_sequence[irng])
+                dx = self.dm.fginv(self.dm.random_sequence[irng])
 
                 # picks the elements of the vector in a random order.
                 # this introduces a degree of randomness in the sobol-like PRNGs
-                x = x[self.dm.random_shuffle]
+                dx = dx[self.dm.random_shuffle]
 
                 # Transforms the "normal" random number and stores it.
-                x = np.dot(self.dm.isqM, np.dot(self.dm.sqtD, x))
-                self.x[self.dm.isc, self.dm.imc - 1] = (self.dm.beads.q + x.T)[-1]
+                dx = np.dot(self.dm.isqM, np.dot(self.dm.sqtD, dx))
+                x[self.dm.imc - 1] = (self.dm.beads.q + dx.T)[-1]
                 self.dm.imc += 1
 
                 # Performs an inversion to the displacement and samples another configuration.
-                x = -x
-                self.x[self.dm.isc, self.dm.imc - 1] = (self.dm.beads.q + x.T)[-1]
+                dx = -dx
+                x[self.dm.imc - 1] = (self.dm.beads.q + dx.T)[-1]
                 self.dm.imc += 1
+            x.flush()
+
+            # The potential is NaN for the samples that have not been evaluated
+            # yet. Its store is created last, so that its presence marks a
+            # complete set of configurations.
+            f = open_memmap(
+                self.samples_file("f", self.dm.isc),
+                mode="w+",
+                shape=(self.dm.max_steps, self.dm.dof),
+            )
+            v = open_memmap(
+                self.samples_file("v", self.dm.isc),
+                mode="w+",
+                shape=(self.dm.max_steps,),
+            )
+            v[:] = np.nan
+            v.flush()
+
+        for store, value in zip((self.x, self.v, self.f), (x, v, f)):
+            del store[self.dm.isc :]
+            store.append(value)
 
         # Resets the number of MC steps to 1.
         self.dm.imc = 1
-        info(
-            " @SCP: Performing %8d new force evaluations." % (self.dm.max_steps,),
-            verbosity.medium,
-        )
 
-    def step(self, step=None):
+    def samples_file(self, name, isc):
         """
-        Executes one monte carlo step.
+        Returns the name of the binary file that stores the configurations
+        (x), potential energies (v) or forces (f) sampled at the isc-th
+        SCP iteration.
         """
 
-        if os.path.exists(
+        return (
             self.dm.output_maker.prefix
             + "."
             + self.dm.prefix
-            + ".x."
-            + str(self.dm.isc)
-        ):
+            + "."
+            + name
+            + "."
+            + str(isc)
+            + ".npy"
+        )
+
+    def step(self, step=None):
+        """
+        Collects the potentials and forces of the next block of nparallel
+        samples. At the first step of an SCP iteration queues all the
+        samples that have not been evaluated yet, so that the clients can
+        work through the whole iteration without waiting for i-PI.
+        """
+
+        isc, n = self.dm.isc, self.dm.nparallel
+
+        if self.dm.imc == 1:
+            self.pending = set(
+                b
+                for b in range(len(self.dm.bforces))
+                if np.isnan(self.v[isc][b * n : (b + 1) * n]).any()
+            )
+            if len(self.pending) == 0:
+                info(
+                    " @SCP: Loading %8d forces from file." % (self.dm.max_steps,),
+                    verbosity.medium,
+                )
+                self.dm.imc += self.dm.max_steps
+                return
+
             info(
-                " @SCP: Loading %8d forces from file." % (self.dm.max_steps,),
+                " @SCP: Performing %8d new force evaluations."
+                % (len(self.pending) * n,),
                 verbosity.medium,
             )
-            self.f[self.dm.isc] = np.loadtxt(
-                self.dm.output_maker.prefix
-                + "."
-                + self.dm.prefix
-                + ".f."
-                + str(self.dm.isc)
-            )
-            self.v[self.dm.isc] = np.loadtxt(
-                self.dm.output_maker.prefix
-                + "."
-                + self.dm.prefix
-                + ".v."
-                + str(self.dm.isc)
-            )
-            self.dm.imc += len(self.f[self.dm.isc])
-        else:
-            imcmin = self.dm.imc - 1
-            imcmax = self.dm.imc - 1 + self.dm.nparallel
-
-            x = self.x[self.dm.isc, imcmin:imcmax]
-            self.dm.dbeads.q = x
+            for b in sorted(self.pending):
+                self.dm.bforces[b].beads.q = self.x[isc][b * n : (b + 1) * n]
+                self.dm.bforces[b].queue()
 
-            v = dstrip(self.dm.dforces.pots).copy()
-            f = dstrip(self.dm.dforces.f).copy()
+        b = (self.dm.imc - 1) // n
+        if b in self.pending:
+            bforces = self.dm.bforces[b]
+            self.v[isc][b * n : (b + 1) * n] = dstrip(bforces.pots)
+            self.f[isc][b * n : (b + 1) * n] = dstrip(bforces.f)
+            self.pending.discard(b)
 
-            self.v[self.dm.isc, imcmin:imcmax] = v[:]
-            self.f[self.dm.isc, imcmin:imcmax] = f[:]
-
-            self.dm.imc += self.dm.nparallel
+        self.dm.imc += n
 
     def print_energetics(self):
         """
         Prints the energetics of the sampled configurations.
         """
 
-        # prints the sampled configurations.
-        outfile = self.dm.output_maker.get_output(
-            self.dm.prefix + ".x." + str(self.dm.isc)
-        )
-        np.savetxt(outfile, self.x[self.dm.isc])
-        outfile.close_stream()
-        info(" @SCP: Saving the sampled configurations.", verbosity.medium)
-
-        # prints the potential energy of the sampled configurations.
-        outfile = self.dm.output_maker.get_output(
-            self.dm.prefix + ".v." + str(self.dm.isc)
-        )
-        np.savetxt(outfile, self.v[self.dm.isc])
-        outfile.close_stream()
+        # Flushes the stores of the sampled configurations.
+        for store in (self.x, self.v, self.f):
+            store[self.dm.isc].flush()
         info(
-            " @SCP: Saving the potential energy of the sampled configurations.",
+            " @SCP: Saved the configurations, potential energies and forces of the samples in %s."
+            % (self.samples_file("[xvf]", self.dm.isc),),
             verbosity.medium,
         )
 
-        # prints the sampled configurations.
-        outfile = self.dm.output_maker.get_output(
-            self.dm.prefix + ".f." + str(self.dm.isc)
-        )
-        np.savetxt(outfile, self.f[self.dm.isc])
-        outfile.close_stream()
-        info(
-            " @SCP: Saving the forces of the sampled configurations.", verbosity.medium
-        )
-
         self.dm.isc += 1
         self.dm.imc = 0
 
@@ -711,6 +739,19 @@ class SCPhononator(DummyPhononator):
                     info(" @SCP: All forces are converged.", verbosity.medium)
                     break
 
+    def samples(self):
+        """
+        Returns the configurations and the forces sampled at all the
+        previous SCP iterations, as (isc, max_steps, dof) arrays.
+        """
+
+        if self.stack is None or len(self.stack[0]) != self.dm.isc:
+            self.stack = (
+                np.asarray(self.x[: self.dm.isc]),
+                np.asarray(self.f[: self.dm.isc]),
+            )
+        return self.stack
+
     def weighted_force(self):
         """
         Returns the reweighted force, the associated statistical error
@@ -718,35 +759,30 @@ class SCPhononator(DummyPhononator):
         """
 
         # Creates new variable names for easier referencing.
-        qp, iDp, Kp, i = self.dm.beads.q, self.dm.iD, self.dm.K, self.dm.isc - 1
-
-        # Takes the set of forces calculated at the previous step for (self.q, self.iD)
-        avg_f = dstrip(self.f[i]).copy()[-1] * 0.0
-        var_f = dstrip(self.f[i]).copy()[-1] * 0.0
-        norm = 0.0
-        batch_w = np.zeros(self.dm.isc)
-
-        for i in range(self.dm.isc):
-
-            # Calculates the harmonic force.
-            f = self.f[i]
-            x = self.x[i]
-            fh = -1.0 * np.dot(x - qp, Kp)
-
-            # Calculates the weights to calculate average for the distribution for (qp, iDp).
-            w, sw, rw = self.calculate_weights(i)
-            batch_w[i] = sw
-
-            # Simply multiplies the forces by the weights and averages.
-            V1 = np.sum(rw)
-            V2 = np.sum(rw ** 2)
-            avg_fi = np.sum(rw * (f - fh), axis=0) / V1
-            var_fi = np.sum(rw * (f - fh - avg_fi) ** 2, axis=0) / (V1 - V2 / V1)
-            avg_f += sw * avg_fi
-            var_f += sw ** 2 * var_fi
-            norm += sw
+        qp, Kp = self.dm.beads.q, self.dm.K
+        x, f = self.samples()
+
+        # Calculates the weights to calculate averages for the distribution
+        # for (qp, iDp), and the anharmonic part of the forces.
+        w, batch_w, rw = self.calculate_weights()
+        df = f + np.dot(x - qp, Kp)
+
+        # Simply multiplies the forces by the weights and averages
+        # over the samples of each batch.
+        V1 = np.sum(rw, axis=1)
+        V2 = np.sum(rw ** 2, axis=1)
+        avg_f = np.einsum("ij,ijk->ik", rw, df) / V1[:, np.newaxis]
+        var_f = (
+            np.einsum("ij,ijk->ik", rw, (df - avg_f[:, np.newaxis]) ** 2)
+            / (V1 - V2 / V1)[:, np.newaxis]
+        )
+        norm = np.sum(batch_w)
 
-        return avg_f / norm, np.sqrt(var_f / norm ** 2 / self.dm.max_steps), batch_w
+        return (
+            np.dot(batch_w, avg_f) / norm,
+            np.sqrt(np.dot(batch_w ** 2, var_f) / norm ** 2 / self.dm.max_steps),
+            batch_w,
+        )
 
     def weighted_hessian(self):
         """
@@ -754,66 +790,58 @@ class SCPhononator(DummyPhononator):
         """
 
         # Creates new variable names for easier referencing.
-        qp, iDp, Kp, i = self.dm.beads.q, self.dm.iD, self.dm.K, self.dm.isc - 1
-
-        # Takes the set of forces calculated at the previous step for (self.q, self.iD)
-        avg_K = dstrip(self.dm.iD).copy() * 0.0
-        norm = 0.0
-
-        for i in range(self.dm.isc):
-            # Draws the random configurations and forces.
-            f = self.f[i]
-            x = self.x[i]
-
-            # Calculates the harmonic forces.
-            fh = -1.0 * np.dot(x - qp, Kp)
-
-            # Calculates the weights to calculate average for the distribution for (qp, iDp)
-            w, sw, rw = self.calculate_weights(i)
-
-            # Simply multiplies the forces by the weights and averages
-            V1 = np.sum(rw)
-
-            # Simply multiplies the forces by the weights and averages
-            avg_dKi = -np.dot(iDp, np.dot(((f - fh) * rw).T, (x - qp[-1])).T) / V1
-            avg_Ki = Kp + 0.50 * (avg_dKi + avg_dKi.T)
-            avg_K += sw * avg_Ki
-            norm += sw
+        qp, iDp, Kp = self.dm.beads.q, self.dm.iD, self.dm.K
+        x, f = self.samples()
+
+        # Calculates the weights to calculate averages for the distribution
+        # for (qp, iDp), and the anharmonic part of the forces.
+        w, batch_w, rw = self.calculate_weights()
+        df = f + np.dot(x - qp, Kp)
+
+        # Weights each sample by its reweighting factor, normalised within
+        # its batch, times the batch weight, and sums the products of the
+        # forces and the displacements over all the samples at once.
+        c = rw * (batch_w / np.sum(rw, axis=1))[:, np.newaxis]
+        fx = np.dot(
+            (df * c[:, :, np.newaxis]).reshape((-1, self.dm.dof)).T,
+            (x - qp[-1]).reshape((-1, self.dm.dof)),
+        )
+        avg_dK = -np.dot(iDp, fx.T) / np.sum(batch_w)
 
-        return avg_K / norm
+        return Kp + 0.50 * (avg_dK + avg_dK.T)
 
-    def calculate_weights(self, i):
+    def calculate_weights(self):
         """
         Computes the weights to sample (verb) a distribution described at (qp, iDp) using
-        samples (noun) generated at the i^th SCPhonons step.
+        samples (noun) generated at each of the previous SCPhonons steps. Returns
+        the normalised and the raw weights as (isc, max_steps) arrays, and the batch weights.
         """
 
         # Creates new variable names for easier referencing.
-        qp, iDp, Kp = self.dm.beads.q, self.dm.iD, self.dm.K
-
-        # Takes the set of positions calculated at the previous step for (self.q, self.iD)
-        x = self.x[i].copy()
+        qp, iDp = self.dm.beads.q, self.dm.iD
 
-        # Stores self.q in a vector
-        q0 = self.q[i]
-        iD0 = self.iD[i]
+        # Takes the positions, the mean positions and the inverse displacement
+        # correlation matrices of the previous steps.
+        x = self.samples()[0]
+        q0 = self.q[: self.dm.isc]
+        iD0 = self.iD[: self.dm.isc]
 
         # Estimates the weights as the ratio of density matrix for (qp, iDp) to the density matrix for (self.q, self.iD)
         rw = np.exp(
-            -(0.50 * np.dot(iDp, (qp - x).T).T * (qp - x)).sum(axis=1)
-            + (0.50 * np.dot(iD0, (x - q0).T).T * (x - q0)).sum(axis=1)
+            -(0.50 * np.dot(qp - x, iDp.T) * (qp - x)).sum(axis=2)
+            + (0.50 * np.matmul(x - q0, np.transpose(iD0, (0, 2, 1))) * (x - q0)).sum(
+                axis=2
+            )
         )
 
-        if rw.sum() < 1e-24:
-            w = rw * 0.0
-        else:
-            w = rw / rw.sum()
+        w = np.zeros(rw.shape)
+        rwsum = rw.sum(axis=1)
+        w[rwsum >= 1e-24] = rw[rwsum >= 1e-24] / rwsum[rwsum >= 1e-24, np.newaxis]
 
-        w = w.reshape((self.dm.max_steps, 1))
-        rw = rw.reshape((self.dm.max_steps, 1))
         return (
             w,
-            np.nan_to_num(np.exp(-np.var(np.log(w)))) ** self.dm.batch_weight_exponent,
+            np.nan_to_num(np.exp(-np.var(np.log(w), axis=1)))
+            ** self.dm.batch_weight_exponent,
             rw,
         )
 
@@ -859,26 +887,15 @@ class SCPhononator(DummyPhononator):
         sqtdm[self.nz] = np.sqrt(tdm[self.nz])
         sqtdm[self.z] = 0.0
 
-        self.dm.itK = np.eye(self.dm.dof) * 0.0
-        self.dm.tD = np.eye(self.dm.dof) * 0.0
-        self.dm.tDm = np.eye(self.dm.dof) * 0.0
-        self.dm.itD = np.eye(self.dm.dof) * 0.0
-        self.dm.itDm = np.eye(self.dm.dof) * 0.0
-        self.dm.sqtD = np.eye(self.dm.dof) * 0.0
-        self.dm.sqtDm = np.eye(self.dm.dof) * 0.0
-
-        for i in range(self.dm.dof):
-            if self.z[i]:
-                continue
-            U = self.dm.U.T[i].reshape((1, self.dm.dof))
-            m = np.dot(U.T, U)
-            self.dm.itK += self.dm.iw2[i] * m
-            self.dm.tD += td[i] * m
-            self.dm.tDm += tdm[i] * m
-            self.dm.itD += itd[i] * m
-            self.dm.itDm += itdm[i] * m
-            self.dm.sqtD += sqtd[i] * m
-            self.dm.sqtDm += sqtd[i] * m
+        # Builds the matrices from the non-zero normal modes.
+        U = self.dm.U[:, self.nz]
+        self.dm.itK = np.dot(U * self.dm.iw2[self.nz], U.T)
+        self.dm.tD = np.dot(U * td[self.nz], U.T)
+        self.dm.tDm = np.dot(U * tdm[self.nz], U.T)
+        self.dm.itD = np.dot(U * itd[self.nz], U.T)
+        self.dm.itDm = np.dot(U * itdm[self.nz], U.T)
+        self.dm.sqtD = np.dot(U * sqtd[self.nz], U.T)
+        self.dm.sqtDm = np.dot(U * sqtdm[self.nz], U.T)
 
         self.dm.K = np.dot(self.dm.sqM, np.dot(self.dm.dynmatrix, self.dm.sqM))
         self.dm.iD = np.dot(self.dm.sqM, np.dot(self.dm.itD, self.dm.sqM))
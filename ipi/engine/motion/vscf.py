@@ -32,10 +32,10 @@ from ipi.utils.softexit import softexit
 from ipi.utils.messages import verbosity, warning, info
 from ipi.utils.io import print_file
 from ipi.engine.atoms import Atoms
+from ipi.engine.beads import Beads
 
 try:
     import scipy
-    from scipy.special import hermite
     from scipy.special import logsumexp
     from scipy.interpolate import interp1d
     from scipy.interpolate import interp2d
@@ -141,10 +141,53 @@ class NormalModeMover(Motion):
         self.m = dstrip(self.beads.m)
         self.calc.bind(self)
 
-        self.dbeads = self.beads.copy(nbeads=self.nparallel)
+        self.dbeads = self.beads.copy()
         self.dcell = self.cell.copy()
         self.dforces = self.forces.copy(self.dbeads, self.dcell)
 
+        # multi-bead copies used to evaluate batches of displacements,
+        # created on demand for each batch size
+        self.bforces = {}
+        if self.nparallel > 1 and any(fc.nbeads > 0 for fc in self.forces.fcomp):
+            info(
+                " Ring-polymer contraction would mix the displaced configurations: disabling batched evaluation.",
+                verbosity.low,
+            )
+            self.nparallel = 1
+
+    def evaluate(self, qs):
+        """Computes the potential and the forces at a set of configurations.
+        The configurations are evaluated nparallel at a time, as the beads of
+        a multi-bead copy of the system, so that their force requests reach
+        the clients together.
+
+        Args:
+            qs: A (nconf, 3*natoms) array of positions.
+
+        Returns:
+            A (nconf) array with the potential energies and a (nconf, 3*natoms)
+            array with the forces.
+        """
+
+        qs = np.asarray(qs).reshape((-1, 3 * self.beads.natoms))
+        pots = np.zeros(len(qs))
+        forces = np.zeros(qs.shape)
+        for i in range(0, len(qs), self.nparallel):
+            n = min(self.nparallel, len(qs) - i)
+            if n == 1:
+                bforces = self.dforces
+            else:
+                if n not in self.bforces:
+                    bbeads = Beads(self.beads.natoms, n)
+                    bbeads.m[:] = dstrip(self.beads.m)
+                    bbeads.names[:] = dstrip(self.beads.names)
+                    self.bforces[n] = self.forces.copy(bbeads, self.dcell)
+                bforces = self.bforces[n]
+            bforces.beads.q = qs[i : i + n]
+            pots[i : i + n] = dstrip(bforces.pots)
+            forces[i : i + n] = dstrip(bforces.f)
+        return pots, forces
+
     def step(self, step=None):
         """Executes one step of phonon computation. """
         self.calc.step(step)
@@ -270,9 +313,6 @@ class IMF(DummyCalculator):
         # Potential energy (offset) at equilibrium positions per primitve unit (cell)
         self.v0 = 0
 
-        # Initializes the SHO wvfn basis for solving the 1D Schroedinger equation
-        self.hermite_functions = [hermite(i) for i in range(max(20, 4 * self.nbasis))]
-
         # Sets the total number of steps for IMF.
         self.total_steps = 3 * self.imm.beads.natoms
 
@@ -283,19 +323,32 @@ class IMF(DummyCalculator):
         at position x.
         """
 
+        return self.psi_grid(n + 1, m, hw, q)[n]
+
+    def psi_grid(self, nbasis, m, hw, q):
+        """
+        Returns the values of the first nbasis wavefunctions of a
+        harmonic oscillator with mass m, frequency hw on the
+        grid q, as a (nbasis, len(q)) array. Uses the recurrence
+        for the normalised Hermite functions, that is vectorised
+        over the grid and stable for large n.
+        """
+
         # Defines variables for easier referencing
         alpha = m * hw
-        try:
-            herfun = self.hermite_functions[n]
-        except:
-            herfun = hermite(n)
-
-        norm = (alpha / np.pi) ** 0.25 * np.sqrt(
-            1.0 / (2.0 ** (n) * np.math.factorial(n))
-        )
-        psival = norm * np.exp(-alpha * q ** 2 / 2.0) * herfun(np.sqrt(alpha) * q)
+        x = np.sqrt(alpha) * np.asarray(q, float)
+
+        psigrid = np.zeros((nbasis,) + x.shape)
+        psigrid[0] = (alpha / np.pi) ** 0.25 * np.exp(-(x ** 2) / 2.0)
+        if nbasis > 1:
+            psigrid[1] = np.sqrt(2.0) * x * psigrid[0]
+        for n in range(1, nbasis - 1):
+            psigrid[n + 1] = (
+                np.sqrt(2.0 / (n + 1)) * x * psigrid[n]
+                - np.sqrt(n / (n + 1.0)) * psigrid[n - 1]
+            )
 
-        return psival
+        return psigrid
 
     def solve_schroedingers_equation(self, hw, psigrid, vgrid, return_eigsys=False):
         """
@@ -308,13 +361,8 @@ class IMF(DummyCalculator):
         nbasis = len(psigrid)
 
         # Constructs the Hamiltonian matrix.
-        h = np.zeros((nbasis, nbasis))
-        for i in range(nbasis):
-            for j in range(i, nbasis, 1):
-                h[i][j] = np.dot(psigrid[i] * psigrid[j], vgrid)
-            h[i][i] *= 0.5
-            h[i][i] += 0.5 * (i + 0.5) * hw
-        h += h.T
+        h = np.dot(psigrid * vgrid, psigrid.T)
+        h[np.diag_indices(nbasis)] += (np.arange(nbasis) + 0.5) * hw
 
         # Diagonalise Hamiltonian matrix and evaluate anharmonic free energy and vibrational freq
         evals, evecs = np.linalg.eigh(h)
@@ -330,6 +378,53 @@ class IMF(DummyCalculator):
         else:
             return A, E
 
+    def sample_mode(self, dev, bailout, stride=1, nextra=0):
+        """
+        Samples the potential energy surface at the configurations
+        displaced by c * dev, for c = 1, 1 + stride, 1 + 2 * stride ...
+        and for the opposite displacements, until bailout(c, v, f) is
+        true for the potential v and forces f sampled at c, and for
+        nextra more points in that direction. The configurations of
+        both directions are evaluated together, nparallel at a time.
+
+        Returns a dictionary that maps each direction (+1 and -1)
+        to the lists of the sampled c, potentials and forces.
+        """
+
+        q = dstrip(self.imm.beads.q)[0]
+        samples = {1: ([], [], []), -1: ([], [], [])}
+        nstop = {1: None, -1: None}
+
+        def pending(d, n):
+            return nstop[d] is None or n < nstop[d] + nextra
+
+        while pending(1, len(samples[1][0])) or pending(-1, len(samples[-1][0])):
+
+            # Fills a batch with the next displacements along the open directions.
+            nnext = {d: len(samples[d][0]) for d in samples}
+            clist = []
+            while len(clist) < self.imm.nparallel:
+                dopen = [d for d in (1, -1) if pending(d, nnext[d])]
+                if len(dopen) == 0:
+                    break
+                for d in dopen[: self.imm.nparallel - len(clist)]:
+                    clist.append(d * (1 + stride * nnext[d]))
+                    nnext[d] += 1
+
+            pots, forces = self.imm.evaluate(q + np.outer(clist, dev))
+
+            # Points beyond the bailout of their direction are discarded.
+            for c, v, f in zip(clist, pots, forces):
+                d = 1 if c > 0 else -1
+                if not pending(d, len(samples[d][0])):
+                    continue
+                for l, x in zip(samples[d], (c, v, f)):
+                    l.append(x)
+                if nstop[d] is None and bailout(c, v, f):
+                    nstop[d] = len(samples[d][0])
+
+        return samples
+
     def step(self, step=None):
         """Computes the Born Oppenheimer curve along a normal mode."""
 
@@ -381,17 +476,15 @@ class IMF(DummyCalculator):
 
             # Calculates the 1D correction potential on a grid.
             qgrid = np.linspace(np.min(qlist), np.max(qlist), self.nint)
-            vgrid = np.asarray([(np.nan_to_num(vspline(x))) for x in qgrid])
+            vgrid = np.nan_to_num(vspline(qgrid))
 
             while True:
                 nnbasis = max(1, self.nbasis - 5) + 5 * bs_iter
                 nnbasis = self.nbasis + 5 * bs_iter
 
-                psigrid = np.zeros((nnbasis, self.nint))
                 # Calculates the wavefunctions on the grid.
-                for i in range(nnbasis):
-                    psigrid[i] = self.psi(i, 1.0, self.imm.w[step], qgrid)
-                    psigrid[i] = psigrid[i] / np.sqrt(np.dot(psigrid[i], psigrid[i]))
+                psigrid = self.psi_grid(nnbasis, 1.0, self.imm.w[step], qgrid)
+                psigrid /= np.sqrt(np.sum(psigrid ** 2, axis=1))[:, np.newaxis]
 
                 # Solves the Schroedinger's Equation.
                 bs_AEanh = self.solve_schroedingers_equation(
@@ -465,99 +558,40 @@ class IMF(DummyCalculator):
                 else:
                     delta_counter = 2
 
-                counter = 1
+                # Stores the "anharmonic" component of the potential
+                # and the force.
+                def anharmonic(c, v, f):
+                    dv = v / self.nprim - 0.50 * self.imm.w2[step] * (nmd * c) ** 2 - v0
+                    df = np.dot(f, np.real(self.imm.V.T[step])) / self.nprim
+                    df += self.imm.w2[step] * (nmd * c)
+                    return dv, df
 
                 # Explores configurations until the sampled energy exceeds
                 # a user-defined threshold of the zero-point energy.
-                while True:
-
-                    # Displaces along the normal mode.
-                    self.imm.dbeads.q = self.imm.beads.q + dev * counter
-
-                    # Stores the "anharmonic" component of the potential
-                    # and the force.
-                    dv = (
-                        dstrip(self.imm.dforces.pots).copy()[0] / self.nprim
-                        - 0.50 * self.imm.w2[step] * (nmd * counter) ** 2
-                        - v0
+                def bailout(c, v, f):
+                    return self.nevib * self.imm.nmevib[step] < np.abs(
+                        0.50 * self.imm.w2[step] * (nmd * c) ** 2
+                        + anharmonic(c, v, f)[0]
                     )
-                    df = (
-                        np.dot(
-                            dstrip(self.imm.dforces.f).copy()[0],
-                            np.real(self.imm.V.T[step]),
-                        )
-                        / self.nprim
-                        + self.imm.w2[step] * (nmd * counter)
-                    )
-
-                    # Adds to the list.
-                    # Also stores the total energetics i.e. including
-                    # the harmonic component.
-                    vlist.append(dv)
-                    flist.append(df)
-                    qlist.append(nmd * counter)
-
-                    # Bailout condition.
-                    if self.nevib * self.imm.nmevib[step] < np.abs(
-                        0.50 * self.imm.w2[step] * (nmd * counter) ** 2 + dv
-                    ):
-                        break
-
-                    # Increases the displacement by 1 or 2 depending on the iteration.
-                    counter += delta_counter
-
-                info(
-                    " @NM: Using %8d configurations along the +ve direction."
-                    % (counter,),
-                    verbosity.medium,
-                )
 
-                counter = -1
+                samples = self.sample_mode(dev, bailout, stride=delta_counter)
 
-                # Similarly displaces in the "-ve direction"
-                while True:
-
-                    # Displaces along the normal mode.
-                    self.imm.dbeads.q = self.imm.beads.q + dev * counter
+                # Adds to the list, first the +ve and then the -ve direction.
+                # Also stores the total energetics i.e. including
+                # the harmonic component.
+                for d, direction in [(1, "+ve"), (-1, "-ve")]:
+                    for c, v, f in zip(*samples[d]):
+                        dv, df = anharmonic(c, v, f)
+                        vlist.append(dv)
+                        flist.append(df)
+                        qlist.append(nmd * c)
 
-                    # Stores the "anharmonic" component of the potential
-                    # and the force.
-                    dv = (
-                        dstrip(self.imm.dforces.pots).copy()[0] / self.nprim
-                        - 0.50 * self.imm.w2[step] * (nmd * counter) ** 2
-                        - v0
-                    )
-                    df = (
-                        np.dot(
-                            dstrip(self.imm.dforces.f).copy()[0],
-                            np.real(self.imm.V.T[step]),
-                        )
-                        / self.nprim
-                        + self.imm.w2[step] * (nmd * counter)
+                    info(
+                        " @NM: Using %8d configurations along the %s direction."
+                        % (abs(samples[d][0][-1]), direction),
+                        verbosity.medium,
                     )
 
-                    # Adds to the list.
-                    # Also stores the total energetics i.e. including
-                    # the harmonic component.
-                    vlist.append(dv)
-                    flist.append(df)
-                    qlist.append(nmd * counter)
-
-                    # Bailout condition.
-                    if self.nevib * self.imm.nmevib[step] < np.abs(
-                        0.50 * self.imm.w2[step] * (nmd * counter) ** 2 + dv
-                    ):
-                        break
-
-                    # Increases the displacement by 1 or 2 depending on the iteration.
-                    counter -= delta_counter
-
-                info(
-                    " @NM: Using %8d configurations along the -ve direction."
-                    % (-counter,),
-                    verbosity.medium,
-                )
-
                 # Fits cubic splines to data.
                 info("@NM: Fitting cubic splines.", verbosity.medium)
                 vspline = interp1d(qlist, vlist, kind="cubic", bounds_error=False)
@@ -569,18 +603,14 @@ class IMF(DummyCalculator):
 
                 # Calculates the 1D correction potential on a grid.
                 qgrid = np.linspace(np.min(qlist), np.max(qlist), self.nint)
-                vgrid = np.asarray([(np.nan_to_num(vspline(x))) for x in qgrid])
+                vgrid = np.nan_to_num(vspline(qgrid))
 
                 while True:
                     nnbasis = max(1, self.nbasis - 5) + 5 * bs_iter
 
-                    psigrid = np.zeros((nnbasis, self.nint))
                     # Calculates the wavefunctions on the grid.
-                    for i in range(nnbasis):
-                        psigrid[i] = self.psi(i, 1.0, self.imm.w[step], qgrid)
-                        psigrid[i] = psigrid[i] / np.sqrt(
-                            np.dot(psigrid[i], psigrid[i])
-                        )
+                    psigrid = self.psi_grid(nnbasis, 1.0, self.imm.w[step], qgrid)
+                    psigrid /= np.sqrt(np.sum(psigrid ** 2, axis=1))[:, np.newaxis]
 
                     # Solves the Schroedinger's Equation.
                     bs_AEanh = self.solve_schroedingers_equation(
@@ -1020,15 +1050,10 @@ class VSCF(IMF):
                         self.npts_pos[self.inm] * self.fnmrms * self.nmrms[self.inm],
                         self.nint,
                     )
-                    vigrid = np.asarray(
-                        [
-                            np.asscalar(
-                                vspline(igrid[iinm])
-                                - 0.5 * self.imm.w2[self.inm] * igrid[iinm] ** 2
-                                - self.v0
-                            )
-                            for iinm in range(self.nint)
-                        ]
+                    vigrid = (
+                        vspline(igrid)
+                        - 0.5 * self.imm.w2[self.inm] * igrid ** 2
+                        - self.v0
                     )
 
                     # Save coupling correction to file for vistualisation.
@@ -1114,7 +1139,8 @@ class VSCF(IMF):
 
                 # Calculates the potential energy at the displaced positions.
                 k = 0
-                didjv = []
+                koff = []
+                qoff = []
                 unit_displacement_nmi = np.real(self.imm.V.T[self.inm]) * np.sqrt(
                     self.nprim
                 )
@@ -1136,23 +1162,27 @@ class VSCF(IMF):
                         elif (-self.npts_neg[self.jnm] + j - 2) == 0:
                             self.v_coupled[k] = self.v_indep_list[self.inm_index][i]
                         else:
-                            self.imm.dbeads.q = (
-                                dstrip(self.imm.beads.q)
-                                + displacements_nmi[i] * unit_displacement_nmi
+                            koff.append(k)
+                            qoff.append(
+                                displacements_nmi[i] * unit_displacement_nmi
                                 + displacements_nmj[j] * unit_displacement_nmj
                             )
-                            self.v_coupled[k] = (
-                                dstrip(self.imm.dforces.pots)[0] / self.nprim
-                            )
-                        didjv.append(
-                            [
-                                displacements_nmi[i],
-                                displacements_nmj[j],
-                                self.v_coupled[k] - self.v0,
-                            ]
-                        )
                         k += 1
 
+                # Evaluates all the off-axis configurations in one batch.
+                if len(koff) > 0:
+                    self.v_coupled[koff] = (
+                        self.imm.evaluate(
+                            dstrip(self.imm.beads.q)[0] + np.asarray(qoff)
+                        )[0]
+                        / self.nprim
+                    )
+                didjv = np.c_[
+                    np.repeat(displacements_nmi, len(displacements_nmj)),
+                    np.tile(displacements_nmj, len(displacements_nmi)),
+                    self.v_coupled - self.v0,
+                ]
+
                 # Saves the displacements and the sampled potential energy.
                 info(
                     " @NM: Saving the sampled potential energy to %s."
@@ -1309,13 +1339,12 @@ class VSCF(IMF):
         # Initializes the wavefunctions for all the normal modes.
         for inm in self.inms:
 
-            for ibasis in range(self.nbasis):
-                self.psi_i_grids[inm, ibasis, :] = self.psi(
-                    ibasis, 1.0, self.imm.w[inm], self.q_grids[inm]
-                )
-                self.psi_i_grids[inm, ibasis, :] /= np.sqrt(
-                    np.sum(self.psi_i_grids[inm, ibasis, :] ** 2)
-                )
+            self.psi_i_grids[inm] = self.psi_grid(
+                self.nbasis, 1.0, self.imm.w[inm], self.q_grids[inm]
+            )
+            self.psi_i_grids[inm] /= np.sqrt(
+                np.sum(self.psi_i_grids[inm] ** 2, axis=1)
+            )[:, np.newaxis]
 
             (
                 ai[inm],
@@ -1442,54 +1471,27 @@ class VSCF(IMF):
         # Determines the displacement vector in Cartesian space.
         dev = np.real(self.imm.V.T[self.inm]) * nmd * np.sqrt(self.nprim)
 
-        # Adds the minimum configuration to the list of sampled potential.
-        v_indeps = [self.v0]
-
-        # Displaces along the negative direction.
-        counter = -1
-        while True:
-
-            self.imm.dbeads.q = self.imm.beads.q + dev * counter
-            v = dstrip(self.imm.dforces.pots).copy()[0] / self.nprim
-            v_indeps.append(v)
-
-            # Bails out if the sampled potenital energy exceeds a user defined threshold.
-            if self.nevib * self.imm.nmevib[self.inm] < np.absolute(v - self.v0):
-
-                # Adds two extra points required later for solid spline fitting at edges.
-                self.imm.dbeads.q -= dev
-                v_indeps.append(dstrip(self.imm.dforces.pots).copy()[0] / self.nprim)
-                self.imm.dbeads.q -= dev
-                v_indeps.append(dstrip(self.imm.dforces.pots).copy()[0] / self.nprim)
-                break
-
-            counter -= 1
-
-        r_npts_neg = -counter
-
-        # invert vi so it starts with the potential for the most negative displacement and ends on the equilibrium
-        v_indeps = v_indeps[::-1]
-
-        counter = 1
-        while True:
-
-            self.imm.dbeads.q = self.imm.beads.q + dev * counter
-            v = dstrip(self.imm.dforces.pots).copy()[0] / self.nprim
-            v_indeps.append(v)
-
-            # Bails out if the sampled potenital energy exceeds a user defined threshold.
-            if self.nevib * self.imm.nmevib[self.inm] < np.absolute(v - self.v0):
-
-                # add two extra points required later for solid spline fitting at edges
-                self.imm.dbeads.q += dev
-                v_indeps.append(dstrip(self.imm.dforces.pots).copy()[0] / self.nprim)
-                self.imm.dbeads.q += dev
-                v_indeps.append(dstrip(self.imm.dforces.pots).copy()[0] / self.nprim)
-                break
-
-            counter += 1
+        # Displaces along both directions until the sampled potential energy
+        # exceeds a user defined threshold, and adds two extra points
+        # required later for solid spline fitting at edges.
+        samples = self.sample_mode(
+            dev,
+            lambda c, v, f: self.nevib * self.imm.nmevib[self.inm]
+            < np.absolute(v / self.nprim - self.v0),
+            nextra=2,
+        )
+        r_npts_neg = len(samples[-1][0]) - 2
+        r_npts_pos = len(samples[1][0]) - 2
 
-        r_npts_pos = counter
+        # The list starts with the potential for the most negative displacement,
+        # goes through the minimum configuration and ends on the most positive.
+        v_indeps = np.concatenate(
+            (
+                np.asarray(samples[-1][1][::-1]) / self.nprim,
+                [self.v0],
+                np.asarray(samples[1][1]) / self.nprim,
+            )
+        )
 
         return r_npts_neg, r_npts_pos, v_indeps
 
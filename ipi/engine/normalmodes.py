@@ -19,6 +19,7 @@ from ipi.utils import units
 from ipi.utils import nmtransform
 from ipi.utils.messages import verbosity, warning, info
 from ipi.utils.exchange import *
+from ipi.utils import beadtools
 
 __all__ = ["NormalModes"]
 
@@ -166,6 +167,10 @@ class NormalModes(dobject):
         if len(self.bosons) > self.natoms:
             raise IOError
 
+        # per-atom masks used by the vectorised path kernels
+        self.open_mask = beadtools.atom_mask(self.natoms, self.open_paths)
+        self.dist_mask = np.logical_not(beadtools.atom_mask(self.natoms, self.bosons))
+
         dself = dd(self)
 
         # stores a reference to the bound beads and ensemble objects
@@ -211,16 +216,15 @@ class NormalModes(dobject):
         dd(self.beads).q.add_synchro(sync_q)
         dd(self.beads).p.add_synchro(sync_p)
 
-        # also within the "atomic" interface to beads
-        for b in range(self.nbeads):
-            dd(self.beads._blist[b]).q._func = {
-                "qnm": (lambda: self.transform.nm2b(dstrip(self.qnm)))
-            }
-            dd(self.beads._blist[b]).p._func = {
-                "pnm": (lambda: self.transform.nm2b(dstrip(self.pnm)))
-            }
-            dd(self.beads._blist[b]).q.add_synchro(sync_q)
-            dd(self.beads._blist[b]).p.add_synchro(sync_p)
+        # also within the "atomic" interface to beads, for the replicas that
+        # have already been materialised (the others inherit from beads.q/p)
+        for atoms in self.beads._blist:
+            if atoms is None:
+                continue
+            dd(atoms).q._func = {"qnm": (lambda: self.transform.nm2b(dstrip(self.qnm)))}
+            dd(atoms).p._func = {"pnm": (lambda: self.transform.nm2b(dstrip(self.pnm)))}
+            dd(atoms).q.add_synchro(sync_q)
+            dd(atoms).p.add_synchro(sync_p)
 
         # finally, we mark the beads as those containing the set positions
         dd(self.beads).q.update_man()
@@ -369,7 +373,7 @@ class NormalModes(dobject):
             name="fspringnm",
             value=np.zeros((self.nbeads, 3 * self.natoms), float),
             func=self.get_fspringnm,
-            dependencies=[dself.qnm, dself.omegak, dd(self.beads).m3],
+            dependencies=[dself.qnm, dself.omegak, dself.o_omegak, dd(self.beads).m3],
         )
 
         # spring forces on beads, transformed from normal modes
@@ -384,7 +388,13 @@ class NormalModes(dobject):
     def get_fspringnm(self):
         """Returns the spring force calculated in NM representation."""
 
-        return -self.beads.m3 * self.omegak[:, np.newaxis] ** 2 * self.qnm
+        return beadtools.spring_force(
+            self.qnm,
+            self.beads.m,
+            self.omegak2,
+            self.open_mask,
+            dstrip(self.o_omegak) ** 2,
+        )
 
     def get_vspring(self):
         """Returns the spring energy calculated in NM representation for distinguishable particles.
@@ -396,43 +406,23 @@ class NormalModes(dobject):
             return 0.0
 
         if len(self.bosons) == 0:
-            sqnm = dstrip(self.qnm) * dstrip(self.beads.sm3)
-            q2 = (sqnm ** 2).sum(axis=1)
-
-            vspring = (self.omegak2 * q2).sum()
-
-            for j in self.open_paths:
-                vspring += (
-                    self.beads.m[j]
-                    * (self.o_omegak ** 2 - self.omegak ** 2)
-                    * (
-                        self.qnm[:, 3 * j] ** 2
-                        + self.qnm[:, 3 * j + 1] ** 2
-                        + self.qnm[:, 3 * j + 2] ** 2
-                    )
-                ).sum()
-
-            return vspring * 0.5
+            return beadtools.spring_energy(
+                self.qnm,
+                self.beads.m,
+                self.omegak2,
+                self.open_mask,
+                dstrip(self.o_omegak) ** 2,
+            )
 
         elif len(self.bosons) is self.natoms:
             return self.vspring_and_fspring_B[0]
         else:
             # Sum over only those particles who are distinguishable.
-            vspring = 0.0
-
-            notbosons = list(set(range(self.natoms)) - set(self.bosons))
-            for j in notbosons:
-                vspring += (
-                    self.beads.m[j]
-                    * self.omegak ** 2
-                    * (
-                        self.qnm[:, 3 * j] ** 2
-                        + self.qnm[:, 3 * j + 1] ** 2
-                        + self.qnm[:, 3 * j + 2] ** 2
-                    )
-                ).sum()
+            vspring = beadtools.spring_energy(
+                self.qnm, self.beads.m, self.omegak2, select=self.dist_mask
+            )
 
-            return vspring * 0.5 + self.vspring_and_fspring_B[0]
+            return vspring + self.vspring_and_fspring_B[0]
 
     def get_omegan(self):
         """Returns the effective vibrational frequency for the interaction
@@ -694,16 +684,9 @@ class NormalModes(dobject):
     def get_dynm3(self):
         """Returns an array with the dynamical masses of individual atoms in the normal modes representation."""
 
-        dm3 = np.zeros(self.beads.m3.shape, float)
-        for b in range(self.nbeads):
-            dm3[b] = self.beads.m3[b] * self.nm_factor[b]
-
-        # dynamical masses for the open paths
-        for j in self.open_paths:
-            for a in range(3 * j, 3 * (j + 1)):
-                for k in range(1, self.nbeads):
-                    dm3[k, a] = self.beads.m3[k, a] * self.o_nm_factor[k]
-        return dm3
+        return beadtools.dynamical_masses(
+            self.beads.m3, self.nm_factor, self.open_mask, self.o_nm_factor
+        )
 
     def get_vspring_and_fspring_B(self):
         """
@@ -809,48 +792,25 @@ class NormalModes(dobject):
                     "@Normalmodes : Bosonic forces not compatible right now with the exact or Cayley propagators."
                 )
 
-            pq = np.zeros((2, self.natoms * 3), float)
             sm = dstrip(self.beads.sm3)
-            prop_pq = dstrip(self.prop_pq)
-            o_prop_pq = dstrip(self.o_prop_pq)
             pnm = dstrip(self.pnm) / sm
             qnm = dstrip(self.qnm) * sm
 
-            for k in range(1, self.nbeads):
-                pq[0, :] = pnm[k]
-                pq[1, :] = qnm[k]
-                pq = np.dot(prop_pq[k], pq)
-                qnm[k] = pq[1, :]
-                pnm[k] = pq[0, :]
-
-            for k in range(1, self.nbeads):
-                pq[0, :] = pnm[k]
-                pq[1, :] = qnm[k]
-                qnm[k] = pq[1, :]
-                pnm[k] = pq[0, :]
-
-            # now for open paths we recover the initial conditions (that have not yet been overwritten)
-            # and do open path propagation
-            pq = np.zeros(2)
-            for j in self.open_paths:
-                for a in range(3 * j, 3 * (j + 1)):
-                    for k in range(1, self.nbeads):
-                        pq[0] = self.pnm[k, a] / sm[k, a]
-                        pq[1] = self.qnm[k, a] * sm[k, a]
-                        pq = np.dot(o_prop_pq[k], pq)
-                        qnm[k, a] = pq[1]
-                        pnm[k, a] = pq[0]
+            # applies the 2x2 propagator of each internal mode to all the
+            # degrees of freedom at once. the centroid is propagated in qcstep
+            pq = dstrip(self.prop_pq)[1:, :, :, np.newaxis]
+            if self.open_mask.any():
+                # open paths have their own propagator
+                o_pq = dstrip(self.o_prop_pq)[1:, :, :, np.newaxis]
+                pq = np.where(np.repeat(self.open_mask, 3), o_pq, pq)
+            pk, qk = pnm[1:], qnm[1:]
+            pnm[1:], qnm[1:] = (
+                pq[:, 0, 0] * pk + pq[:, 0, 1] * qk,
+                pq[:, 1, 0] * pk + pq[:, 1, 1] * qk,
+            )
+
             self.pnm = pnm * sm
             self.qnm = qnm / sm
-            # pq = np.zeros((2,self.natoms*3),float)
-            # sm = dstrip(self.beads.sm3)[0]
-            # prop_pq = dstrip(self.prop_pq)
-            # for k in range(1,self.nbeads):
-            #   pq[0,:] = dstrip(self.pnm)[k]/sm
-            #   pq[1,:] = dstrip(self.qnm)[k]*sm
-            #   pq = np.dot(prop_pq[k],pq)
-            #   self.qnm[k] = pq[1,:]/sm
-            #   self.pnm[k] = pq[0,:]*sm
 
     def get_kins(self):
         """Gets the MD kinetic energy for all the normal modes.
@@ -860,10 +820,7 @@ class NormalModes(dobject):
 
         """
         # include the partially adiabatic CMD mass scaling
-        pnm = dstrip(self.pnm) / dstrip(self.beads.sm3)
-        kmd = 0.5 * (pnm ** 2).sum(axis=1) / dstrip(self.nm_factor)
-
-        return kmd
+        return beadtools.kinetic_energies(self.pnm, self.beads.m3, self.nm_factor)
 
     def get_kin(self):
         """Gets the total MD kinetic energy.
@@ -887,22 +844,4 @@ class NormalModes(dobject):
            The sum of the MD kinetic stress tensor contributions from each NM.
         """
 
-        kmd = np.zeros((3, 3), float)
-        sm = dstrip(self.beads.sm3[0])
-        pnm = dstrip(self.pnm)
-        nmf = dstrip(self.nm_factor)
-
-        for b in range(self.nbeads):
-            sp = pnm[b] / sm  # mass-scaled momentum of b-th NM
-
-            for i in range(3):
-                for j in range(3):
-                    # computes the outer product of the p of various normal modes
-                    # singling out Cartesian components to build the tensor
-                    # also takes care of the possibility of having non-RPMD masses
-                    kmd[i, j] += (
-                        np.dot(sp[i : 3 * self.natoms : 3], sp[j : 3 * self.natoms : 3])
-                        / nmf[b]
-                    )
-
-        return kmd
+        return beadtools.kinetic_stress(self.pnm, self.beads.m, self.nm_factor)
@@ -10,6 +10,10 @@ and the restart files.
 
 
 import os
+import queue
+import threading
+import time
+from copy import copy
 
 import numpy as np
 
@@ -30,25 +34,178 @@ __all__ = [
     "CheckpointOutput",
     "OutputList",
     "OutputMaker",
+    "OutputWriter",
     "BaseOutput",
 ]
 
 
 class OutputList(list):
-    """A simple decorated list to save the output prefix and bring it
-    back to the initialization phase of the simulation"""
+    """A simple decorated list to save the output prefix, and the options of
+    the output pipeline, and bring them back to the initialization phase of
+    the simulation"""
 
-    def __init__(self, prefix, olist):
+    def __init__(self, prefix, olist, queue=0, backpressure="block", fsync=0.0):
         super(OutputList, self).__init__(olist)
         self.prefix = prefix
+        self.queue = queue
+        self.backpressure = backpressure
+        self.fsync = fsync
+
+
+class OutputWriter(object):
+    """Writes out the outputs of a simulation after each step.
+
+    Each output first takes a snapshot of the data it has to write out, which
+    must be done in the main loop, as the state of the simulation changes at
+    the next step. If the queue size is zero, the snapshots are then written
+    out straight away. Otherwise they are put in a bounded queue, and a single
+    persistent thread formats and writes them, in the order they were taken,
+    so that the MD loop does not wait for the file system.
+
+    Attributes:
+       queue: The maximum number of snapshots waiting to be written out.
+       backpressure: What to do when the queue is full. "block" waits for
+          the writer to catch up, "drop" discards the snapshot.
+       pool: An optional WorkerPool, on which the snapshots of the different
+          outputs are taken concurrently, which is needed when they trigger
+          force evaluations in multi-system runs.
+       ndropped: The number of snapshots that have been discarded.
+    """
+
+    def __init__(self, queue=0, backpressure="block", pool=None):
+        """Initializes OutputWriter.
+
+        Args:
+           queue: The maximum number of snapshots waiting to be written out.
+              If zero, the outputs are written out synchronously.
+           backpressure: Either "block" or "drop".
+           pool: A WorkerPool on which the snapshots are taken, or None.
+        """
+
+        if backpressure not in ["block", "drop"]:
+            raise ValueError("Invalid backpressure policy " + str(backpressure))
+        self.queue = queue
+        self.backpressure = backpressure
+        self.pool = pool
+        self.ndropped = 0
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        """Starts the writer thread, if the outputs are queued."""
+
+        if self.queue > 0 and self._thread is None:
+            self._queue = queue.Queue(self.queue)
+            self._thread = threading.Thread(target=self._loop, name="OutputWriter")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _loop(self):
+        """Writes out the queued snapshots until it gets a None."""
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    o, snap = item
+                    o.emit(snap)
+            except Exception as err:
+                # streams are closed under our feet during a soft exit
+                if not softexit.triggered:
+                    self._error = err
+            finally:
+                self._queue.task_done()
+
+    def _check(self):
+        """Raises in the main thread the errors of the writer thread."""
+
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise err
+
+    def snapshots(self, outputs):
+        """Takes the snapshots of the outputs that are due at this step."""
+
+        if self.pool is None:
+            return [o.snapshot() for o in outputs]
+
+        # must use multi-threading to avoid blocking in multi-system runs with WTE
+        return self.pool.run([(o.snapshot, {}) for o in outputs])
+
+    def write(self, outputs):
+        """Writes out, or queues for writing, the outputs due at this step.
+
+        Args:
+           outputs: A list of output objects.
+        """
+
+        self._check()
+        for o, snap in zip(outputs, self.snapshots(outputs)):
+            if snap is None:
+                continue
+            if self._thread is None:
+                o.emit(snap)
+            elif self.backpressure == "drop":
+                try:
+                    self._queue.put_nowait((o, snap))
+                except queue.Full:
+                    self.ndropped += 1
+                    warning(
+                        "Output queue full, dropping a frame of " + o.filename,
+                        verbosity.medium,
+                    )
+            else:
+                while True:
+                    try:
+                        # a timeout, so that main can still receive signals
+                        self._queue.put((o, snap), timeout=2.0)
+                        break
+                    except queue.Full:
+                        self._check()
+
+    def drain(self, timeout=None):
+        """Waits until the queued snapshots have been written out.
+
+        Args:
+           timeout: The maximum time to wait for, in seconds.
+        """
+
+        if self._thread is None:
+            return
+        tstart = time.time()
+        while self._queue.unfinished_tasks > 0 and self._thread.is_alive():
+            if timeout is not None and time.time() - tstart > timeout:
+                break
+            time.sleep(1e-3)
+
+    def stop(self):
+        """Writes out the queued snapshots and stops the writer thread."""
+
+        if self._thread is not None:
+            self.drain()
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check()
+
+    def softexit(self):
+        """Emergency call when i-pi must exit quickly. Gives the writer some
+        time to write out the pending snapshots before the streams are
+        closed."""
+
+        self.drain(timeout=10.0)
 
 
 class OutputMaker(dobject):
     """ Class to create floating outputs with an appropriate prefix """
 
-    def __init__(self, prefix="", f_start=False):
+    def __init__(self, prefix="", f_start=False, fsync=0.0):
         self.prefix = prefix
         self.f_start = f_start
+        self.fsync = fsync
 
     def bind(self, system):
 
@@ -59,6 +216,7 @@ class OutputMaker(dobject):
         if self.prefix != "":
             filename = self.prefix + "." + filename
         rout = BaseOutput(filename)
+        rout.fsync = self.fsync
         if mode is None:
             if self.f_start:
                 mode = "w"
@@ -69,13 +227,22 @@ class OutputMaker(dobject):
 
 
 class BaseOutput(object):
-    """Base class for outputs. Deals with flushing upon close and little more """
+    """Base class for outputs. Deals with flushing upon close and little more
+
+    Attributes:
+       fsync: The minimum time, in seconds, between two commits of a stream
+          to disk. The flushes that come earlier only pass the data to the
+          operating system. If zero, the streams are committed at each flush,
+          if negative never.
+    """
 
     def __init__(self, filename="out"):
         """Initializes the class"""
 
         self.filename = filename
         self.out = None
+        self.fsync = 0.0
+        self._synced = {}
 
     def softexit(self):
         """Emergency call when i-pi must exit quickly"""
@@ -105,8 +272,22 @@ class BaseOutput(object):
         """Tries hard to flush the output stream"""
 
         if self.out is not None:
-            self.out.flush()
-            os.fsync(self.out)
+            self.sync(self.out)
+
+    def sync(self, stream):
+        """Flushes a stream, and commits it to disk following the fsync policy.
+
+        Args:
+           stream: The stream to be flushed.
+        """
+
+        stream.flush()
+        if self.fsync < 0:
+            return
+        now = time.time()
+        if self.fsync == 0 or now - self._synced.get(id(stream), 0.0) >= self.fsync:
+            os.fsync(stream)
+            self._synced[id(stream)] = now
 
     def remove(self):
         """Removes (temporary) output"""
@@ -208,6 +389,18 @@ class PropertyOutput(BaseOutput):
 
         Note that properties are outputted using the same format as for the
         output to the xml checkpoint files, as specified in io_xml.
+        """
+
+        snap = self.snapshot()
+        if snap is not None:
+            self.emit(snap)
+
+    def snapshot(self):
+        """Computes the properties that must be output at this step.
+
+        Returns:
+           A list with the values of the properties, in the output units, or
+           None if nothing must be output at this step.
 
         Raises:
            KeyError: Raised if one of the properties specified in the output list
@@ -215,11 +408,11 @@ class PropertyOutput(BaseOutput):
         """
 
         if softexit.triggered:
-            return  # don't write if we are about to exit!
+            return None  # don't write if we are about to exit!
 
         if not (self.system.simul.step + 1) % self.stride == 0:
-            return
-        self.out.write("  ")
+            return None
+        values = []
         for what in self.outlist:
             try:
                 quantity, dimension, unit = self.system.properties[what]
@@ -227,6 +420,20 @@ class PropertyOutput(BaseOutput):
                     quantity = unit_to_user(dimension, unit, quantity)
             except KeyError:
                 raise KeyError(what + " is not a recognized property")
+            if hasattr(quantity, "__len__"):
+                quantity = np.copy(quantity)
+            values.append(quantity)
+        return values
+
+    def emit(self, values):
+        """Writes out a line of properties.
+
+        Args:
+           values: The values returned by snapshot().
+        """
+
+        self.out.write("  ")
+        for quantity in values:
             if not hasattr(quantity, "__len__"):
                 self.out.write(write_type(float, quantity) + "   ")
             else:
@@ -299,6 +506,8 @@ class TrajectoryOutput(BaseOutput):
         self.cell_units = cell_units
         self.out = None
         self.nout = 0
+        self.fsync = 0.0
+        self._synced = {}
 
     def bind(self, system, mode="w"):
         """Binds output proxy to System object.
@@ -384,10 +593,45 @@ class TrajectoryOutput(BaseOutput):
     def write(self):
         """Writes out the required trajectories."""
 
+        snap = self.snapshot()
+        if snap is not None:
+            self.emit(snap)
+
+    def snapshot(self):
+        """Copies the trajectory data that must be output at this step.
+
+        Returns:
+           A dictionary with the data and the step, the atom names and the
+           cell they refer to, or None if nothing must be output at this step.
+        """
+
         if softexit.triggered:
-            return  # don't write if we are about to exit!
+            return None  # don't write if we are about to exit!
         if not (self.system.simul.step + 1) % self.stride == 0:
-            return
+            return None
+
+        data, dimension, units = self.system.trajs[
+            self.what
+        ]  # gets the trajectory data that must be printed
+        if isinstance(data, np.ndarray):
+            data = dstrip(data).copy()
+        else:
+            data = copy(data)
+        return {
+            "data": data,
+            "dimension": dimension,
+            "units": units,
+            "step": self.system.simul.step,
+            "names": dstrip(self.system.beads.names).copy(),
+            "h": dstrip(self.system.cell.h).copy(),
+        }
+
+    def emit(self, snap):
+        """Writes out a frame of the trajectories.
+
+        Args:
+           snap: The dictionary returned by snapshot().
+        """
 
         doflush = False
         self.nout += 1
@@ -395,37 +639,27 @@ class TrajectoryOutput(BaseOutput):
             doflush = True
             self.nout = 0
 
-        data, dimension, units = self.system.trajs[
-            self.what
-        ]  # gets the trajectory data that must be printed
+        data = snap["data"]
+        frame = dict(
+            format=self.format,
+            dimension=snap["dimension"],
+            units=snap["units"],
+            cell_units=self.cell_units,
+            flush=doflush,
+            step=snap["step"],
+            names=snap["names"],
+            h=snap["h"],
+        )
         # quick-and-dirty way to check if a trajectory is "global" or per-bead
         # Checks to see if there is a list of files or just a single file.
         if hasattr(self.out, "__getitem__"):
             if self.ibead < 0:
                 for b in range(len(self.out)):
                     if self.out[b] is not None:
-                        self.write_traj(
-                            data,
-                            self.what,
-                            self.out[b],
-                            b,
-                            format=self.format,
-                            dimension=dimension,
-                            units=units,
-                            cell_units=self.cell_units,
-                            flush=doflush,
-                        )
+                        self.write_traj(data, self.what, self.out[b], b, **frame)
             elif self.ibead < len(self.out):
                 self.write_traj(
-                    data,
-                    self.what,
-                    self.out[self.ibead],
-                    self.ibead,
-                    format=self.format,
-                    dimension=dimension,
-                    units=units,
-                    cell_units=self.cell_units,
-                    flush=doflush,
+                    data, self.what, self.out[self.ibead], self.ibead, **frame
                 )
             else:
                 raise ValueError(
@@ -435,17 +669,7 @@ class TrajectoryOutput(BaseOutput):
                     + self.what
                 )
         else:
-            self.write_traj(
-                data,
-                getkey(self.what),
-                self.out,
-                b=0,
-                format=self.format,
-                dimension=dimension,
-                units=units,
-                cell_units=self.cell_units,
-                flush=doflush,
-            )
+            self.write_traj(data, getkey(self.what), self.out, b=0, **frame)
 
     def write_traj(
         self,
@@ -458,6 +682,9 @@ class TrajectoryOutput(BaseOutput):
         units="automatic",
         cell_units="automatic",
         flush=True,
+        step=None,
+        names=None,
+        h=None,
     ):
         """Prints out a frame of a trajectory for the specified quantity and bead.
 
@@ -469,19 +696,24 @@ class TrajectoryOutput(BaseOutput):
            cell_units: The units used to specify the cell parameters.
            flush: A boolean which specifies whether to flush the output buffer
               after each write to file or not.
+           step, names, h: The step, the atom names and the cell matrix of the
+              frame. Default to the current ones of the system.
         """
 
+        if step is None:
+            step = self.system.simul.step
+        if names is None:
+            names = self.system.beads.names
+        if h is None:
+            h = self.system.cell.h
+
         key = getkey(what)
         if key in ["extras"]:
-            stream.write(
-                " #*EXTRAS*# Step:  %10d  Bead:  %5d  \n"
-                % (self.system.simul.step + 1, b)
-            )
+            stream.write(" #*EXTRAS*# Step:  %10d  Bead:  %5d  \n" % (step + 1, b))
             stream.write(data[b])
             stream.write("\n")
             if flush:
-                stream.flush()
-                os.fsync(stream)
+                self.sync(stream)
             return
         elif getkey(what) in [
             "positions",
@@ -491,15 +723,15 @@ class TrajectoryOutput(BaseOutput):
             "momenta",
         ]:
             fatom = Atoms(self.system.beads.natoms)
-            fatom.names[:] = self.system.beads.names
+            fatom.names[:] = names
             fatom.q[:] = data[b]
         else:
             fatom = Atoms(self.system.beads.natoms)
-            fatom.names[:] = self.system.beads.names
+            fatom.names[:] = names
             fatom.q[:] = data
 
         fcell = Cell()
-        fcell.h = self.system.cell.h
+        fcell.h = h
 
         if units == "":
             units = "automatic"
@@ -510,15 +742,14 @@ class TrajectoryOutput(BaseOutput):
             fatom,
             fcell,
             stream,
-            title=("Step:  %10d  Bead:   %5d " % (self.system.simul.step + 1, b)),
+            title=("Step:  %10d  Bead:   %5d " % (step + 1, b)),
             key=key,
             dimension=dimension,
             units=units,
             cell_units=cell_units,
         )
         if flush:
-            stream.flush()
-            os.fsync(stream)
+            self.sync(stream)
 
 
 class CheckpointOutput(dobject):
@@ -602,6 +833,22 @@ class CheckpointOutput(dobject):
               stored before writing the checkpoint file.
         """
 
+        snap = self.snapshot(store)
+        if snap is not None:
+            self.emit(snap)
+
+    def snapshot(self, store=True):
+        """Prepares the checkpoint file that must be written out at this step.
+
+        Args:
+           store: A boolean saying whether the state of the system should be
+              stored before writing the checkpoint file.
+
+        Returns:
+           A tuple with the function used to open the file, its name and its
+           content, or None if no checkpoint must be written at this step.
+        """
+
         if self._storing:
             info(
                 "@ CHECKPOINT: Write called while storing. Force re-storing",
@@ -610,7 +857,7 @@ class CheckpointOutput(dobject):
             self.store()
 
         if not (self.simul.step + 1) % self.stride == 0:
-            return
+            return None
 
         # function to use to open files
         open_function = open_backup
@@ -628,8 +875,18 @@ class CheckpointOutput(dobject):
             self.store()
             self.status.step.store(self.simul.step + 1)
 
-        with open_function(filename, "w") as check_file:
-            check_file.write(self.status.write(name="simulation"))
-
         # Do not use backed up file open on subsequent writes.
         self._continued = True
+
+        return open_function, filename, self.status.write(name="simulation")
+
+    def emit(self, snap):
+        """Writes out a checkpoint file.
+
+        Args:
+           snap: The tuple returned by snapshot().
+        """
+
+        open_function, filename, content = snap
+        with open_function(filename, "w") as check_file:
+            check_file.write(content)
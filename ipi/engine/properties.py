@@ -13,6 +13,7 @@ from ipi.utils.messages import verbosity, info, warning
 from ipi.utils.depend import *
 from ipi.utils.units import Constants, unit_to_internal
 from ipi.utils.mathtools import logsumlog, h2abc_deg
+from ipi.utils import beadtools
 from ipi.utils.io.inputs import io_xml
 from ipi.engine.atoms import *
 from ipi.engine.cell import *
@@ -1429,14 +1430,21 @@ class Properties(dobject):
             iatom = -1
             latom = atom
 
-        tkcv = np.zeros((6), float)
-        ncount = 0
-        for i in range(self.beads.natoms):
-            if atom != "" and iatom != i and latom != self.beads.names[i]:
-                continue
-
-            tkcv += self.get_kij(str(i), str(i))
-            ncount += 1
+        if atom == "":
+            mask = np.ones(self.beads.natoms, bool)
+        else:
+            mask = dstrip(self.beads.names) == latom
+            if iatom >= 0:
+                mask[iatom] = True
+        ncount = np.count_nonzero(mask)
+
+        # same as summing get_kij(i, i) over the selected atoms
+        kst = beadtools.centroid_virial(
+            self.beads.q, self.beads.qc, self.forces.f, mask
+        )
+        kst = -(kst + kst.T) / (4.0 * self.beads.nbeads)
+        kst += np.eye(3) * 0.5 * Constants.kb * self.ensemble.temp * ncount
+        tkcv = kst[[0, 1, 2, 0, 0, 1], [0, 1, 2, 1, 2, 2]]
 
         if ncount == 0:
             warning(
@@ -1588,24 +1596,7 @@ class Properties(dobject):
            A 3*3 tensor with all the components of the tensor.
         """
 
-        kst = np.zeros((3, 3), float)
-        q = dstrip(self.beads.q)
-        qc = dstrip(self.beads.qc)
-        pc = dstrip(self.beads.pc)
-        m = dstrip(self.beads.m)
-        fall = dstrip(self.forces.f + self.forces.fsc)
-        na3 = 3 * self.beads.natoms
-
-        for b in range(self.beads.nbeads):
-            for i in range(3):
-                for j in range(i, 3):
-                    kst[i, j] -= np.dot(q[b, i:na3:3] - qc[i:na3:3], fall[b, j:na3:3])
-
-        # return the CV estimator MULTIPLIED BY NBEADS -- again for consistency with the virial, kstress_MD, etc...
-        for i in range(3):
-            kst[i, i] += self.beads.nbeads * (np.dot(pc[i:na3:3], pc[i:na3:3] / m))
-
-        return kst
+        return self.cv_kstress(dstrip(self.forces.f + self.forces.fsc))
 
     def kstress_cv(self):
         """Calculates the quantum centroid virial kinetic stress tensor
@@ -1617,24 +1608,20 @@ class Properties(dobject):
            A 3*3 tensor with all the components of the tensor.
         """
 
-        kst = np.zeros((3, 3), float)
-        q = dstrip(self.beads.q)
-        qc = dstrip(self.beads.qc)
-        pc = dstrip(self.beads.pc)
-        m = dstrip(self.beads.m)
-        fall = dstrip(self.forces.f)
-        na3 = 3 * self.beads.natoms
+        return self.cv_kstress(self.forces.f)
 
-        for b in range(self.beads.nbeads):
-            for i in range(3):
-                for j in range(i, 3):
-                    kst[i, j] -= np.dot(q[b, i:na3:3] - qc[i:na3:3], fall[b, j:na3:3])
+    def cv_kstress(self, f):
+        """Centroid virial kinetic stress tensor associated with the forces f,
+        in upper triangular form.
+        """
 
+        kst = -beadtools.centroid_virial(self.beads.q, self.beads.qc, f)
         # return the CV estimator MULTIPLIED BY NBEADS -- again for consistency with the virial, kstress_MD, etc...
-        for i in range(3):
-            kst[i, i] += self.beads.nbeads * (np.dot(pc[i:na3:3], pc[i:na3:3] / m))
-
-        return kst
+        kst += np.diag(
+            np.diag(beadtools.kinetic_stress(self.beads.pc, self.beads.m))
+            * self.beads.nbeads
+        )
+        return np.triu(kst)
 
     def opening(self, bead):
         """Path opening function, used in linlin momentum distribution
@@ -12,7 +12,6 @@ choosing which properties to initialise, and which properties to output.
 
 
 import os
-import threading
 import time
 from copy import deepcopy
 
@@ -20,6 +19,7 @@ from ipi.utils.depend import depend_value, dobject, dd, dpipe
 from ipi.utils.io.inputs.io_xml import xml_parse_file
 from ipi.utils.messages import verbosity, info, warning, banner
 from ipi.utils.softexit import softexit
+from ipi.utils.workers import WorkerPool
 import ipi.engine.outputs as eoutputs
 import ipi.inputs.simulation as isimulation
 
@@ -187,7 +187,9 @@ class Simulation(dobject):
             mode = "w"
         else:
             mode = "a"
-        self.output_maker = eoutputs.OutputMaker(self.outtemplate.prefix, f_start)
+        self.output_maker = eoutputs.OutputMaker(
+            self.outtemplate.prefix, f_start, self.outtemplate.fsync
+        )
 
         for s in self.syslist:
             # binds important computation engines
@@ -208,11 +210,23 @@ class Simulation(dobject):
                 "Output filenames are not unique. Modify filename attributes."
             )
 
+        # persistent threads to step the systems and take the output snapshots
+        self.pool = WorkerPool("Step") if self.threading else None
+
+        # registered before the outputs, so that pending frames are written
+        # out before the streams are closed on soft exit
+        self.writer = eoutputs.OutputWriter(
+            self.outtemplate.queue, self.outtemplate.backpressure, self.pool
+        )
+        softexit.register_function(self.writer.softexit)
+
         self.outputs = []
         for o in self.outtemplate:
             dco = deepcopy(o)  # avoids overwriting the actual filename
             if self.outtemplate.prefix != "":
                 dco.filename = self.outtemplate.prefix + "." + o.filename
+            if not type(dco) is eoutputs.CheckpointOutput:
+                dco.fsync = self.outtemplate.fsync
             if (
                 type(dco) is eoutputs.CheckpointOutput
             ):  # checkpoints are output per simulation
@@ -265,27 +279,12 @@ class Simulation(dobject):
         # registers the softexit routine
         softexit.register_function(self.softexit)
         softexit.start(self.ttime)
+        self.writer.start()
 
         # prints inital configuration -- only if we are not restarting
         if self.step == 0:
             self.step = -1
-            # must use multi-threading to avoid blocking in multi-system runs with WTE
-            if self.threading:
-                stepthreads = []
-                for o in self.outputs:
-                    st = threading.Thread(target=o.write, name=o.filename)
-                    st.daemon = True
-                    st.start()
-                    stepthreads.append(st)
-
-                for st in stepthreads:
-                    while st.isAlive():
-                        # This is necessary as join() without timeout prevents main from receiving signals.
-                        st.join(2.0)
-            else:
-                for o in self.outputs:
-                    o.write()  # threaded output seems to cause random hang-ups. should make things properly thread-safe
-
+            self.writer.write(self.outputs)
             self.step = 0
 
         steptime = 0.0
@@ -296,6 +295,8 @@ class Simulation(dobject):
         # tqtime = 0.0
         # tttime = 0.0
         ttot = 0.0
+        ttot2 = 0.0  # to report the fluctuations of the step time
+        twait = 0.0  # time spent waiting for the slowest system
         # main MD loop
         for self.step in range(self.step, self.tsteps):
             # stores the state before doing a step.
@@ -309,23 +310,13 @@ class Simulation(dobject):
             self.chk.store()
 
             if self.threading:
-                stepthreads = []
-                # steps through all the systems
-                for s in self.syslist:
-                    # creates separate threads for the different systems
-                    st = threading.Thread(
-                        target=s.motion.step, name=s.prefix, kwargs={"step": self.step}
-                    )
-                    st.daemon = True
-                    stepthreads.append(st)
-
-                for st in stepthreads:
-                    st.start()
-
-                for st in stepthreads:
-                    while st.isAlive():
-                        # This is necessary as join() without timeout prevents main from receiving signals.
-                        st.join(2.0)
+                # steps through all the systems, each on its own worker thread
+                self.pool.run(
+                    [(s.motion.step, {"step": self.step}) for s in self.syslist]
+                )
+                twait += max(self.pool.times) - sum(self.pool.times) / len(
+                    self.pool.times
+                )
             else:
                 for s in self.syslist:
                     s.motion.step(step=self.step)
@@ -343,24 +334,11 @@ class Simulation(dobject):
                 # Don't write if we are about to exit.
                 break
 
-            if self.threading:
-                stepthreads = []
-                for o in self.outputs:
-                    st = threading.Thread(target=o.write, name=o.filename)
-                    st.daemon = True
-                    st.start()
-                    stepthreads.append(st)
-
-                for st in stepthreads:
-                    while st.isAlive():
-                        # This is necessary as join() without timeout prevents main from receiving signals.
-                        st.join(2.0)
-            else:
-                for o in self.outputs:
-                    o.write()
+            self.writer.write(self.outputs)
 
             steptime += time.time()
             ttot += steptime
+            ttot2 += steptime ** 2
             cstep += 1
 
             if (
@@ -368,12 +346,21 @@ class Simulation(dobject):
                 or (verbosity.medium and self.step % 100 == 0)
                 or (verbosity.low and self.step % 1000 == 0)
             ):
+                tmean = ttot / cstep
+                tstd = max(ttot2 / cstep - tmean ** 2, 0.0) ** 0.5
                 info(
-                    " # Average timings at MD step % 7d. t/step: %10.5e"
-                    % (self.step, ttot / cstep)
+                    " # Average timings at MD step % 7d. t/step: %10.5e +/- %10.5e"
+                    % (self.step, tmean, tstd)
                 )
+                if self.threading:
+                    info(
+                        " # Average wait for the slowest system. t/step: %10.5e"
+                        % (twait / cstep)
+                    )
                 cstep = 0
                 ttot = 0.0
+                ttot2 = 0.0
+                twait = 0.0
                 # info(" # MD diagnostics: V: %10.5e    Kcv: %10.5e   Ecns: %10.5e" %
                 #     (self.properties["potential"], self.properties["kinetic_cv"], self.properties["conserved"] ) )
 
@@ -385,4 +372,13 @@ class Simulation(dobject):
                 info(" # Wall clock time expired! Bye bye!", verbosity.low)
                 break
 
+        self.writer.stop()
+        if self.pool is not None:
+            self.pool.stop()
+        if self.writer.ndropped > 0:
+            warning(
+                "%d output frames were dropped because the output queue was full"
+                % self.writer.ndropped,
+                verbosity.low,
+            )
         self.rollback = False
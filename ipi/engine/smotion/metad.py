@@ -7,6 +7,8 @@ Algorithms implemented by Robert Meissner and Riccardo Petraglia, 2016
 # i-PI Copyright (C) 2014-2016 i-PI developers
 # See the "licenses" directory for full license information.
 
+import numpy as np
+
 from ipi.engine.smotion import Smotion
 from ipi.utils.depend import *
 
@@ -31,13 +33,16 @@ class MetaDyn(Smotion):
         self.metaff = metaff
 
     def step(self, step=None):
-        """Updates metad bias."""
+        """Updates metad bias.
+
+        The walkers that share a metadynamics forcefield are passed to it in
+        a single update. Then, only the bias components of that forcefield are
+        tainted, and they are queued for all the systems before any of them is
+        needed, so that they can be re-evaluated together.
+        """
 
+        walkers = {}
         for s in self.syslist:
-            # Karen 07.05.2020: the line below causes the complaint "variable not used",
-            # but I'm not sure that deleting it doesn't change the behavior, because
-            # calling forces might cause their recalculation.
-            oldf = dstrip(s.forces.f).copy()
             for ik, bc in enumerate(s.ensemble.bcomp):
                 k = bc.ffield
                 if k not in self.metaff:
@@ -53,10 +58,24 @@ class MetaDyn(Smotion):
                     )
                 if s.ensemble.bweights[ik] == 0:
                     continue  # do not put metad bias on biases with zero weights (useful to do remd+metad!)
-                fmtd = f.mtd_update(pos=s.beads.qc, cell=s.cell.h)
-                if fmtd:  # if metadyn has updated, then we must recompute forces.
+                walkers.setdefault(k, (f, []))[1].append(s)
+
+        updated = []
+        for k, (f, slist) in walkers.items():
+            fmtd = f.mtd_update(
+                pos=np.asarray([dstrip(s.beads.qc) for s in slist]),
+                cell=np.asarray([dstrip(s.cell.h) for s in slist]),
+            )
+            if fmtd:  # if metadyn has updated, then we must recompute forces.
+                for s in slist:
                     # hacky but cannot think of a better way: we must manually taint *just* that component
                     for fc in s.ensemble.bias.mforces:
                         if fc.ffield == k:
                             for fb in fc._forces:
                                 dd(fb).ufvx.taint()
+                    if s not in updated:
+                        updated.append(s)
+
+        # only the tainted components are queued
+        for s in updated:
+            s.ensemble.bias.queue()
@@ -13,8 +13,10 @@ import time
 
 from ipi.engine.smotion import Smotion
 from ipi.engine.ensembles import ensemble_swap
+from ipi.engine.barostats import Barostat, BaroBZP, BaroMTK
 from ipi.utils.depend import *
 from ipi.utils.messages import verbosity, info
+from ipi.utils.units import Constants
 
 
 __all__ = ["ReplicaExchange"]
@@ -46,18 +48,42 @@ def gle_scale(sys, scale):
     motion_scale(sys.motion, scale)
 
 
+def component_pot(forces, k, weighted=True):
+    """Total potential of the k-th component of a Forces object, expanded
+    to the full ring polymer and including the MTS weights, consistently
+    with the way it enters the total potential energy."""
+
+    fc = forces.mforces[k]
+    pot = fc.mts_weights.sum() * forces.mrpc[k].b2tob1(dstrip(fc.pots)).sum()
+    if weighted:
+        pot *= fc.weight
+    return pot
+
+
 class ReplicaExchange(Smotion):
     """Replica exchange routine.
 
     Attributes:
         every: on which steps REMD should be performed
+        swapmode: how exchanges are attempted. "sequential" tries all pairs
+            by actually swapping the ensembles, "pairs" tries the same pairs
+            from a matrix of the replica energies in all ensembles, "neighbour"
+            alternates between even and odd neighbours along the ladder,
+            "gibbs" does multiple sweeps of heat-bath swaps between random pairs
         exchange:
             temperature: activate temperature replica exchange
             hamiltonian: activate hamiltonian replica exchange
             bias: activate hamiltonian replica exchange ***not yet implemented
     """
 
-    def __init__(self, stride=1.0, repindex=None, krescale=True, swapfile="PARATEMP"):
+    def __init__(
+        self,
+        stride=1.0,
+        repindex=None,
+        krescale=True,
+        swapfile="PARATEMP",
+        swapmode="sequential",
+    ):
         """Initialises REMD.
 
         Args:
@@ -70,6 +96,7 @@ class ReplicaExchange(Smotion):
         self.rescalekin = krescale
         # replica exchange options
         self.stride = stride
+        self.swapmode = swapmode
 
         if repindex is None:
             self.repindex = np.zeros(0, int)
@@ -90,8 +117,195 @@ class ReplicaExchange(Smotion):
                     "Size of replica index does not match number of systems replicas"
                 )
 
+        if self.swapmode != "sequential":
+            # the energy matrix assumes that the ensemble probability can be
+            # split into terms with a known dependence on the ensemble parameters
+            nh = len(self.syslist[0].ensemble.hweights)
+            nb = len(self.syslist[0].ensemble.bweights)
+            for s in self.syslist:
+                ens = s.ensemble
+                if len(ens.hweights) != nh or len(ens.bweights) != nb:
+                    raise ValueError(
+                        "Cannot exchange ensembles that are described by different forces"
+                    )
+                if len(s.nm.bosons) > 0 or (s.nm.nbeads > 1 and s.nm.mode != "rpmd"):
+                    raise ValueError(
+                        "REMD swap mode '%s' requires distinguishable particles and RPMD normal modes"
+                        % self.swapmode
+                    )
+                # the only extended Lagrangian terms that can be handled are
+                # those of barostats with a P V elastic energy
+                baro = getattr(s.motion, "barostat", None)
+                known = []
+                if type(baro) in [Barostat, BaroBZP, BaroMTK]:
+                    known = [dd(baro).pot, dd(baro).cell_jacobian, dd(baro).kin]
+                for x in ens._xlpot + ens._xlkin:
+                    if not any(x is k for k in known):
+                        raise ValueError(
+                            "REMD swap mode '%s' cannot handle the extended Lagrangian term '%s'"
+                            % (self.swapmode, x._name)
+                        )
+
         self.sf = self.output_maker.get_output(self.swapfile)
 
+    def swap_ensembles(self, i, j):
+        """Exchanges the ensembles of replicas i and j, rescaling the momenta
+        and swapping the barostat reference cells. Calling it twice restores
+        the initial state."""
+
+        sl = self.syslist
+        ti = sl[i].ensemble.temp
+        tj = sl[j].ensemble.temp
+
+        ensemble_swap(sl[i].ensemble, sl[j].ensemble)
+
+        # it is generally a good idea to rescale the kinetic energies,
+        # which means that the exchange is done only relative to the potential energy part.
+        if self.rescalekin:
+            # also rescales the velocities -- should do the same with cell velocities
+            sl[i].beads.p *= np.sqrt(tj / ti)
+            sl[j].beads.p *= np.sqrt(ti / tj)
+            try:  # if motion has a barostat, and barostat has a momentum, does the swap
+                # also note that the barostat has a hidden T dependence inside the mass, so
+                # as a matter of fact <p^2> \propto T^2
+                sl[i].motion.barostat.p *= tj / ti
+                sl[j].motion.barostat.p *= ti / tj
+            except AttributeError:
+                pass
+
+        try:  # if motion has a barostat, and the barostat has a reference cell, does the swap
+            # as that when there are very different pressures, the cell should reflect the
+            # pressure/temperature dependence. this also changes the barostat conserved quantities
+            bjh = dstrip(sl[j].motion.barostat.h0.h).copy()
+            sl[j].motion.barostat.h0.h[:] = sl[i].motion.barostat.h0.h[:]
+            sl[i].motion.barostat.h0.h[:] = bjh
+        except AttributeError:
+            pass
+
+    def energy_matrix(self):
+        """Returns the matrix of the log-probabilities lp[i, a] of the
+        configuration of replica i in the ensemble of replica a, as it
+        would be after swapping the two ensembles (and rescaling the
+        momenta). Each replica is evaluated once, in its current ensemble."""
+
+        sl = self.syslist
+        nrep = len(sl)
+        temps = np.asarray([s.ensemble.temp for s in sl], float)
+        hw = np.asarray([dstrip(s.ensemble.hweights) for s in sl], float)
+        bw = np.asarray([dstrip(s.ensemble.bweights) for s in sl], float)
+        uh = np.zeros(hw.shape)
+        ub = np.zeros(bw.shape)
+        pext = np.asarray([s.ensemble.pext for s in sl], float)
+        kin = np.zeros(nrep)
+        spring = np.zeros(nrep)
+        nbeads = np.zeros(nrep)
+        # barostat terms. the cell jacobian is proportional to T
+        pv = np.zeros(nrep)
+        bkin = np.zeros(nrep)
+        bjac = np.zeros(nrep)
+
+        for i, s in enumerate(sl):
+            for k in range(hw.shape[1]):
+                if s.forces.mforces[k].weight != 0:
+                    uh[i, k] = component_pot(s.forces, k)
+            # only the explicit bias components, the ones following them
+            # reproduce the hamiltonian weights
+            for k in range(bw.shape[1]):
+                if bw[:, k].any():
+                    ub[i, k] = component_pot(s.ensemble.bias, k, weighted=False)
+            kin[i] = s.nm.kin
+            spring[i] = s.nm.vspring
+            nbeads[i] = s.beads.nbeads
+            if len(s.ensemble._xlpot) > 0:
+                baro = s.motion.barostat
+                if type(baro) is not Barostat:
+                    pv[i] = s.cell.V * s.beads.nbeads
+                bkin[i] = baro.kin
+                bjac[i] = baro.cell_jacobian
+
+        # ratio between the temperature of the new ensemble and the current one.
+        # the spring constant goes as T^2, the kinetic energy as T, if rescaled,
+        # and so does the barostat one (its mass is proportional to T)
+        tratio = temps[np.newaxis, :] / temps[:, np.newaxis]
+        eham = np.dot(uh, hw.T) + np.dot(ub, bw.T) + np.outer(pv, pext)
+        eham += spring[:, np.newaxis] * tratio ** 2 + bjac[:, np.newaxis] * tratio
+        if self.rescalekin:
+            eham += (kin + bkin)[:, np.newaxis] * tratio
+        else:
+            eham += kin[:, np.newaxis] + bkin[:, np.newaxis] / tratio
+
+        return -eham / (Constants.kb * temps[np.newaxis, :] * nbeads[:, np.newaxis])
+
+    def swap_delta(self, lp, perm, i, j):
+        """Change in the log-probability when replicas i and j, holding the
+        ensembles perm[i] and perm[j] in the energy matrix lp, swap them."""
+
+        return lp[i, perm[j]] + lp[j, perm[i]] - lp[i, perm[i]] - lp[j, perm[j]]
+
+    def pairs_schedule(self, lp, perm):
+        """Tries all the pairs in the same order as the sequential exchanges."""
+
+        nrep = len(perm)
+        for i in range(nrep):
+            for j in range(i):
+                if 1.0 / self.stride < self.prng.u:
+                    continue  # tries a swap with probability 1/stride
+
+                if self.swap_delta(lp, perm, i, j) > np.log(self.prng.u):
+                    perm[i], perm[j] = perm[j], perm[i]
+                    info(
+                        " @ PT:  SWAPPING replicas % 5d and % 5d." % (i, j),
+                        verbosity.low,
+                    )
+                else:
+                    info(
+                        " @ PT:  SWAP REJECTED BETWEEN replicas % 5d and % 5d."
+                        % (i, j),
+                        verbosity.low,
+                    )
+
+        return perm
+
+    def neighbour_schedule(self, lp, perm, step):
+        """Tries swaps between neighbours along the ladder of the initial
+        ensembles, alternating between even and odd pairs every round."""
+
+        nevery = max(1, int(round(self.stride)))
+        if step % nevery != 0:
+            return perm
+
+        # replicas sorted by the index of the ensemble they hold
+        ladder = np.argsort(self.repindex)
+        parity = (step // nevery) % 2
+        i = ladder[parity:-1:2]
+        j = ladder[parity + 1 :: 2]
+        delta = lp[i, perm[j]] + lp[j, perm[i]] - lp[i, perm[i]] - lp[j, perm[j]]
+        acc = delta > np.log(self.prng.rng.random_sample(len(i)))
+        perm[i[acc]], perm[j[acc]] = perm[j[acc]], perm[i[acc]]
+
+        return perm
+
+    def gibbs_schedule(self, lp, perm):
+        """Gibbs sampling of the permutation of the ensembles: every sweep
+        tries heat-bath swaps between disjoint random pairs of replicas."""
+
+        nrep = len(perm)
+        if 1.0 / self.stride < self.prng.u:
+            return perm
+
+        for sweep in range(nrep):
+            shuffle = self.prng.rng.permutation(nrep)
+            i = shuffle[0 : nrep - 1 : 2]
+            j = shuffle[1:nrep:2]
+            delta = lp[i, perm[j]] + lp[j, perm[i]] - lp[i, perm[i]] - lp[j, perm[j]]
+            # heat-bath probability 1/(1+exp(-delta)), written so it cannot overflow
+            acc = self.prng.rng.random_sample(len(i)) < 0.5 * (
+                1.0 + np.tanh(0.5 * delta)
+            )
+            perm[i[acc]], perm[j[acc]] = perm[j[acc]], perm[i[acc]]
+
+        return perm
+
     def step(self, step=None):
         """Tries to exchange replica."""
 
@@ -101,6 +315,86 @@ class ReplicaExchange(Smotion):
         info("\nTrying to exchange replicas on STEP %d" % step, verbosity.debug)
 
         t_start = time.time()
+        if self.swapmode == "sequential":
+            fxc, t_eval, t_swap = self.sequential_step()
+        else:
+            fxc, t_eval, t_swap = self.matrix_step(step)
+
+        if fxc:  # writes out the new status
+            self.sf.write("% 10d" % (step))
+            for i in self.repindex:
+                self.sf.write(" % 5d" % (i))
+            self.sf.write("\n")
+            self.sf.force_flush()
+
+        info(
+            "# REMD step evaluated in %f (%f eval, %f swap) sec."
+            % (time.time() - t_start, t_eval, t_swap),
+            verbosity.debug,
+        )
+
+    def matrix_step(self, step):
+        """Computes all the acceptance probabilities from the energy matrix,
+        and only applies the final permutation of the ensembles."""
+
+        sl = self.syslist
+        nrep = len(sl)
+
+        t_eval = -time.time()
+        lp = self.energy_matrix()
+        t_eval += time.time()
+
+        perm = np.arange(nrep)
+        if self.swapmode == "pairs":
+            perm = self.pairs_schedule(lp, perm)
+        elif self.swapmode == "neighbour":
+            perm = self.neighbour_schedule(lp, perm, step)
+        elif self.swapmode == "gibbs":
+            perm = self.gibbs_schedule(lp, perm)
+        else:
+            raise ValueError("Unknown REMD swap mode '%s'" % self.swapmode)
+
+        moved = np.flatnonzero(perm != np.arange(nrep))
+        if len(moved) == 0:
+            return False, t_eval, 0.0
+
+        t_eval -= time.time()
+        econs = {i: sl[i].ensemble.econs for i in moved}
+        t_eval += time.time()
+
+        # applies the permutation as a sequence of exchanges. held[i] is the
+        # (initial) replica whose ensemble is currently held by replica i
+        t_swap = -time.time()
+        held = np.arange(nrep)
+        where = np.arange(nrep)
+        for i in moved:
+            if held[i] == perm[i]:
+                continue
+            j = where[perm[i]]
+            info(" @ PT:  SWAPPING replicas % 5d and % 5d." % (i, j), verbosity.low)
+            ti = sl[i].ensemble.temp
+            tj = sl[j].ensemble.temp
+            self.swap_ensembles(i, j)
+            # if we have GLE thermostats, we also have to exchange rescale the s!!!
+            gle_scale(sl[i], (tj / ti))
+            gle_scale(sl[j], (ti / tj))
+            self.repindex[i], self.repindex[j] = self.repindex[j], self.repindex[i]
+            held[i], held[j] = held[j], held[i]
+            where[held[i]], where[held[j]] = i, j
+        t_swap += time.time()
+
+        t_eval -= time.time()
+        # we just have to carry on with the swapped ensembles, but we also keep track of the changes in econs
+        for i in moved:
+            sl[i].ensemble.eens += econs[i] - sl[i].ensemble.econs
+        t_eval += time.time()
+
+        return True, t_eval, t_swap
+
+    def sequential_step(self):
+        """Tries all pairs of replicas, swapping the ensembles to compute
+        the acceptance and swapping them back if the exchange is rejected."""
+
         fxc = False
         sl = self.syslist
 
@@ -121,33 +415,7 @@ class ReplicaExchange(Smotion):
                 t_eval += time.time()
 
                 t_swap -= time.time()
-                ensemble_swap(
-                    sl[i].ensemble, sl[j].ensemble
-                )  # tries to swap the ensembles!
-
-                # it is generally a good idea to rescale the kinetic energies,
-                # which means that the exchange is done only relative to the potential energy part.
-                if self.rescalekin:
-                    # also rescales the velocities -- should do the same with cell velocities
-                    sl[i].beads.p *= np.sqrt(tj / ti)
-                    sl[j].beads.p *= np.sqrt(ti / tj)
-                    try:  # if motion has a barostat, and barostat has a momentum, does the swap
-                        # also note that the barostat has a hidden T dependence inside the mass, so
-                        # as a matter of fact <p^2> \propto T^2
-                        sl[i].motion.barostat.p *= tj / ti
-                        sl[j].motion.barostat.p *= ti / tj
-                    except AttributeError:
-                        pass
-
-                try:  # if motion has a barostat, and the barostat has a reference cell, does the swap
-                    # as that when there are very different pressures, the cell should reflect the
-                    # pressure/temperature dependence. this also changes the barostat conserved quantities
-                    bjh = dstrip(sl[j].motion.barostat.h0.h).copy()
-                    sl[j].motion.barostat.h0.h[:] = sl[i].motion.barostat.h0.h[:]
-                    sl[i].motion.barostat.h0.h[:] = bjh
-                except AttributeError:
-                    pass
-
+                self.swap_ensembles(i, j)  # tries to swap the ensembles!
                 t_swap += time.time()
 
                 t_eval -= time.time()
@@ -179,26 +447,9 @@ class ReplicaExchange(Smotion):
                     )  # keeps track of the swap
 
                     fxc = True  # signal that an exchange has been made!
-                else:  # undoes the swap
+                else:  # undoes the swap, including the kinetic scaling
                     t_swap -= time.time()
-                    ensemble_swap(sl[i].ensemble, sl[j].ensemble)
-
-                    # undoes the kinetic scaling
-                    if self.rescalekin:
-                        sl[i].beads.p *= np.sqrt(ti / tj)
-                        sl[j].beads.p *= np.sqrt(tj / ti)
-                        try:
-                            sl[i].motion.barostat.p *= ti / tj
-                            sl[j].motion.barostat.p *= tj / ti
-                        except AttributeError:
-                            pass
-                    try:
-                        bjh = dstrip(sl[j].motion.barostat.h0.h).copy()
-                        sl[j].motion.barostat.h0.h[:] = sl[i].motion.barostat.h0.h[:]
-                        sl[i].motion.barostat.h0.h[:] = bjh
-                    except AttributeError:
-                        pass
-
+                    self.swap_ensembles(i, j)
                     t_swap += time.time()
                     info(
                         " @ PT:  SWAP REJECTED BETWEEN replicas % 5d and % 5d."
@@ -206,20 +457,4 @@ class ReplicaExchange(Smotion):
                         verbosity.low,
                     )
 
-                # tempi = copy(self.syslist[i].ensemble.temp)
-
-                # self.syslist[i].ensemble.temp = copy(self.syslist[j].ensemble.temp)
-                # velocities have to be adjusted according to the new temperature
-
-        if fxc:  # writes out the new status
-            self.sf.write("% 10d" % (step))
-            for i in self.repindex:
-                self.sf.write(" % 5d" % (i))
-            self.sf.write("\n")
-            self.sf.force_flush()
-
-        info(
-            "# REMD step evaluated in %f (%f eval, %f swap) sec."
-            % (time.time() - t_start, t_eval, t_swap),
-            verbosity.debug,
-        )
+        return fxc, t_eval, t_swap
@@ -188,12 +188,29 @@ class InputAlKMC(InputDictionary):
                 "help": "Filename for storing/loading positions cache",
             },
         ),
+        "parallel": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "threads",
+                "options": ["threads", "processes"],
+                "help": "How the neval relaxations of new states run concurrently. 'threads' runs them in threads of the i-PI process, 'processes' in a pool of worker processes, that send their force requests to the forcefields of i-PI, so that the geometry optimizers do not compete for the Python interpreter lock.",
+            },
+        ),
+        "cache_db": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "",
+                "help": "Filename of a sqlite database of relaxed states, that is kept up to date as new states are found and can be shared between restarts and concurrent runs on the same system",
+            },
+        ),
         "max_cache_len": (
             InputValue,
             {
                 "dtype": int,
                 "default": 1000,
-                "help": "Maximum cache length before oldest entry is deleted",
+                "help": "Maximum number of states kept in memory before the least recently used is deleted",
             },
         ),
     }
@@ -237,12 +254,13 @@ class InputAlKMC(InputDictionary):
         self.tottime.store(kmc.tottime)
         self.ecache_file.store(kmc.ecache_file)
         self.qcache_file.store(kmc.qcache_file)
+        self.cache_db.store(kmc.cache_db)
+        self.parallel.store(kmc.parallel)
         self.max_cache_len.store(kmc.max_cache_len)
 
         # only stores cache after a decent amount of new structures have been found
-        if (
-            kmc.struct_count - kmc.ncache_stored
-        ) >= 0.1 * kmc.ncache:  # dump if new structures exceed 10% of current store
+        # (dump if new structures exceed 10% of current store)
+        if (kmc.struct_count - kmc.ncache_stored) >= 0.1 * len(kmc.cache):
             # if (kmc.struct_count - kmc.ncache_stored) >= 100 : # Basically dump only after 100 new structures.
             if kmc.ecache_file != "":
                 print(
@@ -250,7 +268,7 @@ class InputAlKMC(InputDictionary):
                     kmc.ecache_file,
                 )
                 ff = open(kmc.ecache_file, "wb")
-                pickle.dump(kmc.ecache, ff)
+                pickle.dump(kmc.cache.ecache, ff)
                 ff.close()
             if kmc.qcache_file != "":
                 print(
@@ -258,7 +276,7 @@ class InputAlKMC(InputDictionary):
                     kmc.qcache_file,
                 )
                 ff = open(kmc.qcache_file, "wb")
-                pickle.dump(kmc.qcache, ff)
+                pickle.dump(kmc.cache.qcache, ff)
                 ff.close()
             # kmc.ncache_stored = kmc.ncache
             kmc.ncache_stored = kmc.struct_count
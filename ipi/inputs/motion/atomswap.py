@@ -63,6 +63,14 @@ class InputAtomSwap(InputDictionary):
                 "help": "The contribution to the conserved quantity for the atom swapper",
             },
         ),
+        "nparallel": (
+            InputValue,
+            {
+                "dtype": int,
+                "default": 1,
+                "help": "The number of trial swaps whose energies are evaluated at the same time, on separate copies of the system. They are then accepted or rejected in turn, and the ones following an accepted swap are evaluated again.",
+            },
+        ),
     }
 
     dynamic = {}
@@ -83,6 +91,7 @@ class InputAtomSwap(InputDictionary):
         self.names.store(alc.names)
         self.nxc.store(alc.nxc)
         self.ealc.store(alc.ealc)
+        self.nparallel.store(alc.nparallel)
 
     def fetch(self):
         """Creates an ensemble object.
@@ -55,6 +55,14 @@ class InputConstraintSolver(InputDictionary):
                 "help": "Order of norm used to determine termination of the Quasi-newton iteration.",
             },
         ),
+        "quasi_newton": (
+            InputValue,
+            {
+                "dtype": bool,
+                "default": True,
+                "help": "Keep the Jacobian of the constraints, and the factorisation of the Gram matrix, fixed during the iterative projection. If false, the Jacobian is recomputed at every iteration (exact Newton).",
+            },
+        ),
     }
     default_help = (
         "Holds all parameters for the numerical method used to solve the contraint."
@@ -66,6 +74,7 @@ class InputConstraintSolver(InputDictionary):
         self.tolerance.store(csolver.tolerance)
         self.maxit.store(csolver.maxit)
         self.norm_order.store(csolver.norm_order)
+        self.quasi_newton.store(csolver.quasi_newton)
 
     def fetch(self):
         return super(InputConstraintSolver, self).fetch()
@@ -48,7 +48,7 @@ class InputGeop(InputDictionary):
                 "dtype": str,
                 "default": "lbfgs",
                 "help": "The geometry optimization algorithm to be used",
-                "options": ["sd", "cg", "bfgs", "bfgstrm", "lbfgs"],
+                "options": ["sd", "cg", "bfgs", "bfgstrm", "lbfgs", "fire", "fire2"],
             },
         )
     }
@@ -115,6 +115,30 @@ class InputGeop(InputDictionary):
                 "help": "The number of past vectors to store for L-BFGS.",
             },
         ),
+        "fire_options": (
+            InputDictionary,
+            {
+                "dtype": [float, float, float, float, int, int],
+                "help": """Options for the FIRE and FIRE 2.0 methods. Includes:
+                              dt: initial time step,
+                              dtmax: maximum time step,
+                              maxstep: largest displacement of any degree of freedom in one step,
+                              alpha: initial velocity mixing parameter,
+                              nmin: number of downhill steps before the time step is increased,
+                              ndelay: number of initial steps without time step decrease (FIRE 2.0).
+                              """,
+                "options": ["dt", "dtmax", "maxstep", "alpha", "nmin", "ndelay"],
+                "default": [41.341373, 413.41373, 0.5, 0.1, 5, 20],
+                "dimension": [
+                    "time",
+                    "time",
+                    "length",
+                    "undefined",
+                    "undefined",
+                    "undefined",
+                ],
+            },
+        ),
         # re-start parameters, estimate hessian, etc.
         "old_pos": (
             InputArray,
@@ -148,7 +172,7 @@ class InputGeop(InputDictionary):
             {
                 "dtype": float,
                 "default": input_default(factory=np.zeros, args=(0,)),
-                "help": "The previous direction in a CG or SD optimization.",
+                "help": "The previous direction in a CG or SD optimization, or the velocities in FIRE.",
             },
         ),
         "invhessian_bfgs": (
@@ -176,6 +200,14 @@ class InputGeop(InputDictionary):
                 "dimension": "length",
             },
         ),
+        "state_fire": (
+            InputArray,
+            {
+                "dtype": float,
+                "default": input_default(factory=np.zeros, args=(0,)),
+                "help": "The current time step, mixing parameter and number of downhill steps in FIRE.",
+            },
+        ),
         "qlist_lbfgs": (
             InputArray,
             {
@@ -230,6 +262,10 @@ class InputGeop(InputDictionary):
             self.old_direction.store(geop.d)
             self.ls_options.store(geop.ls_options)
             self.old_force.store(geop.old_f)
+        elif geop.mode in ["fire", "fire2"]:
+            self.old_direction.store(geop.d)
+            self.fire_options.store(geop.fire_options)
+            self.state_fire.store(geop.state_fire)
 
     def fetch(self):
         rv = super(InputGeop, self).fetch()
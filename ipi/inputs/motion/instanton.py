@@ -114,7 +114,7 @@ class InputInst(InputDictionary):
                 "default": "None",
                 "options": ["nichols", "NR", "lbfgs", "lanczos", "None"],
                 "help": """The geometry optimization algorithm to be used.
-                                            For small system sizes nichols is recomended. Lanczos is tailored for big bigger than nbeads*natoms >~38*64.
+                                            nichols is recomended. Like NR and lanczos it works with the banded ring polymer hessian and never builds the (3*natoms*nbeads)^2 matrix. Lanczos skips the hessian_asr projection and is slightly cheaper for big systems (nbeads*natoms >~38*64).
                                             NR works in both cases given that the initial guess is close to the optimized geometry.
                                             Finally lbfgs is used for tunneling splitting calculations. """,
             },
@@ -291,6 +291,32 @@ class InputInst(InputDictionary):
                 "help": "Decide if we are going to compute the final big-hessian by finite difference.",
             },
         ),
+        "hessian_batch": (
+            InputValue,
+            {
+                "dtype": int,
+                "default": 1,
+                "help": "Number of rows of the finite-difference hessian that are computed together. The 2*nbeads*hessian_batch displaced replicas are sent to the force clients at once.",
+            },
+        ),
+        "hessian_symmetrize": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "false",
+                "options": ["false", "true"],
+                "help": "Symmetrize the finite-difference hessian after it has been computed, averaging H_ij and H_ji. Reduces the finite-difference noise; it does not reduce the number of force evaluations.",
+            },
+        ),
+        "hessian_format": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "text",
+                "options": ["text", "binary"],
+                "help": "Format of the hessian files that are printed every 'alt_out' steps and at the end. 'text' writes the (3*natoms, 3*natoms*nbeads) physical hessian as a single line, 'binary' as a .npy file, which is much smaller and faster to write for big systems.",
+            },
+        ),
     }
 
     dynamic = {}
@@ -321,6 +347,9 @@ class InputInst(InputDictionary):
         self.prefix.store(options["prefix"])
         self.delta.store(optarrays["delta"])
         self.hessian_final.store(options["hessian_final"])
+        self.hessian_batch.store(options["hessian_batch"])
+        self.hessian_symmetrize.store(options["hessian_symmetrize"])
+        self.hessian_format.store(options["hessian_format"])
         self.old_pot.store(optarrays["old_u"])
         self.old_force.store(optarrays["old_f"])
         self.energy_shift.store(optarrays["energy_shift"])
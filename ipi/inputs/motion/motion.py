@@ -153,13 +153,30 @@ class InputMotionBase(Input):
                     factory=ipi.engine.initializer.InitFile, kwargs={"mode": "xyz"}
                 ),
                 "help": "This describes the location to read a trajectory file from. "
-                        "Replay syntax allows using some POSIX wildcards in the filename "
-                        "of trajectory files. If symbols *?[] are found in a filename, "
-                        "the code expects to find exactly Nbeads files that match "
-                        "the provided pattern. Bead indices will be read from the files, "
-                        "and the files will be ordered ascendingly by their bead indices. "
-                        "Wildcarded files are expected to be in the folder "
-                        "where the simulation runs.",
+                "Replay syntax allows using some POSIX wildcards in the filename "
+                "of trajectory files. If symbols *?[] are found in a filename, "
+                "the code expects to find exactly Nbeads files that match "
+                "the provided pattern. Bead indices will be read from the files, "
+                "and the files will be ordered ascendingly by their bead indices. "
+                "Wildcarded files are expected to be in the folder "
+                "where the simulation runs.",
+            },
+        ),
+        "prefetch": (
+            InputValue,
+            {
+                "dtype": int,
+                "default": 0,
+                "help": "Replay only. The number of steps of the trajectory that are read ahead of the current one, in the background, by a reader for each trajectory file. Zero reads each frame when it is needed.",
+            },
+        ),
+        "readers": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "threads",
+                "options": ["threads", "processes"],
+                "help": "Replay only. Whether the trajectory files are read ahead by threads, or by separate processes that parse them in parallel with i-PI.",
             },
         ),
         "vibrations": (
@@ -287,6 +304,8 @@ class InputMotionBase(Input):
 
         if tsc == 0:
             self.file.store(sc.intraj)
+            self.prefetch.store(sc.prefetch)
+            self.readers.store(sc.readers)
         elif tsc > 0:
             self.fixcom.store(sc.fixcom)
             self.fixatoms.store(sc.fixatoms)
@@ -306,6 +325,8 @@ class InputMotionBase(Input):
                 fixcom=self.fixcom.fetch(),
                 fixatoms=self.fixatoms.fetch(),
                 intraj=self.file.fetch(),
+                prefetch=self.prefetch.fetch(),
+                readers=self.readers.fetch(),
             )
         elif self.mode.fetch() == "minimize":
             sc = GeopMotion(
@@ -314,15 +335,11 @@ class InputMotionBase(Input):
                 **self.optimizer.fetch()
             )
         elif self.mode.fetch() == "neb":
-
-            raise ValueError(
-                "The nudged elastic band calculation has been temporarily disabled until further bug-fixes."
+            sc = NEBMover(
+                fixcom=self.fixcom.fetch(),
+                fixatoms=self.fixatoms.fetch(),
+                **self.neb_optimizer.fetch()
             )
-        #            sc = NEBMover(
-        #                fixcom=self.fixcom.fetch(),
-        #                fixatoms=self.fixatoms.fetch(),
-        #                **self.neb_optimizer.fetch()
-        #            )
         elif self.mode.fetch() == "dynamics":
             sc = Dynamics(
                 fixcom=self.fixcom.fetch(),
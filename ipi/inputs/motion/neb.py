@@ -50,7 +50,7 @@ class InputNEB(InputDictionary):
                 "dtype": str,
                 "default": "lbfgs",
                 "help": "The geometry optimization algorithm to be used",
-                "options": ["sd", "cg", "bfgs", "lbfgs"],
+                "options": ["sd", "cg", "bfgs", "lbfgs", "fire", "fire2"],
             },
         )
     }
@@ -150,6 +150,38 @@ class InputNEB(InputDictionary):
                 "help": "The number of past vectors to store for L-BFGS.",
             },
         ),
+        "fire_options": (
+            InputDictionary,
+            {
+                "dtype": [float, float, float, float, int, int],
+                "help": """Options for the FIRE and FIRE 2.0 methods. Includes:
+                              dt: initial time step,
+                              dtmax: maximum time step,
+                              maxstep: largest displacement of any degree of freedom in one step,
+                              alpha: initial velocity mixing parameter,
+                              nmin: number of downhill steps before the time step is increased,
+                              ndelay: number of initial steps without time step decrease (FIRE 2.0).
+                              """,
+                "options": ["dt", "dtmax", "maxstep", "alpha", "nmin", "ndelay"],
+                "default": [41.341373, 413.41373, 0.5, 0.1, 5, 20],
+                "dimension": [
+                    "time",
+                    "time",
+                    "length",
+                    "undefined",
+                    "undefined",
+                    "undefined",
+                ],
+            },
+        ),
+        "state_fire": (
+            InputArray,
+            {
+                "dtype": float,
+                "default": input_default(factory=np.zeros, args=(0,)),
+                "help": "The current time step, mixing parameter and number of downhill steps in FIRE.",
+            },
+        ),
         "endpoints": (
             InputDictionary,
             {
@@ -165,12 +197,21 @@ class InputNEB(InputDictionary):
                 "dtype": [bool, float, float, float],
                 "options": ["varsprings", "kappa", "kappamax", "kappamin"],
                 "default": [False, 1.0, 1.5, 0.5],
-                "help": "Uniform or variable spring constants along the elastic band",
+                "help": """Uniform or variable spring constants along the elastic band.
+                              varsprings: if true, the spring constants are scaled
+                              between kappamin and kappamax with the energy of the
+                              segments, so that images crowd around the saddle point,
+                              kappa: spring constant if varsprings is false.""",
             },
         ),
         "climb": (
             InputValue,
-            {"dtype": bool, "default": False, "help": "Use climbing image NEB"},
+            {
+                "dtype": bool,
+                "default": False,
+                "help": """Use climbing image NEB: the highest-energy image is pushed
+                           up along the band, converging to the saddle point.""",
+            },
         ),
     }
 
@@ -195,6 +236,8 @@ class InputNEB(InputDictionary):
         self.spring.store(neb.spring)
         self.climb.store(neb.climb)
         self.scale_lbfgs.store(neb.scale)
+        self.fire_options.store(neb.fire_options)
+        self.state_fire.store(neb.state_fire)
 
     def fetch(self):
         rv = super(InputNEB, self).fetch()
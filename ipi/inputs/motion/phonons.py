@@ -89,6 +89,23 @@ class InputDynMatrix(InputDictionary):
                 "help": "Removes the zero frequency vibrational modes depending on the symmerty of the system.",
             },
         ),
+        "batch": (
+            InputValue,
+            {
+                "dtype": int,
+                "default": 1,
+                "help": "Number of rows of the dynamical matrix computed together. The 2*batch displaced configurations are evaluated at once, so they can be sent to several clients in parallel. All the rows of a batch are computed at its first step.",
+            },
+        ),
+        "symmetry": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "none",
+                "options": ["none", "translations"],
+                "help": "Reduces the number of displacements using the symmetry of the system. 'translations' finds the lattice translations that map the (super)cell onto itself, only displaces one atom for each set of equivalent atoms, and reconstructs the other rows by permutation, enforcing translational invariance. The calculation then needs 3*n_irreducible steps. Only for the fd mode.",
+            },
+        ),
         "dynmat": (
             InputArray,
             {
@@ -121,6 +138,8 @@ class InputDynMatrix(InputDictionary):
         self.output_shift.store(phonons.deltaw)
         self.prefix.store(phonons.prefix)
         self.asr.store(phonons.asr)
+        self.batch.store(phonons.batch)
+        self.symmetry.store(phonons.symmetry)
         self.dynmat.store(phonons.dynmatrix)
         self.refdynmat.store(phonons.refdynmatrix)
 
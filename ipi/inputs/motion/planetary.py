@@ -109,6 +109,16 @@ class InputPlanetary(InputDictionary):
                 "help": "Screening parameter for path-integral frequency matrix.",
             },
         ),
+        "sparse": (
+            InputValue,
+            {
+                "dtype": bool,
+                "default": False,
+                "help": """Only accumulate the 3x3 blocks of the frequency matrix for the pairs of atoms that are
+                        within the screening distance in the centroid configuration, found with a cell-list
+                        search, rather than screening the full matrix at the end. Requires screen > 0.""",
+            },
+        ),
     }
 
     dynamic = {}
@@ -135,6 +145,7 @@ class InputPlanetary(InputDictionary):
         self.nsamples.store(plan.nsamples)
         self.stride.store(plan.stride)
         self.screen.store(plan.screen)
+        self.sparse.store(plan.sparse)
 
     def fetch(self):
         """Creates an ensemble object.
@@ -148,7 +148,7 @@ class InputSCPhonons(InputDictionary):
             {
                 "dtype": int,
                 "default": 1,
-                "help": "The number of Monte Carlo forces to be evaluated (in parallel) per i-PI step.",
+                "help": "The number of Monte Carlo samples collected per i-PI step, evaluated as the beads of a multi-bead copy of the system. All the samples of an SCP iteration are queued at its first step.",
             },
         ),
         "batch_weight_exponent": (
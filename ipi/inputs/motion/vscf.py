@@ -231,7 +231,7 @@ class InputNormalMode(InputDictionary):
             {
                 "dtype": int,
                 "default": 1,
-                "help": "The number of forces evaluations per i-PI step.",
+                "help": "The number of displaced configurations that are evaluated together, as the beads of a multi-bead copy of the system. Should match the number of clients.",
             },
         ),
     }
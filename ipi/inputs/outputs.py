@@ -324,6 +324,10 @@ class InputOutputs(Input):
     Attributes:
        prefix: A string that will be appended to all output files from this
           simulation.
+       queue: The number of frames that can wait to be written out by the
+          output thread.
+       backpressure: What to do when the output queue is full.
+       fsync: The minimum time between two commits of a file to disk.
 
     Dynamic fields:
        trajectory: Specifies a trajectory to be output
@@ -339,7 +343,32 @@ class InputOutputs(Input):
                 "default": "i-pi",
                 "help": "A string that will be prepended to each output file name. The file name is given by 'prefix'.'filename' + format_specifier. The format specifier may also include a number if multiple similar files are output.",
             },
-        )
+        ),
+        "queue": (
+            InputAttribute,
+            {
+                "dtype": int,
+                "default": 0,
+                "help": "The number of frames that can wait to be written out. If larger than zero, the outputs are formatted and written by a separate thread, so that the dynamics does not wait for the file system. If zero, they are written out at the end of each step.",
+            },
+        ),
+        "backpressure": (
+            InputAttribute,
+            {
+                "dtype": str,
+                "default": "block",
+                "options": ["block", "drop"],
+                "help": "What to do when the output queue is full: 'block' waits for the frames to be written out, 'drop' discards the new frame.",
+            },
+        ),
+        "fsync": (
+            InputAttribute,
+            {
+                "dtype": float,
+                "default": 0.0,
+                "help": "The minimum time, in seconds, between two commits of an output file to disk. The flushes that come earlier only pass the data to the operating system, which avoids stalling on network file systems. If zero, the files are committed at each flush, if negative never.",
+            },
+        ),
     }
 
     dynamic = {
@@ -412,11 +441,22 @@ class InputOutputs(Input):
 
         super(InputOutputs, self).fetch()
         outlist = eoutputs.OutputList(
-            self.prefix.fetch(), [p.fetch() for (n, p) in self.extra]
+            self.prefix.fetch(),
+            [p.fetch() for (n, p) in self.extra],
+            queue=self.queue.fetch(),
+            backpressure=self.backpressure.fetch(),
+            fsync=self.fsync.fetch(),
         )
 
         return outlist
 
+    def check(self):
+        """Checks for optional parameters."""
+
+        super(InputOutputs, self).check()
+        if self.queue.fetch() < 0:
+            raise ValueError("The size of the output queue must be positive.")
+
     def store(self, plist):
         """Stores a list of the output objects, creating a sequence of
         dynamic containers.
@@ -430,6 +470,9 @@ class InputOutputs(Input):
         super(InputOutputs, self).store()
 
         self.prefix.store(plist.prefix)
+        self.queue.store(plist.queue)
+        self.backpressure.store(plist.backpressure)
+        self.fsync.store(plist.fsync)
 
         if len(self.extra) != len(plist):
             self.extra = [0] * len(plist)
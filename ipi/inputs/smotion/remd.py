@@ -62,6 +62,22 @@ class InputReplicaExchange(InputDictionary):
                 "help": "File to keep track of replica exchanges",
             },
         ),
+        "swapmode": (
+            InputValue,
+            {
+                "dtype": str,
+                "default": "sequential",
+                "options": ["sequential", "pairs", "neighbour", "gibbs"],
+                "help": """How exchanges are attempted. 'sequential' tries all pairs of replicas, swapping
+                        the ensembles to compute each acceptance. The other modes evaluate each replica once and
+                        compute all the acceptances from the matrix of the energies of the replicas in the
+                        different ensembles, and only apply the accepted swaps. 'pairs' tries the same pairs as
+                        'sequential', each with probability 1/stride. 'neighbour' tries every round(stride) steps
+                        the swaps between neighbouring replicas along the ladder of the initial ensembles,
+                        alternating between even and odd pairs. 'gibbs' does, with probability 1/stride, N sweeps
+                        of heat-bath swaps between disjoint random pairs of the N replicas.""",
+            },
+        ),
         "repindex": (
             InputArray,
             {
@@ -82,6 +98,7 @@ class InputReplicaExchange(InputDictionary):
         self.repindex.store(remd.repindex)
         self.krescale.store(remd.rescalekin)
         self.swapfile.store(remd.swapfile)
+        self.swapmode.store(remd.swapmode)
 
     def fetch(self):
         rv = super(InputReplicaExchange, self).fetch()
@@ -0,0 +1,212 @@
+"""Vectorised kernels acting on ring-polymer arrays.
+
+Bead and normal-mode arrays are stored as contiguous (nbeads, 3*natoms)
+blocks. The functions in this module reinterpret them as (nbeads, natoms, 3)
+views, without copying, and evaluate kinetic energies, kinetic stress tensors,
+dynamical masses and spring terms in a single pass over the whole path, rather
+than looping over beads, atoms and Cartesian components. Open paths (and any
+other per-atom special treatment) are handled through boolean atom masks.
+"""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+
+from ipi.utils.depend import dstrip
+
+
+__all__ = [
+    "atomic_view",
+    "atom_mask",
+    "bead_atom_factors",
+    "kinetic_energies",
+    "kinetic_stress",
+    "centroid_virial",
+    "dynamical_masses",
+    "spring_energy",
+    "spring_force",
+]
+
+
+def atomic_view(x):
+    """Returns a (..., natoms, 3) view of a (..., 3*natoms) array.
+
+    Args:
+       x: An array whose last dimension runs over the 3*natoms Cartesian
+          degrees of freedom. Depend arrays are stripped.
+
+    Returns:
+       A view of x (a copy only if x is not contiguous along the last axis)
+       with the last dimension split into atoms and Cartesian components.
+    """
+
+    x = dstrip(x)
+    return x.reshape(x.shape[:-1] + (x.shape[-1] // 3, 3))
+
+
+def atom_mask(natoms, indices):
+    """Builds a boolean mask selecting a subset of the atoms.
+
+    Args:
+       natoms: The number of atoms.
+       indices: A list of atom indices, e.g. the open paths or the bosons.
+
+    Returns:
+       A boolean array of length natoms, True for the atoms in indices.
+    """
+
+    mask = np.zeros(natoms, bool)
+    mask[np.asarray(indices, int)] = True
+    return mask
+
+
+def bead_atom_factors(factors, mask=None, mfactors=None):
+    """Expands per-bead factors to a (nbeads, natoms) or (nbeads, 1) array.
+
+    Args:
+       factors: An array of nbeads factors applying to all atoms.
+       mask: An optional boolean atom mask.
+       mfactors: An array of nbeads factors applying to the atoms selected
+          by mask.
+
+    Returns:
+       An array that can be broadcast against a (nbeads, natoms) array,
+       containing mfactors for the masked atoms and factors for all the others.
+    """
+
+    factors = dstrip(factors)
+    if mask is None or not mask.any():
+        return factors[:, np.newaxis]
+    return np.where(
+        mask[np.newaxis, :], dstrip(mfactors)[:, np.newaxis], factors[:, np.newaxis]
+    )
+
+
+def kinetic_energies(p, m3, nm_factor=None):
+    """Computes the kinetic energy of each bead (or normal mode).
+
+    Args:
+       p: A (nbeads, 3*natoms) array of momenta.
+       m3: A (nbeads, 3*natoms) or (3*natoms) array of masses.
+       nm_factor: Optional dynamical mass scaling factors, one per bead.
+
+    Returns:
+       An array with the kinetic energy of each of the nbeads replicas.
+    """
+
+    p = dstrip(p)
+    kins = 0.5 * np.einsum("bi,bi->b", p, p / dstrip(m3))
+    if nm_factor is not None:
+        kins /= dstrip(nm_factor)
+    return kins
+
+
+def kinetic_stress(p, m, nm_factor=None):
+    """Computes the kinetic stress tensor, summed over beads and atoms.
+
+    Evaluates sum_b sum_a p_bai p_baj / (m_a f_b) with a single matrix
+    product over a (nbeads*natoms, 3) view of the momenta.
+
+    Args:
+       p: A (nbeads, 3*natoms) or (3*natoms) array of momenta.
+       m: An array of natoms masses.
+       nm_factor: Optional dynamical mass scaling factors, one per bead.
+
+    Returns:
+       The full (symmetric) 3x3 kinetic stress tensor, not volume-scaled.
+    """
+
+    pa = atomic_view(p)
+    if pa.ndim == 2:
+        pa = pa[np.newaxis]
+    w = 1.0 / dstrip(m)[np.newaxis, :]
+    if nm_factor is not None:
+        w = w / dstrip(nm_factor)[:, np.newaxis]
+    return np.dot((pa * w[:, :, np.newaxis]).reshape(-1, 3).T, pa.reshape(-1, 3))
+
+
+def centroid_virial(q, qc, f, mask=None):
+    """Computes the centroid virial tensor, summed over beads and atoms.
+
+    Evaluates sum_b sum_a (q_bai - qc_ai) f_baj with a single matrix product
+    over (nbeads*natoms, 3) views of the positions and forces. This is the
+    configurational part of the centroid-virial kinetic stress estimators
+    used by the barostats and the properties.
+
+    Args:
+       q: A (nbeads, 3*natoms) array of bead positions.
+       qc: A (3*natoms) array with the centroid positions.
+       f: A (nbeads, 3*natoms) array of forces.
+       mask: An optional boolean mask restricting the sum to some atoms.
+
+    Returns:
+       The full (not symmetrised) 3x3 tensor, not volume-scaled.
+    """
+
+    dq = atomic_view(q) - atomic_view(qc)[np.newaxis]
+    fa = atomic_view(f)
+    if mask is not None:
+        dq, fa = dq[:, mask], fa[:, mask]
+    return np.dot(dq.reshape(-1, 3).T, fa.reshape(-1, 3))
+
+
+def dynamical_masses(m3, nm_factor, mask=None, o_nm_factor=None):
+    """Computes the normal-mode dynamical masses.
+
+    Args:
+       m3: A (nbeads, 3*natoms) array of masses.
+       nm_factor: The mass scaling factor of each normal mode.
+       mask: An optional boolean mask selecting the open-path atoms.
+       o_nm_factor: The mass scaling factors for the open-path atoms.
+
+    Returns:
+       A (nbeads, 3*natoms) array of dynamical masses.
+    """
+
+    m3 = dstrip(m3)
+    if mask is not None and mask.any():
+        # the centroid is never rescaled differently for open paths
+        o_nm_factor = dstrip(o_nm_factor).copy()
+        o_nm_factor[0] = dstrip(nm_factor)[0]
+    fac = bead_atom_factors(nm_factor, mask, o_nm_factor)
+    return (atomic_view(m3) * fac[:, :, np.newaxis]).reshape(m3.shape)
+
+
+def spring_energy(qnm, m, omegak2, mask=None, o_omegak2=None, select=None):
+    """Computes the ring-polymer spring energy in the normal-mode basis.
+
+    Args:
+       qnm: A (nbeads, 3*natoms) array of normal-mode positions.
+       m: An array of natoms masses.
+       omegak2: The squared normal-mode frequencies.
+       mask: An optional boolean mask selecting the open-path atoms.
+       o_omegak2: The squared normal-mode frequencies of open paths.
+       select: An optional boolean mask restricting the sum to some atoms.
+
+    Returns:
+       The spring potential energy.
+    """
+
+    q2 = (atomic_view(qnm) ** 2).sum(axis=2) * dstrip(m)[np.newaxis, :]
+    w2 = bead_atom_factors(omegak2, mask, o_omegak2)
+    if select is not None:
+        w2 = w2 * select[np.newaxis, :]
+    return 0.5 * (w2 * q2).sum()
+
+
+def spring_force(qnm, m, omegak2, mask=None, o_omegak2=None):
+    """Computes the ring-polymer spring force in the normal-mode basis.
+
+    Args:
+       See spring_energy().
+
+    Returns:
+       A (nbeads, 3*natoms) array with the spring force on the normal modes.
+    """
+
+    qnm = dstrip(qnm)
+    w2 = bead_atom_factors(omegak2, mask, o_omegak2) * dstrip(m)[np.newaxis, :]
+    return -(atomic_view(qnm) * w2[:, :, np.newaxis]).reshape(qnm.shape)
@@ -13,12 +13,18 @@ try:
 except ImportError:
     spla = None
 
+try:
+    import scipy.sparse as sps
+except ImportError:
+    sps = None
+
 __all__ = [
     "ConstraintBase",
     "ConstraintList",
     "AngleConstraint",
     "RigidBondConstraint",
     "EckartConstraint",
+    "ConstraintBatch",
 ]
 
 
@@ -123,10 +129,27 @@ class ConstraintBase(dobject):
                 name="GramChol", value=(), func=self.GCfunc, dependencies=[dself.Gram]
             )
 
+    def batch_key(self):
+        """Returns a hashable key that is equal for constraints that have the
+        same structure, and can therefore be evaluated together by a
+        ConstraintBatch, or None if the constraint cannot be batched."""
+
+        return None
+
     def gfunc(self):
         """ Calculates the value of the constraint(s) """
         raise NotImplementedError()
 
+    def Dg_dot(self, x):
+        """ Multiplies the Jacobian by a vector of 3*n_unique components. """
+
+        return np.dot(dstrip(self.Dg), x)
+
+    def DgT_dot(self, x):
+        """ Multiplies the transpose of the Jacobian by a vector of ncons components. """
+
+        return np.dot(dstrip(self.Dg).T, x)
+
     def Dgfunc(self):
         """
         Calculates the Jacobian of the constraint.
@@ -197,6 +220,49 @@ class ValueConstraintBase(ConstraintBase):
         dself.g.add_dependency(dself.constraint_values)
         dself.Dg.add_dependency(dself.constraint_values)
 
+    def batch_key(self):
+        return (self.__class__.__name__, self.n_unique, self.i3_indirect.tobytes())
+
+    def batch_values(self):
+        """ Returns the target values, to be stacked by a ConstraintBatch. """
+        return dstrip(self.constraint_values)
+
+    def gfunc(self):
+        """
+        Calculates the deviation of the constraint from its target
+        """
+
+        return self.batch_gfunc(
+            dstrip(self.q)[np.newaxis], dstrip(self.constraint_values)[np.newaxis]
+        )[0]
+
+    def Dgfunc(self, reduced=False):
+        """
+        Calculates the Jacobian of the constraint.
+        """
+
+        return self.batch_Dgfunc(
+            dstrip(self.qprev)[np.newaxis], dstrip(self.constraint_values)[np.newaxis]
+        )[0]
+
+    def batch_gfunc(self, q, values):
+        """Calculates the constraint for a stack of groups of atoms with the
+        same structure as this constraint.
+
+        Args:
+            q: A (nbatch, 3*n_unique) array of positions.
+            values: A (nbatch, ncons) array of target values.
+
+        Returns:
+            A (nbatch, ncons) array with the constraint functions.
+        """
+        raise NotImplementedError()
+
+    def batch_Dgfunc(self, q, values):
+        """Calculates the Jacobian for a stack of groups of atoms, see
+        batch_gfunc(). Returns a (nbatch, ncons, 3*n_unique) array."""
+        raise NotImplementedError()
+
 
 class RigidBondConstraint(ValueConstraintBase):
     """Constraint class for MD.
@@ -208,7 +274,7 @@ class RigidBondConstraint(ValueConstraintBase):
 
         # this is a bit perverse, but we need to function regardless of
         # whether this is called with a shaped or flattended index list
-        ncons = len(constrained_indices.flatten()) / 2
+        ncons = len(constrained_indices.flatten()) // 2
         super(RigidBondConstraint, self).__init__(
             constrained_indices, constraint_values, ncons=ncons
         )
@@ -225,39 +291,26 @@ class RigidBondConstraint(ValueConstraintBase):
             self.q = dstrip(beads.q[0])[self.i3_unique.flatten()]
             self.constraint_values = np.sqrt(dstrip(self.g))
 
-    def gfunc(self):
+    def batch_gfunc(self, q, values):
         """
-        Calculates the deviation of the constraint frp, its target
+        Calculates the deviation of the squared bond lengths from their targets
         """
 
-        q = dstrip(self.q)
-        r = np.zeros(self.ncons)
-        constraint_distances = dstrip(self.constraint_values)
-        for i in range(self.ncons):
-            c_atoms = self.i3_indirect[i]
-            c_dist = constraint_distances[i]
-            # print q[c_atoms[0]], q[c_atoms[1]], c_dist
-            r[i] = np.sum((q[c_atoms[0]] - q[c_atoms[1]]) ** 2) - c_dist ** 2
-        if q[0] == float("inf"):
-            ValueError("fgfgf")
-            print("autsch")
-            exit()
-        # print("gfunc", r)
-        return r
+        ia = self.i3_indirect
+        d = q[:, ia[:, 0]] - q[:, ia[:, 1]]
+        return np.sum(d ** 2, axis=2) - values ** 2
 
-    def Dgfunc(self, reduced=False):
+    def batch_Dgfunc(self, q, values):
         """
         Calculates the Jacobian of the constraint.
         """
 
-        q = dstrip(self.qprev)
-        # constrained_indices = self.constrained_indices
-        r = np.zeros((self.ncons, self.n_unique * 3))
-        for i in range(self.ncons):
-            c_atoms = self.i3_indirect[i]
-            inst_position_vector = q[c_atoms[0]] - q[c_atoms[1]]
-            r[i][c_atoms[0]] = 2.0 * inst_position_vector
-            r[i][c_atoms[1]] = -2.0 * inst_position_vector
+        ia = self.i3_indirect
+        ic = np.arange(self.ncons)[:, np.newaxis]
+        d = q[:, ia[:, 0]] - q[:, ia[:, 1]]
+        r = np.zeros((len(q), self.ncons, self.n_unique * 3))
+        r[:, ic, ia[:, 0]] = 2.0 * d
+        r[:, ic, ia[:, 1]] = -2.0 * d
         return r
 
 
@@ -270,7 +323,7 @@ class AngleConstraint(ValueConstraintBase):
 
     def __init__(self, constrained_indices, constraint_values):
 
-        ncons = len(constrained_indices.flatten()) / 3
+        ncons = len(constrained_indices.flatten()) // 3
         super(AngleConstraint, self).__init__(
             constrained_indices, constraint_values, ncons=ncons
         )
@@ -287,44 +340,38 @@ class AngleConstraint(ValueConstraintBase):
             self.q = dstrip(beads.q[0])[self.i3_unique.flatten()]
             self.constraint_values = np.arccos(dstrip(self.g))
 
-    def gfunc(self):
+    def batch_gfunc(self, q, values):
         """
-        Calculates the constraint.
+        Calculates the deviation of the cosines of the angles from their targets
         """
 
-        q = dstrip(self.q)
-        r = np.zeros(self.ncons)
-        constraint_cosines = np.cos(dstrip(self.constraint_values))
-        for i in range(self.ncons):
-            c_atoms = self.i3_indirect[i]
-            c_cos = constraint_cosines[i]
-            q1 = q[c_atoms[1]] - q[c_atoms[0]]
-            r1 = np.sqrt(np.dot(q1, q1))
-            q2 = q[c_atoms[2]] - q[c_atoms[0]]
-            r2 = np.sqrt(np.dot(q2, q2))
-            r[i] = np.dot(q1, q2) / r1 / r2
-            r[i] -= c_cos
-        return r
+        ia = self.i3_indirect
+        q1 = q[:, ia[:, 1]] - q[:, ia[:, 0]]
+        q2 = q[:, ia[:, 2]] - q[:, ia[:, 0]]
+        r1 = np.sqrt(np.sum(q1 ** 2, axis=2))
+        r2 = np.sqrt(np.sum(q2 ** 2, axis=2))
+        return np.sum(q1 * q2, axis=2) / r1 / r2 - np.cos(values)
 
-    def Dgfunc(self, reduced=False):
+    def batch_Dgfunc(self, q, values):
         """
         Calculates the Jacobian of the constraint.
         """
 
-        q = dstrip(self.qprev)
-        r = np.zeros((self.ncons, self.n_unique * 3))
-        for i in range(self.ncons):
-            c_atoms = self.i3_indirect[i]
-            q1 = q[c_atoms[1]] - q[c_atoms[0]]
-            r1 = np.sqrt(np.dot(q1, q1))
-            q1 /= r1
-            q2 = q[c_atoms[2]] - q[c_atoms[0]]
-            r2 = np.sqrt(np.dot(q2, q2))
-            q2 /= r2
-            ct = np.dot(q1, q2)
-            r[i][c_atoms[1]] = (q2 - ct * q1) / r1
-            r[i][c_atoms[2]] = (q1 - ct * q2) / r2
-            r[i][c_atoms[0]] = -(r[i][c_atoms[1]] + r[i][c_atoms[2]])
+        ia = self.i3_indirect
+        ic = np.arange(self.ncons)[:, np.newaxis]
+        q1 = q[:, ia[:, 1]] - q[:, ia[:, 0]]
+        r1 = np.sqrt(np.sum(q1 ** 2, axis=2))[:, :, np.newaxis]
+        q1 /= r1
+        q2 = q[:, ia[:, 2]] - q[:, ia[:, 0]]
+        r2 = np.sqrt(np.sum(q2 ** 2, axis=2))[:, :, np.newaxis]
+        q2 /= r2
+        ct = np.sum(q1 * q2, axis=2)[:, :, np.newaxis]
+        d1 = (q2 - ct * q1) / r1
+        d2 = (q1 - ct * q2) / r2
+        r = np.zeros((len(q), self.ncons, self.n_unique * 3))
+        r[:, ic, ia[:, 1]] = d1
+        r[:, ic, ia[:, 2]] = d2
+        r[:, ic, ia[:, 0]] = -(d1 + d2)
         return r
 
 
@@ -448,13 +495,23 @@ class EckartConstraint(ConstraintBase):
 
 class ConstraintList(ConstraintBase):
     """Class to hold a list of constraints to be treated
-    simultaneously by the solver."""
+    simultaneously by the solver.
 
-    def __init__(self, constraint_list):
+    The Jacobian of the list is block-sparse, as each constraint only
+    involves its own atoms. For long lists it is stored as a scipy CSR matrix
+    (Dgs), which is used to compute the Gram matrix and the projections,
+    and the dense Dg is only built when it is explicitly requested."""
+
+    def __init__(self, constraint_list, sparse=None):
         """Initialize the constraint list.
         Contains a list of constraint objects, that will
         be stored and used to compute the different blocks
-        of the constraint values and Jacobian"""
+        of the constraint values and Jacobian.
+
+        sparse: whether to use a sparse Jacobian. If None, it is used when
+            scipy is available and the blocks fill less than a tenth of the
+            dense Jacobian.
+        """
 
         self.constraint_list = constraint_list
         self.ncons = sum([constr.ncons for constr in constraint_list])
@@ -479,6 +536,21 @@ class ConstraintList(ConstraintBase):
                 np.array([[i * 3, i * 3 + 1, i * 3 + 2] for i in i_map]).flatten()
             )
 
+        # row and column indices of the non-zero blocks of the Jacobian
+        rows, cols = [], []
+        si = 0
+        for ic, c in enumerate(self.constraint_list):
+            ic3 = self.ic3_map[ic]
+            rows.append(np.repeat(np.arange(si, si + c.ncons), len(ic3)))
+            cols.append(np.tile(ic3, c.ncons))
+            si += c.ncons
+        self.dgs_rows = np.concatenate(rows)
+        self.dgs_cols = np.concatenate(cols)
+
+        if sparse is None:
+            sparse = len(self.dgs_rows) < 0.1 * self.ncons * 3 * self.n_unique
+        self.sparse = sparse and sps is not None
+
     def bind(self, beads):
 
         super(ConstraintList, self).bind(beads)
@@ -508,10 +580,29 @@ class ConstraintList(ConstraintBase):
             dqprev._func = make_qprevgetter(ic)
             dself.Dg.add_dependency(dd(c).Dg)
 
+        self._batchable = self.batch_key() is not None
+
+        if self.sparse:
+            dself.Dgs = depend_value(
+                name="Dgs",
+                value=None,
+                func=self.Dgsfunc,
+                dependencies=[dd(c).Dg for c in self.constraint_list],
+            )
+            # the dense Dg is not necessarily computed, so the Gram matrix
+            # must be tainted directly by the sparse Jacobian
+            dself.Gram.add_dependency(dself.Dgs)
+
     def gfunc(self):
         """
         Compute the constraint function.
         """
+        if self._batchable:
+            # evaluates all the constraints at once, rather than going
+            # through the depend objects of each of them
+            return self.batch_gfunc(
+                dstrip(self.q)[np.newaxis], self.batch_values()[np.newaxis]
+            )[0]
         r = np.zeros(self.ncons)
         si = 0
         for constr in self.constraint_list:
@@ -531,8 +622,156 @@ class ConstraintList(ConstraintBase):
             si += constr.ncons
         return r
 
+    def Dgsfunc(self):
+        """
+        Compute the Jacobian of the constraint function as a CSR matrix.
+        """
+        data = np.concatenate(
+            [dstrip(constr.Dg).flatten() for constr in self.constraint_list]
+        )
+        return sps.csr_matrix(
+            (data, (self.dgs_rows, self.dgs_cols)),
+            shape=(self.ncons, 3 * self.n_unique),
+        )
+
+    def Gfunc(self):
+        """Computes the mass-scaled Gram matrix, using the sparse Jacobian
+        if available."""
+
+        if not self.sparse:
+            return super(ConstraintList, self).Gfunc()
+        dgs = self.Dgs
+        return (dgs.multiply(1.0 / dstrip(self.m3)) @ dgs.T).toarray()
+
+    def Dg_dot(self, x):
+        if not self.sparse:
+            return super(ConstraintList, self).Dg_dot(x)
+        return self.Dgs.dot(x)
+
+    def DgT_dot(self, x):
+        if not self.sparse:
+            return super(ConstraintList, self).DgT_dot(x)
+        return self.Dgs.T.dot(x)
+
+    def batch_key(self):
+        keys = tuple(constr.batch_key() for constr in self.constraint_list)
+        if None in keys:
+            return None
+        return (
+            self.__class__.__name__,
+            self.n_unique,
+            keys,
+            tuple(ic3.tobytes() for ic3 in self.ic3_map),
+        )
+
+    def batch_values(self):
+        return np.concatenate(
+            [constr.batch_values() for constr in self.constraint_list]
+        )
+
+    def batch_gfunc(self, q, values):
+        """
+        Compute the constraint function for a stack of groups of atoms.
+        """
+        r = np.zeros((len(q), self.ncons))
+        si = 0
+        for ic, constr in enumerate(self.constraint_list):
+            sl = slice(si, si + constr.ncons)
+            r[:, sl] = constr.batch_gfunc(q[:, self.ic3_map[ic]], values[:, sl])
+            si += constr.ncons
+        return r
+
+    def batch_Dgfunc(self, q, values):
+        """
+        Compute the Jacobian of the constraint function for a stack of groups of atoms.
+        """
+        r = np.zeros((len(q), self.ncons, q.shape[1]))
+        si = 0
+        for ic, constr in enumerate(self.constraint_list):
+            sl = slice(si, si + constr.ncons)
+            r[:, sl, self.ic3_map[ic]] = constr.batch_Dgfunc(
+                q[:, self.ic3_map[ic]], values[:, sl]
+            )
+            si += constr.ncons
+        return r
+
     def get_iai(self):
         iai = []
         for constr in self.constraint_list:
             iai += list(constr.get_iai())
         return np.unique(iai)
+
+
+class ConstraintBatch(object):
+    """Stack of independent groups of constraints that have the same
+    structure (same constraint types acting on the same number of atoms,
+    in the same order), e.g. the rigid-body constraints of all the water
+    molecules in a box. The constraint functions, Jacobians and Gram
+    matrices of all the groups are evaluated with vectorised calls on
+    (nbatch, ...) arrays, rather than group by group through the depend
+    machinery of each constraint.
+
+    Attributes:
+        constraint_list: The constraints in the batch.
+        template: The first constraint, used to evaluate the stacked functions.
+        ncons: The number of constraints in each group.
+        i3_unique: A (nbatch, 3*n_unique) array with the indices of the
+            degrees of freedom involved in each group.
+        values: A (nbatch, ncons) array with the target values.
+        qprev: A (nbatch, 3*n_unique) array with the positions at which
+            the Jacobian is evaluated.
+    """
+
+    def __init__(self, constraint_list):
+        """Initialises the batch. The constraints must be bound, and must
+        all return the same batch_key()."""
+
+        self.constraint_list = constraint_list
+        self.template = constraint_list[0]
+        self.ncons = self.template.ncons
+        self.i3_unique = np.array([constr.i3_unique for constr in constraint_list])
+        self.values = np.array([constr.batch_values() for constr in constraint_list])
+        self.qprev = np.zeros(self.i3_unique.shape)
+        self._Dg = None
+        self._m3 = None
+        self._iGram = None
+
+    def set_qprev(self, q):
+        """Sets the positions at which the Jacobian is evaluated, extracting
+        them from a full 3*natoms position vector."""
+
+        self.qprev = q[self.i3_unique]
+        self._Dg = None
+        self._iGram = None
+
+    def g(self, q, active=slice(None)):
+        """Constraint functions at the stacked positions q, optionally
+        restricted to the groups selected by active."""
+
+        return self.template.batch_gfunc(q[active], self.values[active])
+
+    def Dg(self):
+        """ Jacobians of the constraints, evaluated at qprev. """
+
+        if self._Dg is None:
+            self._Dg = self.template.batch_Dgfunc(self.qprev, self.values)
+        return self._Dg
+
+    def Dg_at(self, q, active=slice(None)):
+        """Jacobians of the constraints at the stacked positions q, optionally
+        restricted to the groups selected by active."""
+
+        return self.template.batch_Dgfunc(q[active], self.values[active])
+
+    def iGram(self, m3):
+        """Inverses of the mass-scaled Gram matrices of the groups, given the
+        (nbatch, 3*n_unique) masses. The inverses are computed once for each
+        qprev, as they are applied many times within each projection."""
+
+        if self._iGram is None or not np.array_equal(m3, self._m3):
+            dg = self.Dg()
+            self._m3 = m3.copy()
+            self._iGram = np.linalg.inv(
+                np.matmul(dg / m3[:, np.newaxis, :], dg.transpose((0, 2, 1)))
+            )
+        return self._iGram
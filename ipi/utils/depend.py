@@ -44,6 +44,7 @@ __all__ = [
     "dcopy",
     "dstrip",
     "depraise",
+    "dbatch",
 ]
 
 
@@ -262,8 +263,10 @@ class depend_base(object):
 
         self._tainted[:] = True
         for item in self._dependants:
-            if not item()._tainted[0]:
-                item().taint()
+            item = item()
+            # dependants that have been garbage collected are skipped
+            if item is not None and not item._tainted[0]:
+                item.taint()
         if self._synchro is not None:
             for v in list(self._synchro.synced.values()):
                 if (not v._tainted[0]) and (v is not self):
@@ -317,6 +320,15 @@ class depend_base(object):
                 + self._name
                 + ">"
             )
+
+        pending = getattr(_batch, "pending", None)
+        if pending is not None:
+            # inside a dbatch block: the value is up to date, but propagating
+            # the taint to the dependants is deferred to the end of the block
+            if self._active[0]:
+                self._tainted[:] = False
+            pending.append(self)
+            return
         self.taint(taintme=False)
 
     def set(self, value, manual=False):
@@ -833,6 +845,70 @@ def depraise(exception):
     raise exception
 
 
+# holds the writes collected by the dbatch blocks of each thread
+_batch = threading.local()
+
+
+class dbatch(object):
+
+    """Context manager that groups together manual updates of depend objects.
+
+    Within a dbatch block, setting the value of a depend object updates its
+    value but does not taint its dependants (or the objects it is synchronized
+    with). The taint is propagated once for each of the objects that have been
+    set, when the outermost block is exited. This avoids repeated taint
+    cascades over large dependency networks when the same arrays are updated
+    several times in a row, e.g. in the momentum steps of an integrator.
+
+    Within the block one can read back the objects that have been set, and
+    any quantity that does not depend on them, but NOT the quantities that
+    depend on (or are synchronized with) them, as those have not been
+    invalidated yet. If two synchronized objects are set in the same block,
+    the one that has been set last is taken to hold the correct value.
+    Blocks are local to the thread that opens them, and can be nested.
+    """
+
+    def __init__(self, active=True):
+        """Initialises dbatch.
+
+        Args:
+            active: If False, the block does nothing and the taint is
+                propagated immediately as usual.
+        """
+
+        self.active = active
+
+    def __enter__(self):
+        if not self.active:
+            return self
+        depth = getattr(_batch, "depth", 0)
+        if depth == 0:
+            _batch.pending = []
+        _batch.depth = depth + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.active:
+            return False
+        _batch.depth -= 1
+        if _batch.depth > 0:
+            return False
+
+        pending = _batch.pending
+        _batch.pending = None
+        done = set()
+        for obj in pending:
+            # slices share the flag arrays with their parent, so only taint once
+            if id(obj._tainted) in done:
+                continue
+            done.add(id(obj._tainted))
+            if obj._synchro is not None and obj._synchro.manual != obj._name:
+                # a synchronized object has been set afterwards and takes over
+                continue
+            obj.taint(taintme=False)
+        return False
+
+
 class dobject(object):
 
     """Class that allows standard notation to be used for depend objects.
@@ -49,71 +49,18 @@ def clean_hessian(h, q, natoms, nbeads, m, m3, asr, mofi=False):
     info(" @clean_hessian: asr = %s " % asr, verbosity.medium)
     # Set some useful things
     ii = natoms * nbeads
-    mm = np.zeros((nbeads, natoms))
-    for i in range(nbeads):
-        mm[i] = m
-    mm = mm.reshape(ii)
     ism = m3.reshape((ii * 3, 1)) ** (-0.5)
     dynmat = np.multiply(ism.T, np.multiply(h, ism))
     # ismm = np.outer(ism, ism)
     # dynmat = np.multiply(h, ismm)
 
-    if asr == "none" or asr is None:
+    D, I = external_modes(q, natoms, nbeads, m, m3, asr, mofi=True)
+    if D is None:
         hm = dynmat
     else:
-        # Computes the centre of mass.
-        com = np.dot(np.transpose(q.reshape((ii, 3))), mm) / mm.sum()
-        qminuscom = q.reshape((ii, 3)) - com
-        ism = ism.flatten()
-
-        if asr == "poly":
-            # Computes the moment of inertia tensor.
-            moi = np.zeros((3, 3), float)
-            for k in range(ii):
-                moi -= (
-                    np.dot(
-                        np.cross(qminuscom[k], np.identity(3)),
-                        np.cross(qminuscom[k], np.identity(3)),
-                    )
-                    * mm[k]
-                )
-
-            I, U = np.linalg.eig(moi)
-            R = np.dot(qminuscom, U)
-            D = np.zeros((6, 3 * ii), float)
-
-            # Computes the vectors along translations and rotations.
-            # Translations
-            D[0] = np.tile([1, 0, 0], ii) / ism
-            D[1] = np.tile([0, 1, 0], ii) / ism
-            D[2] = np.tile([0, 0, 1], ii) / ism
-            # Rotations
-            for i in range(3 * ii):
-                iatom = i // 3
-                idof = np.mod(i, 3)
-                D[3, i] = (R[iatom, 1] * U[idof, 2] - R[iatom, 2] * U[idof, 1]) / ism[i]
-                D[4, i] = (R[iatom, 2] * U[idof, 0] - R[iatom, 0] * U[idof, 2]) / ism[i]
-                D[5, i] = (R[iatom, 0] * U[idof, 1] - R[iatom, 1] * U[idof, 0]) / ism[i]
-
-            for k in range(6):
-                D[k] = D[k] / np.linalg.norm(D[k])
-            # Computes the transformation matrix.
-            transfmatrix = np.eye(3 * ii) - np.dot(D.T, D)
-            hm = np.dot(transfmatrix.T, np.dot(dynmat, transfmatrix))
-
-        elif asr == "crystal":
-            # Computes the vectors along translations.
-            # Translations
-            D = np.zeros((3, 3 * ii), float)
-            D[0] = np.tile([1, 0, 0], ii) / ism
-            D[1] = np.tile([0, 1, 0], ii) / ism
-            D[2] = np.tile([0, 0, 1], ii) / ism
-
-            for k in range(3):
-                D[k] = D[k] / np.linalg.norm(D[k])
-            # Computes the transformation matrix.
-            transfmatrix = np.eye(3 * ii) - np.dot(D.T, D)
-            hm = np.dot(transfmatrix.T, np.dot(dynmat, transfmatrix))
+        # Computes the transformation matrix.
+        transfmatrix = np.eye(3 * ii) - np.dot(D.T, D)
+        hm = np.dot(transfmatrix.T, np.dot(dynmat, transfmatrix))
 
     # Symmetrize to use linalg.eigh
     hmT = hm.T
@@ -167,17 +114,105 @@ def clean_hessian(h, q, natoms, nbeads, m, m3, asr, mofi=False):
         w = np.delete(w, list(range(nneg.size, nneg.size + nzero.size)), axis=1)
 
     if mofi:
-        if asr == "poly":
-            return d, w, np.prod(I)
-        else:
-            return d, w, 1.0
+        return d, w, I
     else:
         return d, w
 
 
-def get_hessian(gm, x0, natoms, nbeads=1, fixatoms=[], d=0.001):
+def external_modes(q, natoms, nbeads, m, m3, asr, mofi=False):
+    """
+    Mass-weighted displacements along the external (translational and, for
+    asr = 'poly', rotational) modes that clean_hessian projects out.
+    IN  q      = positions
+        natoms = number of atoms
+        nbeads = number of beads
+        m      = mass vector, one value for each atom
+        m3     = mass vector, one value for each degree of freedom
+        asr    = 'none', 'poly' or 'crystal'
+        mofi   = An optional boolean which decides whether the det(M_of_I)
+                 is returned or not
+    OUT D      = normalised external modes, one per row, or None if asr is 'none'
+    """
+
+    ii = natoms * nbeads
+    if asr == "none" or asr is None:
+        D = None
+        I = 1.0
+    else:
+        mm = np.zeros((nbeads, natoms))
+        for i in range(nbeads):
+            mm[i] = m
+        mm = mm.reshape(ii)
+        ism = m3.reshape(ii * 3) ** (-0.5)
+
+        # Computes the centre of mass.
+        com = np.dot(np.transpose(q.reshape((ii, 3))), mm) / mm.sum()
+        qminuscom = q.reshape((ii, 3)) - com
+
+        if asr == "poly":
+            # Computes the moment of inertia tensor.
+            moi = np.zeros((3, 3), float)
+            for k in range(ii):
+                moi -= (
+                    np.dot(
+                        np.cross(qminuscom[k], np.identity(3)),
+                        np.cross(qminuscom[k], np.identity(3)),
+                    )
+                    * mm[k]
+                )
+
+            I, U = np.linalg.eig(moi)
+            R = np.dot(qminuscom, U)
+            D = np.zeros((6, 3 * ii), float)
+
+            # Computes the vectors along translations and rotations.
+            # Translations
+            D[0] = np.tile([1, 0, 0], ii) / ism
+            D[1] = np.tile([0, 1, 0], ii) / ism
+            D[2] = np.tile([0, 0, 1], ii) / ism
+            # Rotations
+            for i in range(3 * ii):
+                iatom = i // 3
+                idof = np.mod(i, 3)
+                D[3, i] = (R[iatom, 1] * U[idof, 2] - R[iatom, 2] * U[idof, 1]) / ism[i]
+                D[4, i] = (R[iatom, 2] * U[idof, 0] - R[iatom, 0] * U[idof, 2]) / ism[i]
+                D[5, i] = (R[iatom, 0] * U[idof, 1] - R[iatom, 1] * U[idof, 0]) / ism[i]
+            I = np.prod(I)
+
+        elif asr == "crystal":
+            # Computes the vectors along translations.
+            # Translations
+            D = np.zeros((3, 3 * ii), float)
+            D[0] = np.tile([1, 0, 0], ii) / ism
+            D[1] = np.tile([0, 1, 0], ii) / ism
+            D[2] = np.tile([0, 0, 1], ii) / ism
+            I = 1.0
+
+        for k in range(len(D)):
+            D[k] = D[k] / np.linalg.norm(D[k])
+
+    if mofi:
+        return D, I
+    else:
+        return D
+
+
+def get_hessian(
+    gm, x0, natoms, nbeads=1, fixatoms=[], d=0.001, batch=1, symmetrize=False
+):
     """Compute the physical hessian given a function to evaluate energy and forces (gm).
-    The intermediate steps are written as a temporary files so the full hessian calculations is only ONE step.
+
+    The rows are computed by central finite differences, displacing each
+    active degree of freedom in all the beads at once. If batch > 1 and
+    the gradient mapper provides a batch_gradient() method, the 2*batch
+    displaced configurations of batch rows are evaluated together, so that
+    they can be dispatched to all the available clients in parallel.
+
+    The completed rows are stored in a binary file (hessian_tmp.npy) that is
+    accessed through a memory map, and the rows that have been completed are
+    marked in a second file (hessian_done.npy). Rows are only ever written
+    once, so if the calculation is interrupted it restarts from the rows that
+    are missing, and the full hessian calculation is still only ONE step.
 
     IN     gm       = gradient mapper
            x0       = position vector
@@ -185,6 +220,12 @@ def get_hessian(gm, x0, natoms, nbeads=1, fixatoms=[], d=0.001):
            nbeads   = number of beads
            fixatoms = indexes of fixed atoms
            d        = displacement
+           batch    = number of rows to be computed together
+           symmetrize = symmetrize each bead block of the hessian once all
+                      the rows are known, averaging the finite-difference
+                      estimates of H_ij and H_ji. This reduces the noise of
+                      the finite differences, but does not save any force
+                      evaluation, since every row needs its own displacement
 
     OUT    h       = physical hessian ( (natoms-len(fixatoms) )*3 , nbeads*( natoms-len(fixatoms) )*3)
     """
@@ -197,53 +238,156 @@ def get_hessian(gm, x0, natoms, nbeads=1, fixatoms=[], d=0.001):
         raise ValueError(
             "The position vector is not consistent with the number of atoms/beads."
         )
+    x0 = np.asarray(x0).reshape((nbeads, natoms * 3))
 
-    h = np.zeros((ii, ii * nbeads), float)
-
-    # Check if there is a temporary file:
-    i0 = -1
+    # indices of the active degrees of freedom in the full position vector
+    fixdof = (3 * np.asarray(fixatoms, int)[:, np.newaxis] + np.arange(3)).flatten()
+    iact = np.delete(np.arange(natoms * 3), fixdof)
 
-    for i in range(ii, -1, -1):
+    # Check if there is a (consistent) temporary file, otherwise start anew
+    hfile, dfile = "hessian_tmp.npy", "hessian_done.npy"
+    h, done = None, None
+    if os.path.exists(hfile) and os.path.exists(dfile):
         try:
-            b = np.loadtxt("hessian_" + str(i) + ".tmp")
-        except IOError:
-            pass
+            h = np.lib.format.open_memmap(hfile, mode="r+")
+            done = np.lib.format.open_memmap(dfile, mode="r+")
+        except (IOError, ValueError):
+            h, done = None, None
         else:
-            h[:, :] = b[:, :]
-            i0 = i
-            print(("We have found a temporary file ( hessian_" + str(i) + ".tmp). "))
-            if (
-                b.shape == h.shape
-            ):  # Check that the last temporary file was properly written
-                break
+            if h.shape != (ii, ii * nbeads) or done.shape != (ii,):
+                h, done = None, None
             else:
-                continue
+                info(
+                    " @get_hessian: Restarting from a temporary file, %d rows of %d already computed."
+                    % (np.count_nonzero(done), ii),
+                    verbosity.low,
+                )
+    if h is None:
+        h = np.lib.format.open_memmap(
+            hfile, mode="w+", dtype=float, shape=(ii, ii * nbeads)
+        )
+        done = np.lib.format.open_memmap(dfile, mode="w+", dtype=np.uint8, shape=(ii,))
+
+    batched = batch > 1 and hasattr(gm, "batch_gradient")
+    if not batched:
+        batch = 1
 
     # Start calculation:
-    for j in range(i0 + 1, ii):
+    todo = np.flatnonzero(done == 0)
+    for k in range(0, len(todo), batch):
+        rows = todo[k : k + batch]
         info(
-            " @get_hessian: Computing hessian: %d of %d" % ((j + 1), ii), verbosity.low
+            " @get_hessian: Computing hessian: %d to %d of %d"
+            % (rows[0] + 1, rows[-1] + 1, ii),
+            verbosity.low,
         )
-        x = x0.copy()
 
-        x[:, j] = x0[:, j] + d
-        e, f1 = gm(x, new_disc=False)
-        x[:, j] = x0[:, j] - d
-        e, f2 = gm(x, new_disc=False)
-        g = (f1 - f2) / (2 * d)
+        # positive and negative displacements of each row
+        x = np.tile(x0, (len(rows), 2, 1, 1))
+        for r, j in enumerate(rows):
+            x[r, 0, :, iact[j]] += d
+            x[r, 1, :, iact[j]] -= d
 
-        h[j, :] = g.flatten()
+        if batched:
+            g = gm.batch_gradient(x.reshape((-1, nbeads, natoms * 3)))
+            g = g.reshape((len(rows), 2, nbeads, ii))
+        else:
+            e, f1 = gm(x[0, 0], new_disc=False)
+            e, f2 = gm(x[0, 1], new_disc=False)
+            g = np.asarray([[f1, f2]]).reshape((1, 2, nbeads, ii))
 
-        f = open("hessian_" + str(j) + ".tmp", "w")
-        np.savetxt(f, h)
-        f.close()
+        h[rows, :] = ((g[:, 0] - g[:, 1]) / (2 * d)).reshape((len(rows), -1))
+        # the rows are marked as done only once they are safely on disk
+        h.flush()
+        done[rows] = 1
+        done.flush()
 
     u, g = gm(x0)  # Keep the mapper updated
 
-    for i in range(ii):
+    hessian = np.array(h)
+    del h, done
+    for fname in (hfile, dfile):
         try:
-            os.remove("hessian_" + str(i) + ".tmp")
+            os.remove(fname)
         except OSError:
             pass
 
+    if symmetrize:
+        for b in range(nbeads):
+            block = hessian[:, b * ii : (b + 1) * ii]
+            block[:] = 0.5 * (block + block.T)
+
+    return hessian
+
+
+def lattice_translations(q, h, labels, symprec=1e-4):
+    """Finds the lattice translations that map a periodic system onto itself,
+    e.g. the translations by the primitive cell vectors in a supercell.
+
+    IN     q       = positions (3*natoms)
+           h       = cell matrix, with the cell vectors as columns
+           labels  = species of the atoms; only atoms with the same label can
+                     be equivalent
+           symprec = tolerance (in bohr) to consider two positions equal
+
+    OUT    perms   = (ntrans, natoms) array. perms[t, i] is the index of the
+                     atom onto which atom i is mapped by the t-th translation.
+                     The first translation is the identity.
+    """
+
+    labels = np.unique(np.asarray(labels), return_inverse=True)[1]
+    natoms = len(labels)
+    s = np.dot(np.reshape(q, (natoms, 3)), np.linalg.inv(h).T)
+    # processes the atoms in chunks, to limit the memory used for distances
+    chunk = max(1, 2 ** 21 // natoms)
+
+    perms = [np.arange(natoms)]
+    for j in range(1, natoms):
+        if labels[j] != labels[0]:
+            continue
+        st = s + (s[j] - s[0])
+        perm = np.zeros(natoms, int)
+        for i0 in range(0, natoms, chunk):
+            ds = st[i0 : i0 + chunk, np.newaxis, :] - s[np.newaxis, :, :]
+            ds -= np.round(ds)
+            d2 = np.sum(np.dot(ds, h.T) ** 2, axis=2)
+            d2[labels[i0 : i0 + chunk, np.newaxis] != labels[np.newaxis, :]] = np.inf
+            perm[i0 : i0 + chunk] = np.argmin(d2, axis=1)
+            if d2[np.arange(len(d2)), perm[i0 : i0 + chunk]].max() > symprec ** 2:
+                break
+        else:
+            if len(np.unique(perm)) == natoms:
+                perms.append(perm)
+    return np.asarray(perms)
+
+
+def irreducible_atoms(perms):
+    """Returns the indices of a set of atoms, one for each class of atoms
+    that are equivalent by the translations in perms (see lattice_translations)."""
+
+    return np.unique(perms.min(axis=0))
+
+
+def expand_translations(h, perms, reps):
+    """Fills the rows of a (3*natoms, 3*natoms) force-constant (or
+    dynamical) matrix, given the rows of the irreducible atoms reps, using
+    the invariance under the lattice translations in perms. Equivalent
+    atoms must have the same mass if h is mass-scaled."""
+
+    ra = (3 * np.asarray(reps)[:, np.newaxis] + np.arange(3)).flatten()
+    for perm in perms[1:]:
+        p3 = (3 * perm[:, np.newaxis] + np.arange(3)).flatten()
+        h[np.ix_(p3[ra], p3)] = h[ra]
     return h
+
+
+def apply_translational_invariance(h):
+    """Enforces the acoustic sum rule on a force-constant matrix, by setting
+    the diagonal 3x3 blocks so that each row sums to zero, i.e. so that a
+    rigid translation gives no force."""
+
+    natoms = len(h) // 3
+    h3 = h.reshape((natoms, 3, natoms, 3))
+    idx = np.arange(natoms)
+    h3[idx, :, idx, :] -= h3.sum(axis=2)
+    return h3.reshape(h.shape)
@@ -20,38 +20,6 @@ def banded_hessian(h, im, masses=True, shift=0.001):
     ii = natoms * 3 * nbeads
     ndiag = natoms * 3 + 1  # only upper diagonal form
 
-    href = np.zeros((ndiag, ii))
-
-    # add physical part
-    for i in range(nbeads):
-        h_aux = h[
-            :, i * natoms * 3 : (i + 1) * natoms * 3
-        ]  # Peaks one physical hessian
-        for j in range(1, ndiag):
-            href[j, (ndiag - 1 - j) + i * natoms * 3 : (i + 1) * natoms * 3] = np.diag(
-                h_aux, ndiag - 1 - j
-            )
-
-    # add spring parts
-    if nbeads > 1:
-        # Diagonal
-        if masses:
-            d_corner = im.dbeads.m3[0] * im.omega2
-        else:
-            d_corner = np.ones(im.dbeads.m3[0].shape) * im.omega2
-
-        d_0 = np.array([[d_corner * 2]]).repeat(im.dbeads.nbeads - 2, axis=0).flatten()
-        diag_sp = np.concatenate((d_corner, d_0, d_corner))
-        href[-1, :] += diag_sp
-
-        # Non-Diagonal
-        d_out = -d_corner
-        ndiag_sp = np.array([[d_out]]).repeat(im.dbeads.nbeads - 1, axis=0).flatten()
-        href[0, :] = np.concatenate((np.zeros(natoms * 3), ndiag_sp))
-
-    # Add safety shift value
-    href[-1, :] += shift
-
     # ------- new Discretization --------------
     hnew = np.zeros((ndiag, ii))
 
@@ -151,6 +119,167 @@ def diag_banded(A, n=2):
     return d
 
 
+def band_matvec(A, x):
+    """A is in upper banded form.
+    Returns the product of the (symmetric) A with the vector, or with the
+    columns of the matrix, x."""
+
+    u = len(A) - 1
+    if x.ndim > 1:
+        A = A[..., np.newaxis]
+    y = A[u] * x
+    for k in range(1, u + 1):
+        y[:-k] += A[u - k, k:] * x[k:]
+        y[k:] += A[u - k, k:] * x[:-k]
+    return y
+
+
+def shifted_solver(A, shift=0.0):
+    """A is in upper banded form.
+    LU-factorises A - shift once and returns a function that solves
+    (A - shift) x = b for any number of right hand sides."""
+
+    try:
+        from scipy.linalg.lapack import dgbtrf, dgbtrs
+
+        info("Import of scipy successful", verbosity.high)
+    except ImportError:
+        raise ValueError(" @shifted_solver: scipy is needed for banded solvers")
+
+    u = len(A) - 1
+    ab = np.zeros((3 * u + 1, A.shape[1]))  # the first u rows hold the fill-in
+    ab[u:] = sym_band(A)
+    ab[2 * u] -= shift
+    lu, piv, err = dgbtrf(ab, u, u)
+    if err != 0:
+        raise ValueError(" @shifted_solver: singular matrix (dgbtrf info %d)" % err)
+
+    def solve(b):
+        x, err = dgbtrs(lu, u, u, b, piv)
+        return x
+
+    return solve
+
+
+def nichols_banded(h, f, big_step, mode=1, D=None):
+    """Nichols step (JCP 92,340 (1990)) for a ring-polymer dynamical matrix
+    in upper banded form, without building the (3*natoms*nbeads)^2 matrix.
+    IN    h        = upper banded dynmat, spring terms included
+          f        = mass-scaled forces (physical + spring)
+          big_step = maximum step, only used to find minima (mode = 0)
+          mode     = 1 for first order saddle points, 0 for minima
+          D        = external modes (one per row) to be projected out, or None
+    OUT   d        = three lowest eigenvalues of the (projected) dynmat
+          d_x      = mass-scaled displacement
+
+    The step alpha*sum_j w_j (w_j.f) / (d_j-lamb) of mintools.nichols is
+    alpha*(h-lamb)^-1 f, so it only needs the lowest eigenpairs, which come
+    from eig_banded, and a banded solve. The projected dynmat
+    (1-D^T D) h (1-D^T D) is not banded: it is written as h plus a low rank
+    term, with the external modes moved to the top of the spectrum, and
+    handled with the Woodbury identity and a shift-invert Lanczos (eigsh)."""
+
+    try:
+        from scipy.linalg import eig_banded
+        from scipy.sparse.linalg import LinearOperator, eigsh
+
+        info("Import of scipy successful", verbosity.high)
+    except ImportError:
+        raise ValueError(" @nichols_banded: scipy is needed for banded solvers")
+
+    n = h.shape[1]
+    g = f.reshape(n).copy()
+
+    if D is None:
+
+        def solver(lamb):
+            return shifted_solver(h, lamb)
+
+        d, w = eig_banded(h, select="i", select_range=(0, 2), check_finite=False)
+    else:
+        D = np.linalg.qr(D.T)[0]  # orthonormal columns
+        k = D.shape[1]
+        g -= np.dot(D, np.dot(D.T, g))
+        Y = band_matvec(h, D)
+        # external modes are shifted well above the largest eigenvalue
+        s = 2.0 * np.amax(band_matvec(np.absolute(h), np.ones(n)))
+        # P h P + s D D^T = h + U C U^T
+        U = np.hstack((D, Y))
+        C = np.block(
+            [
+                [np.dot(D.T, Y) + s * np.eye(k), -np.eye(k)],
+                [-np.eye(k), np.zeros((k, k))],
+            ]
+        )
+        iC = np.linalg.inv(C)
+
+        def solver(lamb):
+            solve = shifted_solver(h, lamb)
+            iBU = solve(U)
+            iS = np.linalg.inv(iC + np.dot(U.T, iBU))
+
+            def woodbury(b):
+                iBb = solve(b)
+                return iBb - np.dot(iBU, np.dot(iS, np.dot(U.T, iBb)))
+
+            return woodbury
+
+        def matvec(x):
+            x = x.reshape(n)
+            return band_matvec(h, x) + np.dot(U, np.dot(C, np.dot(U.T, x)))
+
+        # eigenvalues of the projected dynmat are bounded from below by those of h
+        sigma = eig_banded(
+            h, select="i", select_range=(0, 0), eigvals_only=True, check_finite=False
+        )[0]
+        sigma -= 1e-3 * s
+        solve = solver(sigma)
+        d, w = eigsh(
+            LinearOperator((n, n), matvec=matvec, dtype=float),
+            k=3,
+            sigma=sigma,
+            which="LM",
+            OPinv=LinearOperator(
+                (n, n), matvec=lambda x: solve(x.reshape(n)), dtype=float
+            ),
+        )
+        order = np.argsort(d)
+        d, w = d[order], w[:, order]
+
+    if mode == 0:
+        # Minimization
+        alpha = 1.0
+        lamb = 0.0
+        if d[0] > 0:
+            d_x = alpha * solver(lamb)(g)
+        if d[0] <= 0 or np.dot(d_x, d_x) > big_step ** 2:
+            lamb = d[0] - np.absolute(np.dot(w[:, 0], g) / big_step)
+            d_x = alpha * solver(lamb)(g)
+
+    elif mode == 1:
+        if d[0] > 0:
+            if d[1] / 2 > d[0]:
+                alpha = 1
+                lamb = (2 * d[0] + d[1]) / 4
+            else:
+                alpha = (d[1] - d[0]) / d[1]
+                lamb = (3 * d[0] + d[1]) / 4
+        elif d[1] < 0:  # Jeremy Richardson
+            if d[1] >= d[0] / 2:
+                alpha = 1
+                lamb = (d[0] + 2 * d[1]) / 4
+            else:
+                alpha = (d[0] - d[1]) / d[1]
+                lamb = (d[0] + 3 * d[1]) / 4
+        else:  # Only d[0] <0
+            alpha = 1
+            lamb = (d[0] + d[1]) / 4
+
+        d_x = alpha * solver(lamb)(g)
+
+    return d, d_x
+
+
 def red2comp(h, nbeads, natoms, coef=None):
     """Takes the reduced physical hessian (3*natoms*nbeads,3*natoms)
     and construct the 'complete' one (3*natoms*nbeads)^2"""
@@ -284,10 +413,15 @@ def print_instanton_geo(
     outfile2.close_stream()
 
 
-def print_instanton_hess(prefix, step, hessian, output_maker):
-    """ Print physical part of the instanton hessian """
-    outfile = output_maker.get_output(prefix + ".hess_" + str(step), "w")
-    np.savetxt(outfile, hessian.reshape(1, hessian.size))
+def print_instanton_hess(prefix, step, hessian, output_maker, binary=False):
+    """Print physical part of the instanton hessian, either as a line of text
+    or, if binary is True, as a .npy file that is streamed to disk as is"""
+    if binary:
+        outfile = output_maker.get_output(prefix + ".hess_" + str(step) + ".npy", "wb")
+        np.save(outfile, hessian)
+    else:
+        outfile = output_maker.get_output(prefix + ".hess_" + str(step), "w")
+        np.savetxt(outfile, hessian.reshape(1, hessian.size))
     outfile.close_stream()
 
 
@@ -420,7 +420,8 @@ def open_backup(filename, mode="r", buffering=-1):
 
 
 def netstring_encoded_savez(ofile, compressed=True, **named_objs):
-    output = io.StringIO()
+    # npz archives are binary, so ofile must be opened in binary mode
+    output = io.BytesIO()
     if compressed:
         # np.savez_compressed(output,*unnamed_objs,**named_objs)
         np.savez_compressed(output, **named_objs)
@@ -428,25 +429,25 @@ def netstring_encoded_savez(ofile, compressed=True, **named_objs):
         # np.savez(output,*unnamed_objs,**named_objs)
         np.savez(output, **named_objs)
     content = output.getvalue()
-    ofile.write(str(len(content)) + ":" + content + ",")
+    ofile.write(str(len(content)).encode() + b":" + content + b",")
 
 
 def netstring_encoded_loadz(ifile):
     # read string length
     c = ifile.read(1)
-    if c == "0":
+    if c == b"0":
         raise ValueError("Reading an empty netstring")
-    length = ""
-    while c in ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"]:
+    length = b""
+    while c.isdigit():
         length += c
         c = ifile.read(1)
-    if not c == ":":
+    if not c == b":":
         raise ValueError("Invalid netstring delimiter")
     content = ifile.read(int(length))
-    if not ifile.read(1) == ",":
+    if not ifile.read(1) == b",":
         raise ValueError("Invalid netstring delimiter")
 
-    istr = io.StringIO(content)
+    istr = io.BytesIO(content)
     npz = np.load(istr)
     rdic = {}
     for a in npz.files:
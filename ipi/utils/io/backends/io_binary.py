@@ -38,7 +38,10 @@ def print_binary(
     nat[0] = len(names)
     nat.tofile(buff)
     np.asarray([names]).tofile(buff)
-    # also saves the title to the file.
+    # also saves the title to the file, with its length so that frames can
+    # be read one after the other
+    nat[0] = len(title)
+    nat.tofile(buff)
     np.asarray([title]).tofile(buff)
 
 
@@ -53,7 +56,8 @@ def read_binary(filedesc):
         names = "".join(names)
         names = names.split("|")
         masses = np.zeros(len(names))
-        title = "".join(np.fromfile(filedesc, dtype="|U1", count=-1))
-    except (StopIteration, ValueError):
+        nat = np.fromfile(filedesc, dtype=int, count=1)[0]
+        title = "".join(np.fromfile(filedesc, dtype="|U1", count=nat))
+    except (StopIteration, ValueError, IndexError):
         raise EOFError
     return (title, cell, qatoms, names, masses)
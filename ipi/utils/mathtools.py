@@ -5,11 +5,13 @@
 # See the "licenses" directory for full license information.
 
 
+import itertools
 import math
 
 import numpy as np
 
 from ipi.utils.messages import verbosity, warning
+from ipi.utils import pbctools
 
 
 __all__ = [
@@ -25,6 +27,7 @@ __all__ = [
     "root_herm",
     "logsumlog",
     "gaussian_inv",
+    "neighbour_pairs",
 ]
 
 
@@ -406,6 +409,66 @@ def root_herm(A):
     return rv
 
 
+def neighbour_pairs(q, h, ih, rcut, s=None):
+    """Finds the pairs of atoms closer than a cutoff with a cell-list search.
+
+    Distances are computed by folding the scaled separations into [-0.5, 0.5),
+    which is the minimum image only for orthorhombic cells.
+
+    Args:
+       q: An array with the (natoms, 3) atomic positions.
+       h: The cell matrix, with the lattice vectors as columns.
+       ih: The inverse of the cell matrix.
+       rcut: The cutoff distance.
+       s: Optional fractional coordinates of the atoms, e.g. as cached by
+          Cell.fractional(), that are otherwise computed from q.
+
+    Returns:
+       Two arrays with the indices i >= j of the pairs, including each atom
+       with itself, sorted by i and then by j.
+    """
+
+    if s is None:
+        s = pbctools.fractional(np.reshape(q, (-1, 3)), ih)
+    else:
+        s = np.reshape(s, (-1, 3))
+    natoms = len(s)
+
+    # bins along each lattice vector are at least rcut wide, so that all the
+    # neighbours are in the adjacent bins. with fewer than three bins along
+    # a direction, the adjacent bins are just all the bins.
+    nbin = np.maximum(np.floor(1.0 / (np.linalg.norm(ih, axis=1) * rcut)), 1)
+    nbin = nbin.astype(int)
+    ibin = np.minimum(((s - np.floor(s)) * nbin).astype(int), nbin - 1)
+    cid = np.ravel_multi_index(ibin.T, nbin)
+    order = np.argsort(cid, kind="stable")
+    count = np.bincount(cid, minlength=nbin.prod())
+    start = np.cumsum(count) - count
+
+    shifts = [np.arange(-1, 2) if n > 2 else np.arange(n) for n in nbin]
+    pi, pj = [], []
+    for shift in itertools.product(*shifts):
+        ncid = np.ravel_multi_index(((ibin + shift) % nbin).T, nbin)
+        # all the atoms j in bin ncid for each atom i
+        nj = count[ncid]
+        i = np.repeat(np.arange(natoms), nj)
+        offset = np.arange(nj.sum()) - np.repeat(np.cumsum(nj) - nj, nj)
+        j = order[np.repeat(start[ncid], nj) + offset]
+        sel = j <= i
+        pi.append(i[sel])
+        pj.append(j[sel])
+    pi = np.concatenate(pi)
+    pj = np.concatenate(pj)
+
+    d = pbctools.fold(s[pi] - s[pj])
+    d = pbctools.cartesian(d, h)
+    sel = (d ** 2).sum(axis=1) < rcut ** 2
+    pi, pj = pi[sel], pj[sel]
+
+    order = np.lexsort((pj, pi))
+    return pi[order], pj[order]
+
+
 def gaussian_inv(x):
     """
     Beasley-Springer-Moro algorithm for approximating the inverse normal.
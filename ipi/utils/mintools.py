@@ -51,6 +51,9 @@ Functions:
              (R. Fletcher. Practical Methods of Optimization. 2nd ed.(1987)
         nichols: nichols algorithm for optimization (minimum or transition state)
         Simons, J. and Nichols, J. (1990), Int. J. Quantum Chem., 38: 263-276.
+        FIRE: fast inertial relaxation engine, damped dynamics without line search.
+            Bitzek, E. et al. (2006), Phys. Rev. Lett. 97, 170201 (FIRE), and
+            Guenole, J. et al. (2020), Comput. Mater. Sci. 175, 109584 (FIRE 2.0)
 """
 
 # TODO: CLEAN UP BFGS, L-BFGS, L-BFGS_nls TO NOT EXIT WITHIN MINTOOLS.PY
@@ -889,6 +892,75 @@ def L_BFGS(x0, d0, fdf, qlist, glist, fdf0, big_step, tol, itmax, m, scale, k):
     info(" @MINIMIZE: Updated search direction", verbosity.debug)
 
 
+def FIRE(x0, f0, v, m3, fdf, state, options, k, version=2):
+    """FIRE minimization, i.e. molecular dynamics with a velocity mixing
+    that steers the system downhill, and an adaptive time step.
+    Does one step, with a single evaluation of the forces, and no line search.
+        Arguments:
+            x0: initial point
+            f0: forces (minus the gradient) at x0
+            v: velocities, updated in place
+            m3: masses associated with each degree of freedom
+            fdf: function and gradient
+            state: array with the current time step, mixing parameter and
+                number of consecutive downhill steps, updated in place
+            options: dictionary with the initial time step dt, the maximum
+                time step dtmax, the largest displacement allowed in one step
+                maxstep, the initial mixing parameter alpha, the number of
+                downhill steps before accelerating nmin, and the number of steps
+                during which the time step is not decreased ndelay (FIRE 2.0 only)
+            k: iteration number
+            version: 1 for the original FIRE, 2 for FIRE 2.0
+        Returns:
+            The new point, and the function value and gradient there.
+    """
+
+    finc, fdec, falpha = 1.1, 0.5, 0.99
+    dt, alpha, npos = state
+
+    fnorm = np.sqrt(np.dot(f0.flatten(), f0.flatten()))
+    power = np.dot(f0.flatten(), v.flatten())
+    if power > 0.0:
+        if version == 1:
+            vnorm = np.sqrt(np.dot(v.flatten(), v.flatten()))
+            v[:] = (1.0 - alpha) * v + alpha * vnorm * f0 / fnorm
+        npos += 1
+        if npos > options["nmin"]:
+            dt = min(dt * finc, options["dtmax"])
+            alpha *= falpha
+    elif v.any():
+        info(" @MINIMIZE: FIRE going uphill, stopping", verbosity.debug)
+        npos = 0
+        if version == 1:
+            dt *= fdec
+            alpha = options["alpha"]
+        else:
+            # moves back by half of the step that overshot, to the middle of
+            # the overshoot, before the time step is reduced
+            x0 = x0 - 0.5 * dt * v
+            if k >= options["ndelay"]:
+                dt = max(dt * fdec, 0.02 * options["dt"])
+                alpha = options["alpha"]
+        v[:] = 0.0
+
+    # semi-implicit Euler integration
+    v += dt * f0 / m3
+    if version == 2 and fnorm > 0.0:
+        vnorm = np.sqrt(np.dot(v.flatten(), v.flatten()))
+        v[:] = (1.0 - alpha) * v + alpha * vnorm * f0 / fnorm
+
+    dx = dt * v
+    dxmax = np.amax(np.absolute(dx))
+    if dxmax > options["maxstep"]:
+        info(" @MINIMIZE: Scaled FIRE step", verbosity.debug)
+        dx *= options["maxstep"] / dxmax
+
+    state[:] = [dt, alpha, npos]
+    x = x0 + dx
+    fx, g = fdf(x)
+    return x, fx, g
+
+
 # Bracketing for NEB, TODO: DEBUG THIS IF USING SD OR CG OPTIONS FOR NEB
 def bracket_neb(fdf, fdf0=None, x0=0.0, init_step=1.0e-3):
     """Given an initial point, determines the initial bracket for the minimum
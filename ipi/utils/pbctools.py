@@ -0,0 +1,195 @@
+"""Vectorised periodic boundary conditions.
+
+The functions in this module act on arrays of Cartesian vectors whose last
+dimension has length 3, with any number of leading dimensions, e.g. the
+(nbeads, natoms, 3) views of the bead arrays given by beadtools.atomic_view.
+Whole ring polymers are thus folded, or compared, in a single pass. The
+routines accept output and work arrays, and can be applied in place, so
+they do not allocate memory when they are called repeatedly on the same
+buffers, except for the exact triclinic minimum image.
+
+The cell matrix h has the lattice vectors as columns, and ih is its
+inverse, so that the fractional coordinates of a position q are s = ih q.
+"""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import itertools
+
+import numpy as np
+
+from ipi.utils.depend import dstrip
+
+
+__all__ = [
+    "fractional",
+    "cartesian",
+    "fold",
+    "minimum_image",
+    "distance_table",
+    "pair_distances",
+]
+
+
+def fractional(q, ih, out=None):
+    """Computes fractional coordinates.
+
+    Args:
+       q: A (..., 3) array of positions.
+       ih: The inverse of the cell matrix.
+       out: An optional (..., 3) array the result is written to. It must not
+          be q itself.
+
+    Returns:
+       The (..., 3) array s = ih q.
+    """
+
+    return np.matmul(dstrip(q), dstrip(ih).T, out=out)
+
+
+def cartesian(s, h, out=None):
+    """Computes Cartesian coordinates from fractional ones.
+
+    Args:
+       s: A (..., 3) array of fractional coordinates.
+       h: The cell matrix.
+       out: An optional (..., 3) array the result is written to. It must not
+          be s itself.
+
+    Returns:
+       The (..., 3) array q = h s.
+    """
+
+    return np.matmul(dstrip(s), dstrip(h).T, out=out)
+
+
+def fold(s, out=None):
+    """Folds fractional coordinates in [-0.5, 0.5], as s - round(s).
+
+    Args:
+       s: A (..., 3) array of fractional coordinates.
+       out: An optional (..., 3) array the result is written to. It must not
+          be s itself.
+
+    Returns:
+       The folded fractional coordinates.
+    """
+
+    out = np.rint(s, out=out)
+    return np.subtract(s, out, out=out)
+
+
+def minimum_image(d, h, ih, out=None, work=None, exact=False):
+    """Applies the minimum image convention to an array of vectors.
+
+    The vectors are folded by rounding their fractional coordinates, which
+    gives the shortest image for orthorhombic cells, and for triclinic
+    cells as long as the vectors are shorter than half the smallest width
+    of the cell. Applied to positions, this returns their images in the cell
+    centred at the origin.
+
+    Args:
+       d: A (..., 3) array of vectors, e.g. the separations between atoms.
+       h: The cell matrix.
+       ih: The inverse of the cell matrix.
+       out: An optional (..., 3) array the result is written to. It can be
+          d itself.
+       work: An optional (..., 3) work array, distinct from d and out.
+       exact: If True, the images of the folded vectors in the neighbouring
+          cells that can be shorter are also checked, so that the shortest
+          image is found for any triclinic cell.
+
+    Returns:
+       The minimum image of the vectors.
+    """
+
+    h = dstrip(h)
+    s = fractional(d, ih, out=work)
+    r = np.rint(s, out=out)
+    np.subtract(s, r, out=s)
+    out = cartesian(s, h, out=r)
+
+    if exact and out.size > 0:
+        # a shorter image is no longer than the folded vector, so the offsets
+        # of its fractional coordinates are bounded by |d| |ih_i| + 1/2
+        d2 = (out ** 2).sum(axis=-1)
+        nmax = np.sqrt(d2.max()) * np.linalg.norm(dstrip(ih), axis=1) + 0.5
+        nmax = nmax.astype(int)
+        folded = out.copy()
+        for n in itertools.product(*[range(-k, k + 1) for k in nmax]):
+            if n == (0, 0, 0):
+                continue
+            t = np.add(folded, np.dot(h, n), out=s)
+            t2 = (t ** 2).sum(axis=-1)
+            closer = t2 < d2
+            if closer.any():
+                out[...] = np.where(closer[..., np.newaxis], t, out)
+                d2 = np.where(closer, t2, d2)
+    return out
+
+
+def distance_table(qa, qb, h, ih, exact=False):
+    """Computes the minimum-image separations between two sets of atoms.
+
+    Args:
+       qa: A (..., na, 3) array of positions.
+       qb: A (..., nb, 3) array of positions, with the same leading
+          dimensions, e.g. the same number of beads, as qa.
+       h: The cell matrix.
+       ih: The inverse of the cell matrix.
+       exact: Whether the exact triclinic minimum image is used.
+
+    Returns:
+       A (..., na, nb, 3) array with the separations q_a - q_b and a
+       (..., na, nb) array with the distances.
+    """
+
+    d = dstrip(qa)[..., :, np.newaxis, :] - dstrip(qb)[..., np.newaxis, :, :]
+    minimum_image(d, h, ih, out=d, exact=exact)
+    return d, np.sqrt((d ** 2).sum(axis=-1))
+
+
+def pair_distances(qa, qb, h, ih, rcut, exact=False, block=256):
+    """Finds the pairs of atoms of two sets that are closer than a cutoff.
+
+    The distance table is built for blocks of atoms of the first set, so
+    that the memory needed stays bounded for large systems.
+
+    Args:
+       qa: A (..., na, 3) array of positions.
+       qb: A (..., nb, 3) array of positions, with the same leading
+          dimensions as qa.
+       h: The cell matrix.
+       ih: The inverse of the cell matrix.
+       rcut: The cutoff distance.
+       exact: Whether the exact triclinic minimum image is used.
+       block: The number of atoms of the first set that are treated at once.
+
+    Returns:
+       A tuple with the indices of the pairs along each dimension of the
+       (..., na, nb) distance table, sorted as in np.nonzero, the (npairs, 3)
+       array of their separations q_a - q_b and the array of their distances.
+    """
+
+    qa, qb = dstrip(qa), dstrip(qb)
+    na = qa.shape[-2]
+    idx, dvec, dist = [], [], []
+    for i0 in range(0, max(na, 1), block):
+        d, r = distance_table(qa[..., i0 : i0 + block, :], qb, h, ih, exact=exact)
+        sel = np.nonzero(r < rcut)
+        idx.append(sel[:-2] + (sel[-2] + i0, sel[-1]))
+        dvec.append(d[sel])
+        dist.append(r[sel])
+
+    idx = [np.concatenate(i) for i in zip(*idx)]
+    if qa.ndim > 2:
+        # restores the order of np.nonzero over the whole table
+        order = np.lexsort(idx[::-1])
+        idx = [i[order] for i in idx]
+        dvec, dist = np.concatenate(dvec)[order], np.concatenate(dist)[order]
+    else:
+        dvec, dist = np.concatenate(dvec), np.concatenate(dist)
+    return tuple(idx), dvec, dist
@@ -0,0 +1,117 @@
+"""A pool of persistent worker threads.
+
+Used to run the steps of several systems, or the snapshots of several outputs,
+concurrently, without creating and joining new threads at every step.
+"""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import queue
+import threading
+import time
+
+
+__all__ = ["WorkerPool"]
+
+
+class WorkerPool(object):
+    """Runs batches of tasks on long-lived worker threads.
+
+    Each task of a batch gets its own worker, so that tasks that wait for each
+    other, e.g. force evaluations that are collected across systems, cannot
+    block the pool. Workers are created the first time they are needed, and
+    then reused for the following batches. They are daemon threads, so they
+    do not prevent the interpreter from exiting after a soft exit.
+
+    Attributes:
+       name: The prefix of the names of the worker threads.
+       nworkers: The number of worker threads.
+       times: The wall clock time spent in each task of the last batch.
+    """
+
+    def __init__(self, name="Worker"):
+        """Initializes WorkerPool.
+
+        Args:
+           name: The prefix of the names of the worker threads.
+        """
+
+        self.name = name
+        self._tasks = queue.Queue()
+        self._threads = []
+        self.times = []
+
+    @property
+    def nworkers(self):
+        return len(self._threads)
+
+    def _work(self):
+        """Runs tasks until it gets a None."""
+
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                return
+            func, kwargs, results, times, i, done = item
+            times[i] = -time.time()
+            try:
+                results[i] = func(**kwargs)
+            except SystemExit:
+                # a soft exit was triggered from this task: the worker survives
+                # and the main loop notices that the simulation must stop
+                pass
+            except BaseException as err:
+                results[i] = err
+            times[i] += time.time()
+            done.release()
+
+    def run(self, tasks):
+        """Runs a batch of tasks, and waits for all of them to finish.
+
+        Args:
+           tasks: A list of (function, kwargs) tuples.
+
+        Returns:
+           The list of the values returned by the functions.
+
+        Raises:
+           Any exception raised by one of the tasks, after all the others
+           have finished.
+        """
+
+        while len(self._threads) < len(tasks):
+            t = threading.Thread(
+                target=self._work, name="%s-%d" % (self.name, len(self._threads))
+            )
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+        results = [None] * len(tasks)
+        times = [0.0] * len(tasks)
+        done = threading.Semaphore(0)
+        for i, (func, kwargs) in enumerate(tasks):
+            self._tasks.put((func, kwargs, results, times, i, done))
+
+        for i in range(len(tasks)):
+            # This is necessary as waiting without timeout prevents main from receiving signals.
+            while not done.acquire(timeout=2.0):
+                pass
+
+        self.times = times
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+        return results
+
+    def stop(self):
+        """Stops the worker threads."""
+
+        for t in self._threads:
+            self._tasks.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
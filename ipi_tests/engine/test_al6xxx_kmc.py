@@ -0,0 +1,173 @@
+"""Tests the state cache of the Al-6xxx kinetic Monte Carlo, and the
+forcefield proxies used by its worker processes."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.atoms import Atoms
+from ipi.engine.cell import Cell
+from ipi.engine.forcefields import ForceField, FFProxy, ProxyChannel, ProxyServer
+from ipi.engine.motion.al6xxx_kmc import AlKMC, StateCache
+
+
+prng = np.random.RandomState(2021)
+
+
+def make_kmc(**kwargs):
+    """A 3x3x3 lattice with two vacancies, two Si and two Mg."""
+
+    return AlKMC(
+        mode="rfkmc",
+        geop={},
+        nstep=1,
+        a0=7.6,
+        ncell=3,
+        nvac=2,
+        nsi=2,
+        nmg=2,
+        neval=1,
+        diffusion_barrier_al=0.01,
+        diffusion_prefactor_al=1e-5,
+        diffusion_barrier_mg=0,
+        diffusion_prefactor_mg=0,
+        diffusion_barrier_si=0,
+        diffusion_prefactor_si=0,
+        **kwargs
+    )
+
+
+def test_lru():
+    """The least recently used entry is evicted first."""
+
+    cache = StateCache(max_len=2)
+    cache.put(b"a", 1.0, np.zeros(3))
+    cache.put(b"b", 2.0, np.zeros(3))
+    assert cache.get(b"a")[0] == 1.0
+    cache.put(b"c", 3.0, np.zeros(3))
+    assert b"a" in cache and b"c" in cache and b"b" not in cache
+    assert cache.get(b"b") is None
+    assert (cache.nhit, cache.ndisk, cache.nmiss) == (1, 0, 1)
+
+
+def test_sqlite(tmp_path):
+    """Entries evicted from memory, or written by another instance, are
+    read back from the database."""
+
+    dbfile = str(tmp_path / "states.db")
+    q = prng.normal(size=6)
+    cache = StateCache(max_len=1, dbfile=dbfile)
+    cache.put(b"a", 1.0, q)
+    cache.put(b"b", 2.0, q)
+    e, qa = cache.get(b"a")
+    assert e == 1.0 and cache.ndisk == 1
+    assert_almost_equal(qa, q)
+
+    other = StateCache(dbfile=dbfile)
+    assert other.get(b"b")[0] == 2.0
+    assert other.get(b"c") is None
+
+
+def test_canonical():
+    """Translated states share the key, and the cached geometry is mapped
+    back onto each of them."""
+
+    kmc = make_kmc()
+    state = np.asarray(list("SSMM" + "A" * 21 + "VV"))
+    prng.shuffle(state)
+    # the beads also hold a dummy atom for each vacancy
+    uid = kmc.unique_idx(state)
+    disp = 0.1 * prng.normal(size=(kmc.nsites, 3))
+    q = kmc.sites[uid] + disp[uid]
+    kmc.cache_store(state, -1.0, q.flatten())
+
+    key = kmc.canonical_state(state)[0]
+    for it in prng.choice(len(kmc.tperm), 5, replace=False):
+        tstate = state.copy()
+        tstate[kmc.tperm[it]] = state
+        assert kmc.canonical_state(tstate)[0] == key
+
+        e, tq = kmc.cache_fetch(tstate)
+        assert e == -1.0
+        # each atom sits on the translated site with the same displacement
+        tdisp = np.zeros(disp.shape)
+        tdisp[kmc.tperm[it]] = disp
+        tuid = kmc.unique_idx(tstate)
+        dq = tq - (kmc.sites[tuid] + tdisp[tuid]).flatten()
+        kmc.dcell.array_pbc(dq)
+        assert_almost_equal(dq, 0.0)
+
+    # swapping two different species gives a new state
+    other = state.copy()
+    other[[np.argmax(state == "S"), np.argmax(state == "A")]] = ["A", "S"]
+    assert kmc.canonical_state(other)[0] != key
+    assert kmc.cache_fetch(other) is None
+
+
+class HarmonicFF(ForceField):
+    """Harmonic potential centred at the origin."""
+
+    def poll(self):
+        with self._threadlock:
+            for r in self.requests:
+                if r["status"] == "Queued":
+                    q = r["pos"]
+                    r["result"] = [0.5 * np.dot(q, q), -q, np.zeros((3, 3)), ""]
+                    r["status"] = "Done"
+
+
+_channel = None
+
+
+def _init_proxy(requests, results, nworkers):
+    global _channel
+    with nworkers.get_lock():
+        slot = nworkers.value
+        nworkers.value += 1
+    _channel = ProxyChannel(slot, requests, results[slot])
+
+
+def _proxy_forces(q):
+    """Computes energy and forces through a proxy in a worker process."""
+
+    ff = FFProxy(HarmonicFF(name="harmonic", latency=1e-3), _channel)
+    ff.start()
+    atoms = Atoms(len(q) // 3)
+    atoms.q = q
+    r = ff.queue(atoms, Cell(10 * np.eye(3)))
+    while r["status"] != "Done":
+        time.sleep(1e-3)
+    ff.release(r)
+    ff.stop()
+    return r["result"][0], r["result"][1]
+
+
+def test_proxy():
+    """Worker processes get the forces from the forcefield of this process."""
+
+    ctx = multiprocessing.get_context("fork")
+    requests, results = ctx.Queue(), [ctx.Queue() for i in range(2)]
+    server = ProxyServer(
+        {"harmonic": HarmonicFF(name="harmonic", latency=1e-3)}, requests, results
+    )
+    server.start()
+    qs = prng.uniform(-1, 1, size=(5, 6))
+    with ProcessPoolExecutor(
+        2,
+        mp_context=ctx,
+        initializer=_init_proxy,
+        initargs=(requests, results, ctx.Value("i", 0)),
+    ) as pool:
+        out = list(pool.map(_proxy_forces, qs))
+    server.stop()
+    for q, (u, f) in zip(qs, out):
+        assert_almost_equal(u, 0.5 * np.dot(q, q))
+        assert_almost_equal(f, -q)
@@ -0,0 +1,81 @@
+"""Tests the vectorised bookkeeping of the alchemical exchanges."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.beads import Beads
+from ipi.engine.motion.alchemy import AlchemyMC
+from ipi.utils.depend import dstrip
+from ipi.utils.prng import Random
+from ipi.utils.units import Constants
+
+
+natoms, nbeads, temp = 30, 6, 1e-3
+mass = {"O": 29156.9, "H": 1837.4, "D": 3671.5}
+prng = np.random.RandomState(3)
+names = np.asarray(["O", "H", "D"] * (natoms // 3))
+qnm = prng.normal(scale=0.2, size=(nbeads, 3 * natoms))
+p = prng.normal(size=(nbeads, 3 * natoms))
+omegak2 = (np.sin(np.arange(nbeads) * np.pi / nbeads) * 2e-3) ** 2
+
+
+def reference(nxc):
+    """Tries the exchanges one at a time, as in a plain loop over atoms and beads."""
+
+    rng = Random(seed=5)
+    n, m, pp = names.copy(), np.asarray([mass[a] for a in names]), p.copy()
+    betaP = 1.0 / (Constants.kb * temp * nbeads)
+    ealc = 0.0
+    axlist = [a for a in range(natoms) if n[a] in ["H", "D"]]
+    spring = []
+    for a in axlist:
+        spr = 0.0
+        for b in range(1, nbeads):
+            spr += omegak2[b] * (qnm[b, 3 * a : 3 * a + 3] ** 2).sum()
+        spring.append(0.5 * spr)
+
+    ntries = rng.rng.poisson(nxc)
+    for x in range(ntries):
+        i = rng.rng.randint(len(axlist))
+        j = rng.rng.randint(len(axlist))
+        while n[axlist[i]] == n[axlist[j]]:
+            j = rng.rng.randint(len(axlist))
+        ai, aj = axlist[i], axlist[j]
+        de = (spring[i] - spring[j]) * (m[aj] - m[ai])
+        if np.exp(-betaP * de) > rng.u:
+            n[ai], n[aj] = n[aj], n[ai]
+            ratio = m[ai] / m[aj]
+            m[ai], m[aj] = m[aj], m[ai]
+            pp[:, 3 * ai : 3 * ai + 3] /= np.sqrt(ratio)
+            pp[:, 3 * aj : 3 * aj + 3] *= np.sqrt(ratio)
+            ealc -= de
+    return n, m, pp, ealc
+
+
+def test_exchanges():
+    """All the exchanges of a step are applied at once, with the same outcome
+    as applying them one by one."""
+
+    beads = Beads(natoms, nbeads)
+    beads.names = names
+    beads.m = np.asarray([mass[a] for a in names])
+    beads.p = p
+    alc = AlchemyMC(names=["H", "D"], nxc=40)
+    alc.beads, alc.prng = beads, Random(seed=5)
+    alc.nm = SimpleNamespace(qnm=qnm, omegak2=omegak2)
+    alc.ensemble = SimpleNamespace(temp=temp)
+    alc.step()
+
+    n, m, pp, ealc = reference(40)
+    assert (beads.names == n).all()
+    assert (n != names).any()
+    assert_almost_equal(dstrip(beads.m) / mass["H"], m / mass["H"])
+    assert_almost_equal(dstrip(beads.p), pp)
+    assert_almost_equal(alc.ealc / 1e-3, ealc / 1e-3)
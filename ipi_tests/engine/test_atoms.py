@@ -5,6 +5,8 @@
 # See the "licenses" directory for full license information.
 
 
+import pytest
+
 from ipi_tests.common.folder import local
 
 from ipi.utils.io import read_file
@@ -31,3 +33,23 @@ def test_names():
     for i, atom in enumerate(atoms):
         assert atom.name == expected[i]
         assert atom.name == atoms.names[i]
+
+
+def test_views():
+    """Tests that writes through Atom views update the Atoms object."""
+    atoms = get_atoms("test.pos_0.xyz")
+    atoms.m[:] = [16.0, 1.0, 1.0]
+    kin = atoms.kin
+    atoms[1].p = [1.0, 2.0, 2.0]
+    assert atoms.p[3:6].tolist() == [1.0, 2.0, 2.0]
+    assert atoms[1].kin == 4.5
+    assert atoms.kin == kin + 4.5
+    atoms[-1].m = 2.0
+    assert atoms.m[2] == 2.0
+    assert atoms[2].m3.tolist() == [2.0, 2.0, 2.0]
+
+    # in-place writes would bypass the depend machinery
+    with pytest.raises(ValueError):
+        atoms[0].q[0] = 1.0
+    with pytest.raises(ValueError):
+        atoms[0].p += 1.0
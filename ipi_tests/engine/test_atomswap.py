@@ -0,0 +1,128 @@
+"""Tests the concurrent evaluation of the trial moves of the atom swapper."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.beads import Beads
+from ipi.engine.cell import Cell
+from ipi.engine.forcefields import ForceField
+from ipi.engine.forces import Forces, ForceComponent
+from ipi.engine.motion.atomswap import AtomSwap
+from ipi.utils.depend import dstrip
+from ipi.utils.prng import Random
+from ipi.utils.units import Constants
+
+
+natoms, nbeads, temp = 8, 2, 1e-3
+# each site has its own spring constant, so swapping atoms changes the energy
+weights = np.linspace(0.5, 2.0, natoms)
+
+
+def energy(q):
+    return 0.5 * (weights * (q.reshape((-1, natoms, 3)) ** 2).sum(axis=2)).sum()
+
+
+class SiteFF(ForceField):
+    """Harmonic wells centred at the origin, a different one for each atom."""
+
+    def __init__(self, **kwargs):
+        super(SiteFF, self).__init__(**kwargs)
+        self.nevals = 0
+
+    def poll(self):
+        with self._threadlock:
+            for r in self.requests:
+                if r["status"] == "Queued":
+                    q = r["pos"]
+                    self.nevals += 1
+                    r["result"] = [
+                        energy(q),
+                        -np.repeat(weights, 3) * q,
+                        np.zeros((3, 3)),
+                        "",
+                    ]
+                    r["status"] = "Done"
+
+
+def make_swapper(nparallel):
+    ff = SiteFF(latency=1e-4, name="site", dopbc=False)
+    beads = Beads(natoms, nbeads)
+    beads.q = np.random.RandomState(7).normal(scale=0.05, size=(nbeads, 3 * natoms))
+    beads.names = np.asarray(["A", "B"] * (natoms // 2))
+    beads.m = np.ones(natoms)
+    cell = Cell(10 * np.eye(3))
+    forces = Forces()
+    forces.bind(
+        beads,
+        cell,
+        [ForceComponent("site", mts_weights=np.ones(1))],
+        {"site": ff},
+        open_paths=[],
+    )
+
+    swap = AtomSwap(names=["A", "B"], nxc=20, nparallel=nparallel)
+    ens = SimpleNamespace(temp=temp, add_econs=lambda e: None)
+    swap.bind(ens, beads, None, cell, forces, Random(seed=123), None)
+    ff.start()
+    return swap, ff
+
+
+def reference(q, nparallel):
+    """Draws the same trial moves, and accepts them with the exact energies."""
+
+    prng = Random(seed=123)
+    names = ["A", "B"] * (natoms // 2)
+    q = q.copy()
+    betaP = 1.0 / (Constants.kb * temp * nbeads)
+    ealc, nevals, nacc = 0.0, 0, 0
+    ntries = prng.rng.poisson(20)
+    for x in range(0, ntries, nparallel):
+        pairs = []
+        for k in range(min(nparallel, ntries - x)):
+            i = prng.rng.randint(natoms)
+            j = prng.rng.randint(natoms)
+            while names[i] == names[j]:
+                j = prng.rng.randint(natoms)
+            pairs.append((i, j))
+        nevals += len(pairs)
+        for k, (i, j) in enumerate(pairs):
+            dq = q.copy()
+            dq[:, 3 * i : 3 * i + 3], dq[:, 3 * j : 3 * j + 3] = (
+                q[:, 3 * j : 3 * j + 3],
+                q[:, 3 * i : 3 * i + 3],
+            )
+            de = energy(dq) - energy(q)
+            if np.exp(-betaP * de) > prng.u:
+                q = dq
+                ealc -= de
+                nacc += 1
+                # the following trials of the batch are evaluated again
+                nevals += len(pairs) - k - 1
+    assert 0 < nacc < ntries  # otherwise the test is not meaningful
+    return q, ealc, nevals * nbeads
+
+
+@pytest.mark.parametrize("nparallel", [1, 3, 8])
+def test_concurrent_trials(nparallel):
+    """Trials evaluated together are accepted as if they were evaluated one
+    after the other, starting from the configuration left by the previous ones."""
+
+    swap, ff = make_swapper(nparallel)
+    q, ealc, nevals = reference(dstrip(swap.beads.q).copy(), nparallel)
+    swap.forces.pot  # the initial configuration is evaluated once
+    ff.nevals = 0
+    swap.step()
+    ff.stop()
+
+    assert_almost_equal(swap.beads.q, q)
+    assert_almost_equal(swap.ealc, ealc)
+    assert_almost_equal(swap.forces.pot, energy(q))
+    assert ff.nevals == nevals
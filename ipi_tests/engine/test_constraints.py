@@ -0,0 +1,153 @@
+"""Tests the batched constraint solver against the group-by-group one."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.beads import Beads
+from ipi.engine.motion.constrained_dynamics import ConstraintSolver
+from ipi.utils.constrtools import (
+    sps,
+    ConstraintList,
+    AngleConstraint,
+    RigidBondConstraint,
+)
+
+
+nwater = 6
+prng = np.random.RandomState(4321)
+water = np.array([[0.0, 0.0, 0.0], [1.8, 0.0, 0.0], [-0.45, 1.75, 0.0]])
+q0 = (
+    water[np.newaxis]
+    + prng.uniform(0, 20.0, (nwater, 1, 3))
+    + 0.05 * prng.normal(size=(nwater, 3, 3))
+).flatten()
+p0 = prng.normal(size=3 * 3 * nwater)
+
+
+def water_constraints():
+    clist = []
+    for i in range(nwater):
+        o, h1, h2 = 3 * i, 3 * i + 1, 3 * i + 2
+        clist.append(
+            [
+                AngleConstraint(np.array([o, h1, h2]), [1.82]),
+                RigidBondConstraint(np.array([o, h1, o, h2]), [1.81, 1.81]),
+            ]
+        )
+    return clist
+
+
+def make_solver(batched=True, quasi_newton=True, sparse=None):
+    """Solver for a box of rigid waters. If sparse is None there is one
+    constraint list per molecule, otherwise all the constraints are
+    collected in a single list, with a sparse or dense Jacobian."""
+
+    beads = Beads(3 * nwater, 1)
+    beads.m = np.tile([16.0, 1.0, 1.0], nwater) * 1822.9
+    beads.q[0] = q0
+    beads.p[0] = p0
+    if sparse is None:
+        clist = [ConstraintList(c) for c in water_constraints()]
+    else:
+        clist = [ConstraintList(sum(water_constraints(), []), sparse=sparse)]
+    for c in clist:
+        c.bind(beads)
+    solver = ConstraintSolver(
+        clist,
+        dt=1.0,
+        tolerance=1e-10,
+        maxit=100,
+        batched=batched,
+        quasi_newton=quasi_newton,
+    )
+    solver.bind(beads)
+    return solver, beads
+
+
+def run_solver(*args, **kwargs):
+    """Two geodesic steps, checking that the final point is on the manifold."""
+
+    solver, beads = make_solver(*args, **kwargs)
+    solver.proj_manifold()
+    solver.proj_cotangent()
+    beads.q[0] += 0.01 * beads.p[0] / beads.m3[0]
+    solver.proj_manifold()
+    solver.proj_cotangent()
+    for c in solver.constraint_list:
+        c.q = beads.q[0][c.i3_unique]
+        assert np.abs(c.g).max() < 1e-8
+    return beads.q[0].copy(), beads.p[0].copy()
+
+
+def test_batch_kernels():
+    """Stacked constraint functions and Jacobians."""
+
+    solver, beads = make_solver(True)
+    assert len(solver.batches) == 1 and len(solver.unbatched) == 0
+    batch = solver.batches[0]
+    g = batch.g(q0[batch.i3_unique])
+    dg = batch.Dg()
+    for i, c in enumerate(solver.constraint_list):
+        c.q = q0[c.i3_unique]
+        assert_almost_equal(g[i], c.g)
+        assert_almost_equal(dg[i], c.Dg)
+
+
+def test_projections():
+    """Batched and sequential projections give the same phase-space point."""
+
+    qb, pb = run_solver(batched=True)
+    qs, ps = run_solver(batched=False)
+    assert_almost_equal(qb, qs)
+    assert_almost_equal(pb, ps)
+
+
+def test_newton():
+    """Quasi-Newton and exact Newton iterations converge to the same point."""
+
+    qb, pb = run_solver(batched=True)
+    for batched in [True, False]:
+        qn, pn = run_solver(batched=batched, quasi_newton=False)
+        assert_almost_equal(qb, qn)
+        assert_almost_equal(pb, pn)
+
+
+def test_sparse():
+    """Sparse and dense Jacobians of a long constraint list."""
+
+    solver, beads = make_solver(sparse=True)
+    clist = solver.constraint_list[0]
+    # without scipy the list falls back to the dense Jacobian
+    assert clist.sparse == (sps is not None)
+    if clist.sparse:
+        assert_almost_equal(clist.Dgs.toarray(), clist.Dg)
+    assert_almost_equal(clist.Gram, np.dot(clist.Dg / clist.m3, clist.Dg.T))
+
+    qs, ps = run_solver(sparse=True)
+    qd, pd = run_solver(sparse=False)
+    qb, pb = run_solver(batched=True)
+    assert_almost_equal(qs, qd)
+    assert_almost_equal(ps, pd)
+    assert_almost_equal(qs, qb)
+    assert_almost_equal(ps, pb)
+
+
+def test_no_convergence(monkeypatch):
+    """Both the batched and the sequential projections warn when they run
+    out of iterations."""
+
+    import ipi.engine.motion.constrained_dynamics as cd
+
+    for batched in [True, False]:
+        messages = []
+        monkeypatch.setattr(cd, "warning", lambda msg, lvl: messages.append(msg))
+        solver, beads = make_solver(batched=batched)
+        solver.maxit = 1
+        beads.q[0] += 0.1 * prng.normal(size=len(q0))
+        solver.proj_manifold()
+        assert len(messages) > 0
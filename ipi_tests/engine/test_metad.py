@@ -0,0 +1,93 @@
+"""Tests the batched update of a metadynamics bias shared by several walkers."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.beads import Beads
+from ipi.engine.cell import Cell
+from ipi.engine.forcefields import ForceField
+from ipi.engine.forces import Forces, ForceComponent
+from ipi.engine.smotion.metad import MetaDyn
+
+
+natoms, nbeads, nsystems = 3, 2, 4
+
+
+class HillsFF(ForceField):
+    """A bias that grows by one hill, centred at the origin, for each walker
+    update."""
+
+    def __init__(self, **kwargs):
+        super(HillsFF, self).__init__(**kwargs)
+        self.nhills, self.nevals, self.updates = 0, 0, []
+
+    def poll(self):
+        with self._threadlock:
+            for r in self.requests:
+                if r["status"] == "Queued":
+                    q = r["pos"]
+                    self.nevals += 1
+                    r["result"] = [
+                        self.nhills * 0.5 * (q ** 2).sum(),
+                        -self.nhills * q,
+                        np.zeros((3, 3)),
+                        "",
+                    ]
+                    r["status"] = "Done"
+
+    def mtd_update(self, pos, cell):
+        self.updates.append((np.copy(pos), np.copy(cell)))
+        self.nhills += len(pos)
+        return True
+
+
+def make_system(ff, weight, prng):
+    beads = Beads(natoms, nbeads)
+    beads.q = prng.normal(size=(nbeads, 3 * natoms))
+    cell = Cell(prng.uniform(5, 10) * np.eye(3))
+    bcomp = [ForceComponent("mtd", mts_weights=np.ones(1))]
+    bias = Forces()
+    bias.bind(beads, cell, bcomp, {"mtd": ff}, open_paths=[])
+    ensemble = SimpleNamespace(bcomp=bcomp, bweights=np.asarray([weight]), bias=bias)
+    return SimpleNamespace(beads=beads, cell=cell, ensemble=ensemble)
+
+
+def test_batched_update():
+    """All the walkers are passed to the forcefield in a single update, and
+    only the bias is recomputed, for all of them at once."""
+
+    ff = HillsFF(latency=1e-4, name="mtd", threaded=True, dopbc=False)
+    prng = np.random.RandomState(11)
+    # the last system does not feel the bias, and does not update it
+    syslist = [
+        make_system(ff, 1.0 if i < nsystems - 1 else 0.0, prng) for i in range(nsystems)
+    ]
+    metad = MetaDyn(metaff=["mtd"])
+    metad.syslist = syslist
+    ff.start()
+
+    for s in syslist:
+        s.ensemble.bias.pot
+    ff.nevals = 0
+    metad.step()
+
+    # every requested evaluation is already queued when the step returns
+    assert len(ff.requests) == (nsystems - 1) * nbeads
+    assert len(ff.updates) == 1
+    pos, cell = ff.updates[0]
+    assert_almost_equal(pos, [s.beads.qc for s in syslist[:-1]])
+    assert_almost_equal(cell, [s.cell.h for s in syslist[:-1]])
+
+    for s in syslist[:-1]:
+        assert_almost_equal(
+            s.ensemble.bias.pot, ff.nhills * 0.5 * (s.beads.q ** 2).sum()
+        )
+    ff.stop()
+    assert ff.nevals == (nsystems - 1) * nbeads
@@ -0,0 +1,74 @@
+"""Tests the construction of the nudged elastic band forces."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.motion.neb import neb_tangents, neb_springs, neb_forces
+
+
+nimg, natoms = 7, 2
+prng = np.random.RandomState(1357)
+bq = np.cumsum(prng.normal(size=(nimg, 3 * natoms)), axis=0)
+bf = prng.normal(size=(nimg, 3 * natoms))
+# two maxima, a minimum, and monotonic stretches in between
+be = np.array([0.0, 1.0, 2.0, 1.5, 1.8, 0.5, -1.0])
+spring = {"varsprings": False, "kappa": 0.7, "kappamax": 1.0, "kappamin": 0.2}
+
+
+def reference_tangent(ii):
+    """Improved tangent at image ii, image by image."""
+
+    d1, d2 = bq[ii] - bq[ii - 1], bq[ii + 1] - bq[ii]
+    if be[ii + 1] > be[ii] > be[ii - 1]:
+        tau = d2
+    elif be[ii + 1] < be[ii] < be[ii - 1]:
+        tau = d1
+    else:
+        demax = max(abs(be[ii + 1] - be[ii]), abs(be[ii - 1] - be[ii]))
+        demin = min(abs(be[ii + 1] - be[ii]), abs(be[ii - 1] - be[ii]))
+        if be[ii + 1] > be[ii - 1]:
+            tau = d2 * demax + d1 * demin
+        else:
+            tau = d2 * demin + d1 * demax
+    return tau / np.linalg.norm(tau)
+
+
+def test_tangents():
+    btau = neb_tangents(bq, be)
+    for ii in range(1, nimg - 1):
+        assert_almost_equal(btau[ii - 1], reference_tangent(ii))
+
+
+def test_forces():
+    """Perpendicular forces plus springs, with fixed end images."""
+
+    fneb = neb_forces(bq, bf, be, spring)
+    assert not fneb[[0, -1]].any()
+    for ii in range(1, nimg - 1):
+        tau = reference_tangent(ii)
+        fs = spring["kappa"] * (
+            np.linalg.norm(bq[ii + 1] - bq[ii]) - np.linalg.norm(bq[ii] - bq[ii - 1])
+        )
+        fref = bf[ii] - np.dot(bf[ii], tau) * tau + fs * tau
+        assert_almost_equal(fneb[ii], fref)
+
+    # the climbing image has no springs and goes up along the band
+    fclimb = neb_forces(bq, bf, be, spring, climb=True)
+    tau = reference_tangent(2)
+    assert_almost_equal(fclimb[2], bf[2] - 2 * np.dot(bf[2], tau) * tau)
+    assert_almost_equal(np.delete(fclimb, 2, axis=0), np.delete(fneb, 2, axis=0))
+
+
+def test_springs():
+    """Energy-weighted springs are stiffer close to the highest image."""
+
+    assert_almost_equal(neb_springs(be, spring), 0.7)
+    kappa = neb_springs(be, dict(spring, varsprings=True))
+    assert_almost_equal(kappa[[1, 2]], spring["kappamax"])
+    assert_almost_equal(kappa[[0, 5]], 0.2 + 0.8 * np.array([0.5, 0.25]))
+    assert kappa.min() >= spring["kappamin"]
@@ -0,0 +1,103 @@
+"""Tests the output pipeline, that writes out the outputs in a separate thread,
+and the fsync policy of the output streams."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import threading
+
+import pytest
+
+import ipi.engine.outputs as eoutputs
+from ipi.engine.outputs import BaseOutput, OutputWriter
+from ipi.utils.workers import WorkerPool
+
+
+class ListOutput(object):
+    """Collects the snapshots of a counter, waiting for a go signal before
+    writing each of them out."""
+
+    def __init__(self, filename, go=None):
+        self.filename = filename
+        self.counter = 0
+        self.written = []
+        self.go = go
+        self.started = threading.Event()
+
+    def snapshot(self):
+        self.counter += 1
+        return self.counter
+
+    def emit(self, snap):
+        self.started.set()
+        if self.go is not None:
+            self.go.wait()
+        self.written.append(snap)
+
+
+@pytest.mark.parametrize("size, threads", [(0, False), (3, False), (3, True)])
+def test_order(size, threads):
+    """The snapshots are written out in the order they are taken."""
+
+    outputs = [ListOutput("a"), ListOutput("b")]
+    pool = WorkerPool() if threads else None
+    writer = OutputWriter(queue=size, pool=pool)
+    writer.start()
+    for step in range(20):
+        writer.write(outputs)
+    writer.stop()
+    if pool is not None:
+        pool.stop()
+    for o in outputs:
+        assert o.written == list(range(1, 21))
+
+
+def test_drop():
+    """A full queue discards the new snapshots, if asked to."""
+
+    go = threading.Event()
+    o = ListOutput("a", go)
+    writer = OutputWriter(queue=2, backpressure="drop")
+    writer.start()
+    writer.write([o])
+    o.started.wait()
+    for step in range(5):
+        writer.write([o])
+    go.set()
+    writer.stop()
+    # one snapshot is being written, two are waiting, and the others are lost
+    assert writer.ndropped == 3
+    assert o.written == [1, 2, 3]
+
+
+def test_errors():
+    """The errors of the writer thread are raised in the main loop."""
+
+    class FailingOutput(ListOutput):
+        def emit(self, snap):
+            raise IOError("disk full")
+
+    writer = OutputWriter(queue=2)
+    writer.start()
+    writer.write([FailingOutput("a")])
+    with pytest.raises(IOError):
+        writer.stop()
+
+
+@pytest.mark.parametrize("fsync, nsync", [(0.0, 5), (1000.0, 1), (-1.0, 0)])
+def test_fsync(tmp_path, monkeypatch, fsync, nsync):
+    """Streams are committed to disk at most once every fsync seconds."""
+
+    synced = []
+    monkeypatch.setattr(eoutputs.os, "fsync", lambda stream: synced.append(stream))
+    o = BaseOutput(str(tmp_path / "out"))
+    o.fsync = fsync
+    o.bind()
+    for i in range(5):
+        o.write("line\n")
+        o.force_flush()
+    o.close_stream()
+    assert len(synced) == nsync
+    assert open(o.filename).read() == "line\n" * 5
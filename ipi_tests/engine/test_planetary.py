@@ -0,0 +1,86 @@
+"""Tests the cell-list screening and the block-sparse accumulation of the
+frequency matrix of the planetary model."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from ipi.engine.beads import Beads
+from ipi.engine.cell import Cell
+from ipi.engine.motion.planetary import Planetary
+from ipi.utils import sparse
+from ipi.utils.mathtools import neighbour_pairs
+
+
+prng = np.random.RandomState(2718)
+natoms, nbeads = 40, 4
+h = np.asarray([[10.0, 2.0, -1.0], [0.0, 9.0, 1.5], [0.0, 0.0, 11.0]])
+
+
+def brute_force(q, rcut):
+    d = q[:, np.newaxis] - q
+    d = np.dot(d, np.linalg.inv(h).T)
+    d -= np.round(d)
+    d = np.dot(d, h.T)
+    return np.tril((d ** 2).sum(axis=2) < rcut ** 2)
+
+
+@pytest.mark.parametrize("rcut", [2.5, 3.5, 6.0])
+def test_neighbour_pairs(rcut):
+    """The cell list finds the same pairs as the full distance matrix, also
+    when there are fewer than three bins along some directions."""
+
+    q = np.dot(prng.uniform(-1, 2, size=(natoms, 3)), h.T)
+    pi, pj = neighbour_pairs(q, h, np.linalg.inv(h), rcut)
+    assert (pi >= pj).all()
+    assert len(set(zip(pi, pj))) == len(pi)
+    mask = np.zeros((natoms, natoms), bool)
+    mask[pi, pj] = True
+    assert (mask == brute_force(q, rcut)).all()
+
+
+def test_sparse():
+    """The block-sparse frequency matrix is the screened dense one."""
+
+    qc = np.dot(prng.uniform(size=(natoms, 3)), h.T).flatten()
+    omegak = np.arange(nbeads) * 1e-3
+    samples = [
+        (prng.normal(size=(nbeads, 3 * natoms)), prng.normal(size=(nbeads, 3 * natoms)))
+        for i in range(3)
+    ]
+
+    matrices = []
+    for blocks in [False, True]:
+        plan = Planetary(timestep=1.0, screen=3.5, sparse=blocks)
+        plan.natoms = natoms
+        plan.dcell = Cell(h)
+        plan.dbeads = Beads(natoms, nbeads)
+        plan.dbeads.m = np.ones(natoms)
+        plan.dbeads.q = np.tile(qc, (nbeads, 1))
+        if blocks:
+            plan.pairs = plan.screen_pairs()
+            plan.omega2 = np.zeros((len(plan.pairs[0]), 3, 3))
+        else:
+            plan.omega2 = np.zeros((3 * natoms, 3 * natoms))
+        for qnm, fnm in samples:
+            plan.increment(SimpleNamespace(qnm=qnm, fnm=fnm, omegak=omegak))
+
+        if blocks:
+            matrices.append(plan.block_matrix())
+        else:
+            omega2 = plan.omega2 * plan.matrix_screen()
+            omega2 = np.tril(0.5 * (omega2 + omega2.T))
+            matrices.append(sparse.csc_matrix(omega2.astype(np.float16)))
+
+    dense, blocks = [m.toarray().astype(float) for m in matrices]
+    assert (blocks == np.tril(blocks)).all()
+    assert_allclose(blocks, dense, rtol=2e-3, atol=1e-6)
+    # the screening leaves out most of the matrix
+    assert matrices[1].density() < 0.5
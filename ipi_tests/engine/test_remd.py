@@ -0,0 +1,65 @@
+"""Tests the exchange schedules of replica exchange, that work on the matrix
+of the energies of the replicas in all the ensembles."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import itertools
+
+import numpy as np
+import pytest
+
+from ipi.engine.smotion.remd import ReplicaExchange
+from ipi.utils.prng import Random
+
+
+def make_remd(swapmode, nrep):
+    remd = ReplicaExchange(stride=1.0, swapmode=swapmode)
+    remd.prng = Random(seed=1234)
+    remd.repindex = np.arange(nrep)
+    return remd
+
+
+@pytest.mark.parametrize("swapmode", ["pairs", "gibbs"])
+def test_stationary(swapmode):
+    """The permutations of the ensembles are sampled with their Boltzmann
+    weight given the log-probabilities of the replicas in each ensemble."""
+
+    nrep = 3
+    lp = np.random.RandomState(42).normal(size=(nrep, nrep))
+    perms = list(itertools.permutations(range(nrep)))
+    weight = np.asarray([np.exp(lp[range(nrep), p].sum()) for p in perms])
+    weight /= weight.sum()
+
+    remd = make_remd(swapmode, nrep)
+    perm = np.arange(nrep)
+    count = np.zeros(len(perms))
+    for step in range(20000):
+        if swapmode == "pairs":
+            perm = remd.pairs_schedule(lp, perm)
+        else:
+            perm = remd.gibbs_schedule(lp, perm)
+        count[perms.index(tuple(perm))] += 1
+
+    assert np.abs(count / count.sum() - weight).max() < 0.02
+
+
+def test_neighbour():
+    """Even and odd neighbours along the ladder are tried in turn."""
+
+    remd = make_remd("neighbour", 5)
+    remd.repindex = np.asarray([0, 2, 1, 3, 4])
+    lp = np.zeros((5, 5))
+    # accepts every swap, the ladder is 0, 2, 1, 3, 4
+    perm = remd.neighbour_schedule(lp, np.arange(5), step=0)
+    assert list(perm) == [2, 3, 0, 1, 4]
+    perm = remd.neighbour_schedule(lp, np.arange(5), step=1)
+    assert list(perm) == [0, 2, 1, 4, 3]
+
+    # rejects every swap that would move replica 1 away from its ensemble
+    lp[1] = -np.inf
+    lp[1, 1] = 0.0
+    perm = remd.neighbour_schedule(lp, np.arange(5), step=0)
+    assert list(perm) == [2, 1, 0, 3, 4]
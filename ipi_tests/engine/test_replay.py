@@ -0,0 +1,101 @@
+"""Tests the replay of trajectories, with frames read when needed or
+prefetched in the background."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from ipi.engine.atoms import Atoms
+from ipi.engine.beads import Beads
+from ipi.engine.cell import Cell
+from ipi.engine.initializer import InitFile
+from ipi.engine.motion.replay import Replay
+from ipi.utils.io import print_file
+from ipi.utils.softexit import softexit
+
+
+natoms, nbeads, nframes = 3, 2, 4
+prng = np.random.RandomState(31)
+q = prng.uniform(0.0, 10.0, size=(nframes, nbeads, 3 * natoms))
+h = np.asarray([np.diag(d) for d in prng.uniform(10.0, 12.0, size=(nframes, 3))])
+
+
+class Finished(Exception):
+    pass
+
+
+def write_trajectory(mode, single):
+    """Writes the frames, in angstrom, in a single file with the beads one
+    after the other, or in a file for each bead."""
+
+    ext = "bin" if mode == "bin" else "xyz"
+    if single:
+        files = [open("traj." + ext, "wb" if mode == "bin" else "w")] * nbeads
+    else:
+        files = [
+            open("traj_%d.%s" % (b, ext), "wb" if mode == "bin" else "w")
+            for b in range(nbeads)
+        ]
+    atoms = Atoms(natoms)
+    atoms.names = ["H"] * natoms
+    for f in range(nframes):
+        for b in range(nbeads):
+            atoms.q = q[f, b]
+            print_file(
+                mode,
+                atoms,
+                Cell(h[f]),
+                files[b],
+                title="Step: %d Bead: %d " % (f, b),
+                key="positions",
+                dimension="length",
+                units="angstrom",
+                cell_units="angstrom",
+            )
+    for f in files:
+        f.close()
+    return "traj." + ext if single else "traj_*." + ext
+
+
+@pytest.mark.parametrize(
+    "prefetch, readers", [(0, "threads"), (2, "threads"), (1, "processes")]
+)
+@pytest.mark.parametrize("single", [True, False])
+@pytest.mark.parametrize("mode", ["xyz", "bin"])
+def test_replay(tmp_path, monkeypatch, mode, single, prefetch, readers):
+    """The frames are replayed in order, converted back to internal units,
+    until the end of the trajectory."""
+
+    monkeypatch.chdir(tmp_path)
+
+    def trigger(message=""):
+        raise Finished(message)
+
+    monkeypatch.setattr(softexit, "trigger", trigger)
+    monkeypatch.setattr(softexit, "flist", [])
+    filename = write_trajectory(mode, single)
+
+    replay = Replay(
+        intraj=InitFile(value=filename, mode=mode),
+        prefetch=prefetch,
+        readers=readers,
+    )
+    beads, cell = Beads(natoms, nbeads), Cell()
+    replay.bind(None, beads, None, cell, None, None, None)
+
+    # starting from a restart, the frames before the current step are skipped
+    replay.step(step=1)
+    for f in range(1, nframes):
+        assert_allclose(beads.q, q[f], rtol=1e-5)
+        assert_allclose(cell.h, h[f], rtol=1e-5, atol=1e-8)
+        if f < nframes - 1:
+            replay.step()
+    with pytest.raises(Finished):
+        replay.step()
+    if replay.reader is not None:
+        replay.reader.stop()
@@ -0,0 +1,96 @@
+"""Tests the reweighting of the samples of the previous iterations of the
+self-consistent phonons."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.motion.scphonons import SCPhononator
+
+
+prng = np.random.RandomState(4321)
+nsc, nmc, dof = 3, 20, 6
+
+
+def random_spd(scale):
+    a = prng.normal(size=(dof, dof))
+    return scale * (np.dot(a, a.T) / dof + np.eye(dof))
+
+
+def make_phononator():
+    """An SCP evaluator at its fourth iteration, with random samples."""
+
+    dm = SimpleNamespace(
+        beads=SimpleNamespace(q=prng.normal(scale=0.1, size=(1, dof))),
+        iD=random_spd(1.0),
+        K=random_spd(0.5),
+        isc=nsc,
+        max_steps=nmc,
+        dof=dof,
+        batch_weight_exponent=2,
+    )
+    scp = SCPhononator()
+    scp.dm = dm
+    scp.stack = None
+    scp.q = prng.normal(scale=0.1, size=(nsc + 1, 1, dof))
+    scp.iD = np.asarray([random_spd(1.0) for i in range(nsc + 1)])
+    scp.x = [q + prng.normal(scale=0.5, size=(nmc, dof)) for q in scp.q[:nsc]]
+    scp.f = [prng.normal(size=(nmc, dof)) for i in range(nsc)]
+    return scp
+
+
+def reference(scp):
+    """The force and the Hessian reweighted one batch at a time."""
+
+    qp, iDp, Kp = scp.dm.beads.q, scp.dm.iD, scp.dm.K
+    avg_f, var_f, avg_K, norm = 0.0, 0.0, 0.0, 0.0
+    batch_w = np.zeros(nsc)
+    for i in range(nsc):
+        x, f = scp.x[i], scp.f[i]
+        rw = np.exp(
+            -(0.50 * np.dot(iDp, (qp - x).T).T * (qp - x)).sum(axis=1)
+            + (0.50 * np.dot(scp.iD[i], (x - scp.q[i]).T).T * (x - scp.q[i])).sum(
+                axis=1
+            )
+        )
+        w = rw / rw.sum()
+        sw = np.exp(-np.var(np.log(w))) ** scp.dm.batch_weight_exponent
+        batch_w[i] = sw
+        rw = rw.reshape((nmc, 1))
+
+        fh = -1.0 * np.dot(x - qp, Kp)
+        V1, V2 = np.sum(rw), np.sum(rw ** 2)
+        avg_fi = np.sum(rw * (f - fh), axis=0) / V1
+        var_fi = np.sum(rw * (f - fh - avg_fi) ** 2, axis=0) / (V1 - V2 / V1)
+        avg_dKi = -np.dot(iDp, np.dot(((f - fh) * rw).T, (x - qp[-1])).T) / V1
+        avg_f += sw * avg_fi
+        var_f += sw ** 2 * var_fi
+        avg_K += sw * (Kp + 0.50 * (avg_dKi + avg_dKi.T))
+        norm += sw
+
+    return avg_f / norm, np.sqrt(var_f / norm ** 2 / nmc), batch_w, avg_K / norm
+
+
+def test_reweighting():
+    """The weights, force and Hessian of all the batches at once match the
+    batch-by-batch averages."""
+
+    scp = make_phononator()
+    f, f_err, batch_w, k = reference(scp)
+
+    w, sw, rw = scp.calculate_weights()
+    assert w.shape == (nsc, nmc)
+    assert_almost_equal(w.sum(axis=1), 1.0)
+    assert_almost_equal(sw, batch_w)
+
+    vf, vf_err, vbatch_w = scp.weighted_force()
+    assert_almost_equal(vf, f)
+    assert_almost_equal(vf_err, f_err)
+    assert_almost_equal(vbatch_w, batch_w)
+    assert_almost_equal(scp.weighted_hessian(), k)
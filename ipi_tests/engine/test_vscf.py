@@ -0,0 +1,72 @@
+"""Tests the harmonic basis and the batched sampling of the
+Born-Oppenheimer surface used by IMF and VSCF."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.beads import Beads
+from ipi.engine.motion.vscf import IMF
+
+
+class QuarticMover(object):
+    """Stands in for NormalModeMover, with a quartic potential along x."""
+
+    def __init__(self, nparallel):
+        self.nparallel = nparallel
+        self.beads = Beads(1, 1)
+        self.nbatch = 0
+
+    def evaluate(self, qs):
+        assert len(qs) <= self.nparallel
+        self.nbatch += 1
+        x = qs[:, 0]
+        return x ** 4 + 0.5 * x ** 2, -np.outer(4 * x ** 3 + x, [1, 0, 0])
+
+
+def test_psi_grid():
+    """The recurrence gives the normalised Hermite functions."""
+
+    special = pytest.importorskip("scipy.special")
+    imf = IMF()
+    alpha, q = 0.7, np.linspace(-10, 10, 401)
+    psigrid = imf.psi_grid(12, 1.0, alpha, q)
+    for n in range(12):
+        ref = (
+            (alpha / np.pi) ** 0.25
+            / np.sqrt(2.0 ** n * special.factorial(n))
+            * np.exp(-alpha * q ** 2 / 2)
+            * special.eval_hermite(n, np.sqrt(alpha) * q)
+        )
+        assert_almost_equal(psigrid[n], ref)
+        assert_almost_equal(imf.psi(n, 1.0, alpha, q), ref)
+    # orthonormal on a wide enough grid
+    assert_almost_equal(np.dot(psigrid, psigrid.T) * (q[1] - q[0]), np.eye(12))
+
+
+@pytest.mark.parametrize("stride,nextra", [(1, 2), (2, 0)])
+def test_sample_mode(stride, nextra):
+    """Batches of displacements sample the same points as one at a time."""
+
+    dev = np.asarray([0.1, 0.0, 0.0])
+    samples = []
+    for nparallel in [1, 4]:
+        imf = IMF()
+        imf.imm = QuarticMover(nparallel)
+        samples.append(imf.sample_mode(dev, lambda c, v, f: v > 1.0, stride, nextra))
+
+    # the potential exceeds the threshold for the first time at |c| = 9
+    nstop = 8 // stride + 1
+    assert imf.imm.nbatch == -(-2 * (nstop + nextra) // 4)
+    for d in [1, -1]:
+        c = samples[0][d][0]
+        assert c == list(d * (1 + stride * np.arange(nstop + nextra)))
+        for x, y in zip(samples[0][d], samples[1][d]):
+            assert_almost_equal(x, y)
+        v = samples[0][d][1]
+        assert v[nstop - 1] > 1.0 and v[nstop - 2] <= 1.0
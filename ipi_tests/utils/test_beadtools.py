@@ -0,0 +1,87 @@
+"""Tests the vectorised ring-polymer kernels against explicit loops."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.utils import beadtools
+
+
+nbeads, natoms = 4, 5
+prng = np.random.RandomState(12345)
+m = prng.uniform(1.0, 10.0, natoms)
+m3 = np.tile(np.repeat(m, 3), (nbeads, 1))
+p = prng.normal(size=(nbeads, 3 * natoms))
+q = prng.normal(size=(nbeads, 3 * natoms))
+nmf = prng.uniform(0.5, 2.0, nbeads)
+o_nmf = prng.uniform(0.5, 2.0, nbeads)
+w2 = prng.uniform(0.0, 1.0, nbeads)
+o_w2 = prng.uniform(0.0, 1.0, nbeads)
+opens = [1, 3]
+
+
+def test_kinetic():
+    """Kinetic energies and stress tensor."""
+
+    kins = beadtools.kinetic_energies(p, m3, nmf)
+    for b in range(nbeads):
+        assert_almost_equal(kins[b], 0.5 * np.dot(p[b], p[b] / m3[b]) / nmf[b])
+
+    ks = np.zeros((3, 3))
+    for b in range(nbeads):
+        for i in range(3):
+            for j in range(3):
+                ks[i, j] += np.dot(p[b, i::3], p[b, j::3] / m) / nmf[b]
+    assert_almost_equal(beadtools.kinetic_stress(p, m, nmf), ks)
+
+
+def test_centroid_virial():
+    """Centroid virial tensor, for all atoms and for a subset."""
+
+    f = prng.normal(size=(nbeads, 3 * natoms))
+    qc = q.mean(axis=0)
+    mask = beadtools.atom_mask(natoms, opens)
+    cv = np.zeros((3, 3))
+    cvm = np.zeros((3, 3))
+    for b in range(nbeads):
+        for i in range(3):
+            for j in range(3):
+                cv[i, j] += np.dot(q[b, i::3] - qc[i::3], f[b, j::3])
+                for a in opens:
+                    cvm[i, j] += (q[b, 3 * a + i] - qc[3 * a + i]) * f[b, 3 * a + j]
+    assert_almost_equal(beadtools.centroid_virial(q, qc, f), cv)
+    assert_almost_equal(beadtools.centroid_virial(q, qc, f, mask), cvm)
+
+
+def test_dynamical_masses():
+    """Dynamical masses with open paths."""
+
+    dm3 = m3 * nmf[:, np.newaxis]
+    for j in opens:
+        dm3[1:, 3 * j : 3 * j + 3] = m3[1:, 3 * j : 3 * j + 3] * o_nmf[1:, np.newaxis]
+    mask = beadtools.atom_mask(natoms, opens)
+    assert_almost_equal(beadtools.dynamical_masses(m3, nmf, mask, o_nmf), dm3)
+
+
+def test_springs():
+    """Spring energy and force with open paths."""
+
+    mask = beadtools.atom_mask(natoms, opens)
+    v = 0.0
+    f = np.zeros(q.shape)
+    for b in range(nbeads):
+        for a in range(natoms):
+            w = o_w2[b] if a in opens else w2[b]
+            v += (
+                0.5
+                * w
+                * m[a]
+                * np.dot(q[b, 3 * a : 3 * a + 3], q[b, 3 * a : 3 * a + 3])
+            )
+            f[b, 3 * a : 3 * a + 3] = -w * m[a] * q[b, 3 * a : 3 * a + 3]
+    assert_almost_equal(beadtools.spring_energy(q, m, w2, mask, o_w2), v)
+    assert_almost_equal(beadtools.spring_force(q, m, w2, mask, o_w2), f)
@@ -63,3 +63,18 @@ def test_readonly():
     """Depend: read-only flag"""
     atoms = ipi.engine.atoms.Atoms(2)
     atoms.q = np.zeros(2 * 3)
+
+
+def test_batch():
+    """Depend: Batched taint test"""
+
+    x = dp.depend_array(name="x", value=np.zeros(3, float))
+    y = dp.depend_value(name="y", func=lambda: x.sum() * 2, dependencies=[x])
+    assert y.get() == 0.0
+    with dp.dbatch():
+        x[0] = 1.0
+        x[1:] += 1.0
+        assert not y.tainted()
+        assert x.sum() == 3.0
+    assert y.tainted()
+    assert y.get() == 6.0
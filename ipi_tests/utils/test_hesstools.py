@@ -0,0 +1,140 @@
+"""Tests the finite-difference hessian engine."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import os
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+from ipi.utils.hesstools import (
+    get_hessian,
+    lattice_translations,
+    irreducible_atoms,
+    expand_translations,
+    apply_translational_invariance,
+)
+
+
+natoms, nbeads = 3, 2
+prng = np.random.RandomState(2468)
+a = prng.normal(size=(3 * natoms, 3 * natoms))
+hbead = [np.dot(a, a.T), np.dot(a, a.T) + np.eye(3 * natoms)]
+x0 = prng.normal(size=(nbeads, 3 * natoms))
+
+
+class QuadraticMapper(object):
+    """Gradient mapper for independent quadratic potentials on each bead."""
+
+    def __init__(self, fixatoms=[], fail_after=None):
+        fixdof = [3 * i + k for i in fixatoms for k in range(3)]
+        self.active = np.delete(np.arange(3 * natoms), fixdof)
+        self.fail_after = fail_after
+        self.ncalls = 0
+
+    def __call__(self, x, new_disc=True):
+        self.ncalls += 1
+        if self.fail_after is not None and self.ncalls > self.fail_after:
+            raise RuntimeError("interrupted")
+        g = np.asarray([np.dot(hbead[b], x[b]) for b in range(nbeads)])
+        return 0.0, g[:, self.active]
+
+
+class BatchQuadraticMapper(QuadraticMapper):
+    def batch_gradient(self, xs):
+        return np.asarray([self(x)[1] for x in xs])
+
+
+def reference(fixatoms=[]):
+    act = QuadraticMapper(fixatoms).active
+    return np.hstack([h[np.ix_(act, act)] for h in hbead])
+
+
+def test_hessian(tmp_path, monkeypatch):
+    """Sequential and batched evaluation, with and without fixed atoms."""
+
+    monkeypatch.chdir(tmp_path)
+    for fixatoms in [[], [1]]:
+        href = reference(fixatoms)
+        h = get_hessian(QuadraticMapper(fixatoms), x0, natoms, nbeads, fixatoms)
+        assert_almost_equal(h, href)
+        h = get_hessian(
+            BatchQuadraticMapper(fixatoms), x0, natoms, nbeads, fixatoms, batch=4
+        )
+        assert_almost_equal(h, href)
+        h = get_hessian(
+            QuadraticMapper(fixatoms), x0, natoms, nbeads, fixatoms, symmetrize=True
+        )
+        assert_almost_equal(h, href)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_restart(tmp_path, monkeypatch):
+    """An interrupted calculation restarts from the rows on disk."""
+
+    monkeypatch.chdir(tmp_path)
+    try:
+        get_hessian(QuadraticMapper(fail_after=7), x0, natoms, nbeads)
+    except RuntimeError:
+        pass
+    done = np.load("hessian_done.npy")
+    assert np.count_nonzero(done) == 3
+
+    gm = QuadraticMapper()
+    h = get_hessian(gm, x0, natoms, nbeads)
+    assert_almost_equal(h, reference())
+    # two evaluations for each missing row, plus the final one
+    assert gm.ncalls == 2 * (3 * natoms - 3) + 1
+
+
+def crystal_hessian(q, h, labels, k=(1.0, 0.5), rc=3.5):
+    """Force constants of pairwise springs between close neighbours, with
+    spring constants that depend on the species of the pair."""
+
+    n = len(labels)
+    ih = np.linalg.inv(h)
+    hess = np.zeros((3 * n, 3 * n))
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            d = q[i] - q[j]
+            d -= np.dot(h, np.round(np.dot(ih, d)))
+            if np.linalg.norm(d) < rc:
+                u = d / np.linalg.norm(d)
+                block = k[int(labels[i] == labels[j])] * np.outer(u, u)
+                hess[3 * i : 3 * i + 3, 3 * j : 3 * j + 3] -= block
+                hess[3 * i : 3 * i + 3, 3 * i : 3 * i + 3] += block
+    return hess
+
+
+def test_translations():
+    """Reconstruction of the force constants of a 3x2x2 supercell from
+    those of the atoms in the primitive cell."""
+
+    a = 4.0
+    basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0]]) * a
+    cells = np.array([[i, j, k] for i in range(3) for j in range(2) for k in range(2)])
+    q = (cells[:, np.newaxis, :] * a + basis[np.newaxis]).reshape((-1, 3))
+    labels = np.tile(["A", "B"], len(cells))
+    h = np.diag([3 * a, 2 * a, 2 * a])
+    # shuffles the atoms and shifts the whole crystal, to make things harder
+    order = prng.permutation(len(q))
+    q, labels = q[order] + 0.3, labels[order]
+    href = crystal_hessian(q, h, labels)
+
+    perms = lattice_translations(q.flatten(), h, labels)
+    assert len(perms) == len(cells)
+    reps = irreducible_atoms(perms)
+    assert len(reps) == 2
+
+    hs = np.zeros(href.shape)
+    rows = (3 * reps[:, np.newaxis] + np.arange(3)).flatten()
+    hs[rows] = href[rows]
+    # spoils the self terms, that should be restored by the sum rule
+    hs[rows, rows] += 0.1
+    hs = apply_translational_invariance(expand_translations(hs, perms, reps))
+    assert_almost_equal(hs, href)
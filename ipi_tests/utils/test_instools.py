@@ -0,0 +1,101 @@
+"""Tests the banded ring-polymer hessian tools of the instanton optimisers."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.motion.instanton import SpringMapper
+from ipi.engine.outputs import OutputMaker
+from ipi.utils.hesstools import clean_hessian, external_modes, get_dynmat
+from ipi.utils.instools import (
+    band_matvec,
+    banded_hessian,
+    nichols_banded,
+    print_instanton_hess,
+    red2comp,
+)
+from ipi.utils.mintools import nichols
+
+
+pytest.importorskip("scipy")
+
+natoms, nbeads = 3, 6
+prng = np.random.RandomState(1357)
+m = prng.uniform(1.0, 3.0, natoms) * 1837.0
+m3 = np.tile(np.repeat(m, 3), (nbeads, 1))
+q = prng.normal(size=(nbeads, 3 * natoms))
+coef = prng.uniform(0.8, 1.2, nbeads + 1).reshape(-1, 1)
+omega2 = 1e-5
+# physical hessian in the reduced (3*natoms, 3*natoms*nbeads) form, with one
+# unstable direction on each bead
+h = np.zeros((3 * natoms, 3 * natoms * nbeads))
+for i in range(nbeads):
+    a = 1e-2 * prng.normal(size=(3 * natoms, 3 * natoms))
+    a = a + a.T
+    a[0, 0] -= 0.2
+    h[:, 3 * natoms * i : 3 * natoms * (i + 1)] = a
+f0 = 1e-2 * prng.normal(size=(nbeads, 3 * natoms))
+f1 = 1e-2 * prng.normal(size=(nbeads, 3 * natoms))
+
+im = SimpleNamespace(
+    dbeads=SimpleNamespace(nbeads=nbeads, natoms=natoms, m3=m3),
+    omega2=omega2,
+    coef=coef,
+)
+
+
+def full_hessian():
+    return red2comp(h, nbeads, natoms, coef) + SpringMapper.spring_hessian(
+        natoms, nbeads, m3[0], omega2, coef=coef
+    )
+
+
+def test_band_matvec():
+    """The banded dynmat is the full ring-polymer dynmat."""
+
+    hb = banded_hessian(get_dynmat(h, m3, nbeads), im, masses=False, shift=0.0)
+    ism = m3.flatten() ** -0.5
+    dynmat = full_hessian() * np.outer(ism, ism)
+    x = prng.normal(size=(dynmat.shape[0], 2))
+    assert_almost_equal(band_matvec(hb, x) / 1e-2, np.dot(dynmat, x) / 1e-2)
+    assert_almost_equal(band_matvec(hb, x[:, 0]) / 1e-2, np.dot(dynmat, x[:, 0]) / 1e-2)
+
+
+@pytest.mark.parametrize("mode", [0, 1])
+@pytest.mark.parametrize("asr", ["none", "crystal", "poly"])
+def test_nichols_banded(asr, mode):
+    """The banded Nichols step is the one obtained by diagonalising the
+    full (projected) ring-polymer hessian."""
+
+    d, w = clean_hessian(full_hessian(), q, natoms, nbeads, m, m3, asr)
+    ref = nichols(f0, f1, d, w, m3, 0.3, mode=mode)
+
+    hb = banded_hessian(get_dynmat(h, m3, nbeads), im, masses=False, shift=0.0)
+    D = external_modes(q, natoms, nbeads, m, m3, asr)
+    db, d_x = nichols_banded(hb, (f0 + f1) * m3 ** -0.5, 0.3, mode=mode, D=D)
+    d_x = d_x.reshape(m3.shape) * m3 ** -0.5
+
+    assert_almost_equal(db / d[0], d[:3] / d[0])
+    assert_almost_equal(
+        d_x / np.amax(np.absolute(ref)), ref / np.amax(np.absolute(ref))
+    )
+
+
+def test_binary_hess(tmp_path):
+    """Binary hessian files hold the same numbers as the text ones."""
+
+    out = OutputMaker(prefix=str(tmp_path / "sim"))
+    print_instanton_hess("inst", 3, h, out)
+    print_instanton_hess("inst", 3, h, out, binary=True)
+    text = np.loadtxt(str(tmp_path / "sim.inst.hess_3"))
+    binary = np.load(str(tmp_path / "sim.inst.hess_3.npy"))
+    assert binary.shape == h.shape
+    assert_almost_equal(text, h.flatten())
+    assert (binary == h).all()
@@ -0,0 +1,72 @@
+"""Tests the minimization helpers."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from ipi.utils.mintools import FIRE
+
+
+options = {
+    "dt": 0.1,
+    "dtmax": 1.0,
+    "maxstep": 0.5,
+    "alpha": 0.1,
+    "nmin": 5,
+    "ndelay": 20,
+}
+prng = np.random.RandomState(97531)
+a = prng.normal(size=(6, 6))
+hessian = np.dot(a, a.T) + 0.5 * np.eye(6)
+xmin = prng.normal(size=(2, 3))
+
+
+class Quadratic(object):
+    def __init__(self):
+        self.ncalls = 0
+
+    def __call__(self, x):
+        self.ncalls += 1
+        dx = (x - xmin).flatten()
+        return 0.5 * np.dot(dx, np.dot(hessian, dx)), np.dot(hessian, dx).reshape(
+            x.shape
+        )
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_fire(version):
+    """FIRE converges to the minimum of a quadratic, with one function
+    evaluation per step and a bounded displacement."""
+
+    fdf = Quadratic()
+    x = np.zeros((2, 3))
+    v = np.zeros(x.shape)
+    state = np.array([options["dt"], options["alpha"], 0])
+    u, g = fdf(x)
+    for k in range(1000):
+        xold = x
+        x, u, g = FIRE(x, -g, v, np.ones(x.shape), fdf, state, options, k, version)
+        assert np.absolute(x - xold).max() <= options["maxstep"] + 1e-12
+        if np.absolute(g).max() < 1e-8:
+            break
+    assert fdf.ncalls == k + 2
+    assert_almost_equal(x, xmin)
+    assert options["dt"] * 0.02 <= state[0] <= options["dtmax"]
+
+
+def test_fire2_backoff():
+    """Going uphill, FIRE 2.0 moves back by half of the last step, computed
+    with the time step before it is reduced."""
+
+    x0, f0, v = np.zeros(3), -np.ones(3), np.ones(3)
+    state = np.array([0.2, 0.05, 3])
+    x, u, g = FIRE(
+        x0, f0, v, np.ones(3), lambda x: (0.0, 0.0 * x), state, options, 20, 2
+    )
+    assert_almost_equal(state, [0.1, options["alpha"], 0])
+    assert_almost_equal(x, -0.5 * 0.2 * np.ones(3) + 0.1 * 0.1 * f0)
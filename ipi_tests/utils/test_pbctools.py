@@ -0,0 +1,116 @@
+"""Tests the vectorised periodic boundary conditions against explicit loops."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import itertools
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from ipi.engine.beads import Beads
+from ipi.engine.cell import Cell
+from ipi.utils import pbctools
+from ipi.utils.depend import dd
+
+
+nbeads, natoms = 3, 10
+prng = np.random.RandomState(4242)
+orthorhombic = np.diag([8.0, 9.0, 10.0])
+# strongly skewed, so that rounding the fractional coordinates is not enough
+triclinic = np.asarray([[8.0, 6.5, -5.0], [0.0, 7.0, 4.5], [0.0, 0.0, 6.0]])
+
+
+def shortest(d, h):
+    """The shortest image of a vector, from the images in the 5x5x5 cells
+    around the folded vector."""
+
+    s = np.linalg.solve(h, d)
+    d = np.dot(h, s - np.round(s))
+    images = [d + np.dot(h, n) for n in itertools.product(range(-2, 3), repeat=3)]
+    return min(images, key=lambda x: np.dot(x, x))
+
+
+@pytest.mark.parametrize("h", [orthorhombic, triclinic])
+def test_minimum_image(h):
+    """Rounding the fractional coordinates gives the shortest image in an
+    orthorhombic cell, the exact search in any cell."""
+
+    ih = np.linalg.inv(h)
+    d = prng.uniform(-20.0, 20.0, size=(nbeads, natoms, 3))
+    ref = np.asarray([[shortest(x, h) for x in b] for b in d])
+
+    exact = pbctools.minimum_image(d, h, ih, exact=True)
+    assert_almost_equal((exact ** 2).sum(axis=-1), (ref ** 2).sum(axis=-1))
+    folded = pbctools.minimum_image(d, h, ih)
+    if h is orthorhombic:
+        assert_almost_equal(folded, ref)
+    # the images are lattice translations of the original vectors
+    s = np.dot(d - folded, ih.T)
+    assert_almost_equal(s, np.round(s))
+
+    # in place, with a work array
+    work = np.empty_like(d)
+    pbctools.minimum_image(d, h, ih, out=d, work=work, exact=True)
+    assert_almost_equal(d, exact)
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_pair_distances(exact):
+    """The pairs within the cutoff, in blocks, are those of the full table."""
+
+    h = triclinic
+    ih = np.linalg.inv(h)
+    qa = prng.uniform(0.0, 10.0, size=(nbeads, natoms, 3))
+    qb = prng.uniform(0.0, 10.0, size=(nbeads, natoms + 3, 3))
+    d, r = pbctools.distance_table(qa, qb, h, ih, exact=exact)
+    for b, i, j in itertools.product(range(nbeads), range(natoms), range(natoms + 3)):
+        ref = pbctools.minimum_image(qa[b, i] - qb[b, j], h, ih, exact=exact)
+        assert_almost_equal(d[b, i, j], ref)
+
+    sel = np.nonzero(r < 3.0)
+    idx, dvec, dist = pbctools.pair_distances(qa, qb, h, ih, 3.0, exact=exact, block=4)
+    for i, j in zip(idx, sel):
+        assert (i == j).all()
+    assert_almost_equal(dvec, d[sel])
+    assert_almost_equal(dist, r[sel])
+
+
+def test_cell_fractional():
+    """The fractional coordinates cached by the cell follow the positions
+    and the cell."""
+
+    beads = Beads(natoms, nbeads)
+    beads.q = prng.uniform(0.0, 10.0, size=(nbeads, 3 * natoms))
+    cell = Cell(triclinic)
+
+    def ref():
+        q = beads.q.reshape((nbeads, natoms, 3))
+        return np.dot(q, cell.ih.T).reshape((nbeads, 3 * natoms))
+
+    assert_almost_equal(cell.fractional(dd(beads).q), ref())
+    beads.q[1] += 1.0
+    assert_almost_equal(cell.fractional(dd(beads).q), ref())
+    cell.h = orthorhombic
+    assert_almost_equal(cell.fractional(dd(beads).q), ref())
+    # the centroid is computed when the fractional coordinates are requested
+    assert_almost_equal(cell.fractional(dd(beads).qc), ref().mean(axis=0), decimal=6)
+
+
+def test_array_pbc():
+    """Plain arrays and depend arrays are folded in place."""
+
+    cell = Cell(orthorhombic)
+    beads = Beads(natoms, nbeads)
+    q = prng.uniform(-20.0, 20.0, size=(nbeads, 3 * natoms))
+    ref = np.asarray(
+        [[shortest(x, orthorhombic) for x in b] for b in q.reshape((nbeads, natoms, 3))]
+    )
+    beads.q = q
+    cell.array_pbc(q)
+    cell.array_pbc(dd(beads).q)
+    assert_almost_equal(q, ref.reshape(q.shape))
+    assert_almost_equal(beads.q, ref.reshape(q.shape))
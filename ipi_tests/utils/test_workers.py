@@ -0,0 +1,58 @@
+"""Tests the pool of persistent worker threads."""
+
+# This file is part of i-PI.
+# i-PI Copyright (C) 2014-2015 i-PI developers
+# See the "licenses" directory for full license information.
+
+
+import sys
+import threading
+
+import pytest
+
+from ipi.utils.workers import WorkerPool
+
+
+def test_concurrent():
+    """The tasks of a batch run at the same time, on workers that are reused
+    by the following batches."""
+
+    pool = WorkerPool()
+    barrier = threading.Barrier(4, timeout=10.0)
+
+    def task(i):
+        # would time out if the tasks were not run concurrently
+        barrier.wait()
+        return i, threading.get_ident()
+
+    idents = set()
+    for step in range(5):
+        results = pool.run([(task, {"i": i}) for i in range(4)])
+        assert [r[0] for r in results] == list(range(4))
+        idents.update(r[1] for r in results)
+    assert pool.nworkers == 4
+    assert len(idents) == 4
+    assert len(pool.times) == 4
+    pool.stop()
+    assert pool.nworkers == 0
+
+
+def test_errors():
+    """Errors are raised in the calling thread once the batch is over, while
+    a soft exit only stops the task that triggered it."""
+
+    pool = WorkerPool()
+    done = []
+
+    def fail():
+        raise ValueError("broken")
+
+    def finish():
+        done.append(True)
+
+    with pytest.raises(ValueError):
+        pool.run([(fail, {}), (finish, {})])
+    assert done == [True]
+    assert pool.run([(sys.exit, {}), (finish, {})]) == [None, None]
+    assert len(done) == 2
+    pool.stop()
@@ -131,7 +131,7 @@ if input_geo != "None" or chk != "None":
         natoms = simulation.syslist[0].motion.beads.natoms
         nbeads = beads.nbeads
         q = beads.q
-        atom = beads._blist[0]
+        atom = beads[0]
 
     print(" ")
     print(
@@ -256,7 +256,7 @@ class Planets(object):
         # Boolean mask for frequencies close to 0
         self.mask = np.zeros(3 * self.natoms, dtype=bool)
 
-        self.fomega2 = open("{}.omega2".format(self.prefix), "r")
+        self.fomega2 = open("{}.omega2".format(self.prefix), "rb")
         self.fqc = open("{}.xc.xyz".format(self.prefix), "r")
         self.fpc = open("{}.pc.xyz".format(self.prefix), "r")
 
@@ -22,8 +22,8 @@ Syntax:
    of each file (default 0)"
 
 WARNING:
-   Since the python code for computing RDF is inefficient the fortran function in f90 folder must be compiled to
-   compute RDFs.
+   If the fortran module in the f90 folder has been compiled, it is used to compute the RDFs. Otherwise a
+   vectorised numpy implementation is used, which is slower for large systems.
 """
 
 import numpy as np
@@ -32,6 +32,63 @@ import glob
 import os
 from ipi.utils.units import unit_to_internal, unit_to_user, Constants, Elements
 from ipi.utils.io import read_file
+from ipi.utils import pbctools
+
+
+def f2divm(fatxyz, masses, nat, nob):
+    """Sum of the squared forces divided by the masses, as fortran.f2divm."""
+
+    f2 = fatxyz[:nob, : 3 * nat].reshape((nob, nat, 3)) ** 2
+    return (f2.sum(axis=2) / masses[:nat]).sum()
+
+
+def updateqrdf(
+    gOOr,
+    f2gOOr,
+    fgOOr,
+    atxyz1,
+    atxyz2,
+    fatxyz1,
+    fatxyz2,
+    nat1,
+    nat2,
+    nbins,
+    r_min,
+    r_max,
+    h,
+    ainv,
+    nbeads,
+    f2,
+    mass1,
+    mass2,
+):
+    """Accumulates the RDF and the PPI correction terms, as fortran.updateqrdf."""
+
+    tol = 0.00001
+    deltar = gOOr[1, 0] - gOOr[0, 0]
+    if mass1 == mass2:
+        norm = 1.0 / (nat1 * (nat2 - 1))
+    else:
+        norm = 1.0 / (nat1 * nat2)
+
+    qa = atxyz1[:nbeads].reshape((nbeads, -1, 3))
+    qb = atxyz2[:nbeads].reshape((nbeads, -1, 3))
+    (ih, ia, ib), vdAB, dAB = pbctools.pair_distances(qa, qb, h, ainv, r_max)
+    sel = dAB > r_min
+    ih, ia, ib, vdAB, dAB = ih[sel], ia[sel], ib[sel], vdAB[sel], dAB[sel]
+    ig = np.minimum(((dAB - r_min) / deltar).astype(int), nbins - 1)
+    count = np.bincount(ig, minlength=nbins) * norm
+    gOOr[:, 1] += count
+    f2gOOr += f2 * count
+
+    # PPI corrections
+    sel = dAB > tol
+    ih, ia, ib, vdAB, dAB, ig = ih[sel], ia[sel], ib[sel], vdAB[sel], dAB[sel], ig[sel]
+    fa = fatxyz1[:nbeads].reshape((nbeads, -1, 3))[ih, ia] / mass1
+    fb = fatxyz2[:nbeads].reshape((nbeads, -1, 3))[ih, ib] / mass2
+    temp = ((fa - fb) * vdAB).sum(axis=1) / (dAB * deltar) * norm
+    fgOOr -= np.bincount(ig[ig > 0] - 1, temp[ig > 0], minlength=nbins)
+    fgOOr += np.bincount(ig[ig < nbins - 1] + 1, temp[ig < nbins - 1], minlength=nbins)
 
 
 def RDF(prefix, temp, A, B, nbins, r_min, r_max, ss=0, unit="angstrom"):
@@ -40,12 +97,14 @@ def RDF(prefix, temp, A, B, nbins, r_min, r_max, ss=0, unit="angstrom"):
     sys.path.append(os.path.abspath(os.path.dirname(sys.argv[0]))[:-2] + "f90")
     try:
         import fortran
+
+        fortran_f2divm, fortran_updateqrdf = fortran.f2divm, fortran.updateqrdf
     except ImportError:
         print(
             "WARNING: No compiled fortran module for fast calculations have been found.\n"
-            "Proceeding the calculations is not possible."
+            "The numpy implementation is used instead."
         )
-        sys.exit(0)
+        fortran_f2divm, fortran_updateqrdf = f2divm, updateqrdf
 
     temperature = unit_to_internal(
         "temperature", "kelvin", float(temp)
@@ -170,9 +229,9 @@ def RDF(prefix, temp, A, B, nbins, r_min, r_max, ss=0, unit="angstrom"):
                     forB[bead, :] = force[bead, species_B]
 
                 # RDF amd PPI RDF calculations
-                f2temp = fortran.f2divm(force, mass, natoms, nbeads)
+                f2temp = fortran_f2divm(force, mass, natoms, nbeads)
                 f2 += f2temp
-                fortran.updateqrdf(
+                fortran_updateqrdf(
                     rdf,
                     f2rdf,
                     frdf,